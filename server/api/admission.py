@@ -0,0 +1,192 @@
+"""Admission control: per-class concurrency pools, per-user rate limits and load shedding.
+
+Requests are classified by route. Each class has its own concurrency pool,
+so slow LLM generations can never occupy the slots that clinical scoring
+(`/maternal/predict`, `/fetal/predict`) needs. A request that can't get a
+slot within its class's queue budget, or that already waited longer than
+that in front of the app (`X-Request-Start`, set by the proxy), is shed
+with a fast 503. Users who exceed their class's token bucket get a 429.
+Both carry a Retry-After header.
+
+Routes that can queue their work as a background job (`?async=true`) name
+a second class for that case: the submission returns at once, so it takes
+a slot from that class instead, but it is still charged to the route's
+per-user bucket, so the job queue can't be flooded past the LLM rate limit.
+"""
+import math
+import threading
+import time
+
+from flask import g, jsonify, request
+
+
+class RequestClass:
+    def __init__(self, name, max_concurrent, max_waiting=0, queue_timeout=0.0,
+                 rate=None, burst=None, retry_after=1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.rate = rate  # tokens per second per user, None for unlimited
+        self.burst = burst or (math.ceil(rate) if rate else None)
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._slots = threading.Condition()
+        self.counts = {'admitted': 0, 'rate_limited': 0, 'shed_queue_full': 0, 'shed_queue_time': 0}
+
+    def acquire(self, budget):
+        """Wait up to `budget` seconds for a slot; False means the request should be shed."""
+        with self._slots:
+            if self.active < self.max_concurrent:
+                self.active += 1
+                return True
+            if self.waiting >= self.max_waiting or budget <= 0:
+                self.counts['shed_queue_full'] += 1
+                return False
+            self.waiting += 1
+            deadline = time.monotonic() + budget
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counts['shed_queue_time'] += 1
+                        return False
+                    self._slots.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def count(self, outcome):
+        with self._slots:
+            self.counts[outcome] += 1
+
+    def release(self):
+        with self._slots:
+            self.active -= 1
+            self._slots.notify()
+
+    def snapshot(self):
+        with self._slots:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_waiting': self.max_waiting,
+                'queue_timeout': self.queue_timeout,
+                'rate_per_minute': self.rate * 60 if self.rate else None,
+                'active': self.active,
+                'waiting': self.waiting,
+                **self.counts,
+            }
+
+
+class TokenBuckets:
+    """Per-key token buckets, refilled lazily on each take."""
+
+    def __init__(self, rate, burst, max_keys=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key):
+        """Return 0 if a token was taken, else the seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            # Popped and re-inserted so the dict stays in least-recently-used order.
+            tokens, last = self._buckets.pop(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_keys:
+                # The least recently used buckets have refilled the longest, so dropping them loses least.
+                for stale in list(self._buckets)[:len(self._buckets) - self.max_keys]:
+                    del self._buckets[stale]
+            return wait
+
+
+def request_queue_time(headers, now=None):
+    """Seconds since the proxy received the request, from `X-Request-Start` (s, ms or us)."""
+    value = headers.get('X-Request-Start', '')
+    if value.startswith('t='):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return 0.0
+    # Proxies differ in units; normalise to seconds by magnitude.
+    while started > 1e11:
+        started /= 1000.0
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+
+class AdmissionController:
+    def __init__(self, classes, routes, default='default', user_key=None):
+        """`routes` is a list of `(path_prefix, methods or None, class_name[, async_class_name])`,
+        first match wins."""
+        self.classes = {c.name: c for c in classes}
+        self.routes = routes
+        self.default = default
+        self.user_key = user_key
+        self.buckets = {c.name: TokenBuckets(c.rate, c.burst) for c in classes if c.rate}
+        self.enabled = True
+
+    def classify(self, method, path, args=None):
+        """`(pool, limit)`: the class whose slot the request takes and the class whose
+        per-user bucket it is charged to."""
+        for prefix, methods, name, *async_name in self.routes:
+            if path.startswith(prefix) and (methods is None or method in methods):
+                if async_name and args is not None and args.get('async', '').lower() == 'true':
+                    return async_name[0], name
+                return name, name
+        return self.default, self.default
+
+    def _reject(self, status, message, retry_after, request_class):
+        response = jsonify({'error': message, 'class': request_class.name})
+        response.status_code = status
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response
+
+    def admit(self):
+        if not self.enabled or request.method == 'OPTIONS':
+            return None
+        pool, limit = self.classify(request.method, request.path, request.args)
+        request_class = self.classes[pool]
+        buckets = self.buckets.get(limit)
+        if buckets is not None and self.user_key is not None:
+            wait = buckets.take(self.user_key(request) or request.remote_addr)
+            if wait:
+                request_class.count('rate_limited')
+                return self._reject(429, 'Rate limit exceeded', wait, request_class)
+        budget = request_class.queue_timeout - request_queue_time(request.headers)
+        if budget < 0:
+            request_class.count('shed_queue_time')
+            return self._reject(503, 'Server busy, request shed', request_class.retry_after, request_class)
+        if not request_class.acquire(budget):
+            return self._reject(503, 'Server busy, request shed', request_class.retry_after, request_class)
+        request_class.count('admitted')
+        g.admission_class = request_class
+        return None
+
+    def release(self, exc=None):
+        request_class = g.pop('admission_class', None)
+        if request_class is not None:
+            request_class.release()
+
+    def init_app(self, app):
+        app.before_request(self.admit)
+        # teardown runs even when the view raises, so slots are always returned
+        app.teardown_request(self.release)
+
+    def in_flight(self):
+        """Requests currently holding a slot, across classes."""
+        return sum(c.active for c in self.classes.values())
+
+    def stats(self):
+        return {'enabled': self.enabled, 'classes': {name: c.snapshot() for name, c in self.classes.items()}}
@@ -0,0 +1,343 @@
+"""Streaming early-warning rules over the vitals, CTG and contraction write paths.
+
+Rules are declarative (plain dicts, so they can live in a JSON file):
+
+    {"id": "preeclampsia_bp", "stream": "vitals",
+     "any": [["systolic_bp", ">=", 140], ["diastolic_bp", ">=", 90]],
+     "count": 2, "within_s": 21600, "cooldown_s": 21600,
+     "severity": "high", "message": "..."}
+
+A rule fires when its condition matched `count` times within `within_s`
+seconds for one user. Per (user, rule) the engine keeps only the last
+`count` match timestamps, so each event costs O(rules for its stream)
+regardless of history length. After firing, the same rule stays quiet for
+that user for `cooldown_s` seconds (deduplication); suppressed alerts are
+counted. Fired alerts go to a pluggable sink.
+
+Windows run on event time (the reading's `created_at`), not arrival time,
+so a late upload lands where it belongs. In-memory state is per worker, so
+with a `loader` a multi-reading rule that matched re-reads the user's
+stored events for its window, and a matching reading handled by another
+worker (or before a restart) still counts. `fired_loader` does the same
+for the cooldown, from the alerts the sinks have already stored.
+"""
+import json
+import logging
+import operator
+import queue
+import threading
+from collections import OrderedDict, deque
+
+from trends import _timestamp
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    '>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+    '==': operator.eq, '!=': operator.ne,
+    'in': lambda value, options: value in options,
+}
+
+DEFAULT_RULES = [
+    {'id': 'severe_hypertension', 'stream': 'vitals',
+     'any': [['systolic_bp', '>=', 160], ['diastolic_bp', '>=', 110]],
+     'count': 1, 'cooldown_s': 3600, 'severity': 'critical',
+     'message': 'Blood pressure in the severe range (>=160/110)'},
+    {'id': 'preeclampsia_bp', 'stream': 'vitals',
+     'any': [['systolic_bp', '>=', 140], ['diastolic_bp', '>=', 90]],
+     'count': 2, 'within_s': 6 * 3600, 'cooldown_s': 6 * 3600, 'severity': 'high',
+     'message': 'Blood pressure at or above 140/90 twice within 6 hours'},
+    {'id': 'fever', 'stream': 'vitals', 'all': [['body_temp', '>=', 38.0]],
+     'count': 1, 'cooldown_s': 6 * 3600, 'severity': 'medium',
+     'message': 'Body temperature at or above 38 C'},
+    {'id': 'maternal_tachycardia', 'stream': 'vitals', 'all': [['heart_rate', '>=', 120]],
+     'count': 2, 'within_s': 3600, 'cooldown_s': 3 * 3600, 'severity': 'high',
+     'message': 'Heart rate at or above 120 bpm twice within an hour'},
+    {'id': 'high_glucose', 'stream': 'vitals', 'all': [['blood_glucose', '>=', 180]],
+     'count': 2, 'within_s': 24 * 3600, 'cooldown_s': 24 * 3600, 'severity': 'medium',
+     'message': 'Blood glucose at or above 180 mg/dL twice within a day'},
+    {'id': 'repeated_pathological_ctg', 'stream': 'ctg', 'all': [['status', '==', 'Pathological']],
+     'count': 2, 'within_s': 24 * 3600, 'cooldown_s': 12 * 3600, 'severity': 'critical',
+     'message': 'Two pathological CTG results within 24 hours'},
+    {'id': 'severe_decelerations', 'stream': 'ctg', 'all': [['severe_decelerations', '>', 0]],
+     'count': 1, 'cooldown_s': 3600, 'severity': 'critical',
+     'message': 'Severe decelerations on CTG'},
+    {'id': 'labour_511', 'stream': 'contractions', 'all': [['five_one_one', '==', True]],
+     'count': 1, 'cooldown_s': 2 * 3600, 'severity': 'high',
+     'message': 'Contractions 5 minutes apart, lasting 1 minute, for 1 hour (5-1-1)'},
+]
+
+
+class Rule:
+    def __init__(self, spec):
+        self.id = spec['id']
+        self.stream = spec['stream']
+        self.count = int(spec.get('count', 1))
+        self.within = float(spec.get('within_s', 0))
+        self.cooldown = float(spec.get('cooldown_s', self.within or 3600))
+        self.severity = spec.get('severity', 'medium')
+        self.message = spec.get('message', self.id)
+        if 'all' in spec:
+            self.any, clauses = False, spec['all']
+        elif 'any' in spec:
+            self.any, clauses = True, spec['any']
+        else:
+            raise ValueError(f"Rule {self.id} needs an 'all' or 'any' condition")
+        compiled = []
+        for field, op, expected in clauses:
+            if op not in OPERATORS:
+                raise ValueError(f"Rule {self.id}: unknown operator {op!r}")
+            compiled.append((field, OPERATORS[op], expected))
+        self._clauses = compiled
+
+    def matches(self, event):
+        for field, compare, expected in self._clauses:
+            value = event.get(field)
+            try:
+                hit = value is not None and compare(value, expected)
+            except TypeError:
+                hit = False
+            if hit == self.any:
+                # First hit decides `any`, first miss decides `all`.
+                return hit
+        return not self.any
+
+    def to_dict(self):
+        return {'id': self.id, 'stream': self.stream, 'count': self.count, 'within_s': self.within,
+                'cooldown_s': self.cooldown, 'severity': self.severity, 'message': self.message}
+
+
+def load_rules(path=None):
+    """Rules from a JSON file (a list of rule dicts), or the defaults."""
+    if not path:
+        return [Rule(spec) for spec in DEFAULT_RULES]
+    with open(path) as f:
+        return [Rule(spec) for spec in json.load(f)]
+
+
+class _RuleState:
+    __slots__ = ('matches', 'last_fired')
+
+    def __init__(self, count):
+        self.matches = deque(maxlen=count)
+        self.last_fired = None
+
+
+def _fires(stamps, ts, count, within):
+    """True if some `count` consecutive matches that include `ts` span at most `within` seconds."""
+    position = stamps.index(ts)
+    for start in range(max(0, position - count + 1), position + 1):
+        end = start + count - 1
+        if end < len(stamps) and stamps[end] - stamps[start] <= within:
+            return True
+    return False
+
+
+class RulesEngine:
+    def __init__(self, rules, sink=None, max_users=100000, recent_per_user=20, loader=None, fired_loader=None):
+        """`loader(stream, user_id, since)` returns the user's stored events for a stream
+        created at or after `since` (epoch seconds), each with `id` and `created_at`;
+        `fired_loader(user_id, rule_id)` returns when that rule last fired for the user, or None."""
+        self.rules = list(rules)
+        self.by_stream = {}
+        for rule in self.rules:
+            self.by_stream.setdefault(rule.stream, []).append(rule)
+        self.sink = sink
+        self.max_users = max_users
+        self.recent_per_user = recent_per_user
+        self.loader = loader
+        self.fired_loader = fired_loader
+        self._users = OrderedDict()  # user_id -> {rule_id: _RuleState}
+        self._recent = {}
+        self._lock = threading.Lock()
+        self.counts = {'events': 0, 'matches': 0, 'fired': 0, 'suppressed': 0, 'load_failures': 0}
+
+    def _stored(self, stream, user_id, event, ts, rules):
+        """Stored events for the windows of the multi-reading rules `event` matches, or None."""
+        if self.loader is None:
+            return None
+        windows = [rule.within for rule in rules if rule.count > 1 and rule.matches(event)]
+        if not windows:
+            return None
+        try:
+            rows = list(self.loader(stream, user_id, ts - max(windows)))
+        except Exception as e:
+            logger.warning(f"Could not load stored {stream} events for alert rules: {e}")
+            with self._lock:
+                self.counts['load_failures'] += 1
+            return None
+        # The event itself is usually stored already; don't count it twice.
+        return [row for row in rows if event.get('id') is None or row.get('id') != event['id']]
+
+    def _stored_fired(self, user_id, rule):
+        if self.fired_loader is None:
+            return None
+        try:
+            stored = self.fired_loader(user_id, rule.id)
+        except Exception as e:
+            logger.warning(f"Could not load fired alerts: {e}")
+            with self._lock:
+                self.counts['load_failures'] += 1
+            return None
+        return None if stored is None else _timestamp(stored)
+
+    def process(self, stream, user_id, event, ts=None):
+        """Evaluate one event at `ts`, by default its `created_at`; returns the alerts it fired."""
+        rules = self.by_stream.get(stream)
+        if not rules:
+            return []
+        if not isinstance(ts, float):
+            ts = _timestamp(event.get('created_at') if ts is None else ts)
+        stored = self._stored(stream, user_id, event, ts, rules)
+        due = []
+        with self._lock:
+            self.counts['events'] += 1
+            states = self._users.get(user_id)
+            if states is None:
+                states = self._users[user_id] = {}
+                if len(self._users) > self.max_users:
+                    evicted, _ = self._users.popitem(last=False)
+                    self._recent.pop(evicted, None)
+            else:
+                self._users.move_to_end(user_id)
+            for rule in rules:
+                if not rule.matches(event):
+                    continue
+                self.counts['matches'] += 1
+                state = states.get(rule.id)
+                if state is None:
+                    state = states[rule.id] = _RuleState(rule.count)
+                if rule.count > 1:
+                    stamps = list(state.matches)
+                    if stored is not None:
+                        stamps = [_timestamp(row.get('created_at')) for row in stored if rule.matches(row)]
+                    stamps = sorted(stamps + [ts])
+                    state.matches.clear()
+                    state.matches.extend(stamps[-rule.count:])
+                    if not _fires(stamps, ts, rule.count, rule.within):
+                        continue
+                due.append((rule, state))
+        if not due:
+            return []
+        # Looked up outside the lock; only rules about to fire pay for it.
+        stored_fired = [self._stored_fired(user_id, rule) for rule, _ in due]
+        fired = []
+        with self._lock:
+            for (rule, state), last_stored in zip(due, stored_fired):
+                last_fired = max((t for t in (state.last_fired, last_stored) if t is not None), default=None)
+                if last_fired is not None and abs(ts - last_fired) < rule.cooldown:
+                    self.counts['suppressed'] += 1
+                    continue
+                state.last_fired = ts
+                state.matches.clear()
+                alert = {
+                    'UID': user_id,
+                    'rule': rule.id,
+                    'severity': rule.severity,
+                    'message': rule.message,
+                    'stream': stream,
+                    'triggered_at': ts,
+                }
+                self.counts['fired'] += 1
+                self._recent.setdefault(user_id, deque(maxlen=self.recent_per_user)).append(alert)
+                fired.append(alert)
+        if self.sink is not None:
+            for alert in fired:
+                self.sink.send(alert)
+        return fired
+
+    def recent(self, user_id):
+        with self._lock:
+            return list(self._recent.get(user_id, ()))
+
+    def stats(self):
+        with self._lock:
+            stats = {'rules': len(self.rules), 'users': len(self._users), **self.counts}
+        if self.sink is not None and hasattr(self.sink, 'stats'):
+            stats['sink'] = self.sink.stats()
+        return stats
+
+
+class LogSink:
+    def send(self, alert):
+        logger.warning(f"[Alert] {alert['severity']} {alert['rule']} for {alert['UID']}: {alert['message']}")
+
+
+class MemorySink:
+    def __init__(self):
+        self.alerts = []
+
+    def send(self, alert):
+        self.alerts.append(alert)
+
+
+class SupabaseSink:
+    """Insert alerts into a Supabase table (default `alerts`)."""
+
+    def __init__(self, client, table='alerts'):
+        self.client = client
+        self.table = table
+
+    def send(self, alert):
+        from datetime import datetime
+        row = dict(alert, triggered_at=datetime.utcfromtimestamp(alert['triggered_at']).isoformat())
+        self.client.table(self.table).insert(row).execute()
+
+
+class WebhookSink:
+    def __init__(self, url, timeout=3.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        import requests
+        requests.post(self.url, json=alert, timeout=self.timeout).raise_for_status()
+
+
+class FanoutSink:
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def send(self, alert):
+        for sink in self.sinks:
+            try:
+                sink.send(alert)
+            except Exception as e:
+                logger.warning(f"Alert sink {type(sink).__name__} failed: {e}")
+
+
+class BackgroundSink:
+    """Deliver alerts on a daemon thread so slow sinks stay off the request path."""
+
+    def __init__(self, sink, max_queue=10000):
+        self.sink = sink
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.delivered = 0
+        self.dropped = 0
+        self.failed = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def send(self, alert):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-sink', daemon=True)
+                self._thread.start()
+        try:
+            self._queue.put_nowait(alert)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            alert = self._queue.get()
+            try:
+                self.sink.send(alert)
+                self.delivered += 1
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Alert delivery failed: {e}")
+
+    def stats(self):
+        return {'queued': self._queue.qsize(), 'delivered': self.delivered,
+                'dropped': self.dropped, 'failed': self.failed}
@@ -1,8 +1,10 @@
-from flask import Flask, request, jsonify
-import joblib
+from flask import Flask, request
 import numpy as np
-import pandas as pd
 import os
+import json
+import hashlib
+import math
+import time
 import requests
 import jwt
 from dotenv import load_dotenv
@@ -10,20 +12,39 @@ load_dotenv()
 from flask_cors import CORS
 from datetime import datetime
 from typing import Dict, List, Optional, Union
-from sklearn.feature_extraction import DictVectorizer
 from flask_restx import Api, Resource, fields, Namespace
-from supabase import create_client, Client
 import logging
 from ml_models import SymptomClassifier, SymptomRiskModel, RemedyRecommendationModel
+from llm_gateway import get_gateway
+from remedy_engine import TieredRemedyEngine
+from retrieval import BM25Index, TokenLedger, format_snippets, usage_report
+from semantic_cache import ReviewQueue, SemanticCache, fit_vectorizer, is_context_free
+from jobs import JobQueue, JobQueueFull
+from admission import AdmissionController, RequestClass
+from resilience import TRANSIENT_ERRORS, GuardedClient, LastKnownGood, breakers
+from trends import TrendEngine, _timestamp
+from tracking import TrackingEngine
+from explain import Explainer
+from chat_sync import ChatSync
+from diet_library import DietLibrary
+from compression import Compressor
+from warmup import Warmup
+from schemas import compile_model, output_json, validate_request
+import structured
+from drift import DriftMonitor, load_reference
+from shadow import Candidate, ShadowEvaluator, ShadowStore
+from reports import SectionCache, render_weekly_report, week_bounds
+import portable
+from profiler import (AllocationTracker, ProfilerBusy, SamplingProfiler, folded, folded_allocations,
+                      top_functions)
+from alerts import (BackgroundSink, FanoutSink, LogSink, RulesEngine, SupabaseSink, WebhookSink,
+                    load_rules)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app)
-
-# Initialize Flask-RestX API with documentation settings
+# Initialize Flask-RestX API with documentation settings; it is bound to the
+# Flask app in create_app()
 api = Api(
-    app,
     version='1.0',
     title='AyurJanani Prenatal Care API',
     description='''Comprehensive API for prenatal health monitoring and personalized care recommendations.
@@ -79,8 +100,35 @@ generate_recommendations = Namespace('recommendations',
     description='''Personalized lifestyle recommendations.
     Generates daily activities, music, exercises, and wellness tips based on health data.'''
 )
+kicks_ns = Namespace('kicks',
+    description='''Fetal kick counting.
+    Batched kick uploads with kicks per 2-hour window and time to 10 kicks.'''
+)
+contractions_ns = Namespace('contractions',
+    description='''Contraction timing.
+    Batched contraction uploads with frequency, duration, interval and 5-1-1 detection.'''
+)
+alerts_ns = Namespace('alerts',
+    description='''Early-warning alerts raised from vitals and CTG readings.
+    Rules such as BP above preeclampsia thresholds twice within 6 hours.'''
+)
+jobs_ns = Namespace('jobs',
+    description='''Background generation jobs.
+    Poll or long-poll for diet plans, recommendations and remedies submitted with ?async=true.'''
+)
+reports_ns = Namespace('reports',
+    description='''Medical documents for patients and their care providers.
+    Weekly PDF summaries of vitals, CTG, symptoms, risk assessments and remedy recommendations.'''
+)
+admin_ns = Namespace('admin',
+    description='''Worker diagnostics for administrators.
+    Sampling CPU profiles (folded stacks for flame graphs) and tracemalloc allocation reports.'''
+)
 
 # Add namespaces to API
+# Responses (NumPy values included) go through the orjson-backed encoder.
+api.representation('application/json')(output_json)
+
 api.add_namespace(auth_ns)
 api.add_namespace(maternal_ns)
 api.add_namespace(fetal_ns)
@@ -88,6 +136,12 @@ api.add_namespace(diet_ns)
 api.add_namespace(chat_ns)
 api.add_namespace(ayurveda_ns)
 api.add_namespace(generate_recommendations)
+api.add_namespace(jobs_ns)
+api.add_namespace(alerts_ns)
+api.add_namespace(kicks_ns)
+api.add_namespace(contractions_ns)
+api.add_namespace(reports_ns)
+api.add_namespace(admin_ns)
 
 # Shared models across namespaces
 auth_header = api.model('AuthHeader', {
@@ -105,6 +159,13 @@ error_response = api.model('ErrorResponse', {
 
 # Maternal namespace models
 maternal_input = maternal_ns.model('MaternalInput', {
+    'age': fields.Integer(
+        required=True,
+        description='Age in years',
+        example=28,
+        min=10,
+        max=70
+    ),
     'systolic_bp': fields.Integer(
         required=True,
         description='Systolic blood pressure in mmHg',
@@ -149,7 +210,8 @@ maternal_response = maternal_ns.model('MaternalResponse', {
 
 # Fetal namespace models
 fetal_input = fetal_ns.model('FetalInput', {
-    'features': fields.List(fields.Float, required=True, description='List of CTG features, exactly 15 values required')
+    'features': fields.List(fields.Float, required=True, min_items=15, max_items=15,
+                            description='List of CTG features, exactly 15 values required')
 })
 
 fetal_response = fetal_ns.model('FetalResponse', {
@@ -157,6 +219,26 @@ fetal_response = fetal_ns.model('FetalResponse', {
     'status': fields.String(description='Detailed status description')
 })
 
+# Kick and contraction models
+kick_input = kicks_ns.model('KickInput', {
+    'kicks': fields.List(fields.Raw, required=True,
+        description='Kick times as ISO 8601 timestamps, or epoch seconds or milliseconds (number or string)',
+        example=['2024-05-01T10:15:00Z', 1714558560]),
+    'session_id': fields.String(description='Client kick-counting session')
+})
+
+contraction_event = contractions_ns.model('ContractionEvent', {
+    'start_time': fields.Raw(required=True,
+        description='Start as ISO 8601 timestamp, or epoch seconds or milliseconds (number or string)'),
+    'end_time': fields.Raw(description='End time, same formats; either this or duration is required'),
+    'duration': fields.Float(description='Duration in seconds')
+})
+
+contraction_input = contractions_ns.model('ContractionInput', {
+    'contractions': fields.List(fields.Nested(contraction_event), required=True),
+    'session_id': fields.String(description='Client contraction-timing session')
+})
+
 # Diet namespace models
 diet_input = diet_ns.model('DietInput', {
     'trimester': fields.String(
@@ -206,7 +288,9 @@ diet_response = diet_ns.model('DietResponse', {
 - Grilled tofu with herbs
 - Brown rice
 - Sautéed spinach
-''')
+'''),
+    'source': fields.String(description='library (precomputed cohort plan) or llm', enum=['library', 'llm']),
+    'cohort': fields.String(description='Cohort of the library plan, e.g. second/vegetarian/nausea')
 })
 
 # Chat namespace models
@@ -218,10 +302,21 @@ chat_input = chat_ns.model('ChatInput', {
     )
 })
 
+chat_delta = chat_ns.model('ChatDelta', {
+    'messages': fields.List(fields.Raw, description='Messages after index `since`'),
+    'since': fields.Integer(description='Index the messages start at'),
+    'total': fields.Integer(description='Messages in the full history; pass as `since` next time'),
+    'reset': fields.Boolean(description='True when `since` was past the end and the full history was sent')
+})
+
 chat_response = chat_ns.model('ChatResponse', {
     'response': fields.String(
         description='AI assistant response',
         example='For morning sickness, try eating small, frequent meals and consider these foods: \n- Ginger tea or candies\n- Plain crackers\n- Bananas\n- Toast with honey\n- Cold foods like yogurt\nAvoid spicy or greasy foods, and stay hydrated.'
+    ),
+    'cached': fields.Boolean(
+        description='True when the answer came from the semantic answer cache',
+        example=False
     )
 })
 
@@ -276,6 +371,9 @@ risk_response = ayurveda_ns.model('RiskResponse', {
                 enum=['low', 'medium', 'high']
             )
         }))
+    ),
+    'degraded': fields.Boolean(
+        description='True when the latest vitals were unavailable and stale or default values were used'
     )
 })
 
@@ -295,8 +393,7 @@ remedy_input = ayurveda_ns.model('RemedyInput', {
         example=['morning sickness', 'fatigue']
     ),
     'prakriti': fields.String(
-        required=True,
-        description='Ayurvedic body type (Prakriti)',
+        description='Ayurvedic body type (Prakriti); decided from the symptoms when omitted',
         example='Pitta-Vata',
         enum=['Vata', 'Pitta', 'Kapha', 'Vata-Pitta', 'Pitta-Kapha', 'Vata-Kapha', 'Tridoshic']
     )
@@ -316,13 +413,23 @@ remedy_response = ayurveda_ns.model('RemedyResponse', {
                 max=1
             )
         }))
+    ),
+    'prakriti': fields.String(
+        description='Prakriti used for the recommendation',
+        example='Vata'
+    ),
+    'tier': fields.String(
+        description='Which tier produced the answer',
+        example='local',
+        enum=['local', 'llm', 'local_fallback']
     )
 })
 
 # Response Models
 prediction_response = api.model('PredictionResponse', {
     'prediction': fields.String(description='Predicted risk level'),
-    'status': fields.String(description='Detailed status description')
+    'status': fields.String(description='Detailed status description'),
+    'explanation': fields.Raw(description='Per-feature contributions to the predicted class (with ?explain=true)')
 })
 
 error_response = api.model('ErrorResponse', {
@@ -348,17 +455,228 @@ recommendation_response = api.model('RecommendationResponse', {
     )
 })
 
+job_response = jobs_ns.model('JobResponse', {
+    'job_id': fields.String(description='Job identifier'),
+    'kind': fields.String(description='diet, recommendations or remedy', example='diet'),
+    'status': fields.String(description='queued, running, done or failed', example='queued'),
+    'created_at': fields.Float(description='Submission time (epoch seconds)'),
+    'started_at': fields.Float(description='Start time (epoch seconds)'),
+    'finished_at': fields.Float(description='Completion time (epoch seconds)'),
+    'result': fields.Raw(description='Endpoint response body, once done'),
+    'error': fields.String(description='Error message, if failed'),
+    'status_url': fields.String(description='Where to poll for the result', example='/jobs/3f2a...')
+})
+
+# Compiled once; handlers reject malformed bodies before any model or DB work.
+maternal_validator = compile_model(maternal_input)
+fetal_validator = compile_model(fetal_input)
+diet_validator = compile_model(diet_input)
+chat_validator = compile_model(chat_input)
+symptom_validator = compile_model(symptom_input)
+symptom_risk_validator = compile_model(symptom_risk_input)
+remedy_validator = compile_model(remedy_input)
+
 # Environment variables and other configurations
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
-SUPABASE_JWT_SECRET = os.environ["SUPABASE_JWT_SECRET"]
+SUPABASE_JWT_SECRET = os.environ.get("SUPABASE_JWT_SECRET")
 OLLAMA_MODEL_ID = os.environ.get("OLLAMA_MODEL_ID")
 OLLAMA_API_HOST = os.environ.get("OLLAMA_API_HOST", "http://localhost:11434")
+NODE_API_URL = os.environ.get("NODE_API_URL", "http://your-node-api.com")
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", 3.0))
+NODE_TIMEOUT = float(os.environ.get("NODE_TIMEOUT", 3.0))
+
+# Heavy resources (Supabase client, ML models, indexes) are built on first
+# use or by the warm-up thread started in create_app(), so importing this
+# module stays cheap. /ready reports progress.
+warmup = Warmup()
+
+def check_config():
+    missing = [name for name in ("SUPABASE_URL", "SUPABASE_KEY", "SUPABASE_JWT_SECRET")
+               if not os.environ.get(name)]
+    if missing:
+        raise ValueError(f"Missing environment variables: {', '.join(missing)}")
+    return True
+
+warmup.register('config', check_config)
+
+# Every dependency gets a timeout and a circuit breaker so a degraded one
+# fails fast instead of holding workers; reads fall back to the last good value.
+supabase_breaker = breakers.get(
+    'supabase',
+    failure_threshold=int(os.environ.get("SUPABASE_BREAKER_THRESHOLD", 5)),
+    recovery_timeout=float(os.environ.get("SUPABASE_BREAKER_RECOVERY", 15))
+)
+last_known_good = LastKnownGood()
+
+def build_supabase_client():
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+    from postgrest.exceptions import APIError
+    from httpx import HTTPError
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY environment variables")
+    # The database answered; the query itself was rejected
+    supabase_breaker.ignore = (APIError,)
+    # Timeouts and connection failures from the HTTP client fall back to last known values
+    last_known_good.errors = TRANSIENT_ERRORS + (HTTPError,)
+    client = create_client(SUPABASE_URL, SUPABASE_KEY, options=ClientOptions(timeout=SUPABASE_TIMEOUT))
+    # supabase-py 0.7 doesn't forward the option to PostgREST, so set it on the session too
+    client.postgrest.session.timeout = SUPABASE_TIMEOUT
+    return client
+
+supabase_client = warmup.register('supabase', build_supabase_client)
+supabase = GuardedClient(supabase_client, supabase_breaker)
+node_breaker = breakers.get(
+    'node',
+    failure_threshold=int(os.environ.get("NODE_BREAKER_THRESHOLD", 3)),
+    recovery_timeout=float(os.environ.get("NODE_BREAKER_RECOVERY", 30))
+)
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Missing SUPABASE_URL or SUPABASE_KEY environment variables")
+def fetch_latest_vitals(user_id):
+    """`(vitals, stale)`: the latest vitals row for a user, or the last one seen
+    (possibly none) if Supabase is unavailable."""
+    def query():
+        result = supabase.table("vitals")\
+            .select("systolic_bp, diastolic_bp, blood_glucose, body_temp, heart_rate")\
+            .eq("UID", user_id)\
+            .order("created_at", desc=True)\
+            .limit(1)\
+            .execute()
+        return result.data[0] if result.data else {}
+    vitals, stale = last_known_good.fetch(('vitals', user_id), query, default={})
+    if stale:
+        logger.warning(f"Could not fetch vitals, using last known values for {user_id}")
+    return vitals, stale
+
+def fetch_recent_symptoms(user_id, limit=3):
+    def query():
+        result = supabase.table("symptoms")\
+            .select("classified_categories")\
+            .eq("UID", user_id)\
+            .order("recorded_at", desc=True)\
+            .limit(limit)\
+            .execute()
+        return [s["classified_categories"] for s in result.data]
+    symptoms, stale = last_known_good.fetch(('symptoms', user_id), query, default=[])
+    if stale:
+        logger.warning(f"Could not fetch symptoms, using last known values for {user_id}")
+    return symptoms
+
+def fetch_diagnoses(node_token, user_id):
+    """Recent diagnoses from the Node reports service, bounded by NODE_TIMEOUT."""
+    def query():
+        response = requests.get(
+            f"{NODE_API_URL}/api/reports/diagnosis",
+            headers={'Node-Token': node_token},
+            timeout=NODE_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.json().get("recent_diagnoses", [])
+    diagnoses, stale = last_known_good.fetch(
+        ('diagnoses', user_id), lambda: node_breaker.call(query), default=[])
+    if stale:
+        logger.warning(f"Could not fetch diagnosis from Node, using last known values for {user_id}")
+    return diagnoses
+
+# Per-user vitals trends, updated incrementally on each maternal prediction.
+# A user's history is read from Supabase when first seen and again once the
+# in-memory copy is older than TREND_TTL_SECONDS (other workers store readings too).
+TREND_HISTORY_LIMIT = int(os.environ.get("TREND_HISTORY_LIMIT", 500))
+TREND_TTL_SECONDS = float(os.environ.get("TREND_TTL_SECONDS", 300))
+
+def load_vitals_history(user_id):
+    result = supabase.table("vitals")\
+        .select("systolic_bp, diastolic_bp, blood_glucose, body_temp, heart_rate, created_at")\
+        .eq("UID", user_id)\
+        .order("created_at", desc=True)\
+        .limit(TREND_HISTORY_LIMIT)\
+        .execute()
+    return list(reversed(result.data))
+
+trend_engine = TrendEngine(
+    windows=[int(d) for d in os.environ.get("TREND_WINDOWS", "7,30").split(",")],
+    half_life=float(os.environ.get("TREND_HALF_LIFE_DAYS", 2.0)),
+    loader=load_vitals_history,
+    ttl=TREND_TTL_SECONDS or None
+)
+
+# Kick and contraction statistics, updated per uploaded event. History is
+# read back from Supabase only the first time a user is seen.
+TRACKING_MAX_BATCH = int(os.environ.get("TRACKING_MAX_BATCH", 500))
+TRACKING_HISTORY_LIMIT = int(os.environ.get("TRACKING_HISTORY_LIMIT", 200))
+TRACKING_MAX_SKEW = float(os.environ.get("TRACKING_MAX_SKEW_SECONDS", 300))
+
+def load_kick_history(user_id):
+    result = supabase.table("kicks")\
+        .select("kicked_at")\
+        .eq("UID", user_id)\
+        .order("kicked_at", desc=True)\
+        .limit(TRACKING_HISTORY_LIMIT)\
+        .execute()
+    return [_timestamp(row["kicked_at"]) for row in reversed(result.data)]
+
+def load_contraction_history(user_id):
+    result = supabase.table("contractions")\
+        .select("start_time, duration")\
+        .eq("UID", user_id)\
+        .order("start_time", desc=True)\
+        .limit(TRACKING_HISTORY_LIMIT)\
+        .execute()
+    return [(_timestamp(row["start_time"]), float(row["duration"])) for row in reversed(result.data)]
+
+tracking_engine = TrackingEngine(
+    kick_window=float(os.environ.get("KICK_WINDOW_HOURS", 2)) * 3600,
+    kick_loader=load_kick_history,
+    contraction_loader=load_contraction_history,
+    max_skew=TRACKING_MAX_SKEW
+)
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Early-warning rules evaluated on every vitals/CTG write; alerts are
+# delivered in the background to the configured sinks. Multi-reading rules
+# and cooldowns read back what other workers stored, through the loaders.
+ALERT_HISTORY_LIMIT = int(os.environ.get("ALERT_HISTORY_LIMIT", 100))
+CTG_STATUS = {0: 'Normal', 1: 'Suspect', 2: 'Pathological'}
+
+def load_alert_events(stream, user_id, since):
+    if stream not in ("vitals", "ctg"):
+        return []
+    result = supabase.table(stream)\
+        .select("*")\
+        .eq("UID", user_id)\
+        .gte("created_at", _iso(since))\
+        .order("created_at", desc=True)\
+        .limit(ALERT_HISTORY_LIMIT)\
+        .execute()
+    if stream == "ctg":
+        return [{**row, 'status': CTG_STATUS.get(row.get('prediction'), 'Unknown')} for row in result.data]
+    return result.data
+
+def load_last_alert(user_id, rule_id):
+    result = supabase.table("alerts")\
+        .select("triggered_at")\
+        .eq("UID", user_id)\
+        .eq("rule", rule_id)\
+        .order("triggered_at", desc=True)\
+        .limit(1)\
+        .execute()
+    return result.data[0]["triggered_at"] if result.data else None
+
+def build_alert_sink():
+    sinks = []
+    for name in [n.strip() for n in os.environ.get("ALERT_SINKS", "log,supabase").split(",") if n.strip()]:
+        if name == "log":
+            sinks.append(LogSink())
+        elif name == "supabase":
+            sinks.append(SupabaseSink(supabase))
+        elif name == "webhook" and os.environ.get("ALERT_WEBHOOK_URL"):
+            sinks.append(WebhookSink(os.environ["ALERT_WEBHOOK_URL"]))
+        else:
+            logger.warning(f"Alert sink '{name}' ignored")
+    return BackgroundSink(FanoutSink(sinks))
+
+alert_engine = RulesEngine(load_rules(os.environ.get("ALERT_RULES_PATH")), sink=build_alert_sink(),
+                           loader=load_alert_events, fired_loader=load_last_alert)
 
 # Load ML Models
 MODEL_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models')
@@ -374,6 +692,7 @@ def load_model_safely(model_path: str, error_msg: str) -> Optional[object]:
             print(f"Solution: Ensure model file is placed at {model_path}")
             return None
         
+        import joblib
         model = joblib.load(model_path)
         print(f"Successfully loaded model from {model_path}")
         return model
@@ -383,69 +702,291 @@ def load_model_safely(model_path: str, error_msg: str) -> Optional[object]:
         print(f"Solution: Check model file format and permissions")
         return None
 
-# Load existing models from current location
-maternal_model = joblib.load("finalized_maternal_model.sav")
-maternal_scaler = joblib.load("scaleX.pkl")
-fetal_model = joblib.load("fetal_health_model.sav")
-fetal_scaler = joblib.load("scaleX1.pkl")
+def load_artifact(path):
+    import joblib
+    return joblib.load(path)
+
+# With PORTABLE_MODELS=true predictions use the exported tree ensembles
+# (scaler included, NumPy only; `python portable.py export` after retraining).
+# Off by default: opt in once `run.py --suite portable` shows full parity for
+# the deployed exports. The pickled models stay for explanations and shadow
+# scoring, and for predictions when no export loads.
+PORTABLE_MODELS = os.environ.get("PORTABLE_MODELS", "false").lower() == "true"
+
+def load_portable_model(path):
+    try:
+        if not os.path.exists(path):
+            print(f"Warning: portable model not found at {path}, predicting with the pickled model")
+            return None
+        return portable.load(path)
+    except Exception as e:
+        print(f"Warning: Failed to load portable model {path}: {str(e)}")
+        return None
 
-# Load new Ayurvedic models from models directory
-symptom_classifier = load_model_safely(
+maternal_portable = warmup.register('maternal_portable', lambda: load_portable_model(
+    "finalized_maternal_model.json") if PORTABLE_MODELS else None)
+fetal_portable = warmup.register('fetal_portable', lambda: load_portable_model(
+    "fetal_health_model.json") if PORTABLE_MODELS else None)
+
+# Load existing models from current location
+maternal_model = warmup.register('maternal_model', lambda: load_artifact("finalized_maternal_model.sav"),
+                                 required=not PORTABLE_MODELS)
+maternal_scaler = warmup.register('maternal_scaler', lambda: load_artifact("scaleX.pkl"),
+                                  required=not PORTABLE_MODELS)
+fetal_model = warmup.register('fetal_model', lambda: load_artifact("fetal_health_model.sav"),
+                              required=not PORTABLE_MODELS)
+fetal_scaler = warmup.register('fetal_scaler', lambda: load_artifact("scaleX1.pkl"),
+                               required=not PORTABLE_MODELS)
+
+def import_pandas():
+    import pandas
+    return pandas
+
+# Only the pickled maternal scaler needs a DataFrame (it checks feature names)
+pandas_module = warmup.register('pandas', import_pandas, required=not PORTABLE_MODELS)
+
+# TreeSHAP contributions for ?explain=true, cached by input vector.
+EXPLAIN_CACHE_SIZE = int(os.environ.get("EXPLAIN_CACHE_SIZE", 4096))
+maternal_explainer = warmup.register('maternal_explainer', lambda: Explainer(
+    maternal_model.get(), maternal_scaler.get(), maternal_scaler.feature_names_in_,
+    max_entries=EXPLAIN_CACHE_SIZE), required=False)
+fetal_explainer = warmup.register('fetal_explainer', lambda: Explainer(
+    fetal_model.get(), fetal_scaler.get(), fetal_scaler.feature_names_in_,
+    max_entries=EXPLAIN_CACHE_SIZE), required=False)
+
+def wants_explanation(request):
+    return request.args.get('explain', 'false').lower() == 'true'
+
+# Input drift: per-feature sketches of every prediction's raw inputs, shared
+# between workers through DRIFT_STATE_DIR and compared with the training data
+DRIFT_MONITOR = os.environ.get("DRIFT_MONITOR", "true").lower() == "true"
+drift_monitor = DriftMonitor(
+    reference=load_reference(os.environ.get("DRIFT_REFERENCE_PATH") or os.path.join(MODEL_PATH, 'drift_reference.json')),
+    state_dir=os.environ.get("DRIFT_STATE_DIR") or os.path.join(MODEL_PATH, 'drift'),
+    window=int(os.environ.get("DRIFT_WINDOW_MINUTES", 60)) * 60,
+    lookback=int(float(os.environ.get("DRIFT_LOOKBACK_HOURS", 24)) * 3600),
+    interval=float(os.environ.get("DRIFT_INTERVAL", 60)),
+    min_count=int(os.environ.get("DRIFT_MIN_COUNT", 100))
+) if DRIFT_MONITOR else None
+
+# Shadow evaluation: a candidate model (SHADOW_<MODEL>_MODEL, optionally with
+# its own scaler) scores a sample of live inputs on a background thread and
+# the agreement with the live model is recorded in a local SQLite store
+MATERNAL_FEATURES = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
+
+def load_scored_candidate(model_path, scaler_path, live_scaler):
+    return lambda: (load_artifact(model_path), load_artifact(scaler_path) if scaler_path else live_scaler.get())
+
+def score_fetal_candidate(candidate, features):
+    model, scaler = candidate
+    return int(model.predict(scaler.transform(np.array(features, dtype=float).reshape(1, -1)))[0])
+
+def score_maternal_candidate(candidate, row):
+    model, scaler = candidate
+    features = pandas_module.DataFrame([row], columns=MATERNAL_FEATURES, dtype=float)
+    return int(model.predict(scaler.transform(features))[0])
+
+def score_symptom_classifier_candidate(model, text):
+    return sorted(model.predict([text])[0])
+
+def score_symptom_risk_candidate(model, features):
+    risks = model.model.predict(encode_features_for_model(features, model))[0]
+    return sorted(label for label in model.label_binarizer.classes_ if label in risks)
+
+def build_shadow():
+    candidates = []
+    for name, live_scaler, score in (('fetal', fetal_scaler, score_fetal_candidate),
+                                     ('maternal', maternal_scaler, score_maternal_candidate)):
+        path = os.environ.get(f"SHADOW_{name.upper()}_MODEL")
+        if path:
+            scaler_path = os.environ.get(f"SHADOW_{name.upper()}_SCALER")
+            candidates.append(Candidate(name, path, load_scored_candidate(path, scaler_path, live_scaler), score))
+    for name, score in (('symptom_classifier', score_symptom_classifier_candidate),
+                        ('symptom_risk', score_symptom_risk_candidate)):
+        path = os.environ.get(f"SHADOW_{name.upper()}_MODEL")
+        if path:
+            candidates.append(Candidate(name, path, lambda path=path: load_artifact(path), score))
+    if not candidates:
+        return None
+    store = ShadowStore(os.environ.get("SHADOW_DB_PATH") or os.path.join(MODEL_PATH, 'shadow', 'shadow.sqlite'),
+                        max_rows=int(os.environ.get("SHADOW_MAX_ROWS", 100000)))
+    logger.info(f"Shadow evaluation for {', '.join(c.name for c in candidates)}")
+    return ShadowEvaluator(candidates, store,
+                           sample_rate=float(os.environ.get("SHADOW_SAMPLE_RATE", 0.1)),
+                           max_queued=int(os.environ.get("SHADOW_QUEUE_SIZE", 256)),
+                           # admission is defined below; only called from the shadow thread
+                           busy=lambda: admission.in_flight() > 0,
+                           max_defer=float(os.environ.get("SHADOW_MAX_DEFER_MS", 50)) / 1000)
+
+# None unless a candidate is configured
+shadow = build_shadow()
+
+# Load new Ayurvedic models from models directory (None when unavailable)
+symptom_classifier = warmup.register('symptom_classifier', lambda: load_model_safely(
     os.path.join(MODEL_PATH, 'ayurvedic', 'symptom_classifier_model.pkl'),
     'Symptom classification may be limited'
-)
+))
 
-symptom_risk_model = load_model_safely(
+symptom_risk_model = warmup.register('symptom_risk_model', lambda: load_model_safely(
     os.path.join(MODEL_PATH, 'ayurvedic', 'symptom_risk_model.pkl'),
     'Risk prediction may be limited'
-)
+))
 
-remedy_model = load_model_safely(
+remedy_model = warmup.register('remedy_model', lambda: load_model_safely(
     os.path.join(MODEL_PATH, 'ayurvedic', 'remedy_model.pkl'),
     'Remedy suggestions may be limited'
+))
+
+remedy_engine = warmup.register('remedy_engine', lambda: TieredRemedyEngine(
+    remedy_model.get(),
+    threshold=float(os.environ.get("REMEDY_LOCAL_THRESHOLD", 0.35))
+))
+
+# Retrieval index over the remedy corpus + curated knowledge, used to ground
+# (and shorten) the remedy and diet prompts
+KNOWLEDGE_PATH = os.path.join(MODEL_PATH, 'ayurvedic', 'knowledge.jsonl')
+RETRIEVAL_PROMPTS = os.environ.get("RETRIEVAL_PROMPTS", "true").lower() == "true"
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 3))
+def build_knowledge_index():
+    index = BM25Index()
+    if remedy_model.get() is not None:
+        index.add_remedy_model(remedy_model.get())
+    index.load_knowledge(KNOWLEDGE_PATH)
+    return index
+
+knowledge_index = warmup.register('knowledge_index', build_knowledge_index)
+token_ledger = TokenLedger()
+
+# Semantic answer cache for context-free chat questions. Only vetted answers
+# from the offline-rebuilt artifact are served; without one the cache starts
+# empty (vectorizer fitted on the knowledge corpus). With SEMANTIC_CACHE_ADMIT
+# live answers are only queued for review, never served to other users.
+SEMANTIC_CACHE_PATH = os.environ.get("SEMANTIC_CACHE_PATH") or os.path.join(
+    MODEL_PATH, 'chat_cache', 'semantic_cache.pkl')
+SEMANTIC_CACHE_ADMIT = os.environ.get("SEMANTIC_CACHE_ADMIT", "false").lower() == "true"
+semantic_review = ReviewQueue(os.environ.get("SEMANTIC_CACHE_REVIEW_PATH") or os.path.join(
+    MODEL_PATH, 'chat_cache', 'review.jsonl'))
+semantic_cache_options = {
+    'threshold': float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", 0.85)),
+    'max_entries': int(os.environ.get("SEMANTIC_CACHE_SIZE", 2000)),
+}
+def build_semantic_cache():
+    try:
+        if os.path.exists(SEMANTIC_CACHE_PATH):
+            cache = SemanticCache.load(SEMANTIC_CACHE_PATH, **semantic_cache_options)
+        else:
+            cache = SemanticCache(
+                fit_vectorizer(f"{doc.get('title', '')} {doc['text']}" for doc in knowledge_index.docs.values()),
+                **semantic_cache_options)
+        logger.info(f"Semantic chat cache ready with {len(cache)} entries")
+        return cache
+    except Exception as e:
+        logger.warning(f"Semantic chat cache disabled: {str(e)}")
+        return None
+
+# None when disabled; optional for readiness since chat works without it
+semantic_cache = warmup.register('semantic_cache', build_semantic_cache, required=False)
+
+# Long LLM generations can run as background jobs (?async=true) so the client
+# doesn't hold a connection open for the whole generation
+JOB_PRIORITIES = {'remedy': 0, 'diet': 1, 'recommendations': 2}
+JOB_MAX_WAIT = float(os.environ.get("JOB_MAX_WAIT", 30))
+job_queue = JobQueue(
+    workers=int(os.environ.get("JOB_WORKERS", 4)),
+    max_queued=int(os.environ.get("JOB_QUEUE_SIZE", 100)),
+    retention=float(os.environ.get("JOB_RESULT_TTL", 600))
 )
 
-# Custom chat function to replace ollama-python client
-def chat(model, messages):
+def wants_async(request):
+    return request.args.get('async', 'false').lower() == 'true'
+
+def submit_job(kind, user_id, payload, fn):
+    """Queue a generation and return the job body with a 202 (200 once done)."""
+    key = hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    try:
+        job, attached = job_queue.submit(kind, user_id, key, fn, priority=JOB_PRIORITIES[kind])
+    except JobQueueFull as e:
+        return {'error': str(e)}, 503
+    if attached:
+        logger.info(f"[Jobs] Attached duplicate {kind} submission to job {job.id}")
+    body = job.to_dict()
+    body['status_url'] = f"/jobs/{job.id}"
+    return body, 200 if job.finished.is_set() else 202
+
+# All LLM traffic goes through the gateway (Groq with local Ollama fallback)
+def chat(model, messages, **options):
     """
-    Send a chat request to Groq API (OpenAI-compatible) using the requests library
+    Send a chat request through the LLM gateway. `model` applies to the
+    remote OpenAI-compatible backend; the local fallback uses its own model.
+    Returns an object with Ollama's `response.message.content` shape.
     """
-    import os
-    import requests
-    class DotDict(dict):
-        """Dot notation access to dictionary attributes"""
-        def __getattr__(self, name):
-            try:
-                return self[name]
-            except KeyError:
-                raise AttributeError(name)
-        __setattr__ = dict.__setitem__
-        __delattr__ = dict.__delitem__
-
-    GROQ_API_KEY = os.environ.get("GROQ_API_KEY")
-    if not GROQ_API_KEY:
-        raise RuntimeError("GROQ_API_KEY environment variable not set.")
-    GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": model,
-        "messages": messages
-    }
     try:
-        response = requests.post(GROQ_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        result = response.json()
-        # Emulate Ollama's response structure for compatibility
-        message_content = result["choices"][0]["message"]["content"]
-        result_obj = DotDict({"message": DotDict({"content": message_content})})
-        return result_obj
+        return get_gateway().chat(messages, model=model, **options)
     except Exception as e:
-        print(f"Error in chat function (Groq): {str(e)}")
+        print(f"Error in chat function: {str(e)}")
         raise
 
+def retrieve_snippets(query, kind):
+    """Top-k knowledge snippets for a prompt, picking up edits to the knowledge file."""
+    knowledge_index.refresh_knowledge(KNOWLEDGE_PATH)
+    return knowledge_index.search(query, k=RETRIEVAL_TOP_K, kind=kind)
+
+def build_remedy_prompt(symptoms, diagnosis_data, vitals, delivery_done):
+    """Compact, retrieval-grounded remedy prompt."""
+    snippets = retrieve_snippets(' '.join(symptoms) + (' postpartum' if delivery_done else ''), 'remedy')
+    details = (
+        f"Symptoms: {', '.join(symptoms)}\n"
+        f"Known diagnoses: {', '.join(diagnosis_data) if diagnosis_data else 'None'}\n"
+        f"Vitals: BP {vitals.get('systolic_bp', 'N/A')}/{vitals.get('diastolic_bp', 'N/A')}, "
+        f"Glucose {vitals.get('blood_glucose', 'N/A')}, HR {vitals.get('heart_rate', 'N/A')}\n"
+    )
+    if delivery_done:
+        return (
+            f"You are an expert Ayurvedic practitioner advising a mother after delivery.\n"
+            f"Reference notes:\n{format_snippets(snippets)}\n{details}"
+            f"Using the notes where relevant, suggest 2-3 remedies safe while breastfeeding.\n"
+            f"{structured.REMEDIES.instructions(structured.POSTPARTUM_EXAMPLE)}"
+        )
+    return (
+        f"You are an expert Ayurvedic practitioner advising a pregnant woman.\n"
+        f"Reference notes:\n{format_snippets(snippets)}\n{details}"
+        f"Using the notes where relevant and only pregnancy-safe ingredients, decide the prakriti "
+        f"and suggest 2-3 remedies.\n{structured.REMEDIES.instructions()}"
+    )
+
+def build_diet_prompt(data):
+    """Compact, retrieval-grounded diet plan prompt."""
+    snippets = retrieve_snippets(
+        f"{data['trimester']} {data['health_conditions']} {data['dietary_preference']}", 'diet')
+    return (
+        f"You are a dietician versed in Ayurveda. Reference notes:\n{format_snippets(snippets)}\n"
+        f"Plan one day of meals for a {data['trimester']} trimester pregnant woman weighing about "
+        f"{data['weight']} kg, feeling {data['health_conditions']}, with strict dietary preferences: "
+        f"{data['dietary_preference']}. Never include foods against these preferences or unsafe in pregnancy.\n"
+        f"Reply only with the headings Breakfast, Lunch, Snacks and Dinner, each followed by 2-3 "
+        f"'- <food> (<portion>)' lines, favouring the Ayurvedic ingredients in the notes."
+    )
+
+REMEDY_MAX_TOKENS = 250
+
+# Lifestyle and remedy answers are requested as JSON: json_object (default),
+# json_schema (schema-constrained, where the backend supports it) or off
+LLM_JSON_MODE = os.environ.get("LLM_JSON_MODE", "json_object").lower()
+DIET_MAX_TOKENS = 450
+
+# Precomputed plans for common (trimester, diet, condition) cohorts, built
+# offline with `python diet_library.py build`. Requests that match a cohort
+# are personalized from the library; the rest go to the LLM.
+DIET_LIBRARY_PATH = os.environ.get("DIET_LIBRARY_PATH") or os.path.join(
+    MODEL_PATH, 'diet_library', 'diet_library.json')
+diet_library = DietLibrary()
+if os.environ.get("DIET_LIBRARY", "true").lower() == "true" and os.path.exists(DIET_LIBRARY_PATH):
+    try:
+        diet_library = DietLibrary.load(DIET_LIBRARY_PATH)
+        logger.info(f"Diet plan library ready with {len(diet_library)} cohort plans")
+    except Exception as e:
+        logger.warning(f"Diet plan library unavailable: {e}")
+
 # Utility function for token validation
 def validate_token(request) -> tuple[Optional[dict], Optional[str]]:
     auth_header = request.headers.get('Authorization', '')
@@ -470,11 +1011,70 @@ def validate_token(request) -> tuple[Optional[dict], Optional[str]]:
     except jwt.InvalidTokenError:
         return None, 'Invalid token'
 
+# Admins are listed in ADMIN_USER_IDS or carry role "admin" in their Supabase app_metadata
+ADMIN_USER_IDS = {uid.strip() for uid in os.environ.get("ADMIN_USER_IDS", "").split(",") if uid.strip()}
+
+def validate_admin(request):
+    """`(claims, None)` for an admin, else `(None, (error body, status))`."""
+    claims, error = validate_token(request)
+    if error:
+        return None, ({'error': error}, 401)
+    role = (claims.get('app_metadata') or {}).get('role')
+    if claims.get('sub') not in ADMIN_USER_IDS and role != 'admin':
+        return None, ({'error': 'Admin access required'}, 403)
+    return claims, None
+
+# Admission control: clinical scoring gets its own concurrency pool so slow,
+# bursty LLM endpoints can't starve it; LLM endpoints are also rate limited
+# per user. Requests that can't be admitted in time get a fast 429/503.
+def admission_user_key(request):
+    claims, _ = validate_token(request)
+    return claims.get('sub') if claims else None
+
+admission = AdmissionController(
+    classes=[
+        RequestClass('clinical',
+            max_concurrent=int(os.environ.get("ADMISSION_CLINICAL_CONCURRENCY", 32)),
+            max_waiting=int(os.environ.get("ADMISSION_CLINICAL_WAITING", 64)),
+            queue_timeout=float(os.environ.get("ADMISSION_CLINICAL_QUEUE_TIMEOUT", 1.0))),
+        RequestClass('llm',
+            max_concurrent=int(os.environ.get("ADMISSION_LLM_CONCURRENCY", 4)),
+            max_waiting=int(os.environ.get("ADMISSION_LLM_WAITING", 4)),
+            queue_timeout=float(os.environ.get("ADMISSION_LLM_QUEUE_TIMEOUT", 2.0)),
+            rate=float(os.environ.get("ADMISSION_LLM_RATE_PER_MINUTE", 20)) / 60,
+            burst=int(os.environ.get("ADMISSION_LLM_BURST", 5)),
+            retry_after=5),
+        RequestClass('default',
+            max_concurrent=int(os.environ.get("ADMISSION_DEFAULT_CONCURRENCY", 16)),
+            max_waiting=int(os.environ.get("ADMISSION_DEFAULT_WAITING", 16)),
+            queue_timeout=float(os.environ.get("ADMISSION_DEFAULT_QUEUE_TIMEOUT", 1.0))),
+    ],
+    routes=[
+        ('/maternal/predict', None, 'clinical'),
+        ('/fetal/predict', None, 'clinical'),
+        ('/chat/history', {'POST'}, 'llm'),
+        # ?async=true submissions take a default slot but count against the LLM rate limit
+        ('/diet/plan', None, 'llm', 'default'),
+        ('/recommendations', None, 'llm', 'default'),
+        ('/ayurveda/remedy_recommendation', {'POST'}, 'llm', 'default'),
+    ],
+    user_key=admission_user_key
+)
+admission.enabled = os.environ.get("ADMISSION_CONTROL", "true").lower() == "true"
+
+# Large JSON responses (chat history, plans) are gzip/brotli encoded.
+compressor = Compressor(min_size=int(os.environ.get("COMPRESS_MIN_SIZE", 1024)))
+compressor.enabled = os.environ.get("COMPRESSION", "true").lower() == "true"
+
+# Chat history delta sync (?since=<n>, If-None-Match).
+chat_sync = ChatSync(supabase)
+
 @maternal_ns.route('/predict')
 class MaternalPrediction(Resource):
     @maternal_ns.doc('predict_maternal',
         description='''Analyze maternal health metrics and predict potential risks.
-        Processes vital signs and generates risk assessment based on machine learning models.''')
+        Processes vital signs and generates risk assessment based on machine learning models.
+        Pass ?explain=true for per-feature contributions to the predicted risk.''')
     @maternal_ns.expect(auth_header, maternal_input)
     @maternal_ns.response(200, 'Success', prediction_response)
     @maternal_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
@@ -486,7 +1086,6 @@ class MaternalPrediction(Resource):
         '''Predict maternal health risks based on vital signs'''
         try:
             logger.info(f"Request headers: {dict(request.headers)}")
-            logger.info(f"Request body: {request.get_json()}")
             print("Authentication header: ", request.headers.get('Authorization'))
             claims, error = validate_token(request)
             if error:
@@ -499,42 +1098,53 @@ class MaternalPrediction(Resource):
                 return {'error': 'Token missing subject'}, 401
 
             logger.info(f"Authenticated request by user_id: {user_id}")
-            data = request.get_json()
+            data, invalid = validate_request(request, maternal_validator)
+            if invalid:
+                logger.warning(f"Rejected maternal input: {invalid[0]['error']}")
+                return invalid
             logger.info(f"Parsed request data: {data}")
 
+            features = np.array([[
+                data["age"],
+                data["systolic_bp"],
+                data["diastolic_bp"],
+                data["blood_glucose"],
+                data["body_temp"],
+                data["heart_rate"],
+            ]], dtype=float)
 
-            FEATURE_NAMES = [
-                "Age", "SystolicBP", "DiastolicBP",
-                "BS", "BodyTemp", "HeartRate"
-            ]
-            try:
-                features = pd.DataFrame([[
-                    float(data["age"]),            
-                    float(data["systolic_bp"]),  
-                    float(data["diastolic_bp"]),   
-                    float(data["blood_glucose"]), 
-                    float(data["body_temp"]),      
-                    float(data["heart_rate"]), 
-                ]], columns=FEATURE_NAMES)
-            except Exception as e:
-                logger.error(f"Error parsing features from request: {e}")
-                return {"error": f"Invalid input data: {e}"}, 400
+            logger.info(f"Features: {features}")
 
-            logger.info(f"Features DataFrame: {features}")
+            started = time.perf_counter()
+            exported = maternal_portable.get()
+            if exported is not None:
+                try:
+                    prediction = exported.predict(features)
+                    logger.info(f"Model prediction: {prediction}")
+                except Exception as e:
+                    logger.error(f"Error in model prediction: {e}")
+                    return {"error": f"Prediction failed: {e}"}, 500
+            else:
+                try:
+                    scaled_features = maternal_scaler.transform(
+                        pandas_module.DataFrame(features, columns=MATERNAL_FEATURES))
+                    logger.info(f"Scaled features: {scaled_features}")
+                except Exception as e:
+                    logger.error(f"Error scaling features: {e}")
+                    return {"error": f"Feature scaling failed: {e}"}, 500
 
-            try:
-                scaled_features = maternal_scaler.transform(features)
-                logger.info(f"Scaled features: {scaled_features}")
-            except Exception as e:
-                logger.error(f"Error scaling features: {e}")
-                return {"error": f"Feature scaling failed: {e}"}, 500
+                try:
+                    prediction = maternal_model.predict(scaled_features)
+                    logger.info(f"Model prediction: {prediction}")
+                except Exception as e:
+                    logger.error(f"Error in model prediction: {e}")
+                    return {"error": f"Prediction failed: {e}"}, 500
 
-            try:
-                prediction = maternal_model.predict(scaled_features)
-                logger.info(f"Model prediction: {prediction}")
-            except Exception as e:
-                logger.error(f"Error in model prediction: {e}")
-                return {"error": f"Prediction failed: {e}"}, 500
+            if drift_monitor is not None:
+                drift_monitor.observe('maternal', features[0].tolist())
+            if shadow is not None:
+                shadow.submit('maternal', features[0].tolist(), int(prediction[0]),
+                              (time.perf_counter() - started) * 1000)
 
             risk_mapping = {0: "Normal", 1: "Suspect", 2: "Pathological"}
             risk_level = risk_mapping.get(int(prediction[0]), "Unknown")
@@ -550,24 +1160,190 @@ class MaternalPrediction(Resource):
                 'heart_rate': data["heart_rate"],
                 'prediction': int(prediction[0])
             }
+            try:
+                trend_engine.update(user_id, vital_data)
+            except Exception as e:
+                logger.warning(f"Failed to update vitals trends: {e}")
             logger.info(f"Inserting vitals data: {vital_data}")
+            stored = {}
             try:
                 result = supabase.table('vitals').insert(vital_data).execute()
                 logger.info(f"Supabase insert result: {result}")
+                stored = result.data[0] if result.data else {}
             except Exception as e:
                 logger.warning(f"Failed to insert vitals into Supabase: {e}")
+            try:
+                # The stored row carries the id and created_at the alert windows key on
+                alert_engine.process('vitals', user_id, {**vital_data, **stored, 'risk_level': risk_level})
+            except Exception as e:
+                logger.warning(f"Failed to evaluate alert rules: {e}")
 
-            return {"prediction": risk_level}, 200
+            response = {"prediction": risk_level}
+            if wants_explanation(request):
+                try:
+                    response["explanation"] = maternal_explainer.explain(
+                        features, classes=[int(prediction[0])])[0]
+                except Exception as e:
+                    logger.warning(f"Failed to explain maternal prediction: {e}")
+            return response, 200
 
         except Exception as e:
             logger.error(f"Unhandled error in maternal prediction: {e}", exc_info=True)
             return {"error": str(e)}, 500
 
+@maternal_ns.route('/trends')
+class MaternalTrends(Resource):
+    @maternal_ns.doc('get_vitals_trends',
+        description='''Rolling vitals trends for the current user.
+        EWMA plus 7- and 30-day decayed mean, standard deviation and slope per day
+        for blood pressure, glucose, heart rate and temperature.''')
+    @maternal_ns.expect(auth_header)
+    @maternal_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        try:
+            return trend_engine.summary(user_id), 200
+        except Exception as e:
+            return {'error': str(e)}, 500
+
+def _iso(ts):
+    return datetime.utcfromtimestamp(ts).isoformat()
+
+@kicks_ns.route('/')
+class Kicks(Resource):
+    @kicks_ns.doc('upload_kicks',
+        description='''Upload a batch of kicks. Kicks not newer than the last one
+        already recorded (e.g. a retried batch) are skipped. If they can't be stored
+        the request fails with 503 and nothing is recorded, so it can be retried.''')
+    @kicks_ns.expect(kick_input, auth_header)
+    @kicks_ns.response(400, 'Invalid input', error_response)
+    @kicks_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @kicks_ns.response(503, 'Kicks could not be stored', error_response)
+    def post(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        data = request.get_json(silent=True) or {}
+        kicks = data.get('kicks')
+        if not isinstance(kicks, list) or not kicks:
+            return {'error': 'kicks must be a non-empty list'}, 400
+        if len(kicks) > TRACKING_MAX_BATCH:
+            return {'error': f'At most {TRACKING_MAX_BATCH} kicks per request'}, 400
+
+        def store(new):
+            supabase.table("kicks").insert([
+                {'UID': user_id, 'kicked_at': _iso(ts), 'session_id': data.get('session_id')}
+                for ts in new
+            ]).execute()
+
+        try:
+            accepted = tracking_engine.add_kicks(user_id, kicks, store=store)
+        except (TypeError, ValueError) as e:
+            return {'error': f'Invalid kick timestamp: {e}'}, 400
+        except Exception as e:
+            logger.warning(f"Failed to store kicks: {e}")
+            return {'error': 'Could not store kicks, please retry'}, 503
+        return {
+            'accepted': len(accepted),
+            'skipped': len(kicks) - len(accepted),
+            'summary': tracking_engine.kick_summary(user_id)
+        }, 200
+
+@kicks_ns.route('/summary')
+class KickSummary(Resource):
+    @kicks_ns.doc('get_kick_summary', description='''Kicks in the current window and time to 10 kicks.''')
+    @kicks_ns.expect(auth_header)
+    @kicks_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        return tracking_engine.kick_summary(user_id), 200
+
+@contractions_ns.route('/')
+class Contractions(Resource):
+    @contractions_ns.doc('upload_contractions',
+        description='''Upload a batch of timed contractions. Contractions not newer than
+        the last one already recorded are skipped. Raises a labour alert when the
+        5-1-1 rule is met. If they can't be stored the request fails with 503 and
+        nothing is recorded, so it can be retried.''')
+    @contractions_ns.expect(contraction_input, auth_header)
+    @contractions_ns.response(400, 'Invalid input', error_response)
+    @contractions_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @contractions_ns.response(503, 'Contractions could not be stored', error_response)
+    def post(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        data = request.get_json(silent=True) or {}
+        contractions = data.get('contractions')
+        if not isinstance(contractions, list) or not contractions:
+            return {'error': 'contractions must be a non-empty list'}, 400
+        if len(contractions) > TRACKING_MAX_BATCH:
+            return {'error': f'At most {TRACKING_MAX_BATCH} contractions per request'}, 400
+
+        def store(new):
+            supabase.table("contractions").insert([
+                {'UID': user_id, 'start_time': _iso(start), 'end_time': _iso(start + duration),
+                 'duration': duration, 'session_id': data.get('session_id')}
+                for start, duration in new
+            ]).execute()
+
+        try:
+            accepted = tracking_engine.add_contractions(user_id, contractions, store=store)
+        except (KeyError, TypeError, ValueError) as e:
+            return {'error': f'Invalid contraction: {e}'}, 400
+        except Exception as e:
+            logger.warning(f"Failed to store contractions: {e}")
+            return {'error': 'Could not store contractions, please retry'}, 503
+        summary = tracking_engine.contraction_summary(user_id)
+        if accepted:
+            try:
+                alert_engine.process('contractions', user_id, summary,
+                                     ts=max(start for start, _ in accepted))
+            except Exception as e:
+                logger.warning(f"Failed to evaluate alert rules: {e}")
+        return {
+            'accepted': len(accepted),
+            'skipped': len(contractions) - len(accepted),
+            'summary': summary
+        }, 200
+
+@contractions_ns.route('/summary')
+class ContractionSummary(Resource):
+    @contractions_ns.doc('get_contraction_summary',
+        description='''Contractions in the last hour, mean duration and interval, and 5-1-1 status.''')
+    @contractions_ns.expect(auth_header)
+    @contractions_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        return tracking_engine.contraction_summary(user_id), 200
+
 @fetal_ns.route('/predict', methods=['POST'])
 class FetalPrediction(Resource):
     @fetal_ns.doc('predict_fetal',
         description='''Analyze fetal health parameters from CTG data.
-        Processes cardiotocography measurements to assess fetal well-being.''')
+        Processes cardiotocography measurements to assess fetal well-being.
+        Pass ?explain=true for per-feature contributions to the predicted status.''')
     @fetal_ns.expect(auth_header, fetal_input)
     @fetal_ns.response(200, 'Success', prediction_response)
     @fetal_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
@@ -583,32 +1359,40 @@ class FetalPrediction(Resource):
         if not user_id:
             return {'error': 'Token missing subject'}, 401
         logger.info(f"Authenticated request by user_id: {user_id}")
-        # 2) Parse input JSON
-        data = request.get_json()
-        if not data or 'features' not in data:
-            return {'error': 'Missing required feature data'}, 400
-
-        # 3) Validate & reshape features
-        features = np.array(data['features'], dtype=float)
-        if features.size != 15:
-            return {'error': 'Invalid feature length, expected 15'}, 400
-        features = features.reshape(1, -1)
-
-        # 4) Scale
-        try:
-            scaled = fetal_scaler.transform(features)
-        except Exception as e:
-            return {'error': f'Feature scaling failed: {e}'}, 500
+        # 2) Parse & validate input JSON (exactly 15 finite numbers)
+        data, invalid = validate_request(request, fetal_validator)
+        if invalid:
+            return invalid
+
+        # 3) Reshape features
+        features = np.array(data['features'], dtype=float).reshape(1, -1)
+
+        # 4) Scale and predict (the exported ensemble scales itself)
+        started = time.perf_counter()
+        exported = fetal_portable.get()
+        if exported is not None:
+            try:
+                pred = int(exported.predict(features)[0])
+            except Exception as e:
+                return {'error': f'Prediction failed: {e}'}, 500
+        else:
+            try:
+                scaled = fetal_scaler.transform(features)
+            except Exception as e:
+                return {'error': f'Feature scaling failed: {e}'}, 500
 
-        # 5) Predict
-        try:
-            pred = int(fetal_model.predict(scaled)[0])
-        except Exception as e:
-            return {'error': f'Prediction failed: {e}'}, 500
+            # 5) Predict
+            try:
+                pred = int(fetal_model.predict(scaled)[0])
+            except Exception as e:
+                return {'error': f'Prediction failed: {e}'}, 500
+        if drift_monitor is not None:
+            drift_monitor.observe('fetal', data['features'])
+        if shadow is not None:
+            shadow.submit('fetal', data['features'], pred, (time.perf_counter() - started) * 1000)
 
         # 6) Map status
-        status_map = {0: 'Normal', 1: 'Suspect', 2: 'Pathological'}
-        status = status_map.get(pred, 'Unknown')
+        status = CTG_STATUS.get(pred, 'Unknown')
 
         # 7) Prepare CTG data
         feature_names = [
@@ -629,21 +1413,35 @@ class FetalPrediction(Resource):
         logger.info(f"Supabase CTG data: {ctg_data}")
         logger.info(f"Supabase Key: {SUPABASE_KEY}")
         # 8) Store to Supabase
+        stored = {}
         try:
-            supabase.table('ctg').insert(ctg_data).execute()
+            result = supabase.table('ctg').insert(ctg_data).execute()
+            stored = result.data[0] if result.data else {}
         except Exception as e:
             logger.warning(f"Failed to store CTG data: {e}")
+        try:
+            alert_engine.process('ctg', user_id, {**ctg_data, **stored, 'status': status})
+        except Exception as e:
+            logger.warning(f"Failed to evaluate alert rules: {e}")
 
         # 9) Return response
-        return {'prediction': pred, 'status': status}, 200
+        response = {'prediction': pred, 'status': status}
+        if wants_explanation(request):
+            try:
+                response['explanation'] = fetal_explainer.explain(features, classes=[pred])[0]
+            except Exception as e:
+                logger.warning(f"Failed to explain fetal prediction: {e}")
+        return response, 200
 
 @diet_ns.route('/plan')
 class DietPlan(Resource):
     @diet_ns.doc('get_diet_plan',
         description='''Generate personalized diet recommendations.
-        Creates trimester-specific meal plans considering health conditions and dietary preferences.''')
+        Creates trimester-specific meal plans considering health conditions and dietary preferences.
+        Common cohorts are served from a precomputed library, scaled by weight and filtered by preference.''')
     @diet_ns.expect(auth_header, diet_input)
     @diet_ns.response(200, 'Success', diet_response)
+    @diet_ns.response(202, 'Accepted - queued as a background job (?async=true)', job_response)
     @diet_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
     @diet_ns.response(500, 'Server Error - Diet planning service unavailable', error_response)
     def post(self):
@@ -657,26 +1455,49 @@ class DietPlan(Resource):
             user_id = claims.get('sub') if claims else None
             if not user_id:
                 return {'error': 'Token missing subject'}, 401
-            data = request.get_json()
-            if not data:
-                return {'error': 'Missing input data'}, 400
-            prompt = f"You are a professional dietician and nutritionist. You suggest excellent diet plans for pregnant women that look after their well being and growth. You will now suggest a diet plan for a {data['trimester']} trimester pregnant woman weighing about {data['weight']} kg, who is feeling {data['health_conditions']} and has strict dietary preferences as follows: {data['dietary_preference']}. Do not suggest any foods that can cause harm or go against the dietary preferences. Integrate Ayurveda recipies into your recommendation, emphasize its benefits, and let natural choices be a high priority. Be clearer and concise in your response, providing a meal plan for the day with breakfast, lunch, snacks, and dinner. Include portion sizes and any specific Ayurvedic ingredients that would be beneficial for her condition."
-            response = chat(model=OLLAMA_MODEL_ID, messages=[{'role':'user','content':prompt}])
-            diet_data = {
-                'UID': user_id,
-                'diet_plan': response.message.content
-            }
-            return {'diet_plan': response.message.content}, 200
+            data, invalid = validate_request(request, diet_validator)
+            if invalid:
+                return invalid
+            library_plan = diet_library.match(data)
+            if library_plan:
+                plan, cohort = library_plan
+                return {'diet_plan': plan, 'source': 'library', 'cohort': cohort}, 200
+            if wants_async(request):
+                return submit_job('diet', user_id, data, lambda: generate_diet_plan(user_id, data))
+            return generate_diet_plan(user_id, data), 200
         except Exception as e:
             return {'error': str(e)}, 500
     
+def generate_diet_plan(user_id, data):
+    """Generate a diet plan with the LLM; returns the DietPlan response body."""
+    legacy_prompt = f"You are a professional dietician and nutritionist. You suggest excellent diet plans for pregnant women that look after their well being and growth. You will now suggest a diet plan for a {data['trimester']} trimester pregnant woman weighing about {data['weight']} kg, who is feeling {data['health_conditions']} and has strict dietary preferences as follows: {data['dietary_preference']}. Do not suggest any foods that can cause harm or go against the dietary preferences. Integrate Ayurveda recipies into your recommendation, emphasize its benefits, and let natural choices be a high priority. Be clearer and concise in your response, providing a meal plan for the day with breakfast, lunch, snacks, and dinner. Include portion sizes and any specific Ayurvedic ingredients that would be beneficial for her condition."
+    if RETRIEVAL_PROMPTS:
+        prompt = build_diet_prompt(data)
+        response = chat(model=OLLAMA_MODEL_ID, messages=[{'role':'user','content':prompt}],
+                        max_tokens=DIET_MAX_TOKENS)
+        usage = usage_report(response, prompt, legacy_prompt)
+    else:
+        prompt = legacy_prompt
+        response = chat(model=OLLAMA_MODEL_ID, messages=[{'role':'user','content':prompt}])
+        usage = usage_report(response, prompt)
+    token_ledger.record('diet', 'retrieval' if RETRIEVAL_PROMPTS else 'legacy', usage)
+    diet_data = {
+        'UID': user_id,
+        'diet_plan': response.message.content
+    }
+    return {'diet_plan': response.message.content, 'source': 'llm', 'token_usage': usage}
+
 @chat_ns.route('/history')
 class ChatBot(Resource):
     @chat_ns.doc('get_chat_history',
         description='''Retrieve chat history for the current user.
-        Returns all previous conversations with the AI assistant.''')
+        Returns all previous conversations with the AI assistant.
+        With ?since=<n> only messages after the first n are returned, wrapped in a delta object.
+        Send the ETag from the last response as If-None-Match to get 304 when nothing changed.''')
     @chat_ns.expect(auth_header)
-    @chat_ns.response(200, 'Success', chat_response)
+    @chat_ns.response(200, 'Success', chat_delta)
+    @chat_ns.response(304, 'Not Modified - history unchanged since the given ETag')
+    @chat_ns.response(400, 'Bad Request - since must be a non-negative integer', error_response)
     @chat_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
     @chat_ns.response(500, 'Server Error - Chat history unavailable', error_response)
     def get(self):
@@ -690,15 +1511,29 @@ class ChatBot(Resource):
             user_id = claims.get('sub') if claims else None
             if not user_id:
                 return {'error': 'Token missing subject'}, 401
-            chat_data = supabase.table('chats')\
-                .select()\
-                .eq('UID', user_id)\
-                .order('created_at', desc=True)\
-                .limit(1)\
-                .execute()
-            if not chat_data.data:
-                return [], 200
-            return chat_data.data[0]['chat_history'], 200
+            since = request.args.get('since')
+            try:
+                offset = int(since) if since is not None else 0
+            except ValueError:
+                offset = -1
+            if offset < 0:
+                return {'error': 'since must be a non-negative integer'}, 400
+            total, etag, messages = chat_sync.fetch(user_id, offset)
+            headers = {'ETag': f'W/"{etag}"'}
+            if request.if_none_match.contains_weak(etag):
+                return '', 304, headers
+            if since is None:
+                return messages, 200, headers
+            reset = offset > total
+            if reset:
+                total, etag, messages = chat_sync.fetch(user_id, 0)
+                headers = {'ETag': f'W/"{etag}"'}
+            return {
+                'messages': messages,
+                'since': 0 if reset else offset,
+                'total': total,
+                'reset': reset
+            }, 200, headers
         except Exception as e:
             return {'error': str(e)}, 500
 
@@ -721,9 +1556,9 @@ class ChatBot(Resource):
             user_id = claims.get('sub') if claims else None
             if not user_id:
                 return {'error': 'Token missing subject'}, 401
-            data = request.get_json()
-            if not data or 'message' not in data:
-                return {'error': 'Missing message'}, 400
+            data, invalid = validate_request(request, chat_validator)
+            if invalid:
+                return invalid
             chat_data = supabase.table('chats')\
                 .select()\
                 .eq('UID', user_id)\
@@ -735,9 +1570,18 @@ class ChatBot(Resource):
             else:
                 chat_history = chat_data.data[0]['chat_history']
             prompt = data['message']
+            cache = semantic_cache.get()
+            cacheable = cache is not None and is_context_free(prompt, chat_history)
+            cached = cache.lookup(prompt) if cacheable else None
             chat_history.append({'role':'user','content':prompt})
-            response = chat(model=OLLAMA_MODEL_ID, messages=chat_history)
-            chat_history.append({'role':'assistant','content':response.message.content})
+            if cached:
+                answer = cached[0]
+            else:
+                response = chat(model=OLLAMA_MODEL_ID, messages=chat_history)
+                answer = response.message.content
+                if cacheable and SEMANTIC_CACHE_ADMIT:
+                    semantic_review.submit(prompt, answer)
+            chat_history.append({'role':'assistant','content':answer})
             try:
                 supabase.table('chats').upsert({
                     'UID': user_id,
@@ -745,7 +1589,7 @@ class ChatBot(Resource):
                 }).execute()
             except Exception as e:
                 logger.warning(f"Failed to store chat history: {str(e)}")
-            return {'response': response.message.content}, 200
+            return {'response': answer, 'cached': bool(cached)}, 200
         except Exception as e:
             return {'error': str(e)}, 500
     
@@ -770,20 +1614,24 @@ class SymptomClassification(Resource):
             user_id = claims.get('sub') if claims else None
             if not user_id:
                 return {'error': 'Token missing subject'}, 401
-            data = request.get_json()
-            if not data or "symptoms" not in data:
-                return {'error': 'Missing symptoms data'}, 400
+            data, invalid = validate_request(request, symptom_validator)
+            if invalid:
+                return invalid
             symptoms = data["symptoms"]
             if not isinstance(symptoms, (str, list)):
                 return {'error': 'Symptoms must be text or list'}, 400
-            if symptom_classifier is None:
+            if symptom_classifier.get() is None:
                 return {'error': 'Symptom classification service unavailable'}, 500
             symptom_text = " ".join(symptoms) if isinstance(symptoms, list) else symptoms
             logger.info(f"[SymptomClassification] Input symptom_text: {symptom_text}")
             try:
+                started = time.perf_counter()
                 prediction_raw = symptom_classifier.predict([symptom_text])
                 logger.info(f"[SymptomClassification] Raw model prediction: {prediction_raw}")
                 classified_symptoms = prediction_raw[0]
+                if shadow is not None:
+                    shadow.submit('symptom_classifier', symptom_text, sorted(classified_symptoms),
+                                  (time.perf_counter() - started) * 1000)
                 confidence_scores = symptom_classifier.predict_proba([symptom_text])[0]
                 logger.info(f"[SymptomClassification] Model confidence scores: {confidence_scores}")
                 classification_result = {
@@ -832,23 +1680,17 @@ class SymptomRiskMapping(Resource):
                 return {'error': 'Token missing subject'}, 401
 
         # Validate request body
-            data = request.get_json()
-            if not data or "symptom_categories" not in data:
-                return {'error': 'Missing symptom categories'}, 400
+            data, invalid = validate_request(request, symptom_risk_validator)
+            if invalid:
+                return invalid
 
-            if symptom_risk_model is None:
+            if symptom_risk_model.get() is None:
                 return {'error': 'Risk mapping service unavailable'}, 500
 
             symptoms = list(dict.fromkeys(data["symptom_categories"]))  # Remove duplicates
 
         # Get most recent vitals (optional fallback values)
-            vitals_data = supabase.table("vitals")\
-                .select("systolic_bp, diastolic_bp, blood_glucose, body_temp, heart_rate")\
-                .eq("UID", user_id)\
-                .order("created_at", desc=True)\
-                .limit(1)\
-                .execute()
-            vitals = vitals_data.data[0] if vitals_data.data else {}
+            vitals, degraded = fetch_latest_vitals(user_id)
 
         # Prepare input features
             model_features = {
@@ -861,10 +1703,15 @@ class SymptomRiskMapping(Resource):
             }
 
             try:
+                started = time.perf_counter()
                 X = encode_features_for_model(model_features, symptom_risk_model)
                 risks = symptom_risk_model.model.predict(X)[0]
+                primary_ms = (time.perf_counter() - started) * 1000
                 probs = symptom_risk_model.model.predict_proba(X)[0]
                 risk_labels = symptom_risk_model.label_binarizer.classes_
+                if drift_monitor is not None:
+                    drift_monitor.observe('symptom_risk', [model_features[name] for name in (
+                        'systolic_bp', 'diastolic_bp', 'blood_glucose', 'body_temp', 'heart_rate', 'symptoms')])
 
                 risks_result = []
                 for idx, label in enumerate(risk_labels):
@@ -875,6 +1722,9 @@ class SymptomRiskMapping(Resource):
                         'probability': round(prob, 4),
                         'severity': 'high' if prob > 0.7 else 'medium' if prob > 0.4 else 'low'
                         })
+                if shadow is not None:
+                    shadow.submit('symptom_risk', model_features,
+                                  sorted(r['risk_type'] for r in risks_result), primary_ms)
 
             # Save the assessment
                 risk_data = {
@@ -888,7 +1738,8 @@ class SymptomRiskMapping(Resource):
                 except Exception as e:
                     logger.warning(f"Failed to store risk assessment: {str(e)}")
 
-                return {'risks': risks_result}, 200
+                # degraded: vitals were unavailable, so stale or default values were used
+                return {'risks': risks_result, 'degraded': degraded}, 200
 
             except Exception as e:
                 logger.warning(f"Risk prediction failed: {str(e)}")
@@ -905,6 +1756,7 @@ class GenerateRecommendations(Resource):
         description='''Generate personalized lifestyle recommendations.\nProvides daily activities, music, exercises, and Ayurvedic tips based on health data.''')
     @api.expect(auth_header)
     @api.response(200, 'Success', recommendation_response)
+    @api.response(202, 'Accepted - queued as a background job (?async=true)', job_response)
     @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
     @api.response(500, 'Server Error - Recommendation service unavailable', error_response)
     def get(self):
@@ -918,86 +1770,52 @@ class GenerateRecommendations(Resource):
             user_id = claims.get('sub') if claims else None
             if not user_id:
                 return {'error': 'Token missing subject'}, 401
-            symptoms = supabase.table("symptoms")\
-                .select("classified_categories")\
-                .eq("UID", user_id)\
-                .order("recorded_at", desc=True)\
-                .limit(3)\
-                .execute()
-            recent_symptoms = [s["classified_categories"] for s in symptoms.data]
-            vitals = supabase.table("vitals")\
-                .select("systolic_bp, diastolic_bp, blood_glucose, body_temp, heart_rate")\
-                .eq("UID", user_id)\
-                .order("created_at", desc=True)\
-                .limit(1)\
-                .execute()
-            vitals_data = vitals.data[0] if vitals.data else {}
             delivery_done = 'delivery_done' in request.args and request.args['delivery_done'].lower() == 'true'
-            if delivery_done:
-                prompt = (
-                    f"You are a postpartum wellness expert. Create lifestyle suggestions including:\n"
-                    f"1. A short daily self-care activity to aid postpartum recovery\n"
-                    f"2. A suitable music type or genre for emotional well-being\n"
-                    f"3. A gentle exercise appropriate for postpartum women\n"
-                    f"4. An Ayurvedic tip for healing and lactation\n\n"
-                
-        f"Context:\n"
-        f"Recent symptoms: {', '.join(sum(recent_symptoms, []))}\n"
-        f"Vitals: BP {vitals_data.get('systolic_bp', 'N/A')}/{vitals_data.get('diastolic_bp', 'N/A')}, "
-        f"Glucose: {vitals_data.get('blood_glucose', 'N/A')}, HR: {vitals_data.get('heart_rate', 'N/A')}\n"
-        f"The user has recently given birth. Focus on postpartum care."
-    )
-            else:
-                prompt = (
-        f"You are a prenatal wellness expert. Create lifestyle suggestions including:\n"
-        f"1. A short daily self-care activity\n"
-        f"2. A suitable music type or genre\n"
-        f"3. A specific exercise suitable for their condition\n"
-        f"4. An Ayurvedic tip\n\n"
-        f"Context:\n"
-        f"Recent symptoms: {', '.join(sum(recent_symptoms, []))}\n"
-        f"Vitals: BP {vitals_data.get('systolic_bp', 'N/A')}/{vitals_data.get('diastolic_bp', 'N/A')}, "
-        f"Glucose: {vitals_data.get('blood_glucose', 'N/A')}, HR: {vitals_data.get('heart_rate', 'N/A')}"
-    )
-            response = chat(model=OLLAMA_MODEL_ID, messages=[{'role': 'user', 'content': prompt}])
-            result = {
-                "self_care": extract_section(response.message.content, "self-care"),
-                "music": extract_section(response.message.content, "music"),
-                "exercise": extract_section(response.message.content, "exercise"),
-                "ayurveda_tip": extract_section(response.message.content, "Ayurveda")
-            }
-            return result, 200
+            if wants_async(request):
+                return submit_job('recommendations', user_id, {'delivery_done': delivery_done},
+                                  lambda: generate_lifestyle_recommendations(user_id, delivery_done))
+            return generate_lifestyle_recommendations(user_id, delivery_done), 200
         except Exception as e:
             return {'error': str(e)}, 500
 
-def extract_section(text, section_name):
-    # Try to extract section by looking for the section name as a heading or in a line
-    import re
-    # Try heading style: e.g. 'Self-care:', 'Music:', etc.
-    pattern = re.compile(rf"{section_name}[:\-]?\s*(.*)", re.IGNORECASE)
-    for line in text.splitlines():
-        match = pattern.match(line.strip())
-        if match:
-            value = match.group(1).strip()
-            if value:
-                return value
-    # Try to find a bullet list under the section
-    lines = text.splitlines()
-    for i, line in enumerate(lines):
-        if section_name.lower() in line.lower():
-            # Collect subsequent bullet points
-            bullets = []
-            for l in lines[i+1:]:
-                if l.strip().startswith('-') or l.strip().startswith('*'):
-                    bullets.append(l.strip('-* ').strip())
-                elif l.strip() == '' or l.strip().startswith('#'):
-                    continue
-                else:
-                    break
-            if bullets:
-                return '\n'.join(bullets)
-    return "Not found"
-    
+def generate_lifestyle_recommendations(user_id, delivery_done):
+    """Build the lifestyle prompt from recent symptoms and vitals and parse the LLM answer."""
+    recent_symptoms = fetch_recent_symptoms(user_id)
+    vitals_data, _ = fetch_latest_vitals(user_id)
+    if delivery_done:
+        prompt = (
+            f"You are a postpartum wellness expert. Create lifestyle suggestions including:\n"
+            f"1. A short daily self-care activity to aid postpartum recovery\n"
+            f"2. A suitable music type or genre for emotional well-being\n"
+            f"3. A gentle exercise appropriate for postpartum women\n"
+            f"4. An Ayurvedic tip for healing and lactation\n\n"
+            f"Context:\n"
+            f"Recent symptoms: {', '.join(sum(recent_symptoms, []))}\n"
+            f"Vitals: BP {vitals_data.get('systolic_bp', 'N/A')}/{vitals_data.get('diastolic_bp', 'N/A')}, "
+            f"Glucose: {vitals_data.get('blood_glucose', 'N/A')}, HR: {vitals_data.get('heart_rate', 'N/A')}\n"
+            f"The user has recently given birth. Focus on postpartum care.\n\n"
+            f"{structured.LIFESTYLE.instructions()}"
+        )
+    else:
+        prompt = (
+            f"You are a prenatal wellness expert. Create lifestyle suggestions including:\n"
+            f"1. A short daily self-care activity\n"
+            f"2. A suitable music type or genre\n"
+            f"3. A specific exercise suitable for their condition\n"
+            f"4. An Ayurvedic tip\n\n"
+            f"Context:\n"
+            f"Recent symptoms: {', '.join(sum(recent_symptoms, []))}\n"
+            f"Vitals: BP {vitals_data.get('systolic_bp', 'N/A')}/{vitals_data.get('diastolic_bp', 'N/A')}, "
+            f"Glucose: {vitals_data.get('blood_glucose', 'N/A')}, HR: {vitals_data.get('heart_rate', 'N/A')}\n\n"
+            f"{structured.LIFESTYLE.instructions()}"
+        )
+    response = chat(model=OLLAMA_MODEL_ID, messages=[{'role': 'user', 'content': prompt}],
+                    **structured.LIFESTYLE.response_format(LLM_JSON_MODE))
+    result, outcome = structured.LIFESTYLE.parse(response.message.content)
+    if outcome != 'json':
+        logger.info(f"[GenerateRecommendations] LLM answer parsed as {outcome}")
+    return result
+
 @ayurveda_ns.route('/remedy_recommendation')
 class RemedyRecommendation(Resource):
     @ayurveda_ns.doc('get_remedy_recommendations',
@@ -1005,6 +1823,7 @@ class RemedyRecommendation(Resource):
         Suggests safe natural remedies based on symptoms, body type, and health history.''')
     @ayurveda_ns.expect(auth_header, node_auth, remedy_input)
     @ayurveda_ns.response(200, 'Success', remedy_response)
+    @ayurveda_ns.response(202, 'Accepted - queued as a background job (?async=true)', job_response)
     @ayurveda_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
     @ayurveda_ns.response(400, 'Bad Request - Missing required fields', error_response)
     @ayurveda_ns.response(500, 'Server Error - Recommendation service unavailable', error_response)
@@ -1019,92 +1838,255 @@ class RemedyRecommendation(Resource):
             user_id = claims.get('sub') if claims else None
             if not user_id:
                 return {'error': 'Token missing subject'}, 401
-            data = request.get_json()
-            if not data or 'symptoms' not in data:
-                return {'error': 'Missing required field: symptoms'}, 400
-            symptoms = data["symptoms"]
-            try:
-                headers = {'Node-Token': data.get('node_token')} if 'node_token' in data else {}
-                diagnosis_data = []
-                if headers:
-                    diagnosis_response = requests.get(
-                        f"http://your-node-api.com/api/reports/diagnosis",
-                        headers=headers
-                    )
-                    diagnosis_data = diagnosis_response.json().get("recent_diagnoses", [])
-            except Exception as e:
-                diagnosis_data = []
-                logger.warning(f"Could not fetch diagnosis from Node: {e}")
-            try:
-                vitals_data = supabase.table("vitals")\
-                    .select("systolic_bp, diastolic_bp, blood_glucose, body_temp, heart_rate")\
-                    .eq("UID", user_id)\
-                    .order("created_at", desc=True)\
-                    .limit(1)\
-                    .execute()
-                vitals = vitals_data.data[0] if vitals_data.data else {}
-            except Exception as e:
-                vitals = {}
-                logger.warning(f"Could not fetch vitals: {e}")
-            delivery_done = data.get('delivery_done', False)
-
-            if delivery_done:
-                prompt = (
-                    f"You are an expert Ayurvedic practitioner. Based on the following details, suggest Ayurvedic postpartum care remedies. "
-                    f"Focus on safe, natural ways to help the mother recover physically and mentally. Suggest only safe herbs, dietary practices, or routines. "
-                    f"Details:\n"
-                    f"- Reported symptoms: {', '.join(symptoms)}\n"
-    
-        f"- Known diagnoses: {', '.join(diagnosis_data) if diagnosis_data else 'None'}\n"
-        f"- Recent vitals: BP: {vitals.get('systolic_bp', 'N/A')}/{vitals.get('diastolic_bp', 'N/A')}, "
-        f"Glucose: {vitals.get('blood_glucose', 'N/A')}, HR: {vitals.get('heart_rate', 'N/A')}\n"
-        f"Suggest 2–3 remedies suitable for postpartum recovery. Mention usage instructions (e.g., time, method). "
-        f"Also mention dietary or routine advice briefly. Avoid anything unsafe for lactating mothers."
-                )
-            else:
-                prompt = (
-                    f"You are an expert Ayurvedic practitioner. Based on the following details, first decide the user's prakriti (body type) as one of: Vata, Pitta, Kapha, Vata-Pitta, Pitta-Kapha, Vata-Kapha, or Tridoshic, and then suggest safe and personalized remedies. "
-                    f"For a pregnant woman with the following details:\n"
-                    f"- Reported symptoms: {', '.join(symptoms)}\n"
-                    f"- Known diagnoses: {', '.join(diagnosis_data) if diagnosis_data else 'None'}\n"
-                    f"- Recent vitals: BP: {vitals.get('systolic_bp', 'N/A')}/{vitals.get('diastolic_bp', 'N/A')}, "
-        f"Glucose: {vitals.get('blood_glucose', 'N/A')}, HR: {vitals.get('heart_rate', 'N/A')}\n"
-        f"Suggest 2–3 Ayurvedic remedies only from safe ingredients (no toxic herbs). "
-        f"Mention how to use them (e.g., morning/evening, with food, etc.). Avoid overlapping with existing prescriptions. "
-        f"First, state the prakriti you have determined, then list the remedies."
-            )
-            response = chat(model=OLLAMA_MODEL_ID, messages=[{'role': 'user', 'content': prompt}])
-            remedy_text = response.message.content.strip()
-            # Try to extract prakriti from the first line if present
-            lines = remedy_text.split("\n")
-            prakriti = None
-            if lines and (':' in lines[0] or 'prakriti' in lines[0].lower()):
-                prakriti = lines[0].split(":", 1)[-1].strip() if ':' in lines[0] else lines[0].strip()
-            # Extract remedies (skip first line if it's prakriti)
-            remedy_lines = lines[1:] if prakriti else lines
-            remedy_list = [
-                {"remedy": line.strip(), "confidence": 1.0}
-                for line in remedy_lines
-                if line.strip()
-            ]
-            remedy_data = {
-                'UID': user_id,
-                'symptoms': symptoms,
-                'prakriti': prakriti,
-                'diagnoses': diagnosis_data,
-                'recommended_remedies': remedy_list,
-                'raw_prompt': prompt,
-                'recorded_at': datetime.utcnow().isoformat()
-            }
-            try:
-                supabase.table('remedy_recommendations').insert(remedy_data).execute()
-            except Exception as e:
-                logger.warning(f"Failed to store remedy recommendations: {str(e)}")
-            return {'prakriti': prakriti, 'remedies': remedy_list}, 200
+            data, invalid = validate_request(request, remedy_validator)
+            if invalid:
+                return invalid
+            if wants_async(request):
+                return submit_job('remedy', user_id, data, lambda: generate_remedies(user_id, data))
+            return generate_remedies(user_id, data), 200
         except Exception as e:
             return {'error': str(e)}, 500
 
 
+def generate_remedies(user_id, data):
+    """Answer from the local model when confident, else from the LLM, and store the result."""
+    symptoms = data["symptoms"]
+    delivery_done = data.get('delivery_done', False)
+
+    def escalate():
+        diagnosis_data = fetch_diagnoses(data['node_token'], user_id) if 'node_token' in data else []
+        vitals, _ = fetch_latest_vitals(user_id)
+        if delivery_done:
+            legacy_prompt = (
+                f"You are an expert Ayurvedic practitioner. Based on the following details, suggest Ayurvedic postpartum care remedies. "
+                f"Focus on safe, natural ways to help the mother recover physically and mentally. Suggest only safe herbs, dietary practices, or routines. "
+                f"Details:\n"
+                f"- Reported symptoms: {', '.join(symptoms)}\n"
+    
+    f"- Known diagnoses: {', '.join(diagnosis_data) if diagnosis_data else 'None'}\n"
+    f"- Recent vitals: BP: {vitals.get('systolic_bp', 'N/A')}/{vitals.get('diastolic_bp', 'N/A')}, "
+    f"Glucose: {vitals.get('blood_glucose', 'N/A')}, HR: {vitals.get('heart_rate', 'N/A')}\n"
+    f"Suggest 2–3 remedies suitable for postpartum recovery. Mention usage instructions (e.g., time, method). "
+    f"Also mention dietary or routine advice briefly. Avoid anything unsafe for lactating mothers.\n"
+    f"{structured.REMEDIES.instructions(structured.POSTPARTUM_EXAMPLE)}"
+            )
+        else:
+            legacy_prompt = (
+                f"You are an expert Ayurvedic practitioner. Based on the following details, first decide the user's prakriti (body type) as one of: Vata, Pitta, Kapha, Vata-Pitta, Pitta-Kapha, Vata-Kapha, or Tridoshic, and then suggest safe and personalized remedies. "
+                f"For a pregnant woman with the following details:\n"
+                f"- Reported symptoms: {', '.join(symptoms)}\n"
+                f"- Known diagnoses: {', '.join(diagnosis_data) if diagnosis_data else 'None'}\n"
+                f"- Recent vitals: BP: {vitals.get('systolic_bp', 'N/A')}/{vitals.get('diastolic_bp', 'N/A')}, "
+    f"Glucose: {vitals.get('blood_glucose', 'N/A')}, HR: {vitals.get('heart_rate', 'N/A')}\n"
+    f"Suggest 2–3 Ayurvedic remedies only from safe ingredients (no toxic herbs). "
+    f"Mention how to use them (e.g., morning/evening, with food, etc.). Avoid overlapping with existing prescriptions. "
+    f"{structured.REMEDIES.instructions()}"
+        )
+        if RETRIEVAL_PROMPTS:
+            prompt = build_remedy_prompt(symptoms, diagnosis_data, vitals, delivery_done)
+            response = chat(model=OLLAMA_MODEL_ID, messages=[{'role': 'user', 'content': prompt}],
+                            max_tokens=REMEDY_MAX_TOKENS, **structured.REMEDIES.response_format(LLM_JSON_MODE))
+            usage = usage_report(response, prompt, legacy_prompt)
+        else:
+            prompt = legacy_prompt
+            response = chat(model=OLLAMA_MODEL_ID, messages=[{'role': 'user', 'content': prompt}],
+                            **structured.REMEDIES.response_format(LLM_JSON_MODE))
+            usage = usage_report(response, prompt)
+        token_ledger.record('remedy', 'retrieval' if RETRIEVAL_PROMPTS else 'legacy', usage)
+        parsed, outcome = structured.REMEDIES.parse(response.message.content)
+        if outcome != 'json':
+            logger.info(f"[RemedyRecommendation] LLM answer parsed as {outcome}")
+        return {
+            'prakriti': None if delivery_done else parsed['prakriti'],
+            'remedies': parsed['remedies'],
+            'diagnoses': diagnosis_data,
+            'raw_prompt': prompt,
+            'token_usage': usage
+        }
+
+    # Common symptom sets are answered by the local model; postpartum
+    # care isn't in its corpus, so those always go to the LLM.
+    result = remedy_engine.recommend(
+        symptoms, data.get('prakriti'), escalate, allow_local=not delivery_done
+    )
+    prakriti = result['prakriti']
+    remedy_list = result['remedies']
+    remedy_data = {
+        'UID': user_id,
+        'symptoms': symptoms,
+        'prakriti': prakriti,
+        'diagnoses': result.get('diagnoses', []),
+        'recommended_remedies': remedy_list,
+        'raw_prompt': result.get('raw_prompt'),
+        'recorded_at': datetime.utcnow().isoformat()
+    }
+    try:
+        supabase.table('remedy_recommendations').insert(remedy_data).execute()
+    except Exception as e:
+        logger.warning(f"Failed to store remedy recommendations: {str(e)}")
+    response_body = {'prakriti': prakriti, 'remedies': remedy_list, 'tier': result['tier']}
+    if 'token_usage' in result:
+        response_body['token_usage'] = result['token_usage']
+    return response_body
+
+
+@chat_ns.route('/cache/stats')
+class ChatCacheStats(Resource):
+    @chat_ns.doc('get_chat_cache_stats',
+        description='''Size and hit rate of the semantic answer cache.
+        Only first-turn or context-free questions are looked up.''')
+    @chat_ns.expect(auth_header)
+    @chat_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        cache = semantic_cache.get()
+        if cache is None:
+            return {'enabled': False}, 200
+        return {'enabled': True, 'admit': SEMANTIC_CACHE_ADMIT, 'review': semantic_review.stats(),
+                **cache.stats()}, 200
+
+@diet_ns.route('/library/stats')
+class DietLibraryStats(Resource):
+    @diet_ns.doc('get_diet_library_stats',
+        description='''Cohort plans in the library and how many requests it served.''')
+    @diet_ns.expect(auth_header)
+    @diet_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return diet_library.stats(), 200
+
+@chat_ns.route('/sync/stats')
+class ChatSyncStats(Resource):
+    @chat_ns.doc('get_chat_sync_stats',
+        description='''How chat history slices were fetched (database function or fallback)
+        and response compression totals.''')
+    @chat_ns.expect(auth_header)
+    @chat_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return {'sync': chat_sync.stats(), 'compression': compressor.stats()}, 200
+
+
+@ayurveda_ns.route('/remedy_recommendation/stats')
+class RemedyRecommendationStats(Resource):
+    @ayurveda_ns.doc('get_remedy_tier_stats',
+        description='''Hit rates of the remedy recommendation tiers.
+        Reports how many requests the local model answered versus the LLM.''')
+    @ayurveda_ns.expect(auth_header)
+    @ayurveda_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return remedy_engine.stats(), 200
+
+
+@ayurveda_ns.route('/retrieval/stats')
+class RetrievalStats(Resource):
+    @ayurveda_ns.doc('get_retrieval_stats',
+        description='''Knowledge index size and prompt/completion token usage.
+        Retrieval-grounded prompts also report the prompt tokens saved against the
+        legacy free-form prompt.''')
+    @ayurveda_ns.expect(auth_header)
+    @ayurveda_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return {
+            'enabled': RETRIEVAL_PROMPTS,
+            'documents': len(knowledge_index.get()),
+            'top_k': RETRIEVAL_TOP_K,
+            'token_usage': token_ledger.snapshot()
+        }, 200
+
+
+@alerts_ns.route('/')
+class RecentAlerts(Resource):
+    @alerts_ns.doc('get_recent_alerts',
+        description='''Most recent alerts raised for the current user.''')
+    @alerts_ns.expect(auth_header)
+    @alerts_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        return alert_engine.recent(user_id), 200
+
+
+@alerts_ns.route('/rules')
+class AlertRules(Resource):
+    @alerts_ns.doc('get_alert_rules', description='''Active alert rules.''')
+    @alerts_ns.expect(auth_header)
+    @alerts_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return [rule.to_dict() for rule in alert_engine.rules], 200
+
+
+@alerts_ns.route('/stats')
+class AlertStats(Resource):
+    @alerts_ns.doc('get_alert_stats',
+        description='''Events evaluated, alerts fired and suppressed, and sink delivery counters.''')
+    @alerts_ns.expect(auth_header)
+    @alerts_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return alert_engine.stats(), 200
+
+
+@jobs_ns.route('/<string:job_id>')
+class JobStatus(Resource):
+    @jobs_ns.doc('get_job',
+        description='''Status and result of a background generation job.
+        Pass ?wait=<seconds> to long-poll until the job finishes (capped by JOB_MAX_WAIT).''')
+    @jobs_ns.expect(auth_header)
+    @jobs_ns.response(200, 'Finished', job_response)
+    @jobs_ns.response(202, 'Still queued or running', job_response)
+    @jobs_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @jobs_ns.response(404, 'Unknown or expired job', error_response)
+    def get(self, job_id):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        try:
+            wait = min(max(float(request.args.get('wait', 0)), 0), JOB_MAX_WAIT)
+        except ValueError:
+            return {'error': 'wait must be a number of seconds'}, 400
+        job = job_queue.get(job_id, wait=wait)
+        if job is None or job.user_id != claims.get('sub'):
+            return {'error': 'Job not found or expired'}, 404
+        body = job.to_dict()
+        body['status_url'] = f"/jobs/{job.id}"
+        return body, 200 if job.finished.is_set() else 202
+
+
+@jobs_ns.route('/stats')
+class JobStats(Resource):
+    @jobs_ns.doc('get_job_stats',
+        description='''Worker pool size, queue depth and job counts.''')
+    @jobs_ns.expect(auth_header)
+    @jobs_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return job_queue.stats(), 200
+
+
 def encode_features_for_model(features: dict, model_obj):
     vector = {
         "systolic_bp": features.get("systolic_bp", 120),
@@ -1117,12 +2099,321 @@ def encode_features_for_model(features: dict, model_obj):
         vector[f"symptom__{symptom}"] = 1
     return model_obj.vectorizer.transform([vector])
 
+@api.route('/explanations/stats')
+class ExplanationStats(Resource):
+    @api.doc('get_explanation_stats', description='''Explanation cache size and hit counts per model.''')
+    @api.expect(auth_header)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return {'maternal': maternal_explainer.stats(), 'fetal': fetal_explainer.stats()}, 200
+
+
+@api.route('/dependencies/stats')
+class DependencyStats(Resource):
+    @api.doc('get_dependency_stats',
+        description='''Circuit breaker state for Supabase, the Node service and each LLM backend.''')
+    @api.expect(auth_header)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        breaker_states = breakers.snapshot()
+        for name, backend in get_gateway().snapshot()['backends'].items():
+            breaker_states[f"llm.{name}"] = backend['breaker']
+        return {
+            'breakers': breaker_states,
+            'timeouts': {'supabase': SUPABASE_TIMEOUT, 'node': NODE_TIMEOUT},
+            'last_known_good': last_known_good.snapshot()
+        }, 200
+
+@api.route('/llm/output/stats')
+class StructuredOutputStats(Resource):
+    @api.doc('get_structured_output_stats',
+        description='''How this worker parsed the JSON answers of the recommendation and remedy generations:
+        counts per outcome (json, repaired, partial, text, failed), failure rate and parse time.''')
+    @api.expect(auth_header)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return {'json_mode': LLM_JSON_MODE, 'specs': structured.stats()}, 200
+
+@api.route('/admission/stats')
+class AdmissionStats(Resource):
+    @api.doc('get_admission_stats',
+        description='''Per-class concurrency, queue and shedding counters of the admission controller.''')
+    @api.expect(auth_header)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        return admission.stats(), 200
+
+@api.route('/drift/stats')
+class DriftStats(Resource):
+    @api.doc('get_drift_stats',
+        description='''Input drift per model feature over the lookback window, merged across workers:
+        PSI and KS against the training-data reference, live and reference medians.
+        Pass ?refresh=true to recompute instead of returning the last periodic check.''')
+    @api.expect(auth_header)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        if drift_monitor is None:
+            return {'enabled': False}, 200
+        refresh = request.args.get('refresh', 'false').lower() == 'true'
+        return {'enabled': True, **drift_monitor.stats(refresh)}, 200
+
+@api.route('/shadow/stats')
+class ShadowStats(Resource):
+    @api.doc('get_shadow_stats',
+        description='''Shadow evaluation of candidate models: sampled, dropped and scored counts,
+        agreement with the live model and latency of both, per model and candidate.''')
+    @api.expect(auth_header)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @api.response(403, 'Forbidden - Admin access required', error_response)
+    def get(self):
+        claims, denied = validate_admin(request)
+        if denied:
+            return denied
+        if shadow is None:
+            return {'enabled': False}, 200
+        return {'enabled': True, **shadow.stats()}, 200
+
+@api.route('/shadow/disagreements')
+class ShadowDisagreements(Resource):
+    @api.doc('get_shadow_disagreements',
+        description='''Most recent inputs where a candidate disagreed with the live model (or failed).
+        Filter with ?model=fetal|maternal|symptom_classifier|symptom_risk and ?limit=.''')
+    @api.expect(auth_header)
+    @api.response(400, 'Bad Request - Invalid limit', error_response)
+    @api.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @api.response(403, 'Forbidden - Admin access required', error_response)
+    def get(self):
+        claims, denied = validate_admin(request)
+        if denied:
+            return denied
+        if shadow is None:
+            return {'enabled': False, 'disagreements': []}, 200
+        try:
+            limit = max(1, min(int(request.args.get('limit', 50)), 500))
+        except ValueError:
+            return {'error': 'limit must be an integer'}, 400
+        return {'enabled': True,
+                'disagreements': shadow.store.disagreements(request.args.get('model'), limit)}, 200
+
+# On-demand profiling of this worker (the one the load balancer routed the call to;
+# the pid is returned so repeated calls can be matched up)
+profiler = SamplingProfiler(max_seconds=float(os.environ.get("PROFILER_MAX_SECONDS", 60)))
+allocation_tracker = AllocationTracker(max_seconds=float(os.environ.get("TRACEMALLOC_MAX_SECONDS", 600)))
+
+# Weekly reports: sections are cached on disk by a digest of their rows,
+# shared with the bulk renderer (python reports.py bulk)
+REPORTS_PAGE_SIZE = int(os.environ.get("REPORTS_PAGE_SIZE", 500))
+report_cache = SectionCache(
+    os.environ.get("REPORTS_CACHE_DIR") or os.path.join(MODEL_PATH, 'reports', 'cache'),
+    memory_items=int(os.environ.get("REPORTS_CACHE_MEMORY_ITEMS", 256))
+)
+
+@reports_ns.route('/weekly')
+class WeeklyReport(Resource):
+    @reports_ns.doc('get_weekly_report',
+        params={'week': 'Any day of the week (YYYY-MM-DD) or an ISO week (YYYY-Www); default last week',
+                'user_id': 'Another patient\'s report (admins only)'},
+        description='''Weekly PDF summary for the current user (Monday to Sunday, UTC).
+        Sections whose readings haven't changed are served from the render cache; the ETag changes
+        only when the data does, so If-None-Match revalidation returns 304.''')
+    @reports_ns.expect(auth_header)
+    @reports_ns.response(200, 'PDF document')
+    @reports_ns.response(304, 'Not modified')
+    @reports_ns.response(400, 'Bad Request - Invalid week', error_response)
+    @reports_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @reports_ns.response(403, 'Forbidden - Admin access required', error_response)
+    def get(self):
+        claims, error = validate_token(request)
+        if error:
+            return {'error': error}, 401
+        user_id = claims.get('sub')
+        if not user_id:
+            return {'error': 'Token missing subject'}, 401
+        patient = request.args.get('user_id')
+        if patient and patient != user_id:
+            claims, denied = validate_admin(request)
+            if denied:
+                return denied
+            user_id = patient
+        try:
+            start, _ = week_bounds(request.args.get('week'))
+        except ValueError:
+            return {'error': 'week must be YYYY-MM-DD or YYYY-Www'}, 400
+        try:
+            pdf, info = render_weekly_report(supabase, user_id, start, report_cache, REPORTS_PAGE_SIZE)
+        except Exception as e:
+            logger.error(f"[Reports] Failed to render week {start} for {user_id}: {e}")
+            return {'error': f'Failed to generate report: {e}'}, 500
+        logger.info(f"[Reports] {user_id} week {start}: rendered {info['rendered']}, cached {info['cached']}")
+
+        from flask import make_response
+        etag = f'"{info["etag"]}"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = make_response('', 304)
+        else:
+            response = make_response(pdf)
+            response.mimetype = 'application/pdf'
+            response.headers['Content-Disposition'] = f'inline; filename="weekly-report-{start}.pdf"'
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+def text_response(body, status=200):
+    from flask import make_response
+    response = make_response(body, status)
+    response.mimetype = 'text/plain'
+    response.headers['X-Worker-Pid'] = str(os.getpid())
+    return response
+
+def flag(name, default='false'):
+    return request.args.get(name, default).lower() == 'true'
+
+@admin_ns.route('/profile')
+class CpuProfile(Resource):
+    @admin_ns.doc('profile_cpu',
+        params={'seconds': 'Sampling duration (default 10, capped by PROFILER_MAX_SECONDS)',
+                'interval_ms': 'Sampling interval in milliseconds (default 5)',
+                'format': 'folded (flame graph input, default) or json (top frames)',
+                'idle': 'Include threads parked in waits (default false)',
+                'threads': 'Root each stack at its thread name (default false)'},
+        description='''Sample the Python stacks of every thread in this worker for a few seconds.
+        The folded output feeds flamegraph.pl, speedscope or inferno directly.''')
+    @admin_ns.expect(auth_header)
+    @admin_ns.response(400, 'Bad Request - Invalid seconds or interval_ms', error_response)
+    @admin_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @admin_ns.response(403, 'Forbidden - Admin access required', error_response)
+    @admin_ns.response(409, 'Conflict - A profile is already running in this worker', error_response)
+    def get(self):
+        claims, denied = validate_admin(request)
+        if denied:
+            return denied
+        try:
+            seconds = float(request.args.get('seconds', 10))
+            interval = float(request.args.get('interval_ms', 5)) / 1000
+        except ValueError:
+            return {'error': 'seconds and interval_ms must be numbers'}, 400
+        if not (math.isfinite(seconds) and math.isfinite(interval)):
+            return {'error': 'seconds and interval_ms must be finite'}, 400
+        logger.info(f"[Admin] {claims.get('sub')} profiling worker {os.getpid()} for {seconds}s")
+        try:
+            result = profiler.profile(seconds, interval, include_idle=flag('idle'), by_thread=flag('threads'))
+        except ProfilerBusy as e:
+            return {'error': str(e)}, 409
+        if request.args.get('format', 'folded') == 'json':
+            stacks = result.pop('stacks')
+            return {'pid': os.getpid(), **result, 'top': top_functions(stacks)}, 200
+        return text_response(folded(result['stacks']))
+
+@admin_ns.route('/memory')
+class AllocationTracking(Resource):
+    @admin_ns.doc('start_allocation_tracking',
+        params={'frames': 'Frames kept per allocation traceback (default 25)',
+                'max_seconds': 'Stop tracing automatically after this long (capped by TRACEMALLOC_MAX_SECONDS)'},
+        description='''Start tracemalloc in this worker and take the baseline snapshot for diffs.''')
+    @admin_ns.expect(auth_header)
+    @admin_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @admin_ns.response(403, 'Forbidden - Admin access required', error_response)
+    def post(self):
+        claims, denied = validate_admin(request)
+        if denied:
+            return denied
+        try:
+            frames = int(request.args.get('frames', 25))
+            max_seconds = float(request.args.get('max_seconds', 0)) or None
+        except ValueError:
+            return {'error': 'frames and max_seconds must be numbers'}, 400
+        if max_seconds is not None and not math.isfinite(max_seconds):
+            return {'error': 'max_seconds must be finite'}, 400
+        logger.info(f"[Admin] {claims.get('sub')} started allocation tracking in worker {os.getpid()}")
+        return {'pid': os.getpid(), **allocation_tracker.start(frames, max_seconds)}, 200
+
+    @admin_ns.doc('get_allocation_report',
+        params={'top': 'Number of entries (default 25)',
+                'group': 'lineno (default), traceback or filename',
+                'diff': 'Growth since tracking started instead of current totals (default false)',
+                'include': 'Only allocations with a frame matching this file pattern, e.g. *app.py',
+                'format': 'json (default) or folded (bytes per traceback, for flame graphs)'},
+        description='''The code paths holding the most traced memory in this worker.''')
+    @admin_ns.expect(auth_header)
+    @admin_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @admin_ns.response(403, 'Forbidden - Admin access required', error_response)
+    @admin_ns.response(409, 'Conflict - Allocation tracking is not running', error_response)
+    def get(self):
+        claims, denied = validate_admin(request)
+        if denied:
+            return denied
+        group = request.args.get('group', 'lineno')
+        if group not in ('lineno', 'traceback', 'filename'):
+            return {'error': 'group must be lineno, traceback or filename'}, 400
+        try:
+            top = int(request.args.get('top', 25))
+        except ValueError:
+            return {'error': 'top must be an integer'}, 400
+        diff = flag('diff')
+        try:
+            status, rows = allocation_tracker.report(top, group, diff, request.args.get('include'))
+        except RuntimeError as e:
+            return {'error': str(e)}, 409
+        if request.args.get('format') == 'folded':
+            return text_response(folded_allocations(rows, diff))
+        return {'pid': os.getpid(), **status, 'group': group, 'diff': diff, 'allocations': rows}, 200
+
+    @admin_ns.doc('stop_allocation_tracking', description='''Stop tracemalloc in this worker.''')
+    @admin_ns.expect(auth_header)
+    @admin_ns.response(401, 'Unauthorized - Invalid or missing token', error_response)
+    @admin_ns.response(403, 'Forbidden - Admin access required', error_response)
+    def delete(self):
+        claims, denied = validate_admin(request)
+        if denied:
+            return denied
+        return {'pid': os.getpid(), 'stopped': allocation_tracker.stop()}, 200
+
+@api.route('/ready')
+class Ready(Resource):
+    @api.doc('get_readiness',
+        description='''Warm-up progress: which models and indexes are loaded. Returns 503 until every
+        required item is ready, so load balancers can hold traffic while a worker starts.''')
+    def get(self):
+        status = warmup.status()
+        return status, 200 if status['ready'] else 503
+
 @api.route('/')
 class Index(Resource):
     @api.doc('index')
     def get(self):
         return "Hello governor"
 
+
+def create_app(warm_up=True):
+    """Build the Flask app. Models load in a background thread when `warm_up` is set,
+    otherwise on first use."""
+    app = Flask(__name__)
+    CORS(app)
+    api.init_app(app)
+    admission.init_app(app)
+    compressor.init_app(app)
+    if warm_up:
+        warmup.start()
+    return app
+
+
+app = create_app(warm_up=os.environ.get("WARMUP", "true").lower() == "true")
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))
     
@@ -0,0 +1,121 @@
+"""Incremental chat history sync.
+
+The chat history is one JSON array per user in `chats.chat_history`. For
+delta sync the client sends the number of messages it already has
+(`?since=<n>`) and/or the ETag of its last response; the server answers
+with only the newer messages, or 304 when nothing changed.
+
+Slicing happens in Postgres through the `chat_history_since` function
+below (apply it once in the Supabase SQL editor; `python chat_sync.py sql`
+prints it), so only the new messages leave the database. If the function
+is missing, the server falls back to fetching the `chat_history` column
+and slicing it here, and retries the function after `retry_rpc_after`
+seconds.
+
+The ETag is derived from the message count and the last message, so every
+server process computes the same tag for the same history.
+"""
+import hashlib
+import json
+import logging
+import sys
+import threading
+import time
+
+from resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+SLICE_FUNCTION = 'chat_history_since'
+
+SLICE_SQL = """
+create or replace function chat_history_since(p_uid uuid, p_since integer)
+returns jsonb
+language sql stable
+as $$
+  select jsonb_build_object(
+    'total', jsonb_array_length(c.chat_history),
+    'last', c.chat_history -> -1,
+    'messages', coalesce((
+      select jsonb_agg(m.value order by m.ord)
+      from jsonb_array_elements(c.chat_history) with ordinality as m(value, ord)
+      where m.ord > p_since
+    ), '[]'::jsonb)
+  )
+  from chats c
+  where c."UID" = p_uid
+  order by c.created_at desc
+  limit 1
+$$;
+""".strip()
+
+
+def history_etag(total, last_message):
+    """Opaque tag for a history of `total` messages ending in `last_message`."""
+    if not total:
+        return '0'
+    digest = hashlib.sha1(json.dumps(last_message, sort_keys=True).encode()).hexdigest()[:16]
+    return f"{total}-{digest}"
+
+
+class ChatSync:
+    def __init__(self, client, table='chats', function=SLICE_FUNCTION, retry_rpc_after=300.0):
+        self.client = client
+        self.table = table
+        self.function = function
+        self.retry_rpc_after = retry_rpc_after
+        self._rpc_disabled_until = 0.0
+        self._lock = threading.Lock()
+        self.counts = {'rpc': 0, 'fallback': 0}
+
+    def _slice_rpc(self, user_id, since):
+        result = self.client.rpc(self.function, {'p_uid': user_id, 'p_since': since}).execute()
+        data = result.data
+        if isinstance(data, list):
+            # Some client versions wrap scalar results in a list.
+            data = data[0] if data else None
+        if not data:
+            return 0, None, []
+        return data['total'], data.get('last'), data.get('messages') or []
+
+    def _slice_full(self, user_id, since):
+        result = self.client.table(self.table)\
+            .select('chat_history')\
+            .eq('UID', user_id)\
+            .order('created_at', desc=True)\
+            .limit(1)\
+            .execute()
+        if not result.data:
+            return 0, None, []
+        history = result.data[0]['chat_history'] or []
+        return len(history), history[-1] if history else None, history[since:]
+
+    def fetch(self, user_id, since=0):
+        """Return `(total, etag, messages after index since)`."""
+        since = max(0, int(since))
+        if time.monotonic() >= self._rpc_disabled_until:
+            try:
+                total, last, messages = self._slice_rpc(user_id, since)
+                with self._lock:
+                    self.counts['rpc'] += 1
+                return total, history_etag(total, last), messages
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                logger.warning(f"{self.function} unavailable, slicing chat history in Python: {e}")
+                self._rpc_disabled_until = time.monotonic() + self.retry_rpc_after
+        total, last, messages = self._slice_full(user_id, since)
+        with self._lock:
+            self.counts['fallback'] += 1
+        return total, history_etag(total, last), messages
+
+    def stats(self):
+        with self._lock:
+            return {'rpc_available': time.monotonic() >= self._rpc_disabled_until, **self.counts}
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] == ['sql']:
+        print(SLICE_SQL)
+    else:
+        print("usage: python chat_sync.py sql")
@@ -0,0 +1,87 @@
+"""Response compression for large JSON payloads.
+
+Responses of at least `min_size` bytes are brotli-encoded when the client
+accepts `br` and the `brotli` package is installed, otherwise
+gzip-encoded when it accepts `gzip`. Quality values are honoured: an
+encoding (or `*`) with `q=0` is refused, and a higher q wins over the
+server's brotli-first preference. Small bodies, streamed responses and
+anything already encoded are left alone.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = ('application/json', 'text/')
+
+
+def parse_accept_encoding(header):
+    """`{coding: q}` from an Accept-Encoding header; malformed q-values count as 0."""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, *params = [p.strip() for p in part.split(';')]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        accepted[coding.lower()] = q
+    return accepted
+
+
+class Compressor:
+    def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.enabled = True
+        self.counts = {'gzip': 0, 'br': 0, 'bytes_in': 0, 'bytes_out': 0}
+
+    def choose(self, accept_encoding):
+        accepted = parse_accept_encoding(accept_encoding)
+        wildcard = accepted.get('*', 0.0)
+        best, best_q = None, 0.0
+        for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+            q = accepted.get(encoding, wildcard)
+            if q > best_q:
+                best, best_q = encoding, q
+        return best
+
+    def compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    def after_request(self, response):
+        from flask import request
+        response.vary.add('Accept-Encoding')
+        if (not self.enabled or response.direct_passthrough or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE)):
+            return response
+        encoding = self.choose(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+        compressed = self.compress(body, encoding)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        self.counts[encoding] += 1
+        self.counts['bytes_in'] += len(body)
+        self.counts['bytes_out'] += len(compressed)
+        return response
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def stats(self):
+        return {'min_size': self.min_size, 'brotli_available': brotli is not None, **self.counts}
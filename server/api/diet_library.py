@@ -0,0 +1,408 @@
+"""Precomputed diet plans by cohort, with deterministic personalization.
+
+Diet plan requests cluster heavily: a trimester, a base diet and usually
+one common condition. A cohort is `(trimester, base diet, conditions)`;
+the `build` command generates one plan per cohort offline and stores the
+library as JSON. Online, `DietLibrary.match` parses a request into a
+cohort and personalizes the stored plan:
+
+- portions are scaled by `weight` relative to the reference weight the
+  plan was written for (spices and "to taste" amounts are left alone);
+- items containing foods excluded by the dietary preference (e.g. dairy
+  for "lactose intolerant", wheat for "gluten free") are dropped.
+
+Parsing is deliberately strict. Any word in `health_conditions` or
+`dietary_preference` that isn't understood, or a meal that loses all its
+items to filtering, makes the request a miss so it goes to the LLM
+instead. When no plan exists for the exact base diet, a plan for a
+stricter diet is used (a vegan plan is fine for a vegetarian).
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_WEIGHT = 60.0
+SECTIONS = ('Breakfast', 'Lunch', 'Snacks', 'Dinner')
+TRIMESTERS = {
+    'first': 'first', '1': 'first', '1st': 'first',
+    'second': 'second', '2': 'second', '2nd': 'second',
+    'third': 'third', '3': 'third', '3rd': 'third',
+}
+
+# Phrases are matched longest first, so "non vegetarian" wins over "vegetarian".
+BASE_DIETS = {
+    'vegan': ['vegan', 'plant based', 'plant-based'],
+    'vegetarian': ['vegetarian', 'veg', 'lacto vegetarian', 'pure veg'],
+    'eggetarian': ['eggetarian', 'ovo vegetarian', 'vegetarian with eggs', 'veg with eggs'],
+    'non_vegetarian': ['non vegetarian', 'non-vegetarian', 'nonveg', 'non veg', 'non-veg',
+                       'omnivore', 'no restrictions', 'no restriction', 'anything', 'everything'],
+}
+# Stricter diets first; a plan for an earlier diet also suits the later ones.
+DIET_ORDER = ('vegan', 'vegetarian', 'eggetarian', 'non_vegetarian')
+
+RESTRICTIONS = {
+    'lactose_free': ['lactose intolerant', 'lactose intolerance', 'lactose free', 'lactose-free',
+                     'dairy free', 'dairy-free', 'no dairy', 'lactose'],
+    'gluten_free': ['gluten free', 'gluten-free', 'no gluten', 'gluten intolerant', 'celiac', 'coeliac',
+                    'gluten'],
+    'nut_free': ['nut allergy', 'nut free', 'nut-free', 'no nuts', 'peanut allergy', 'allergic to nuts'],
+}
+
+CONDITIONS = {
+    'none': ['none', 'healthy', 'fine', 'normal', 'no issues', 'nothing', 'no symptoms', 'good'],
+    'nausea': ['morning sickness', 'nausea', 'nauseous', 'vomiting', 'queasy'],
+    'fatigue': ['fatigue', 'tired', 'tiredness', 'low energy', 'weakness', 'anemia', 'anaemia', 'anemic',
+                'anaemic', 'low iron', 'low hemoglobin', 'low haemoglobin'],
+    'gestational_diabetes': ['gestational diabetes', 'high blood sugar', 'high sugar', 'diabetes', 'gdm'],
+    'hypertension': ['high blood pressure', 'high bp', 'hypertension'],
+    'constipation': ['constipation', 'constipated'],
+    'heartburn': ['heartburn', 'acidity', 'acid reflux', 'indigestion', 'bloating'],
+}
+
+# Words that carry no meaning for matching once the phrases above are removed.
+# Negators ("no", "not") are deliberately absent: outside the explicit
+# phrases above ("no dairy", "no issues", ...) they are left over and make
+# the request a miss, so "no diabetes" is never read as diabetes.
+FILLER = {
+    'a', 'an', 'and', 'am', 'are', 'bit', 'but', 'diet', 'feel', 'feeling', 'few', 'food', 'have',
+    'i', 'im', 'is', 'little', 'lately', 'mild', 'mildly', 'minor', 'moderate', 'occasional',
+    'occasionally', 'of', 'only', 'or', 'prefer', 'preference', 'preferences', 'slight', 'slightly',
+    'some', 'sometimes', 'strict', 'strictly', 'the', 'very', 'with', 'also', 'experiencing',
+    'symptoms', 'eat', 'eats', 'other', 'any',
+}
+
+MEAT = ['chicken', 'mutton', 'lamb', 'goat', 'fish', 'prawn', 'prawns', 'shrimp', 'meat', 'beef', 'pork',
+        'seafood', 'crab', 'salmon', 'tuna', 'sardine', 'sardines', 'keema']
+EGG = ['egg', 'eggs', 'omelette', 'omelet']
+DAIRY = ['milk', 'paneer', 'curd', 'yogurt', 'yoghurt', 'dahi', 'buttermilk', 'chaas', 'lassi', 'cheese',
+         'cream', 'khoa', 'kheer', 'raita', 'butter', 'milkshake']
+EXCLUSIONS = {
+    'vegan': MEAT + EGG + DAIRY + ['ghee', 'honey'],
+    'vegetarian': MEAT + EGG,
+    'eggetarian': MEAT,
+    'non_vegetarian': [],
+    'lactose_free': DAIRY,
+    'gluten_free': ['wheat', 'roti', 'rotis', 'chapati', 'chapatis', 'paratha', 'bread', 'naan', 'pasta',
+                    'semolina', 'suji', 'sooji', 'rava', 'upma', 'dalia', 'barley', 'noodles', 'poori'],
+    'nut_free': ['almond', 'almonds', 'cashew', 'cashews', 'walnut', 'walnuts', 'peanut', 'peanuts',
+                 'pistachio', 'pistachios', 'nuts', 'badam'],
+}
+# Plant "milks" aren't dairy (they still count for nut_free).
+PLANT_DAIRY = re.compile(r'\b(soy|soya|almond|oat|coconut|rice|cashew|peanut)\s+'
+                         r'(milk|yogurt|yoghurt|curd|butter|cream)\b')
+
+METRIC_UNITS = re.compile(r'\b(g|gm|gms|grams?|ml|millilitres?|milliliters?)\b')
+MEASURE_UNITS = re.compile(r'\b(cups?|bowls?|glass(es)?|tbsp|tablespoons?|katori|ladles?|handfuls?)\b')
+UNSCALED = re.compile(r'\b(tsp|teaspoons?|pinch|to taste|few|sprigs?)\b')
+QUANTITY = re.compile(r'(\d+(?:\.\d+)?)(?:\s*/\s*(\d+))?')
+ITEM = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*(.+?)\s*(?:\(([^)]*)\))?\s*$')
+
+
+def _phrase_pattern(phrases):
+    ordered = sorted(phrases, key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(re.escape(p) for p in ordered) + r')\b')
+
+
+_DIET_PATTERNS = {name: _phrase_pattern(p) for name, p in BASE_DIETS.items()}
+_RESTRICTION_PATTERNS = {name: _phrase_pattern(p) for name, p in RESTRICTIONS.items()}
+_CONDITION_PATTERNS = {name: _phrase_pattern(p) for name, p in CONDITIONS.items()}
+_EXCLUSION_PATTERNS = {name: _phrase_pattern(words) for name, words in EXCLUSIONS.items() if words}
+
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', re.sub(r"[^a-z0-9\- ]", ' ', str(text or '').lower())).strip()
+
+
+def _leftover(text):
+    return [w for w in re.split(r'[\s\-]+', text) if w and w not in FILLER]
+
+
+def parse_preference(text):
+    """`(base diet, restrictions)` or None when the preference isn't fully understood."""
+    text = _normalize(text)
+    restrictions = set()
+    for name, pattern in _RESTRICTION_PATTERNS.items():
+        if pattern.search(text):
+            restrictions.add(name)
+            text = pattern.sub(' ', text)
+    # Longest phrases across all diets first, so "non veg" isn't read as "veg".
+    spans = []
+    for name, pattern in _DIET_PATTERNS.items():
+        spans.extend((m.end() - m.start(), name, m.group(0)) for m in pattern.finditer(text))
+    base = None
+    for _, name, phrase in sorted(spans, reverse=True):
+        if phrase in text:
+            if base is not None and base != name:
+                return None
+            base = name
+            text = text.replace(phrase, ' ')
+    if base is None or _leftover(text):
+        return None
+    return base, frozenset(restrictions)
+
+
+def parse_conditions(text):
+    """Set of known conditions, or None when something in the text isn't recognised."""
+    text = _normalize(text)
+    found = set()
+    for name, pattern in _CONDITION_PATTERNS.items():
+        if pattern.search(text):
+            found.add(name)
+            text = pattern.sub(' ', text)
+    if _leftover(text):
+        return None
+    found.discard('none')
+    return frozenset(found)
+
+
+def cohort_key(trimester, diet, conditions):
+    return f"{trimester}/{diet}/{'+'.join(sorted(conditions)) or 'none'}"
+
+
+def request_cohort(data):
+    """`(trimester, diet, restrictions, conditions)` for a DietPlan request, or None."""
+    trimester = TRIMESTERS.get(_normalize(data.get('trimester')).replace(' trimester', ''))
+    preference = parse_preference(data.get('dietary_preference'))
+    conditions = parse_conditions(data.get('health_conditions'))
+    if trimester is None or preference is None or conditions is None:
+        return None
+    return trimester, preference[0], preference[1], conditions
+
+
+def parse_plan(text):
+    """Structured `{section: [{'food', 'portion'}]}` from a plan in the prompt's format."""
+    sections, current = {}, None
+    for line in str(text).splitlines():
+        heading = re.sub(r'[#*:_]', '', line).strip()
+        if heading.title() in SECTIONS:
+            current = heading.title()
+            sections.setdefault(current, [])
+            continue
+        match = ITEM.match(line)
+        if current and match:
+            sections[current].append({'food': match.group(1).strip(' *'), 'portion': (match.group(2) or '').strip()})
+    return sections
+
+
+def render_plan(sections):
+    lines = []
+    for name in SECTIONS:
+        if name not in sections:
+            continue
+        lines.append(name)
+        for item in sections[name]:
+            lines.append(f"- {item['food']} ({item['portion']})" if item['portion'] else f"- {item['food']}")
+        lines.append('')
+    return '\n'.join(lines).strip()
+
+
+FRACTIONS = {0.25: '1/4', 0.5: '1/2', 0.75: '3/4'}
+
+
+def _format_quantity(value, step):
+    value = max(step, round(value / step) * step)
+    if value in FRACTIONS:
+        return FRACTIONS[value]
+    return str(int(value)) if value == int(value) else f"{value:g}"
+
+
+def scale_portion(portion, factor):
+    """Scale the quantities in a portion such as '1/2 cup' or '150 g'."""
+    if factor == 1.0 or not portion or UNSCALED.search(portion.lower()):
+        return portion
+    if METRIC_UNITS.search(portion.lower()):
+        step = 5
+    elif MEASURE_UNITS.search(portion.lower()):
+        step = 0.25
+    else:
+        step = 1  # pieces, rotis, ...
+
+    def scale(match):
+        value = float(match.group(1)) / (float(match.group(2)) if match.group(2) else 1.0)
+        return _format_quantity(value * factor, step)
+    return QUANTITY.sub(scale, portion)
+
+
+def violates(food, tags):
+    """True when `food` contains anything excluded by the given diet/restriction tags."""
+    text = _normalize(food)
+    without_plant_dairy = PLANT_DAIRY.sub(' ', text)
+    for tag in tags:
+        pattern = _EXCLUSION_PATTERNS.get(tag)
+        if pattern is None:
+            continue
+        target = without_plant_dairy if tag in ('vegan', 'lactose_free') else text
+        if pattern.search(target):
+            return True
+    return False
+
+
+def personalize(sections, weight, tags):
+    """Scaled and filtered copy of a plan, or None if a meal would be left empty."""
+    try:
+        factor = min(1.2, max(0.85, float(weight) / REFERENCE_WEIGHT))
+    except (TypeError, ValueError):
+        factor = 1.0
+    result = {}
+    for name, items in sections.items():
+        kept = [{'food': item['food'], 'portion': scale_portion(item['portion'], factor)}
+                for item in items if not violates(item['food'], tags)]
+        if not kept:
+            return None
+        result[name] = kept
+    return result
+
+
+class DietLibrary:
+    def __init__(self, plans=None):
+        """`plans` maps cohort keys to `{'sections': ..., 'generated_at': ...}`."""
+        self.plans = dict(plans or {})
+        self.counts = {'hits': 0, 'misses': 0, 'unparsed': 0, 'filtered_out': 0}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.plans)
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def match(self, data):
+        """Personalized `(plan text, cohort key)` for a request, or None to fall back to the LLM."""
+        cohort = request_cohort(data)
+        if cohort is None:
+            self._count('unparsed')
+            return None
+        trimester, diet, restrictions, conditions = cohort
+        # The requested diet first, then stricter ones.
+        candidates = DIET_ORDER[:DIET_ORDER.index(diet) + 1][::-1]
+        for candidate in candidates:
+            key = cohort_key(trimester, candidate, conditions)
+            entry = self.plans.get(key)
+            if entry is None:
+                continue
+            sections = personalize(entry['sections'], data.get('weight'), {diet, *restrictions})
+            if sections is None:
+                self._count('filtered_out')
+                return None
+            self._count('hits')
+            return render_plan(sections), key
+        self._count('misses')
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {'plans': len(self.plans), **self.counts}
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'reference_weight': REFERENCE_WEIGHT, 'plans': self.plans}, f, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f)['plans'])
+
+
+def cohort_prompt(trimester, diet, conditions):
+    condition_text = ', '.join(c.replace('_', ' ') for c in sorted(conditions)) or 'no particular complaints'
+    return (
+        f"You are a dietician versed in Ayurveda. Plan one day of meals for a {trimester} trimester "
+        f"pregnant woman weighing about {REFERENCE_WEIGHT:g} kg, with {condition_text}, following a strictly "
+        f"{diet.replace('_', '-')} diet. Never include foods against this diet or unsafe in pregnancy.\n"
+        f"Reply only with the headings Breakfast, Lunch, Snacks and Dinner, each followed by 3-4 "
+        f"'- <food> (<portion with a number and unit>)' lines, favouring Ayurvedic ingredients. "
+        f"Keep each food on its own line so individual items can be removed for allergies."
+    )
+
+
+def default_cohorts():
+    return [(trimester, diet, frozenset() if condition == 'none' else frozenset([condition]))
+            for trimester in ('first', 'second', 'third')
+            for diet in DIET_ORDER
+            for condition in CONDITIONS]
+
+
+def top_cohorts(requests, limit):
+    """Most frequent cohorts among past DietPlan request bodies."""
+    from collections import Counter
+    counts = Counter()
+    for data in requests:
+        cohort = request_cohort(data)
+        if cohort is not None:
+            counts[(cohort[0], cohort[1], cohort[3])] += 1
+    return [cohort for cohort, _ in counts.most_common(limit)]
+
+
+def build_library(cohorts, generate, workers=4, existing=None):
+    """Generate and validate a plan per cohort with `generate(prompt) -> text`."""
+    from concurrent.futures import ThreadPoolExecutor
+    library = DietLibrary(existing.plans if existing else None)
+
+    def build(cohort):
+        trimester, diet, conditions = cohort
+        key = cohort_key(trimester, diet, conditions)
+        if key in library.plans:
+            return key, None
+        sections = parse_plan(generate(cohort_prompt(trimester, diet, conditions)))
+        if set(sections) != set(SECTIONS) or not all(sections.values()):
+            return key, 'missing meals'
+        if any(violates(item['food'], {diet}) for items in sections.values() for item in items):
+            return key, f'contains foods outside a {diet} diet'
+        library.plans[key] = {'sections': sections, 'generated_at': time.time()}
+        return key, None
+
+    failures = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for key, error in pool.map(build, cohorts):
+            if error:
+                failures[key] = error
+                logger.warning(f"Skipped diet cohort {key}: {error}")
+    return library, failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diet plan library tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='Generate plans for the most common cohorts')
+    build.add_argument('--out', required=True)
+    build.add_argument('--requests', help='JSON-lines file of past DietPlan request bodies to rank cohorts by')
+    build.add_argument('--top', type=int, default=50, help='Cohorts to take from --requests')
+    build.add_argument('--workers', type=int, default=4)
+    build.add_argument('--refresh', action='store_true', help='Regenerate plans already in --out')
+    args = parser.parse_args(argv)
+
+    from llm_gateway import get_gateway
+    gateway = get_gateway()
+    model = os.environ.get("OLLAMA_MODEL_ID")
+
+    def generate(prompt):
+        return gateway.chat([{'role': 'user', 'content': prompt}], model=model, max_tokens=450).message.content
+
+    cohorts = default_cohorts()
+    if args.requests:
+        with open(args.requests) as f:
+            past = [json.loads(line) for line in f if line.strip()]
+        seen = set(cohorts)
+        cohorts += [c for c in top_cohorts(past, args.top) if c not in seen]
+    existing = None
+    if os.path.exists(args.out) and not args.refresh:
+        existing = DietLibrary.load(args.out)
+    start = time.perf_counter()
+    library, failures = build_library(cohorts, generate, workers=args.workers, existing=existing)
+    library.save(args.out)
+    print(f"Wrote {len(library)} plans to {args.out} in {time.perf_counter() - start:.1f}s "
+          f"({len(failures)} cohorts skipped)")
+
+
+if __name__ == '__main__':
+    main()
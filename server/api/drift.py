@@ -0,0 +1,533 @@
+"""Input-drift monitoring for the maternal, fetal and symptom-risk models.
+
+Every prediction adds its raw model inputs to one sketch per feature:
+
+- numeric features use a log-bucketed histogram (DDSketch-style). A value
+  lands in bucket `ceil(log(|x|) / log(gamma))`, so quantiles are accurate
+  to `alpha` relative error, an update is one `log` and one dict
+  increment, and the number of buckets is capped whatever the traffic.
+- categorical features (symptom names) use a capped counter.
+
+Both kinds merge by adding counts, so sketches from several worker
+processes, or several time windows, combine exactly.
+
+Sketches are kept per time window (`window` seconds). Each worker flushes
+its windows to `<state_dir>/<model>/<window>-<pid>.json` from a background
+thread, and a report merges the windows within `lookback` from every
+worker's files, this process's windows coming from memory.
+
+The merged live sketch of each feature is compared with a reference sketch
+built from the training data: PSI over the reference deciles and the KS
+statistic over the bucket grid. PSI below 0.1 is `stable`, up to 0.25
+`moderate`, above that `drift`. References are built with
+
+    python drift.py reference fetal
+    python drift.py reference maternal --data "../models/Maternal Health Risk Data Set.csv"
+    python drift.py reference symptom_risk --from-live
+
+(`--from-live` freezes the current merged live sketches, for models whose
+training data isn't available).
+"""
+import argparse
+import bisect
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(HERE, '..', 'models')
+REFERENCE_PATH = os.path.join(MODELS_DIR, 'drift_reference.json')
+STATE_DIR = os.path.join(MODELS_DIR, 'drift')
+
+# Raw inputs in the order each model receives them. The fetal names are the
+# training columns of fetal_health.csv (the handler's storage labels differ).
+FEATURES = {
+    'maternal': ['Age', 'SystolicBP', 'DiastolicBP', 'BS', 'BodyTemp', 'HeartRate'],
+    'fetal': ['baseline value', 'accelerations', 'uterine_contractions', 'light_decelerations',
+              'prolongued_decelerations', 'abnormal_short_term_variability',
+              'mean_value_of_short_term_variability',
+              'percentage_of_time_with_abnormal_long_term_variability',
+              'mean_value_of_long_term_variability', 'histogram_width', 'histogram_min',
+              'histogram_number_of_peaks', 'histogram_mean', 'histogram_variance', 'histogram_tendency'],
+    'symptom_risk': ['systolic_bp', 'diastolic_bp', 'blood_glucose', 'body_temp', 'heart_rate', 'symptoms'],
+}
+CATEGORICAL = {'symptoms'}
+
+PSI_MODERATE, PSI_DRIFT = 0.1, 0.25
+STATUS_ORDER = ['no_reference', 'insufficient_data', 'stable', 'moderate', 'drift']
+
+
+class Sketch:
+    """Mergeable log-bucket histogram with relative accuracy `alpha`."""
+    kind = 'numeric'
+    MIN_VALUE = 1e-9  # |x| below this counts as zero
+
+    def __init__(self, alpha=0.01, max_buckets=1024):
+        self.alpha = alpha
+        self.max_buckets = max_buckets
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._inv_log_gamma = 1 / math.log(self.gamma)
+        self.pos, self.neg = {}, {}
+        self.zero = self.count = 0
+        self.min, self.max = math.inf, -math.inf
+
+    def add(self, x):
+        if x > self.MIN_VALUE:
+            k = math.ceil(math.log(x) * self._inv_log_gamma)
+            store = self.pos
+        elif x < -self.MIN_VALUE:
+            k = math.ceil(math.log(-x) * self._inv_log_gamma)
+            store = self.neg
+        elif x == x:
+            self.zero += 1
+            k = store = None
+        else:
+            return  # NaN
+        if store is not None:
+            store[k] = store.get(k, 0) + 1
+            if len(store) > self.max_buckets:
+                self._collapse(store)
+        self.count += 1
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def _collapse(self, store):
+        # Fold the buckets nearest zero into their neighbour; the tails keep their accuracy.
+        keys = sorted(store)
+        excess = len(keys) - self.max_buckets
+        folded = sum(store.pop(k) for k in keys[:excess])
+        target = keys[excess]
+        store[target] += folded
+
+    def merge(self, other):
+        if other.alpha != self.alpha:
+            raise ValueError(f"Cannot merge sketches with alpha {self.alpha} and {other.alpha}")
+        for mine, theirs in ((self.pos, other.pos), (self.neg, other.neg)):
+            for k, c in theirs.items():
+                mine[k] = mine.get(k, 0) + c
+            if len(mine) > self.max_buckets:
+                self._collapse(mine)
+        self.zero += other.zero
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def buckets(self):
+        """`(position, count)` in value order; positions compare across sketches with the same alpha."""
+        items = [((-1, -k), c) for k, c in self.neg.items()]
+        if self.zero:
+            items.append(((0, 0), self.zero))
+        items += [((1, k), c) for k, c in self.pos.items()]
+        items.sort()
+        return items
+
+    def value(self, position):
+        sign, k = position
+        if sign == 0:
+            return 0.0
+        return sign * 2 * self.gamma ** (k if sign > 0 else -k) / (self.gamma + 1)
+
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for position, c in self.buckets():
+            seen += c
+            if seen > rank:
+                return min(max(self.value(position), self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'kind': self.kind, 'alpha': self.alpha, 'count': self.count, 'zero': self.zero,
+                'min': self.min if self.count else None, 'max': self.max if self.count else None,
+                'pos': self.pos, 'neg': self.neg}
+
+    @classmethod
+    def from_dict(cls, data, max_buckets=1024):
+        sketch = cls(data['alpha'], max_buckets)
+        sketch.pos = {int(k): c for k, c in data['pos'].items()}
+        sketch.neg = {int(k): c for k, c in data['neg'].items()}
+        sketch.zero, sketch.count = data['zero'], data['count']
+        if sketch.count:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+class CategorySketch:
+    """Mergeable category counter, capped at `max_keys` distinct values."""
+    kind = 'categorical'
+    OTHER = '__other__'
+
+    def __init__(self, max_keys=256):
+        self.max_keys = max_keys
+        self.counts = {}
+        self.count = 0
+
+    def add(self, values):
+        if isinstance(values, str):
+            values = (values,)
+        counts = self.counts
+        for value in values:
+            if value not in counts and len(counts) >= self.max_keys:
+                value = self.OTHER
+            counts[value] = counts.get(value, 0) + 1
+            self.count += 1
+
+    def merge(self, other):
+        for value, c in other.counts.items():
+            if value not in self.counts and len(self.counts) >= self.max_keys:
+                value = self.OTHER
+            self.counts[value] = self.counts.get(value, 0) + c
+        self.count += other.count
+        return self
+
+    def top(self, n=5):
+        return sorted(self.counts.items(), key=lambda item: -item[1])[:n]
+
+    def to_dict(self):
+        return {'kind': self.kind, 'count': self.count, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data, max_keys=256):
+        sketch = cls(max_keys)
+        sketch.counts = dict(data['counts'])
+        sketch.count = data['count']
+        return sketch
+
+
+def new_sketch(name, alpha=0.01):
+    return CategorySketch() if name in CATEGORICAL else Sketch(alpha)
+
+
+def load_sketch(data):
+    return CategorySketch.from_dict(data) if data.get('kind') == 'categorical' else Sketch.from_dict(data)
+
+
+def psi(expected, actual, floor=1e-4):
+    return sum((a - e) * math.log(a / e)
+               for e, a in ((max(e, floor), max(a, floor)) for e, a in zip(expected, actual)))
+
+
+def compare(reference, live, bins=10):
+    """`{'psi', 'ks'}` of `live` against `reference` (KS is None for categories)."""
+    if reference.kind == 'categorical':
+        keys = sorted(set(reference.counts) | set(live.counts), key=str)
+        return {'psi': psi([reference.counts.get(k, 0) / reference.count for k in keys],
+                           [live.counts.get(k, 0) / live.count for k in keys]), 'ks': None}
+
+    ref_buckets, live_buckets = reference.buckets(), live.buckets()
+    # PSI bins: the reference deciles (fewer when the data is discrete)
+    cuts, seen, i = [], 0, 1
+    for position, c in ref_buckets:
+        seen += c
+        while i < bins and seen >= i * reference.count / bins:
+            if not cuts or cuts[-1] != position:
+                cuts.append(position)
+            i += 1
+    expected, actual = [0] * (len(cuts) + 1), [0] * (len(cuts) + 1)
+    for counts, buckets in ((expected, ref_buckets), (actual, live_buckets)):
+        for position, c in buckets:
+            counts[bisect.bisect_left(cuts, position)] += c
+    value = psi([c / reference.count for c in expected], [c / live.count for c in actual])
+
+    # KS over the union of bucket positions
+    ref_counts, live_counts = dict(ref_buckets), dict(live_buckets)
+    ref_cum = live_cum = ks = 0.0
+    for position in sorted(set(ref_counts) | set(live_counts)):
+        ref_cum += ref_counts.get(position, 0) / reference.count
+        live_cum += live_counts.get(position, 0) / live.count
+        ks = max(ks, abs(ref_cum - live_cum))
+    return {'psi': value, 'ks': ks}
+
+
+def status_for(psi_value):
+    return 'drift' if psi_value > PSI_DRIFT else 'moderate' if psi_value > PSI_MODERATE else 'stable'
+
+
+def load_reference(path=REFERENCE_PATH):
+    """`{model: {'features': {name: sketch}, ...}}`; empty when the file is missing."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    return {model: {**entry, 'features': {name: load_sketch(s) for name, s in entry['features'].items()}}
+            for model, entry in data.get('models', {}).items()}
+
+
+def save_reference(path, model, sketches, source, rows):
+    data = {'version': 1, 'models': {}}
+    if os.path.exists(path):
+        with open(path) as f:
+            data = json.load(f)
+    data['models'][model] = {
+        'source': source,
+        'rows': rows,
+        'created_at': datetime.utcnow().isoformat(),
+        'features': {name: sketch.to_dict() for name, sketch in sketches.items()},
+    }
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+class DriftMonitor:
+    def __init__(self, features=FEATURES, reference=None, state_dir=STATE_DIR, window=3600,
+                 lookback=86400, interval=60, min_count=100, alpha=0.01):
+        self.features = features
+        self.reference = reference or {}
+        self.state_dir = state_dir
+        self.window = window
+        self.lookback = lookback
+        self.interval = interval
+        self.min_count = min_count
+        self.alpha = alpha
+        self._windows = {model: {} for model in features}  # model -> {window id: [sketch per feature]}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._report = None
+        self._report_at = 0.0
+        self._statuses = {}
+        self.counts = {'observed': 0, 'rejected': 0, 'flushes': 0, 'flush_errors': 0}
+
+    def _start(self):
+        # Started on first use so forked server workers each get their own flusher.
+        if self._thread is None and self.interval:
+            self._thread = threading.Thread(target=self._run, name='drift-flush', daemon=True)
+            self._thread.start()
+
+    def observe(self, model, values):
+        """Add one prediction's raw inputs, in `features[model]` order."""
+        window_id = int(time.time() // self.window)
+        with self._lock:
+            windows = self._windows[model]
+            sketches = windows.get(window_id)
+            if sketches is None:
+                sketches = windows[window_id] = [new_sketch(name, self.alpha) for name in self.features[model]]
+                self._expire(windows, window_id)
+            if len(values) != len(sketches):
+                self.counts['rejected'] += 1
+                return
+            for sketch, value in zip(sketches, values):
+                if value is not None:  # a vital missing from the stored row
+                    sketch.add(value)
+            self._dirty.add((model, window_id))
+            self.counts['observed'] += 1
+        if self._thread is None:
+            self._start()
+
+    def _expire(self, windows, window_id):
+        oldest = window_id - self.lookback // self.window
+        for old in [w for w in windows if w <= oldest]:
+            del windows[old]
+
+    def _model_dir(self, model):
+        return os.path.join(self.state_dir, model)
+
+    def flush(self):
+        """Write this process's changed windows to the shared state directory."""
+        if not self.state_dir:
+            return 0
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            snapshots = [(model, window_id, {name: sketch.to_dict() for name, sketch in
+                                             zip(self.features[model], self._windows[model][window_id])})
+                         for model, window_id in dirty if window_id in self._windows[model]]
+        pid = os.getpid()
+        for model, window_id, sketches in snapshots:
+            directory = self._model_dir(model)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{window_id}-{pid}.json")
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump({'window': window_id, 'pid': pid, 'updated_at': time.time(), 'features': sketches}, f)
+            os.replace(f"{path}.tmp", path)
+        self.counts['flushes'] += 1
+        return len(snapshots)
+
+    def _shared_windows(self, model, oldest):
+        """Window files from other processes within the lookback; older files are removed."""
+        directory = self._model_dir(model) if self.state_dir else None
+        if not directory or not os.path.isdir(directory):
+            return
+        pid = os.getpid()
+        for entry in os.scandir(directory):
+            stem, ext = os.path.splitext(entry.name)
+            if ext != '.json':
+                continue
+            try:
+                window_id, file_pid = (int(part) for part in stem.split('-'))
+            except ValueError:
+                continue
+            if window_id <= oldest:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+                continue
+            if file_pid == pid:
+                continue
+            try:
+                with open(entry.path) as f:
+                    yield json.load(f)['features']
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"[Drift] Skipping unreadable state file {entry.path}: {e}")
+
+    def merged(self, model):
+        """The model's live sketches over the lookback, merged across windows and processes."""
+        oldest = int(time.time() // self.window) - self.lookback // self.window
+        names = self.features[model]
+        merged = {name: new_sketch(name, self.alpha) for name in names}
+        with self._lock:
+            for window_id, sketches in self._windows[model].items():
+                if window_id > oldest:
+                    for name, sketch in zip(names, sketches):
+                        merged[name].merge(sketch)
+        for features in self._shared_windows(model, oldest):
+            for name, data in features.items():
+                if name in merged:
+                    merged[name].merge(load_sketch(data))
+        return merged
+
+    def check(self):
+        """Compare every model's merged live sketches with the reference."""
+        models = {}
+        for model in self.features:
+            live = self.merged(model)
+            reference = self.reference.get(model)
+            results = {}
+            for name, sketch in live.items():
+                entry = {'count': sketch.count}
+                ref = reference['features'].get(name) if reference else None
+                if ref is None or not ref.count:
+                    entry['status'] = 'no_reference'
+                elif sketch.count < self.min_count:
+                    entry['status'] = 'insufficient_data'
+                else:
+                    scores = compare(ref, sketch)
+                    entry.update(psi=round(scores['psi'], 4),
+                                 ks=round(scores['ks'], 4) if scores['ks'] is not None else None,
+                                 status=status_for(scores['psi']))
+                if sketch.kind == 'numeric':
+                    entry['live_p50'] = sketch.quantile(0.5)
+                    entry['reference_p50'] = ref.quantile(0.5) if ref is not None else None
+                else:
+                    entry['live_top'] = sketch.top()
+                    entry['reference_top'] = ref.top() if ref is not None else None
+                results[name] = entry
+            models[model] = {
+                'status': max((e['status'] for e in results.values()), key=STATUS_ORDER.index),
+                'drifted': [name for name, e in results.items() if e['status'] == 'drift'],
+                'reference': {k: reference[k] for k in ('source', 'rows', 'created_at')} if reference else None,
+                'features': results,
+            }
+        self._log_changes(models)
+        self._report, self._report_at = models, time.time()
+        return models
+
+    def _log_changes(self, models):
+        for model, result in models.items():
+            for name, entry in result['features'].items():
+                previous = self._statuses.get((model, name))
+                self._statuses[(model, name)] = entry['status']
+                if entry['status'] == 'drift' and previous != 'drift':
+                    logger.warning(f"[Drift] {model}.{name} drifted: PSI {entry['psi']}, KS {entry['ks']}")
+                elif previous == 'drift' and entry['status'] != 'drift':
+                    logger.info(f"[Drift] {model}.{name} back to {entry['status']}")
+
+    def report(self, refresh=False):
+        if refresh or self._report is None or time.time() - self._report_at > self.interval:
+            self.flush()
+            return self.check()
+        return self._report
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+                self.check()
+            except Exception as e:
+                self.counts['flush_errors'] += 1
+                logger.warning(f"[Drift] Periodic check failed: {e}")
+
+    def stats(self, refresh=False):
+        return {
+            'models': self.report(refresh),
+            'window_seconds': self.window,
+            'lookback_seconds': self.lookback,
+            'checked_at': self._report_at,
+            'pid': os.getpid(),
+            **self.counts,
+        }
+
+
+def reference_from_data(model, path=None, alpha=0.01):
+    """Sketch the training columns of `model` (fetal or maternal) the way train_models reads them."""
+    import pandas as pd
+    from train_models import SPECS, preprocess
+    spec = SPECS[model]
+    path = path or spec['data']
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{model} dataset not found at {path} (pass --data)")
+    X, _ = preprocess(pd.read_csv(path), spec)
+    missing = [name for name in FEATURES[model] if name not in X.columns]
+    if missing:
+        raise ValueError(f"{path} lacks the {model} features {missing}")
+    sketches = {}
+    for name in FEATURES[model]:
+        sketch = sketches[name] = Sketch(alpha)
+        for value in X[name].tolist():
+            sketch.add(value)
+    return sketches, os.path.relpath(path, HERE), len(X)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Input drift references and reports')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('reference', help='Build the reference sketches for a model')
+    build.add_argument('model', choices=list(FEATURES))
+    build.add_argument('--data', help='Training CSV (default: the dataset train_models.py uses)')
+    build.add_argument('--from-live', action='store_true', help='Freeze the current merged live sketches')
+    build.add_argument('--out', default=REFERENCE_PATH)
+    build.add_argument('--state-dir', default=STATE_DIR)
+    show = sub.add_parser('report', help='Merge the workers\' live sketches and compare with the reference')
+    show.add_argument('--reference', default=REFERENCE_PATH)
+    show.add_argument('--state-dir', default=STATE_DIR)
+    show.add_argument('--lookback-hours', type=float, default=24)
+    args = parser.parse_args(argv)
+
+    if args.command == 'reference':
+        if args.from_live:
+            sketches = DriftMonitor(state_dir=args.state_dir, interval=0).merged(args.model)
+            source, rows = 'live', max(s.count for s in sketches.values())
+            if not rows:
+                print(f"No live {args.model} observations in {args.state_dir}")
+                return 1
+        elif args.model in ('fetal', 'maternal'):
+            sketches, source, rows = reference_from_data(args.model, args.data)
+        else:
+            parser.error(f"{args.model} has no training dataset here; use --from-live")
+        save_reference(args.out, args.model, sketches, source, rows)
+        print(f"Wrote {args.model} reference ({rows} rows from {source}) to {args.out}")
+        return 0
+
+    monitor = DriftMonitor(reference=load_reference(args.reference), state_dir=args.state_dir,
+                           lookback=int(args.lookback_hours * 3600), interval=0)
+    print(json.dumps(monitor.check(), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""Per-feature contributions (TreeSHAP) for the maternal and fetal models.
+
+Both models are gradient-boosted trees and ship an exact TreeSHAP
+implementation: LightGBM's `pred_contrib` (fetal) and XGBoost's
+`pred_contribs` (maternal). Contributions are in raw-score (log-odds)
+units per class; for each row they sum with the bias to the model margin.
+
+`Explainer.explain` takes a batch of raw (unscaled) rows, serves repeats
+from an LRU keyed by a hash of the input vector and computes all misses in
+one native call. The `batch` command explains a whole CSV (by default
+`server/models/fetal_health.csv`) in chunks across worker processes.
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+LABELS = {0: 'Normal', 1: 'Suspect', 2: 'Pathological'}
+
+
+def tree_contributions(model, X, threads=None):
+    """Contributions as an array of shape (rows, classes, features + 1); the last column is the bias."""
+    X = np.asarray(X, dtype=float)
+    if hasattr(model, 'booster_'):
+        kwargs = {'num_threads': threads} if threads else {}
+        contrib = model.booster_.predict(X, pred_contrib=True, **kwargs)
+    elif hasattr(model, 'get_booster'):
+        import xgboost
+        booster = model.get_booster()
+        if threads:
+            booster.set_param({'nthread': threads})
+        contrib = booster.predict(xgboost.DMatrix(X), pred_contribs=True)
+    else:
+        raise TypeError(f"No native contributions for {type(model).__name__}")
+    contrib = np.asarray(contrib)
+    if contrib.ndim == 3:
+        return contrib
+    # LightGBM (and binary models) return classes side by side in one row.
+    width = X.shape[1] + 1
+    return contrib.reshape(len(X), contrib.shape[1] // width, width)
+
+
+def scale(scaler, X):
+    """`scaler.transform(X)` as an array, named by the scaler's fitted columns when it has them.
+
+    Scalers fitted on a DataFrame warn on every call given a bare array.
+    """
+    if scaler is None:
+        return np.asarray(X, dtype=float)
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is not None and not hasattr(X, 'columns'):
+        import pandas as pd
+        X = pd.DataFrame(np.asarray(X, dtype=float), columns=names)
+    return np.asarray(scaler.transform(X))
+
+
+class Explainer:
+    def __init__(self, model, scaler, feature_names, labels=LABELS, max_entries=4096):
+        self.model = model
+        self.scaler = scaler
+        self.feature_names = list(feature_names)
+        self.labels = labels
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(row):
+        return hashlib.blake2b(np.ascontiguousarray(row, dtype=np.float64).tobytes(),
+                               digest_size=16).digest()
+
+    def contributions(self, X):
+        """Contributions for raw rows, reusing cached ones; shape (rows, classes, features + 1)."""
+        X = np.asarray(X, dtype=float).reshape(-1, len(self.feature_names))
+        keys = [self._key(row) for row in X]
+        found, missing = {}, []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    found[i] = cached
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            scaled = scale(self.scaler, X[missing])
+            computed = tree_contributions(self.model, scaled)
+            with self._lock:
+                for i, contrib in zip(missing, computed):
+                    found[i] = contrib
+                    self._cache[keys[i]] = contrib
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return np.stack([found[i] for i in range(len(X))])
+
+    def explain(self, X, classes=None, top=None):
+        """Readable explanations for raw rows.
+
+        `classes` gives the class to explain per row (usually the prediction);
+        by default the class with the largest margin.
+        """
+        X = np.asarray(X, dtype=float).reshape(-1, len(self.feature_names))
+        contrib = self.contributions(X)
+        if classes is None:
+            classes = contrib.sum(axis=2).argmax(axis=1)
+        explanations = []
+        for row, values, cls in zip(X, contrib, classes):
+            cls = int(cls)
+            per_class = values[cls if len(values) > 1 else 0]
+            order = np.argsort(-np.abs(per_class[:-1]))
+            if top:
+                order = order[:top]
+            explanations.append({
+                'class': self.labels.get(cls, str(cls)),
+                'base_value': float(per_class[-1]),
+                'margin': float(per_class.sum()),
+                'contributions': [
+                    {'feature': self.feature_names[j], 'value': float(row[j]),
+                     'contribution': float(per_class[j])}
+                    for j in order
+                ],
+            })
+        return explanations
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._cache), 'hits': self.hits, 'misses': self.misses}
+
+
+# Offline batch mode. Workers load the model once and use one thread each,
+# so the parallelism comes from processes.
+_worker_model = None
+
+
+def _init_worker(model_path):
+    global _worker_model
+    import joblib
+    _worker_model = joblib.load(model_path)
+
+
+def _explain_chunk(scaled):
+    return tree_contributions(_worker_model, scaled, threads=1)
+
+
+def explain_frame(model_path, scaler, X, workers=None, chunk_size=256):
+    """Contributions for every row of `X` (raw), computed in chunks across processes."""
+    from concurrent.futures import ProcessPoolExecutor
+    scaled = scale(scaler, X)
+    chunks = [scaled[i:i + chunk_size] for i in range(0, len(scaled), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(model_path)
+        return np.concatenate([_explain_chunk(chunk) for chunk in chunks])
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(model_path,)) as pool:
+        return np.concatenate(list(pool.map(_explain_chunk, chunks)))
+
+
+def main(argv=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Model explanation tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    batch = sub.add_parser('batch', help='Explain every row of a CTG dataset')
+    batch.add_argument('--data', default=os.path.join(here, '..', 'models', 'fetal_health.csv'))
+    batch.add_argument('--model', default=os.path.join(here, 'fetal_health_model.sav'))
+    batch.add_argument('--scaler', default=os.path.join(here, 'scaleX1.pkl'))
+    batch.add_argument('--out', default='fetal_explanations.csv')
+    batch.add_argument('--workers', type=int, default=None)
+    batch.add_argument('--chunk-size', type=int, default=256)
+    args = parser.parse_args(argv)
+
+    import joblib
+    import pandas as pd
+    scaler = joblib.load(args.scaler)
+    features = list(scaler.feature_names_in_)
+    data = pd.read_csv(args.data)
+    X = data[features]
+
+    start = time.perf_counter()
+    contrib = explain_frame(args.model, scaler, X, workers=args.workers, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    predicted = contrib.sum(axis=2).argmax(axis=1)
+    chosen = contrib[np.arange(len(contrib)), predicted]
+    out = pd.DataFrame(chosen[:, :-1], columns=features)
+    out.insert(0, 'prediction', [LABELS.get(int(p), str(p)) for p in predicted])
+    out['base_value'] = chosen[:, -1]
+    out.to_csv(args.out, index_label='row')
+
+    print(f"Explained {len(X)} rows in {elapsed:.2f}s ({len(X) / elapsed:.0f} rows/s) -> {args.out}")
+    print("Mean |contribution| for the predicted class:")
+    for name, value in out[features].abs().mean().sort_values(ascending=False).items():
+        print(f"  {name:<55} {value:.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""Background job queue for long-running LLM generations.
+
+Diet plans, lifestyle recommendations and remedies can be submitted as jobs:
+the request returns a job id at once, a bounded pool of worker threads runs
+the generation in priority order, and the client polls (or long-polls) for
+the result. Finished jobs are kept for `retention` seconds so a client that
+lost its connection can still collect the answer.
+
+A submission with the same dedupe key as a queued, running or retained
+successful job attaches to that job instead of generating again, so mobile
+retries don't double the LLM load.
+"""
+import itertools
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind, user_id, key, fn, priority):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.user_id = user_id
+        self.key = key
+        self.fn = fn
+        self.priority = priority
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.attached = 0
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.finished = threading.Event()
+
+    def to_dict(self):
+        body = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == DONE:
+            body['result'] = self.result
+        elif self.status == FAILED:
+            body['error'] = self.error
+        return body
+
+
+class JobQueue:
+    def __init__(self, workers=4, max_queued=100, retention=600):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.retention = retention
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._jobs = {}
+        self._by_key = {}
+        self._expiry = deque()  # (expires_at, job_id) in completion order
+        self._threads = []
+        self._lock = threading.Lock()
+        self.counts = {'submitted': 0, 'attached': 0, 'done': 0, 'failed': 0, 'rejected': 0, 'expired': 0}
+
+    def _start(self):
+        # Threads start on first use so forked server workers each get their own.
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, kind, user_id, key, fn, priority=10):
+        """Queue `fn()` and return `(job, attached)`; lower priority runs first."""
+        with self._lock:
+            self._sweep()
+            existing = self._jobs.get(self._by_key.get((user_id, kind, key)))
+            if existing is not None and existing.status != FAILED:
+                existing.attached += 1
+                self.counts['attached'] += 1
+                return existing, True
+            if self._queue.qsize() >= self.max_queued:
+                self.counts['rejected'] += 1
+                raise JobQueueFull(f"Job queue is full ({self.max_queued} queued)")
+            job = Job(kind, user_id, key, fn, priority)
+            self._jobs[job.id] = job
+            self._by_key[(user_id, kind, key)] = job.id
+            self.counts['submitted'] += 1
+            self._start()
+        self._queue.put((priority, next(self._seq), job))
+        return job, False
+
+    def get(self, job_id, wait=0):
+        """Look up a job, optionally blocking up to `wait` seconds for it to finish."""
+        with self._lock:
+            self._sweep()
+            job = self._jobs.get(job_id)
+        if job is not None and wait > 0:
+            job.finished.wait(wait)
+        return job
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = job.fn()
+                job.status = DONE
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+            job.finished_at = time.time()
+            job.fn = None
+            with self._lock:
+                self.counts[job.status] += 1
+                self._expiry.append((job.finished_at + self.retention, job.id))
+            job.finished.set()
+            self._queue.task_done()
+
+    def _sweep(self):
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, job_id = self._expiry.popleft()
+            job = self._jobs.pop(job_id, None)
+            if job is not None:
+                key = (job.user_id, job.kind, job.key)
+                if self._by_key.get(key) == job_id:
+                    del self._by_key[key]
+                self.counts['expired'] += 1
+
+    def stats(self):
+        with self._lock:
+            self._sweep()
+            states = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                states[job.status] += 1
+            return {
+                'workers': self.workers,
+                'max_queued': self.max_queued,
+                'retention': self.retention,
+                'jobs': states,
+                'counts': dict(self.counts),
+            }
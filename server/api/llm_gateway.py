@@ -0,0 +1,387 @@
+"""Routing layer between the chat-completion backends (Groq, local Ollama).
+
+Every LLM call in the API goes through `get_gateway().chat(...)`. The
+gateway keeps per-backend latency/error statistics, prefers the first
+configured backend while it is healthy, falls back to the next one when it
+errors, is rate limited or gets slow, and can optionally send a hedged
+duplicate request to the next backend once the primary exceeds its p95.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional
+
+from resilience import CircuitBreaker
+from singleflight import SingleFlight, request_key
+
+logger = logging.getLogger(__name__)
+
+
+class DotDict(dict):
+    """Dot notation access to dictionary attributes"""
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+    __setattr__ = dict.__setitem__
+    __delattr__ = dict.__delitem__
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class RateLimitedError(LLMError):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BackendStats:
+    """Rolling latency window plus an EWMA of the error rate."""
+
+    def __init__(self, window=200, alpha=0.2):
+        self.latencies = deque(maxlen=window)
+        self.alpha = alpha
+        self.error_rate = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited_until = 0.0
+        self.lock = threading.Lock()
+
+    def record_success(self, latency):
+        with self.lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.error_rate *= (1 - self.alpha)
+
+    def record_failure(self, latency=None, retry_after=None):
+        with self.lock:
+            self.requests += 1
+            self.errors += 1
+            if latency is not None:
+                self.latencies.append(latency)
+            self.error_rate = self.error_rate * (1 - self.alpha) + self.alpha
+            if retry_after is not None:
+                self.rate_limited_until = time.monotonic() + retry_after
+
+    def percentile(self, p):
+        with self.lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(p / 100.0 * len(samples)))]
+
+    def is_rate_limited(self):
+        return time.monotonic() < self.rate_limited_until
+
+    def snapshot(self):
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'error_rate': round(self.error_rate, 4),
+            'p50_s': self.percentile(50),
+            'p95_s': self.percentile(95),
+            'rate_limited': self.is_rate_limited(),
+        }
+
+
+class Backend:
+    """A chat-completion endpoint. Subclasses implement `_send`."""
+
+    def __init__(self, name, model, timeout=60.0, failure_threshold=5, recovery_timeout=30.0):
+        self.name = name
+        self.model = model
+        self.timeout = timeout
+        self.stats = BackendStats()
+        # Rate limiting is tracked by `stats`; it isn't a reason to open the breaker.
+        self.breaker = CircuitBreaker(f"llm.{name}", failure_threshold=failure_threshold,
+                                      recovery_timeout=recovery_timeout, ignore=(RateLimitedError,))
+
+    def resolve_model(self, model):
+        return model or self.model
+
+    def complete(self, messages, model=None, **options):
+        self.breaker.allow()
+        start = time.monotonic()
+        try:
+            content, usage = self._send(self.resolve_model(model), messages, **options)
+        except RateLimitedError as e:
+            self.stats.record_failure(time.monotonic() - start, e.retry_after)
+            self.breaker.release()
+            raise
+        except Exception:
+            self.stats.record_failure(time.monotonic() - start)
+            self.breaker.record_failure()
+            raise
+        latency = time.monotonic() - start
+        self.stats.record_success(latency)
+        self.breaker.record_success()
+        return DotDict({
+            'message': DotDict({'role': 'assistant', 'content': content}),
+            'usage': usage,
+            'backend': self.name,
+            'latency': latency,
+        })
+
+    def _send(self, model, messages, **options):
+        raise NotImplementedError
+
+    @staticmethod
+    def _raise_for_status(response, name):
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            try:
+                retry_after = float(retry_after) if retry_after else 5.0
+            except ValueError:
+                retry_after = 5.0
+            raise RateLimitedError(f"{name} rate limited", retry_after)
+        response.raise_for_status()
+
+
+class OpenAICompatibleBackend(Backend):
+    """Groq or any other `/v1/chat/completions` server."""
+
+    def __init__(self, name, url, api_key, model, timeout=60.0, **breaker_options):
+        super().__init__(name, model, timeout, **breaker_options)
+        self.url = url
+        self.api_key = api_key
+
+    def _send(self, model, messages, **options):
+        import requests
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {"model": model, "messages": messages, **options}
+        response = requests.post(self.url, headers=headers, json=payload, timeout=self.timeout)
+        self._raise_for_status(response, self.name)
+        result = response.json()
+        return result["choices"][0]["message"]["content"], result.get("usage", {})
+
+
+class OllamaBackend(Backend):
+    """Local Ollama server via its native `/api/chat` endpoint.
+
+    Remote model names don't exist locally, so the configured local model is
+    always used regardless of what the caller asks for. An OpenAI-style
+    `response_format` becomes Ollama's `format` ("json", or the schema itself).
+    """
+
+    def __init__(self, name, host, model, timeout=120.0, **breaker_options):
+        super().__init__(name, model, timeout, **breaker_options)
+        self.host = host.rstrip('/')
+
+    def resolve_model(self, model):
+        return self.model
+
+    def _send(self, model, messages, **options):
+        import requests
+        payload = {"model": model, "messages": messages, "stream": False}
+        options = dict(options)
+        if 'max_tokens' in options:
+            options['num_predict'] = options.pop('max_tokens')
+        response_format = options.pop('response_format', None)
+        if response_format:
+            schema = (response_format.get('json_schema') or {}).get('schema')
+            payload["format"] = schema if response_format.get('type') == 'json_schema' and schema else "json"
+        if options:
+            payload["options"] = options
+        response = requests.post(f"{self.host}/api/chat", json=payload, timeout=self.timeout)
+        self._raise_for_status(response, self.name)
+        result = response.json()
+        usage = {
+            'prompt_tokens': result.get('prompt_eval_count', 0),
+            'completion_tokens': result.get('eval_count', 0),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        return result["message"]["content"], usage
+
+
+class LLMGateway:
+    """Pick a backend per request and fail over between them.
+
+    Backends are listed in preference order. A backend is skipped while it
+    is rate limited, and demoted behind healthier ones when its p95 latency
+    exceeds `slow_threshold` or its error rate exceeds `max_error_rate`
+    (apart from one probe request every `probe_interval` seconds).
+    With `hedge=True` a duplicate request goes to the next backend after the
+    primary's p95 (or `hedge_delay` until enough samples exist); the first
+    successful answer wins.
+
+    Each backend also has a circuit breaker: after repeated failures it is
+    skipped without a network call until its recovery timeout passes.
+
+    Identical concurrent requests (same model and normalized messages) are
+    coalesced into one upstream call unless `coalesce=False` is passed.
+    """
+
+    def __init__(self, backends: List[Backend], hedge=False, hedge_delay=2.0,
+                 hedge_min_samples=20, slow_threshold=15.0, max_error_rate=0.5, probe_interval=30.0,
+                 max_workers=16):
+        self.backends = list(backends)
+        self.hedge = hedge
+        self.hedge_delay = hedge_delay
+        self.hedge_min_samples = hedge_min_samples
+        self.slow_threshold = slow_threshold
+        self.max_error_rate = max_error_rate
+        self.probe_interval = probe_interval
+        self._last_probe = {}
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self.flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+
+    def rank(self) -> List[Backend]:
+        available = [b for b in self.backends if not b.stats.is_rate_limited()]
+        if not available:
+            # Everything is rate limited; try the one that recovers first.
+            return sorted(self.backends, key=lambda b: b.stats.rate_limited_until)
+
+        now = time.monotonic()
+
+        def degraded(backend):
+            p95 = backend.stats.percentile(95)
+            if not (backend.stats.error_rate > self.max_error_rate or
+                    (p95 is not None and p95 > self.slow_threshold)):
+                return False
+            # Let a demoted backend take one request per probe interval so
+            # its statistics can recover.
+            if now - self._last_probe.get(backend.name, 0.0) > self.probe_interval:
+                self._last_probe[backend.name] = now
+                return False
+            return True
+
+        # Stable sort keeps configured preference among equally healthy backends;
+        # a backend with an open breaker goes last and fails fast if reached.
+        return sorted(available, key=lambda b: (b.breaker.is_open(), degraded(b)))
+
+    def chat(self, messages, model=None, coalesce=True, **options):
+        if not coalesce:
+            return self._route(messages, model, **options)
+        key = request_key(model, messages, **options)
+        result, shared = self.flights.do(key, lambda: self._route(messages, model, **options))
+        return DotDict(result, coalesced=shared)
+
+    def _route(self, messages, model, **options):
+        order = self.rank()
+        if not order:
+            raise LLMError("No LLM backends configured")
+        if self.hedge and len(order) > 1:
+            return self._chat_hedged(order, messages, model, **options)
+        return self._chat_sequential(order, messages, model, **options)
+
+    def _chat_sequential(self, order, messages, model, **options):
+        last_error = None
+        for backend in order:
+            try:
+                return backend.complete(messages, model=model, **options)
+            except Exception as e:
+                logger.warning(f"LLM backend {backend.name} failed: {e}")
+                last_error = e
+        raise last_error
+
+    def _hedge_delay_for(self, backend):
+        if len(backend.stats.latencies) >= self.hedge_min_samples:
+            return backend.stats.percentile(95)
+        return self.hedge_delay
+
+    def _chat_hedged(self, order, messages, model, **options):
+        primary, rest = order[0], order[1:]
+        pending = {self._executor.submit(primary.complete, messages, model, **options): primary}
+        done, _ = wait(pending, timeout=self._hedge_delay_for(primary))
+        if not done:
+            backend = rest.pop(0)
+            self.hedges_sent += 1
+            pending[self._executor.submit(backend.complete, messages, model, **options)] = backend
+        last_error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning(f"LLM backend {backend.name} failed: {e}")
+                    last_error = e
+                    continue
+                if backend is not primary:
+                    self.hedges_won += 1
+                return result
+            if not pending and rest:
+                # Both in-flight attempts failed; fall back through the remainder.
+                return self._chat_sequential(rest, messages, model, **options)
+        raise last_error
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            'backends': {b.name: {**b.stats.snapshot(), 'breaker': b.breaker.snapshot()}
+                         for b in self.backends},
+            'hedges_sent': self.hedges_sent,
+            'hedges_won': self.hedges_won,
+            'coalescing': self.flights.snapshot(),
+        }
+
+
+def backends_from_env(env=None, names=None) -> List[Backend]:
+    """Build backends from `names`, else LLM_BACKENDS (default "groq,ollama")."""
+    env = os.environ if env is None else env
+    names = env.get("LLM_BACKENDS", "groq,ollama") if names is None else names
+    breaker_options = {
+        'failure_threshold': int(env.get("LLM_BREAKER_THRESHOLD", 5)),
+        'recovery_timeout': float(env.get("LLM_BREAKER_RECOVERY", 30)),
+    }
+    backends = []
+    for name in [n.strip() for n in names.split(",") if n.strip()]:
+        if name == "groq":
+            api_key = env.get("GROQ_API_KEY")
+            if not api_key:
+                logger.warning("GROQ_API_KEY not set; Groq backend disabled")
+                continue
+            backends.append(OpenAICompatibleBackend(
+                "groq",
+                env.get("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions"),
+                api_key,
+                env.get("GROQ_MODEL_ID") or env.get("OLLAMA_MODEL_ID"),
+                timeout=float(env.get("GROQ_TIMEOUT", 60)),
+                **breaker_options
+            ))
+        elif name == "ollama":
+            backends.append(OllamaBackend(
+                "ollama",
+                env.get("OLLAMA_API_HOST", "http://localhost:11434"),
+                env.get("OLLAMA_LOCAL_MODEL", "deepseek-r1"),
+                timeout=float(env.get("OLLAMA_TIMEOUT", 120)),
+                **breaker_options
+            ))
+        else:
+            logger.warning(f"Unknown LLM backend '{name}' ignored")
+    return backends
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def gateway_from_env(env=None, backends=None) -> LLMGateway:
+    """A gateway configured from the environment; `backends` overrides LLM_BACKENDS."""
+    env = os.environ if env is None else env
+    return LLMGateway(
+        backends_from_env(env, backends),
+        hedge=env.get("LLM_HEDGE", "false").lower() == "true",
+        hedge_delay=float(env.get("LLM_HEDGE_DELAY", 2.0)),
+        slow_threshold=float(env.get("LLM_SLOW_THRESHOLD", 15.0)),
+    )
+
+
+def get_gateway() -> LLMGateway:
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = gateway_from_env()
+    return _gateway
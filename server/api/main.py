@@ -1,12 +1,20 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import ollama
+from dotenv import load_dotenv
+from llm_gateway import gateway_from_env
 import PyPDF2
 import io
+import os
+
+load_dotenv()
 
 app = Flask(__name__)
 CORS(app)  # Allow CORS for Flutter frontend
 
+# CTG reports are patient data: analysed on the local Ollama model unless a
+# deployment explicitly lists a remote backend in CTG_LLM_BACKENDS.
+ctg_gateway = gateway_from_env(backends=os.environ.get("CTG_LLM_BACKENDS", "ollama"))
+
 def extract_text_from_pdf(pdf_bytes):
     """Extracts text from a PDF file."""
     pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
@@ -25,8 +33,8 @@ def analyze_ctg():
     pdf_bytes = file.read()
     extracted_text = extract_text_from_pdf(pdf_bytes)
 
-    # Send extracted text to Ollama DeepSeek R1
-    response = ollama.chat(model="deepseek-r1", messages=[
+    # Send extracted text to the local DeepSeek R1 (see CTG_LLM_BACKENDS)
+    response = ctg_gateway.chat(messages=[
         {"role": "user", "content": f"Analyze this CTG report and provide insights: {extracted_text}"}
     ])
 
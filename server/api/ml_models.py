@@ -70,42 +70,95 @@ class RemedyRecommendationModel:
         self.vectorizer = vectorizer
         self.feature_vectors = vectorizer.fit_transform(features)
 
-    def predict(self, input_dict):
-        """Predict remedies based on symptoms and prakriti"""
-        symptoms_text = " ".join(input_dict.get('symptoms', []))
-        prakriti_text = input_dict.get('prakriti', 'balanced')
-        query_text = f"{symptoms_text} {prakriti_text}"
-        # Transform query
-        query_vector = self.vectorizer.transform([query_text])
-        # Calculate similarity with all training examples
+    def _query_text(self, input_dict):
+        # Corpus entries join multi-word symptoms with underscores (morning_sickness),
+        # so add that form next to the words the user sent.
+        terms = []
+        for symptom in input_dict.get('symptoms', []):
+            terms.append(symptom)
+            joined = '_'.join(symptom.lower().split())
+            if joined != symptom.lower():
+                terms.append(joined)
+        prakriti_text = input_dict.get('prakriti') or 'balanced'
+        return f"{' '.join(terms)} {prakriti_text}"
+
+    def score(self, input_dict, top_n=3, min_similarity=0.1):
+        """Return `(remedy, similarity, corpus_index)` tuples, best match first.
+
+        Each remedy carries the cosine similarity of the corpus entry it came
+        from, so confidences reflect how closely the query matched.
+        """
         from sklearn.metrics.pairwise import cosine_similarity
+        query_vector = self.vectorizer.transform([self._query_text(input_dict)])
         similarities = cosine_similarity(query_vector, self.feature_vectors).flatten()
-        # Get top matches
-        top_indices = similarities.argsort()[-3:][::-1]  # Top 3 matches
-        # Combine remedies from top matches
-        all_remedies = []
-        for idx in top_indices:
-            if similarities[idx] > 0.1:  # Minimum similarity threshold
-                all_remedies.extend(self.remedies[idx])
-        # Remove duplicates while preserving order
-        unique_remedies = []
+        top_indices = similarities.argsort()[-top_n:][::-1]
+        scored = []
         seen = set()
-        for remedy in all_remedies:
-            if remedy not in seen:
-                unique_remedies.append(remedy)
-                seen.add(remedy)
-        return unique_remedies[:3]  # Return top 3 unique remedies
+        for idx in top_indices:
+            if similarities[idx] <= min_similarity:
+                continue
+            for remedy in self.remedies[idx]:
+                if remedy not in seen:
+                    scored.append((remedy, float(similarities[idx]), int(idx)))
+                    seen.add(remedy)
+        return scored
+
+    def symptom_coverage(self, symptoms):
+        """Fraction of symptoms that share at least one term with the corpus."""
+        if not symptoms:
+            return 0.0
+        analyzer = self.vectorizer.build_analyzer()
+        vocabulary = self.vectorizer.vocabulary_
+        covered = 0
+        for symptom in symptoms:
+            joined = '_'.join(symptom.lower().split())
+            if any(term in vocabulary for term in analyzer(f"{symptom} {joined}")):
+                covered += 1
+        return covered / len(symptoms)
+
+    def predict(self, input_dict):
+        """Predict remedies based on symptoms and prakriti"""
+        return [remedy for remedy, _, _ in self.score(input_dict)][:3]  # Return top 3 unique remedies
 
     def predict_with_confidence(self, input_dict):
-        """Predict remedies with confidence scores"""
-        remedies = self.predict(input_dict)
-        # Assign confidence scores (in real implementation, this would be more sophisticated)
-        confidences = [0.9, 0.8, 0.7]
-        result = []
-        for i, remedy in enumerate(remedies):
-            conf = confidences[i] if i < len(confidences) else 0.6
-            result.append({
-                'remedy': remedy,
-                'confidence': conf
-            })
-        return result
+        """Predict remedies with similarity-derived confidence scores"""
+        return [
+            {'remedy': remedy, 'confidence': round(similarity, 4)}
+            for remedy, similarity, _ in self.score(input_dict)[:3]
+        ]
+
+
+class MultiLabelSGD:
+    """One binary SGD classifier per label, trainable batch by batch with `partial_fit`.
+
+    Stands in for `OneVsRestClassifier` in `SymptomClassifier`: `predict`
+    returns a label-indicator matrix and `predict_proba` one column per label.
+    """
+    def __init__(self, n_labels, threshold=0.5, **sgd_params):
+        from sklearn.linear_model import SGDClassifier
+        params = {'loss': 'log_loss', 'alpha': 1e-5, 'random_state': 42, **sgd_params}
+        self.estimators_ = [SGDClassifier(**params) for _ in range(n_labels)]
+        self.threshold = threshold
+
+    def partial_fit(self, X, Y):
+        for j, estimator in enumerate(self.estimators_):
+            estimator.partial_fit(X, Y[:, j], classes=[0, 1])
+        return self
+
+    def predict_proba(self, X):
+        import numpy as np
+        return np.column_stack([estimator.predict_proba(X)[:, 1] for estimator in self.estimators_])
+
+    def predict(self, X):
+        return (self.predict_proba(X) >= self.threshold).astype(int)
+
+    def sparsify(self):
+        """Store coefficients sparsely (smaller artifacts); call `densify` before training again."""
+        for estimator in self.estimators_:
+            estimator.sparsify()
+        return self
+
+    def densify(self):
+        for estimator in self.estimators_:
+            estimator.densify()
+        return self
@@ -0,0 +1,415 @@
+"""Portable export of the maternal and fetal models, and a NumPy evaluator.
+
+`export` turns a fitted LightGBM or XGBoost classifier and its scaler into
+a JSON document of flat arrays, one entry per tree node:
+
+- `feature`: split feature, -1 for a leaf;
+- `threshold`: split threshold;
+- `child`: the left child; the right child is always `child + 1`;
+- `default_left`, `missing`: where a missing value goes (see below);
+- `value`: leaf value (0 for splits).
+
+`roots` and `tree_class` give each tree's first node and the class its
+leaves add to. A row goes left when `x <= threshold` (LightGBM) or
+`x < threshold` (XGBoost, compared in float32 as XGBoost does); the
+scaler (`standard`: subtract `mean`, divide by `scale`; `minmax`: multiply
+by `scale`, add `min`) runs first, in float64. Summing each class's leaves
+plus `base_score` gives the raw margin; the predicted class is its argmax.
+Nothing in it needs more than arrays and a loop, so a client can score
+offline from the same file.
+
+`TreeEnsemble` evaluates a batch with NumPy only: every row walks every
+tree at once, one level per step, so the cost is a few array operations
+per level of the deepest tree (paths that reached a leaf are dropped once
+they are the majority). The server uses it in place of the pickled
+models (no lightgbm, xgboost, sklearn or pandas import on the prediction
+path); `parity` compares the two.
+
+    python portable.py export               # both models, next to the .sav files
+    python portable.py check                # class and probability agreement on the CTG dataset and sampled vitals
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+FORMAT = 'tree-ensemble'
+FORMAT_VERSION = 1
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+ZERO_THRESHOLD = 1e-35  # LightGBM's kZeroThreshold
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODELS = {
+    # name: (model, scaler, export)
+    'maternal': ('finalized_maternal_model.sav', 'scaleX.pkl', 'finalized_maternal_model.json'),
+    'fetal': ('fetal_health_model.sav', 'scaleX1.pkl', 'fetal_health_model.json'),
+}
+
+
+def _pack(trees):
+    """Concatenate trees given as node dicts, renumbered so a split's children are adjacent."""
+    arrays = {key: [] for key in ('feature', 'threshold', 'child', 'default_left', 'missing', 'value')}
+    roots, depth = [], 0
+    for nodes in trees:
+        base = len(arrays['feature'])
+        roots.append(base)
+        order, ids, levels = [0], {0: base}, {0: 0}
+        for node_id in order:  # breadth-first; children are appended as a pair
+            node = nodes[node_id]
+            if node['feature'] >= 0:
+                for child in (node['left'], node['right']):
+                    ids[child] = base + len(order)
+                    levels[child] = levels[node_id] + 1
+                    order.append(child)
+        for node_id in order:
+            node = nodes[node_id]
+            split = node['feature'] >= 0
+            arrays['feature'].append(node['feature'])
+            arrays['threshold'].append(node['threshold'] if split else 0.0)
+            arrays['child'].append(ids[node['left']] if split else -1)
+            arrays['default_left'].append(int(node.get('default_left', True)) if split else 0)
+            arrays['missing'].append(node.get('missing', MISSING_NAN) if split else 0)
+            arrays['value'].append(0.0 if split else node['value'])
+        depth = max(depth, max(levels.values()))
+    return arrays, roots, depth
+
+
+def export_lightgbm(model):
+    booster = model.booster_
+    iterations = getattr(model, 'best_iteration_', None) or None
+    dump = booster.dump_model(num_iteration=iterations)
+    missing_types = {'None': MISSING_NONE, 'Zero': MISSING_ZERO, 'NaN': MISSING_NAN}
+    trees, tree_class = [], []
+    for info in dump['tree_info']:
+        nodes = []
+
+        def walk(node):
+            node_id = len(nodes)
+            nodes.append(None)
+            if 'split_index' not in node:
+                nodes[node_id] = {'feature': -1, 'value': float(node['leaf_value'])}
+                return node_id
+            if node['decision_type'] != '<=':
+                raise ValueError(f"Unsupported LightGBM split '{node['decision_type']}' (categorical features)")
+            left, right = walk(node['left_child']), walk(node['right_child'])
+            nodes[node_id] = {'feature': int(node['split_feature']), 'threshold': float(node['threshold']),
+                              'left': left, 'right': right, 'default_left': bool(node['default_left']),
+                              'missing': missing_types[node['missing_type']]}
+            return node_id
+
+        walk(info['tree_structure'])
+        trees.append(nodes)
+        tree_class.append(info['tree_index'] % dump['num_tree_per_iteration'])
+    num_class = dump['num_class']
+    return {
+        'kind': 'lightgbm',
+        'decision': '<=',
+        'dtype': 'float64',
+        'objective': 'softmax' if num_class > 1 else 'sigmoid',
+        'base_score': [0.0] * num_class,
+        'average_output': bool(dump.get('average_output')),
+        'trees': trees,
+        'tree_class': tree_class,
+    }
+
+
+def export_xgboost(model):
+    booster = model.get_booster()
+    learner = json.loads(booster.save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    gbtree = learner['gradient_booster']
+    if gbtree['name'] != 'gbtree':
+        raise ValueError(f"Unsupported XGBoost booster '{gbtree['name']}'")
+    forest = gbtree['model']
+    count = len(forest['trees'])
+    try:
+        best = model.best_iteration
+    except AttributeError:
+        best = None
+    if best is not None and forest.get('iteration_indptr'):
+        count = forest['iteration_indptr'][best + 1]
+    trees = []
+    for tree in forest['trees'][:count]:
+        if any(tree.get('split_type') or []):
+            raise ValueError('Unsupported XGBoost split (categorical features)')
+        nodes = []
+        for left, right, feature, condition, default_left in zip(
+                tree['left_children'], tree['right_children'], tree['split_indices'],
+                tree['split_conditions'], tree['default_left']):
+            if left == -1:
+                nodes.append({'feature': -1, 'value': float(np.float32(condition))})
+            else:
+                nodes.append({'feature': int(feature), 'threshold': float(np.float32(condition)),
+                              'left': left, 'right': right, 'default_left': bool(default_left),
+                              'missing': MISSING_NAN})
+        trees.append(nodes)
+    num_class = max(int(learner['learner_model_param'].get('num_class', 0)), 1)
+    base_score = float(learner['learner_model_param']['base_score'].strip('[]'))
+    if objective in ('multi:softprob', 'multi:softmax'):
+        kind, base = 'softmax', [base_score] * num_class
+    elif objective == 'binary:logistic':
+        kind, base = 'sigmoid', [float(np.log(base_score / (1 - base_score)))]
+    else:
+        raise ValueError(f"Unsupported XGBoost objective '{objective}'")
+    return {
+        'kind': 'xgboost',
+        'decision': '<',
+        'dtype': 'float32',
+        'objective': kind,
+        'base_score': base,
+        'average_output': False,
+        'trees': trees,
+        'tree_class': [int(c) for c in forest['tree_info'][:count]],
+    }
+
+
+def export_scaler(scaler):
+    if scaler is None:
+        return None
+    if hasattr(scaler, 'data_min_'):
+        return {'kind': 'minmax', 'scale': scaler.scale_.tolist(), 'min': scaler.min_.tolist(),
+                'clip': list(scaler.feature_range) if getattr(scaler, 'clip', False) else None}
+    if hasattr(scaler, 'with_mean'):
+        return {'kind': 'standard',
+                'mean': scaler.mean_.tolist() if scaler.with_mean else None,
+                'scale': scaler.scale_.tolist() if scaler.with_std else None}
+    raise ValueError(f"Unsupported scaler {type(scaler).__name__}")
+
+
+def export(model, scaler=None, feature_names=None):
+    """The portable document for a fitted classifier and its scaler."""
+    if hasattr(model, 'booster_'):
+        spec = export_lightgbm(model)
+    elif hasattr(model, 'get_booster'):
+        spec = export_xgboost(model)
+    else:
+        raise TypeError(f"No tree export for {type(model).__name__}")
+    if feature_names is None:
+        feature_names = getattr(scaler, 'feature_names_in_', None)
+    if feature_names is None:
+        feature_names = [f"f{i}" for i in range(model.n_features_in_)]
+    arrays, roots, depth = _pack(spec.pop('trees'))
+    return {
+        'format': FORMAT,
+        'version': FORMAT_VERSION,
+        **spec,
+        'features': [str(name) for name in feature_names],
+        'classes': [c.item() if hasattr(c, 'item') else c for c in model.classes_],
+        'scaler': export_scaler(scaler),
+        'max_depth': depth,
+        'roots': roots,
+        **arrays,
+    }
+
+
+def save(document, path):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(document, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class TreeEnsemble:
+    def __init__(self, document):
+        if document.get('format') != FORMAT or document.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Not a {FORMAT} v{FORMAT_VERSION} document")
+        self.kind = document['kind']
+        self.features = document['features']
+        self.classes = np.asarray(document['classes'])
+        self.objective = document['objective']
+        self.scaler = document['scaler']
+        self.dtype = np.float32 if document['dtype'] == 'float32' else np.float64
+        self.less_equal = document['decision'] == '<='
+        self.max_depth = document['max_depth']
+        self.roots = np.asarray(document['roots'], dtype=np.intp)
+        self.base_score = np.asarray(document['base_score'], dtype=np.float64)
+        feature = np.asarray(document['feature'], dtype=np.intp)
+        leaf = feature < 0
+        index = np.arange(len(feature))
+        # Leaves loop back to themselves (compare +inf on feature 0, go left), so a
+        # path that ends early can keep stepping until the batch is compacted.
+        self.feature = np.where(leaf, 0, feature)
+        self.threshold = np.where(leaf, np.inf, document['threshold']).astype(self.dtype)
+        self.left = np.where(leaf, index, document['child']).astype(np.intp)
+        self.is_leaf = leaf
+        self.default_left = np.asarray(document['default_left'], dtype=bool) | leaf
+        missing = np.asarray(document['missing'], dtype=np.int8)
+        self.missing = np.where(leaf, MISSING_NAN, missing)
+        self.zero_missing = bool((self.missing == MISSING_ZERO).any())
+        self.value = np.asarray(document['value'], dtype=np.float64)
+        tree_class = np.asarray(document['tree_class'], dtype=np.intp)
+        self.class_matrix = np.zeros((len(self.roots), len(self.base_score)))
+        self.class_matrix[np.arange(len(self.roots)), tree_class] = 1.0
+        if document.get('average_output'):
+            self.class_matrix /= np.maximum(self.class_matrix.sum(axis=0), 1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(json.loads(f.read()))
+
+    def transform(self, X):
+        X = np.array(X, dtype=np.float64).reshape(-1, len(self.features))
+        scaler = self.scaler
+        if scaler is None:
+            return X
+        if scaler['kind'] == 'standard':
+            if scaler['mean'] is not None:
+                X -= scaler['mean']
+            if scaler['scale'] is not None:
+                X /= scaler['scale']
+        else:
+            X *= scaler['scale']
+            X += scaler['min']
+            if scaler['clip'] is not None:
+                np.clip(X, *scaler['clip'], out=X)
+        return X
+
+    def leaves(self, scaled):
+        """Leaf index per (row, tree) for already scaled rows."""
+        X = np.ascontiguousarray(scaled, dtype=self.dtype)
+        rows, width = X.shape[0], len(self.roots)
+        values = X.ravel()
+        nodes = np.broadcast_to(self.roots, (rows, width)).ravel().copy()
+        offset = np.repeat(np.arange(rows) * X.shape[1], width)
+        check_missing = self.zero_missing or bool(np.isnan(values).any())
+        active, current = None, nodes
+        for _ in range(self.max_depth):
+            x = values.take(offset + self.feature.take(current))
+            threshold = self.threshold.take(current)
+            if check_missing:
+                missing = self.missing.take(current)
+                nan = np.isnan(x)
+                # LightGBM reads NaN as 0 unless NaN is the missing value
+                x = np.where(nan & (missing != MISSING_NAN), 0, x)
+                absent = (nan & (missing == MISSING_NAN)) | (
+                    (missing == MISSING_ZERO) & (np.abs(x) <= ZERO_THRESHOLD))
+                go_left = np.where(absent, self.default_left.take(current),
+                                   x <= threshold if self.less_equal else x < threshold)
+            else:
+                go_left = x <= threshold if self.less_equal else x < threshold
+            current = self.left.take(current) + ~go_left
+            done = self.is_leaf.take(current)
+            # Once half the paths have ended, stop carrying them through the deeper levels
+            if np.count_nonzero(done) * 2 > len(current):
+                if active is None:
+                    active = np.arange(len(nodes))
+                nodes[active] = current
+                keep = ~done
+                active, current, offset = active[keep], current[keep], offset[keep]
+                if not len(active):
+                    break
+        if active is None:
+            nodes = current
+        else:
+            nodes[active] = current
+        return nodes.reshape(rows, width)
+
+    def margins(self, X, scaled=False):
+        """Raw scores, shape (rows, classes)."""
+        return self.value[self.leaves(X if scaled else self.transform(X))] @ self.class_matrix + self.base_score
+
+    def predict_proba(self, X):
+        margins = self.margins(X)
+        if self.objective == 'sigmoid':
+            positive = 1 / (1 + np.exp(-margins[:, 0]))
+            return np.column_stack([1 - positive, positive])
+        exp = np.exp(margins - margins.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        margins = self.margins(X)
+        if self.objective == 'sigmoid':
+            return self.classes[(margins[:, 0] > 0).astype(np.intp)]
+        return self.classes[margins.argmax(axis=1)]
+
+
+def load(path):
+    return TreeEnsemble.load(path)
+
+
+PROBA_TOLERANCE = 1e-5  # XGBoost sums leaves in float32
+
+
+def parity(model, scaler, ensemble, X):
+    """Class and probability agreement between the native model (with its scaler) and the
+    exported one on raw rows `X`."""
+    X = np.asarray(X, dtype=np.float64)
+    scaled = scaler.transform(X) if scaler is not None else X
+    native = np.asarray(model.predict(scaled))
+    portable = ensemble.predict(X)
+    mismatches = np.flatnonzero(native != portable)
+    proba_diff = np.abs(np.asarray(model.predict_proba(scaled)) - ensemble.predict_proba(X)).max(initial=0.0)
+    return {
+        'rows': len(X),
+        'agree': int(len(X) - len(mismatches)),
+        'mismatches': mismatches[:20].tolist(),
+        'max_proba_diff': float(proba_diff),
+        'proba_close': bool(proba_diff <= PROBA_TOLERANCE),
+        'scaled_equal': bool(np.array_equal(scaled, ensemble.transform(X), equal_nan=True)),
+    }
+
+
+def sample_rows(ensemble, n, seed=0, spread=0.25):
+    """Random raw rows covering the scaler's range and a margin beyond it."""
+    rng = np.random.default_rng(seed)
+    scaler = ensemble.scaler
+    if scaler['kind'] == 'standard':
+        low = np.asarray(scaler['mean']) - 3 * np.asarray(scaler['scale'])
+        high = np.asarray(scaler['mean']) + 3 * np.asarray(scaler['scale'])
+    else:
+        # minmax maps [low, high] to [0, 1]: x = (y - min) / scale
+        low = -np.asarray(scaler['min']) / np.asarray(scaler['scale'])
+        high = (1 - np.asarray(scaler['min'])) / np.asarray(scaler['scale'])
+    width = high - low
+    return rng.uniform(low - spread * width, high + spread * width, size=(n, len(low)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Portable tree model tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_cmd = sub.add_parser('export', help='Export models with their scalers')
+    export_cmd.add_argument('models', nargs='*', metavar='model', help=f"{', '.join(MODELS)} (default: all)")
+    export_cmd.add_argument('--dir', default=HERE, help='Directory with the .sav/.pkl files and for the export')
+    check = sub.add_parser('check', help='Compare exported and native predictions')
+    check.add_argument('models', nargs='*', metavar='model', help=f"{', '.join(MODELS)} (default: all)")
+    check.add_argument('--dir', default=HERE)
+    check.add_argument('--data', default=os.path.join(HERE, '..', 'models', 'fetal_health.csv'),
+                       help='CTG dataset for the fetal model')
+    check.add_argument('--samples', type=int, default=20000, help='Random rows per model')
+    args = parser.parse_args(argv)
+    unknown = set(args.models) - set(MODELS)
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(sorted(unknown))}")
+
+    import joblib
+    failed = False
+    for name in args.models or MODELS:
+        model_file, scaler_file, export_file = (os.path.join(args.dir, f) for f in MODELS[name])
+        model, scaler = joblib.load(model_file), joblib.load(scaler_file)
+        if args.command == 'export':
+            start = time.perf_counter()
+            document = export(model, scaler)
+            save(document, export_file)
+            print(f"{name}: {len(document['roots'])} trees, {len(document['feature'])} nodes, depth "
+                  f"{document['max_depth']} -> {export_file} ({os.path.getsize(export_file) / 1024:.0f} KiB, "
+                  f"{time.perf_counter() - start:.2f}s)")
+            continue
+        ensemble = load(export_file)
+        sets = {'sampled': sample_rows(ensemble, args.samples)}
+        if name == 'fetal' and os.path.exists(args.data):
+            import pandas as pd
+            sets['dataset'] = pd.read_csv(args.data)[ensemble.features].to_numpy(dtype=float)
+        for label, X in sets.items():
+            result = parity(model, scaler, ensemble, X)
+            failed |= result['agree'] != result['rows'] or not result['proba_close'] or not result['scaled_equal']
+            print(f"{name} {label}: {result['agree']}/{result['rows']} classes agree, "
+                  f"max probability difference {result['max_proba_diff']:.2g}, scaled inputs {'identical' if result['scaled_equal'] else 'DIFFER'}"
+                  + (f", mismatched rows {result['mismatches']}" if result['mismatches'] else ''))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
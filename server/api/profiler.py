@@ -0,0 +1,228 @@
+"""On-demand CPU sampling and allocation tracking for a running worker.
+
+`SamplingProfiler.profile` samples the Python stack of every other thread
+in the process (`sys._current_frames`) every `interval` seconds for a
+bounded duration and counts identical stacks. Threads parked in a wait
+(queue gets, condition waits, socket accepts) are skipped unless asked
+for, so the profile shows where requests spend time rather than idle
+workers. The result renders as folded stacks, one `frame;frame;frame
+count` line per stack, which flamegraph.pl, speedscope and inferno read
+directly. Only one profile runs per process at a time.
+
+`AllocationTracker` wraps `tracemalloc`: `start` begins tracing and keeps
+a baseline snapshot, `report` lists the allocation sites (or whole
+tracebacks) holding the most memory, optionally as a diff against the
+baseline, and `stop` ends tracing. Tracing slows allocation-heavy code
+noticeably, so it stops itself after `max_seconds`.
+"""
+import math
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STDLIB = sysconfig.get_paths()['stdlib']
+
+# (file name, function) of frames where a thread is waiting, not working.
+# A thread in time.sleep shows its caller as the leaf, hence our own loops.
+IDLE_LEAVES = {
+    ('threading.py', 'wait'), ('threading.py', '_wait_for_tstate_lock'),
+    ('queue.py', 'get'), ('selectors.py', 'select'), ('socket.py', 'accept'),
+    ('socket.py', 'readinto'), ('socketserver.py', 'serve_forever'), ('ssl.py', 'read'),
+    ('drift.py', '_run'), ('shadow.py', '_wait_idle'),
+}
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def short_path(filename):
+    """Paths relative to the API directory, site-packages or the standard library."""
+    if filename.startswith(HERE):
+        return os.path.relpath(filename, HERE)
+    for marker in ('site-packages' + os.sep, 'dist-packages' + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            return filename[index + len(marker):]
+    if filename.startswith(STDLIB):
+        return os.path.relpath(filename, STDLIB)
+    return filename
+
+
+class SamplingProfiler:
+    def __init__(self, max_seconds=60, min_interval=0.001):
+        self.max_seconds = max_seconds
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._labels = {}
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            # ';' separates frames in the folded format
+            label = self._labels[code] = (f"{code.co_name} ({short_path(code.co_filename)}:"
+                                          f"{code.co_firstlineno})").replace(';', ',')
+        return label
+
+    def profile(self, seconds, interval=0.005, include_idle=False, by_thread=False):
+        """Sample for `seconds`; returns stacks as `{(frame labels, root first): samples}` with totals."""
+        seconds, interval = float(seconds), float(interval)
+        if not (math.isfinite(seconds) and math.isfinite(interval)):
+            raise ValueError('seconds and interval must be finite')
+        seconds = min(seconds, self.max_seconds)
+        interval = max(interval, self.min_interval)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy('A profile is already running in this worker')
+        try:
+            me = threading.get_ident()
+            stacks = Counter()
+            samples = idle = 0
+            sampling = 0.0
+            start = time.perf_counter()
+            deadline = start + seconds
+            next_at = start
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                names = {t.ident: t.name for t in threading.enumerate()} if by_thread else None
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    leaf = frame.f_code
+                    if not include_idle and (os.path.basename(leaf.co_filename), leaf.co_name) in IDLE_LEAVES:
+                        idle += 1
+                        continue
+                    codes = []
+                    while frame is not None:
+                        codes.append(frame.f_code)
+                        frame = frame.f_back
+                    if by_thread:
+                        codes.append(names.get(ident, str(ident)))
+                    stacks[tuple(codes)] += 1
+                samples += 1
+                sampling += time.perf_counter() - now
+                next_at += interval
+                time.sleep(max(0.0, next_at - time.perf_counter()))
+            elapsed = time.perf_counter() - start
+        finally:
+            self._lock.release()
+
+        labelled = Counter()
+        for codes, count in stacks.items():
+            labels = [c if isinstance(c, str) else self._label(c) for c in reversed(codes)]
+            labelled[tuple(labels)] += count
+        return {
+            'stacks': labelled,
+            'samples': samples,
+            'idle_skipped': idle,
+            'seconds': round(elapsed, 3),
+            'interval_ms': interval * 1000,
+            # share of the profiled time the sampler itself held the interpreter
+            'overhead': round(sampling / elapsed, 4) if elapsed else 0.0,
+        }
+
+
+def folded(stacks):
+    """Folded-stack text for flame graph tools."""
+    return ''.join(f"{';'.join(frames)} {count}\n" for frames, count in stacks.most_common())
+
+
+def top_functions(stacks, limit=25):
+    """Self (leaf) and total (anywhere on the stack) sample counts per frame."""
+    own, total = Counter(), Counter()
+    for frames, count in stacks.items():
+        own[frames[-1]] += count
+        for frame in set(frames):
+            total[frame] += count
+    return [{'frame': frame, 'self': own[frame], 'total': count} for frame, count in total.most_common(limit)]
+
+
+class AllocationTracker:
+    # Allocations made by the tracing and import machinery aren't interesting
+    IGNORE = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+              tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'), tracemalloc.Filter(False, __file__)]
+
+    def __init__(self, max_seconds=600):
+        self.max_seconds = max_seconds
+        self._baseline = None
+        self._started_at = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def start(self, frames=25, max_seconds=None):
+        """Start tracing (restarting with a new baseline if already tracing)."""
+        max_seconds = float(max_seconds or self.max_seconds)
+        if not math.isfinite(max_seconds):
+            raise ValueError('max_seconds must be finite')
+        max_seconds = min(max_seconds, self.max_seconds)
+        with self._lock:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            if self._timer is not None:
+                self._timer.cancel()
+            tracemalloc.start(int(frames))
+            self._baseline = tracemalloc.take_snapshot().filter_traces(self.IGNORE)
+            self._started_at = time.time()
+            self._timer = threading.Timer(max_seconds, self.stop)
+            self._timer.daemon = True
+            self._timer.start()
+        return self.status()
+
+    def stop(self):
+        with self._lock:
+            was_tracing = tracemalloc.is_tracing()
+            if was_tracing:
+                tracemalloc.stop()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._baseline = self._timer = self._started_at = None
+        return was_tracing
+
+    def status(self):
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        return {
+            'tracing': tracing,
+            'frames': tracemalloc.get_traceback_limit() if tracing else None,
+            'started_at': self._started_at,
+            'traced_kb': round(current / 1024, 1),
+            'peak_kb': round(peak / 1024, 1),
+            'overhead_kb': round(tracemalloc.get_tracemalloc_memory() / 1024, 1) if tracing else 0,
+        }
+
+    def report(self, top=25, group='lineno', diff=False, include=None):
+        """`(status, stats)`; stats are dicts with sizes and the frames (oldest first)."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('Allocation tracking is not running; start it first')
+        filters = list(self.IGNORE)
+        if include:
+            filters.append(tracemalloc.Filter(True, include, all_frames=True))
+        snapshot = tracemalloc.take_snapshot().filter_traces(filters)
+        if diff and self._baseline is not None:
+            stats = snapshot.compare_to(self._baseline.filter_traces(filters), group)
+            stats = [s for s in stats if s.size_diff > 0][:top]
+        else:
+            stats = snapshot.statistics(group)[:top]
+        rows = []
+        for stat in stats:
+            row = {
+                'size_kb': round(stat.size / 1024, 1),
+                'count': stat.count,
+                'frames': [f"{short_path(f.filename)}:{f.lineno}" for f in reversed(stat.traceback)],
+            }
+            if diff:
+                row.update(size_diff_kb=round(stat.size_diff / 1024, 1), count_diff=stat.count_diff)
+            rows.append(row)
+        return self.status(), rows
+
+
+def folded_allocations(rows, diff=False):
+    """Allocation tracebacks as folded stacks weighted by bytes (diff bytes when `diff`)."""
+    key = 'size_diff_kb' if diff else 'size_kb'
+    return ''.join(f"{';'.join(row['frames'])} {int(row[key] * 1024)}\n" for row in rows)
@@ -0,0 +1,84 @@
+"""Tiered remedy recommendations: local model first, LLM for the long tail.
+
+`RemedyRecommendationModel` answers common symptom sets in about a
+millisecond. Its answer is used directly when the routing confidence
+(best corpus similarity scaled by the fraction of symptoms the corpus
+covers) clears the threshold; otherwise the request escalates to the LLM.
+If the LLM fails, a low-confidence local answer is still better than a 500.
+"""
+import threading
+from typing import Callable, List, Optional
+
+DOSHAS = ('vata', 'pitta', 'kapha')
+
+
+class TieredRemedyEngine:
+    TIERS = ('local', 'llm', 'local_fallback')
+
+    def __init__(self, model, threshold=0.35, min_remedies=2):
+        self.model = model
+        self.threshold = threshold
+        self.min_remedies = min_remedies
+        self.counts = {tier: 0 for tier in self.TIERS}
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _record(self, tier):
+        with self._lock:
+            self.counts[tier] += 1
+
+    def local_candidate(self, symptoms: List[str], prakriti: Optional[str] = None):
+        """Score with the local model; returns `(answer, confidence)` or `(None, 0.0)`."""
+        if self.model is None or not symptoms:
+            return None, 0.0
+        scored = self.model.score({'symptoms': symptoms, 'prakriti': prakriti})
+        if not scored:
+            return None, 0.0
+        confidence = scored[0][1] * self.model.symptom_coverage(symptoms)
+        if not prakriti:
+            # Corpus entries end with the dosha they were written for.
+            last_term = self.model.features[scored[0][2]].split()[-1]
+            prakriti = last_term.capitalize() if last_term in DOSHAS else None
+        answer = {
+            'prakriti': prakriti,
+            'remedies': [{'remedy': remedy, 'confidence': round(similarity, 4)}
+                         for remedy, similarity, _ in scored[:3]],
+        }
+        return answer, confidence
+
+    def recommend(self, symptoms: List[str], prakriti: Optional[str], escalate: Callable[[], dict],
+                  allow_local=True) -> dict:
+        """Return an answer dict with a `tier` key naming who produced it.
+
+        `escalate` performs the LLM path and returns the same shape
+        (`prakriti`, `remedies`, plus anything the caller wants to store).
+        """
+        candidate, confidence = self.local_candidate(symptoms, prakriti)
+        if (allow_local and candidate is not None and confidence >= self.threshold
+                and len(candidate['remedies']) >= self.min_remedies):
+            self._record('local')
+            return {**candidate, 'tier': 'local', 'confidence': round(confidence, 4)}
+        try:
+            result = escalate()
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            if candidate is None:
+                raise
+            self._record('local_fallback')
+            return {**candidate, 'tier': 'local_fallback', 'confidence': round(confidence, 4)}
+        self._record('llm')
+        return {**result, 'tier': 'llm'}
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            errors = self.errors
+        total = sum(counts.values())
+        return {
+            'threshold': self.threshold,
+            'total': total,
+            'counts': counts,
+            'hit_rates': {tier: (count / total if total else 0.0) for tier, count in counts.items()},
+            'llm_errors': errors,
+        }
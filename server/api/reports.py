@@ -0,0 +1,765 @@
+"""Weekly medical reports (PDF) per patient.
+
+A report covers one Monday-to-Monday UTC week and has a section per source
+table: vitals, CTG, symptoms, risk assessments and remedy
+recommendations. Each section streams its table for the patient and week
+in pages (`stream_rows`), folding rows into a small summary and a digest as
+they arrive, so memory depends on the page size, not on how many readings
+a patient has. The digest (plus the week and the renderer version) keys a
+`SectionCache` of rendered sections: a section whose rows haven't changed
+is reused as-is instead of being laid out and compressed again. The cache
+lives on disk, so web workers and the bulk pool share it.
+
+Sections are drawn as PDF form XObjects by a small writer below (standard
+Helvetica fonts, text, rules and sparklines), so no PDF library is needed
+and a cached section drops into any page position unchanged. A report is
+byte-for-byte stable for unchanged data; its ETag is derived from the
+section keys.
+
+`bulk_render` renders many patients across a process pool, each worker with
+its own Supabase client and the shared cache:
+
+    python reports.py bulk --week 2025-06-02 --workers 8 --out-dir reports/
+    python reports.py render <user id> --week 2025-06-02 --out report.pdf
+    python reports.py prune --max-mb 512
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(HERE, '..', 'models', 'reports', 'cache')
+
+# Bump when a section's drawing changes so cached renderings are replaced.
+RENDER_VERSION = 1
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 42
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+SECTION_GAP = 18
+
+
+# ---------------------------------------------------------------------------
+# Weeks
+
+def week_bounds(value=None):
+    """`(monday, next monday)` for a `date`, `YYYY-MM-DD` (any day of the week)
+    or `YYYY-Www`; defaults to the last completed week."""
+    if value is None or value == '':
+        day = datetime.utcnow().date() - timedelta(days=7)
+    elif isinstance(value, datetime):
+        day = value.date()
+    elif isinstance(value, date):
+        day = value
+    elif '-W' in value:
+        day = datetime.strptime(value + '-1', '%G-W%V-%u').date()
+    else:
+        day = date.fromisoformat(value)
+    start = day - timedelta(days=day.weekday())
+    return start, start + timedelta(days=7)
+
+
+def _day(ts):
+    """Index 0-6 of the weekday of an ISO timestamp."""
+    try:
+        return datetime.fromisoformat(str(ts)[:19]).weekday()
+    except ValueError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Minimal PDF writer
+
+def _escape(text):
+    text = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.replace('\r', ' ').replace('\n', ' ')
+
+
+def _fit(text, width, size):
+    """Truncate `text` to roughly `width` points of Helvetica at `size`."""
+    text = ' '.join(str(text).split())
+    limit = max(4, int(width / (size * 0.5)))
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+def _num(value):
+    return f"{value:.2f}".rstrip('0').rstrip('.')
+
+
+class Canvas:
+    """Drawing operations for one block; (0, 0) is its top-left corner and y grows downwards."""
+
+    def __init__(self, width=CONTENT_WIDTH):
+        self.width = width
+        self.ops = []
+        self.y = 0
+
+    def text(self, x, y, text, size=9, bold=False, gray=0.0):
+        self.ops.append(f"BT /{'F2' if bold else 'F1'} {size} Tf {gray} g {_num(x)} {_num(-y - size)} Td "
+                        f"({_escape(text)}) Tj ET")
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0.0):
+        self.ops.append(f"{width} w {gray} G {_num(x1)} {_num(-y1)} m {_num(x2)} {_num(-y2)} l S")
+
+    def rect(self, x, y, w, h, gray=0.0):
+        self.ops.append(f"{gray} g {_num(x)} {_num(-y - h)} {_num(w)} {_num(h)} re f")
+
+    def polyline(self, points, width=0.8, gray=0.0):
+        if len(points) < 2:
+            return
+        path = ' '.join(f"{_num(x)} {_num(-y)} {'m' if i == 0 else 'l'}" for i, (x, y) in enumerate(points))
+        self.ops.append(f"{width} w {gray} G {path} S")
+
+    def heading(self, title, subtitle=''):
+        self.text(0, self.y, title, size=12, bold=True)
+        if subtitle:
+            self.text(self.width - len(subtitle) * 4.2, self.y + 3, subtitle, size=8, gray=0.4)
+        self.y += 16
+        self.line(0, self.y, self.width, self.y, gray=0.6)
+        self.y += 6
+
+    def row(self, cells, widths, size=9, bold=False, gray=0.0):
+        x = 0
+        for cell, width in zip(cells, widths):
+            if cell != '':
+                self.text(x, self.y, _fit(cell, width - 4, size), size=size, bold=bold, gray=gray)
+            x += width
+        self.y += size + 4
+
+    def sparkline(self, x, y, width, height, values):
+        """Line through the non-empty `values`, scaled to the box."""
+        points = [(i, v) for i, v in enumerate(values) if v is not None]
+        if not points:
+            return
+        low, high = min(v for _, v in points), max(v for _, v in points)
+        span = (high - low) or 1.0
+        step = width / max(1, len(values) - 1)
+        self.line(x, y + height, x + width, y + height, width=0.3, gray=0.8)
+        self.polyline([(x + i * step, y + height - (v - low) / span * height) for i, v in points])
+        for i, v in points:
+            self.rect(x + i * step - 1, y + height - (v - low) / span * height - 1, 2, 2)
+
+    def bar(self, x, y, width, fraction, height=6, gray=0.35):
+        self.rect(x, y, width, height, gray=0.9)
+        self.rect(x, y, width * max(0.0, min(1.0, fraction)), height, gray=gray)
+
+    def content(self):
+        return '\n'.join(self.ops).encode('latin-1', 'replace')
+
+
+def form_xobject(canvas):
+    """`(height, compressed stream)` of a canvas as a form XObject body."""
+    height = max(canvas.y, 1)
+    return height, zlib.compress(canvas.content(), 6)
+
+
+class PdfWriter:
+    """Assembles pages of placed form XObjects into a PDF file."""
+
+    def __init__(self):
+        self.objects = [None, None]  # catalog and page tree are filled in last
+        self.font = self._add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        self.bold = self._add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold "
+                              b"/Encoding /WinAnsiEncoding >>")
+        self.resources = f"<< /Font << /F1 {self.font} 0 R /F2 {self.bold} 0 R >> >>"
+        self.pages = []
+
+    def _add(self, body):
+        self.objects.append(body)
+        return len(self.objects)
+
+    def _stream(self, data, header=''):
+        return self._add(f"<< {header} /Filter /FlateDecode /Length {len(data)} >>\nstream\n".encode()
+                         + data + b"\nendstream")
+
+    def xobject(self, height, data, width=CONTENT_WIDTH):
+        """Add a form from `form_xobject`; returns its object number."""
+        return self._stream(data, f"/Type /XObject /Subtype /Form /BBox [0 {-height} {width} 0] "
+                                  f"/Resources {self.resources}")
+
+    def page(self, placements, overlay=None):
+        """A page drawing `(xobject, x, y)` placements (y from the top) and an optional `Canvas`."""
+        names = {f"/S{i}": ref for i, (ref, _, _) in enumerate(placements)}
+        ops = [f"q 1 0 0 1 {_num(x)} {_num(PAGE_HEIGHT - y)} cm /S{i} Do Q"
+               for i, (_, x, y) in enumerate(placements)]
+        content = '\n'.join(ops).encode()
+        if overlay is not None:
+            content += b"\nq 1 0 0 1 0 " + str(PAGE_HEIGHT).encode() + b" cm\n" + overlay.content() + b"\nQ"
+        contents = self._stream(zlib.compress(content, 6))
+        xobjects = ' '.join(f"{name} {ref} 0 R" for name, ref in names.items())
+        self.pages.append(self._add(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] /Contents {contents} 0 R "
+            f"/Resources << /Font << /F1 {self.font} 0 R /F2 {self.bold} 0 R >> "
+            f"/XObject << {xobjects} >> >> >>".encode()))
+
+    def tobytes(self, title=''):
+        self.objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+        kids = ' '.join(f"{ref} 0 R" for ref in self.pages)
+        self.objects[1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode()
+        info = self._add(f"<< /Title ({_escape(title)}) /Producer (AyurJanani) >>".encode('latin-1', 'replace'))
+        out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(self.objects, 1):
+            offsets.append(len(out))
+            out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        xref = len(out)
+        out += f"xref\n0 {len(self.objects) + 1}\n0000000000 65535 f \n".encode()
+        out += ''.join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+        out += (f"trailer\n<< /Size {len(self.objects) + 1} /Root 1 0 R /Info {info} 0 R >>\n"
+                f"startxref\n{xref}\n%%EOF\n").encode()
+        return bytes(out)
+
+
+# ---------------------------------------------------------------------------
+# Sections: each folds its rows into a summary, then draws it
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+STATUS = {0: 'Normal', 1: 'Suspect', 2: 'Pathological'}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Section:
+    name = table = time_column = columns = title = None
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, row):
+        self.count += 1
+
+    def draw(self, canvas):
+        raise NotImplementedError
+
+    def render(self):
+        canvas = Canvas()
+        canvas.heading(self.title, f"{self.count} record{'s' if self.count != 1 else ''}")
+        if self.count:
+            self.draw(canvas)
+        else:
+            canvas.text(0, canvas.y, 'Nothing recorded this week.', gray=0.4)
+            canvas.y += 13
+        return form_xobject(canvas)
+
+
+class MetricSeries:
+    """Min/mean/max/last of one reading plus its daily means."""
+
+    def __init__(self):
+        self.n = 0
+        self.total = 0.0
+        self.low = self.high = self.last = None
+        self.daily = [[0.0, 0] for _ in WEEKDAYS]
+
+    def add(self, value, day):
+        if value is None:
+            return
+        self.n += 1
+        self.total += value
+        self.low = value if self.low is None else min(self.low, value)
+        self.high = value if self.high is None else max(self.high, value)
+        self.last = value
+        if day is not None:
+            self.daily[day][0] += value
+            self.daily[day][1] += 1
+
+    def daily_means(self):
+        return [total / n if n else None for total, n in self.daily]
+
+
+class MetricSection(Section):
+    metrics = ()  # (column, label, unit)
+
+    def __init__(self):
+        super().__init__()
+        self.series = {column: MetricSeries() for column, _, _ in self.metrics}
+        self.predictions = Counter()
+
+    def add(self, row):
+        super().add(row)
+        day = _day(row.get(self.time_column))
+        for column, series in self.series.items():
+            series.add(_number(row.get(column)), day)
+        if row.get('prediction') is not None:
+            self.predictions[STATUS.get(int(row['prediction']), 'Unknown')] += 1
+
+    def draw(self, canvas):
+        widths = [150, 50, 50, 50, 50, 50, 115]
+        canvas.row(['Reading', 'Count', 'Min', 'Mean', 'Max', 'Last', 'Daily mean (Mon-Sun)'], widths,
+                   size=8, bold=True, gray=0.3)
+        for column, label, unit in self.metrics:
+            s = self.series[column]
+            if not s.n:
+                canvas.row([f"{label} ({unit})", 0, '-', '-', '-', '-', ''], widths)
+                continue
+            top = canvas.y
+            canvas.row([f"{label} ({unit})", s.n, _num(s.low), _num(s.total / s.n), _num(s.high), _num(s.last), ''],
+                       widths)
+            canvas.sparkline(sum(widths[:-1]), top + 1, widths[-1] - 10, 9, s.daily_means())
+        canvas.y += 4
+        if self.predictions:
+            counts = ', '.join(f"{label} {self.predictions[label]}" for label in STATUS.values()
+                               if self.predictions[label])
+            canvas.text(0, canvas.y, f"Model assessments: {counts}", size=9)
+            canvas.y += 13
+
+
+class VitalsSection(MetricSection):
+    name, table, time_column, title = 'vitals', 'vitals', 'created_at', 'Maternal vitals'
+    metrics = (('systolic_bp', 'Systolic BP', 'mmHg'), ('diastolic_bp', 'Diastolic BP', 'mmHg'),
+               ('blood_glucose', 'Blood glucose', 'mmol/L'), ('body_temp', 'Body temperature', 'F'),
+               ('heart_rate', 'Heart rate', 'bpm'))
+    columns = ','.join([c for c, _, _ in metrics] + ['prediction', 'created_at'])
+
+
+class CtgSection(MetricSection):
+    name, table, time_column, title = 'ctg', 'ctg', 'created_at', 'Fetal monitoring (CTG)'
+    metrics = (('baseline_value', 'Baseline FHR', 'bpm'), ('accelerations', 'Accelerations', '/s'),
+               ('uterine_contractions', 'Uterine contractions', '/s'),
+               ('prolonged_decelerations', 'Prolonged decelerations', '/s'),
+               ('abnormal_short_term_variability', 'Abnormal STV', '%'))
+    columns = ','.join([c for c, _, _ in metrics] + ['prediction', 'created_at'])
+
+
+class SymptomsSection(Section):
+    name, table, time_column, title = 'symptoms', 'symptoms', 'recorded_at', 'Reported symptoms'
+    columns = 'reported_symptoms,classified_categories,recorded_at'
+
+    def __init__(self):
+        super().__init__()
+        self.categories = Counter()
+        self.recent = deque(maxlen=5)
+
+    def add(self, row):
+        super().add(row)
+        self.categories.update(row.get('classified_categories') or [])
+        if row.get('reported_symptoms'):
+            self.recent.append((str(row.get('recorded_at') or '')[:10], row['reported_symptoms']))
+
+    def draw(self, canvas):
+        if self.categories:
+            canvas.text(0, canvas.y, 'Classified categories', size=9, bold=True)
+            canvas.y += 13
+            most = self.categories.most_common(8)
+            for category, count in most:
+                canvas.text(0, canvas.y, _fit(category, 160, 9))
+                canvas.bar(170, canvas.y + 2, 200, count / most[0][1])
+                canvas.text(380, canvas.y, str(count))
+                canvas.y += 13
+        canvas.y += 3
+        canvas.text(0, canvas.y, 'Latest reports', size=9, bold=True)
+        canvas.y += 13
+        for day, text in reversed(self.recent):
+            canvas.row([day, text], [70, canvas.width - 70])
+
+
+class RisksSection(Section):
+    name, table, time_column, title = 'risks', 'risk_assessments', 'assessed_at', 'Risk assessments'
+    columns = 'risks,assessed_at'
+    SEVERITY = {'low': 0, 'medium': 1, 'high': 2}
+
+    def __init__(self):
+        super().__init__()
+        self.risks = {}
+
+    def add(self, row):
+        super().add(row)
+        for risk in row.get('risks') or []:
+            if not isinstance(risk, dict) or not risk.get('risk_type'):
+                continue
+            seen = self.risks.setdefault(risk['risk_type'], {'times': 0, 'max': 0.0, 'severity': 'low'})
+            seen['times'] += 1
+            seen['max'] = max(seen['max'], _number(risk.get('probability')) or 0.0)
+            severity = str(risk.get('severity') or 'low').lower()
+            if self.SEVERITY.get(severity, 0) > self.SEVERITY.get(seen['severity'], 0):
+                seen['severity'] = severity
+
+    def draw(self, canvas):
+        if not self.risks:
+            canvas.text(0, canvas.y, 'No risks flagged.', gray=0.4)
+            canvas.y += 13
+            return
+        widths = [180, 60, 230, 45]
+        canvas.row(['Risk', 'Flagged', 'Highest probability', 'Severity'], widths, size=8, bold=True, gray=0.3)
+        ranked = sorted(self.risks.items(), key=lambda item: (-item[1]['max'], item[0]))[:10]
+        for risk_type, seen in ranked:
+            top = canvas.y
+            canvas.row([risk_type.replace('_', ' '), seen['times'], '', seen['severity']], widths)
+            canvas.bar(240, top + 2, 180, seen['max'], gray=0.15 if seen['severity'] == 'high' else 0.35)
+            canvas.text(428, top, f"{seen['max']:.0%}", size=8)
+
+
+class RemediesSection(Section):
+    name, table, time_column = 'remedies', 'remedy_recommendations', 'recorded_at'
+    title = 'Ayurvedic recommendations'
+    columns = 'prakriti,recommended_remedies,recorded_at'
+
+    def __init__(self):
+        super().__init__()
+        self.prakriti = None
+        self.remedies = Counter()
+
+    def add(self, row):
+        super().add(row)
+        self.prakriti = row.get('prakriti') or self.prakriti
+        for remedy in row.get('recommended_remedies') or []:
+            if isinstance(remedy, dict):
+                remedy = remedy.get('remedy') or remedy.get('name')
+            if remedy:
+                self.remedies[str(remedy)] += 1
+
+    def draw(self, canvas):
+        if self.prakriti:
+            canvas.text(0, canvas.y, f"Prakriti: {self.prakriti}", size=9, bold=True)
+            canvas.y += 14
+        for remedy, count in self.remedies.most_common(8):
+            canvas.row([f"- {remedy}", f"x{count}" if count > 1 else ''], [canvas.width - 40, 40])
+
+
+SECTIONS = [VitalsSection, CtgSection, SymptomsSection, RisksSection, RemediesSection]
+
+
+# ---------------------------------------------------------------------------
+# Data and cache
+
+def stream_rows(client, table, user_id, time_column, columns, start, end, page_size=500):
+    """Yield the patient's rows for `[start, end)` in time order, one page at a time.
+
+    Pages are taken by offset: a patient-week is small, so offsets stay cheap
+    and rows sharing a timestamp can't be skipped at a page boundary.
+    """
+    offset = 0
+    while True:
+        page = client.table(table).select(columns).eq('UID', user_id)\
+            .gte(time_column, start.isoformat()).lt(time_column, end.isoformat())\
+            .order(time_column).range(offset, offset + page_size - 1).execute().data or []
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+
+class SectionCache:
+    """Rendered sections by key: files under `directory` (shared between
+    processes) behind a small in-process LRU. `directory=None` keeps them in memory only."""
+
+    def __init__(self, directory=None, memory_items=256):
+        self.directory = directory
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.bin')
+
+    def get(self, key):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    height, data = f.read().split(b'\n', 1)
+                entry = (float(height), data)
+            except (OSError, ValueError):
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key, height, data):
+        self._remember(key, (height, data))
+        if not self.directory:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(str(height).encode() + b'\n' + data)
+        os.replace(tmp, path)
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def prune(self, max_bytes):
+        """Delete the least recently written files until the directory fits in `max_bytes`."""
+        if not self.directory:
+            return 0
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+# ---------------------------------------------------------------------------
+# Reports
+
+def collect_section(client, section_class, user_id, start, end, page_size=500):
+    """Stream one section's rows; returns the folded section and its cache key."""
+    section = section_class()
+    digest = hashlib.blake2b(f"{section.name}|{RENDER_VERSION}|{start}".encode(), digest_size=16)
+    for row in stream_rows(client, section.table, user_id, section.time_column, section.columns,
+                           start, end, page_size):
+        digest.update(json.dumps(row, sort_keys=True, default=str).encode())
+        digest.update(b'\n')
+        section.add(row)
+    return section, digest.hexdigest()
+
+
+def header(user_id, start, end):
+    canvas = Canvas(PAGE_WIDTH)
+    canvas.y = MARGIN
+    canvas.text(MARGIN, canvas.y, 'AyurJanani - Weekly health summary', size=16, bold=True)
+    canvas.y += 22
+    last = end - timedelta(days=1)
+    canvas.text(MARGIN, canvas.y, f"Patient: {user_id}", size=10)
+    canvas.text(PAGE_WIDTH - MARGIN - 190, canvas.y,
+                f"Week: {start:%d %b %Y} - {last:%d %b %Y}", size=10)
+    canvas.y += 16
+    canvas.line(MARGIN, canvas.y, PAGE_WIDTH - MARGIN, canvas.y, width=1)
+    canvas.y += 14
+    return canvas
+
+
+def footer(canvas, page, pages):
+    canvas.text(MARGIN, PAGE_HEIGHT - MARGIN + 14, 'Generated from readings recorded in AyurJanani. '
+                'Not a diagnosis; review with your care provider.', size=7, gray=0.5)
+    canvas.text(PAGE_WIDTH - MARGIN - 45, PAGE_HEIGHT - MARGIN + 14, f"Page {page} of {pages}", size=7, gray=0.5)
+
+
+def render_weekly_report(client, user_id, week=None, cache=None, page_size=500):
+    """`(pdf bytes, info)` for a patient's week; info has the ETag and per-section cache use."""
+    start, end = week_bounds(week)
+    writer = PdfWriter()
+    info = {'week': start.isoformat(), 'rendered': [], 'cached': [], 'rows': {}}
+    placed, keys = [], []
+    for section_class in SECTIONS:
+        section, key = collect_section(client, section_class, user_id, start, end, page_size)
+        info['rows'][section.name] = section.count
+        keys.append(key)
+        entry = cache.get(key) if cache is not None else None
+        if entry is None:
+            entry = section.render()
+            if cache is not None:
+                cache.put(key, *entry)
+            info['rendered'].append(section.name)
+        else:
+            info['cached'].append(section.name)
+        placed.append((writer.xobject(*entry), entry[0]))
+
+    # Lay the sections out top to bottom, starting a page when one doesn't fit
+    pages = [[]]
+    y = header(user_id, start, end).y
+    for ref, height in placed:
+        if y + height > PAGE_HEIGHT - MARGIN - 20 and pages[-1]:
+            pages.append([])
+            y = MARGIN
+        pages[-1].append((ref, MARGIN, y))
+        y += height + SECTION_GAP
+    for number, placements in enumerate(pages, 1):
+        overlay = header(user_id, start, end) if number == 1 else Canvas(PAGE_WIDTH)
+        footer(overlay, number, len(pages))
+        writer.page(placements, overlay)
+
+    identity = f"{user_id}|{RENDER_VERSION}|{'|'.join(keys)}".encode()
+    info['etag'] = hashlib.blake2b(identity, digest_size=16).hexdigest()
+    info['pages'] = len(pages)
+    pdf = writer.tobytes(f"Weekly health summary {start.isoformat()}")
+    return pdf, info
+
+
+# ---------------------------------------------------------------------------
+# Bulk rendering
+
+def patients_with_data(client, week=None, page_size=1000):
+    """Distinct UIDs with a vitals or CTG reading in the week, yielded as they are found."""
+    start, end = week_bounds(week)
+    seen = set()
+    for table in ('vitals', 'ctg'):
+        offset = 0
+        while True:
+            page = client.table(table).select('UID').gte('created_at', start.isoformat())\
+                .lt('created_at', end.isoformat()).order('created_at')\
+                .range(offset, offset + page_size - 1).execute().data or []
+            for row in page:
+                uid = row.get('UID')
+                if uid and uid not in seen:
+                    seen.add(uid)
+                    yield uid
+            if len(page) < page_size:
+                break
+            offset += page_size
+
+
+def supabase_from_env():
+    from dotenv import load_dotenv
+    from supabase import create_client
+    load_dotenv()
+    return create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+
+
+_worker = {}
+
+
+def _init_worker(client_factory, cache_dir, out_dir, page_size):
+    _worker.update(client=client_factory(), cache=SectionCache(cache_dir), out_dir=out_dir, page_size=page_size)
+
+
+def _render_batch(user_ids, week):
+    results = []
+    for user_id in user_ids:
+        t0 = time.perf_counter()
+        try:
+            pdf, info = render_weekly_report(_worker['client'], user_id, week, _worker['cache'],
+                                             _worker['page_size'])
+            path = os.path.join(_worker['out_dir'], f"{user_id}.pdf")
+            fd, tmp = tempfile.mkstemp(dir=_worker['out_dir'], suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf)
+            os.replace(tmp, path)
+            results.append({'user_id': user_id, 'bytes': len(pdf), 'rendered': len(info['rendered']),
+                            'cached': len(info['cached']), 'seconds': time.perf_counter() - t0})
+        except Exception as e:
+            results.append({'user_id': user_id, 'error': str(e), 'seconds': time.perf_counter() - t0})
+    return results
+
+
+def bulk_render(user_ids, week, out_dir, client_factory=supabase_from_env, cache_dir=CACHE_DIR, workers=None,
+                page_size=500, batch_size=8, on_result=None):
+    """Render every patient in `user_ids` (any iterable) into `out_dir/<monday>/<uid>.pdf`.
+
+    Patients go to the pool in batches with a bounded number in flight, so a
+    long id stream is consumed as workers free up. Returns totals.
+    """
+    start, _ = week_bounds(week)
+    out_dir = os.path.join(out_dir, start.isoformat())
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    totals = {'week': start.isoformat(), 'out_dir': out_dir, 'reports': 0, 'errors': 0, 'bytes': 0,
+              'sections_rendered': 0, 'sections_cached': 0}
+    t0 = time.perf_counter()
+
+    def collect(done):
+        for future in done:
+            for result in future.result():
+                if 'error' in result:
+                    totals['errors'] += 1
+                else:
+                    totals['reports'] += 1
+                    totals['bytes'] += result['bytes']
+                    totals['sections_rendered'] += result['rendered']
+                    totals['sections_cached'] += result['cached']
+                if on_result:
+                    on_result(result)
+
+    ids = iter(user_ids)
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(client_factory, cache_dir, out_dir, page_size)) as pool:
+        pending = set()
+        while True:
+            while len(pending) < workers * 2:
+                batch = [uid for _, uid in zip(range(batch_size), ids)]
+                if not batch:
+                    break
+                pending.add(pool.submit(_render_batch, batch, start))
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    totals['seconds'] = round(time.perf_counter() - t0, 3)
+    totals['reports_per_second'] = round(totals['reports'] / totals['seconds'], 2) if totals['seconds'] else None
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Weekly patient reports')
+    sub = parser.add_subparsers(dest='command', required=True)
+    bulk = sub.add_parser('bulk', help='Render every patient with readings in the week')
+    bulk.add_argument('--week', help='Any day of the week (YYYY-MM-DD) or YYYY-Www; default last week')
+    bulk.add_argument('--out-dir', default=os.path.join(HERE, '..', 'models', 'reports'))
+    bulk.add_argument('--users', help='File with one user id per line instead of scanning the week')
+    bulk.add_argument('--workers', type=int)
+    bulk.add_argument('--page-size', type=int, default=500)
+    bulk.add_argument('--cache-dir', default=os.environ.get("REPORTS_CACHE_DIR") or CACHE_DIR)
+    bulk.add_argument('--cache-max-mb', type=float, default=float(os.environ.get("REPORTS_CACHE_MAX_MB", 512)))
+    one = sub.add_parser('render', help='Render one patient')
+    one.add_argument('user_id')
+    one.add_argument('--week')
+    one.add_argument('--out', required=True)
+    one.add_argument('--cache-dir', default=os.environ.get("REPORTS_CACHE_DIR") or CACHE_DIR)
+    prune = sub.add_parser('prune', help='Shrink the section cache')
+    prune.add_argument('--cache-dir', default=os.environ.get("REPORTS_CACHE_DIR") or CACHE_DIR)
+    prune.add_argument('--max-mb', type=float, default=float(os.environ.get("REPORTS_CACHE_MAX_MB", 512)))
+    args = parser.parse_args(argv)
+
+    if args.command == 'prune':
+        removed = SectionCache(args.cache_dir).prune(int(args.max_mb * 2 ** 20))
+        print(f"Removed {removed} cached sections")
+        return 0
+    if args.command == 'render':
+        pdf, info = render_weekly_report(supabase_from_env(), args.user_id, args.week, SectionCache(args.cache_dir))
+        with open(args.out, 'wb') as f:
+            f.write(pdf)
+        print(json.dumps(info, indent=2))
+        return 0
+
+    if args.users:
+        with open(args.users) as f:
+            user_ids = (line.strip() for line in f if line.strip())
+            totals = bulk_render(user_ids, args.week, args.out_dir, cache_dir=args.cache_dir,
+                                 workers=args.workers, page_size=args.page_size)
+    else:
+        user_ids = patients_with_data(supabase_from_env(), args.week)
+        totals = bulk_render(user_ids, args.week, args.out_dir, cache_dir=args.cache_dir,
+                             workers=args.workers, page_size=args.page_size)
+    SectionCache(args.cache_dir).prune(int(args.cache_max_mb * 2 ** 20))
+    print(json.dumps(totals, indent=2))
+    return 1 if totals['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
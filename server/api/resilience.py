@@ -0,0 +1,222 @@
+"""Circuit breakers and last-known-good fallbacks for external dependencies.
+
+Each dependency (Supabase, the Node reports service, every LLM backend)
+gets a `CircuitBreaker`. After `failure_threshold` consecutive failures
+the breaker opens and calls fail immediately with `CircuitOpenError`
+instead of tying up a worker until a timeout. After `recovery_timeout`
+seconds it lets a limited number of trial calls through (half-open); a
+success closes it again, a failure re-opens it.
+
+`LastKnownGood` keeps the most recent successful result per key (e.g. a
+user's latest vitals row) so read paths can degrade to slightly stale data
+rather than failing. Only dependency failures (transport errors, an open
+circuit) fall back; a bug or a rejected query still raises.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} circuit is open; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# OSError covers ConnectionError, TimeoutError and requests' RequestException
+TRANSIENT_ERRORS = (CircuitOpenError, OSError)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0, half_open_max_calls=1,
+                 ignore=()):
+        """Exceptions listed in `ignore` (e.g. a 4xx from the server) don't count as failures."""
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.ignore = tuple(ignore)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_calls = 0
+        self.counts = {'calls': 0, 'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+        self._lock = threading.Lock()
+
+    def _transition(self, state):
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.counts['opened'] += 1
+        self.trial_calls = 0
+        if state == CLOSED:
+            self.consecutive_failures = 0
+
+    def is_open(self):
+        """True while calls would be rejected without trying."""
+        with self._lock:
+            return (self.state == OPEN and
+                    time.monotonic() - self.opened_at < self.recovery_timeout)
+
+    def allow(self):
+        """Reserve a call; raises CircuitOpenError when the call should fail fast."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.recovery_timeout - (time.monotonic() - self.opened_at)
+                if remaining > 0:
+                    self.counts['rejected'] += 1
+                    raise CircuitOpenError(self.name, remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self.trial_calls >= self.half_open_max_calls:
+                    self.counts['rejected'] += 1
+                    raise CircuitOpenError(self.name, self.recovery_timeout)
+                self.trial_calls += 1
+            self.counts['calls'] += 1
+
+    def record_success(self):
+        with self._lock:
+            self.counts['successes'] += 1
+            if self.state != CLOSED:
+                self._transition(CLOSED)
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.counts['failures'] += 1
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    def release(self):
+        """Give back a half-open trial slot for a call that ended with an ignored exception."""
+        with self._lock:
+            if self.state == HALF_OPEN and self.trial_calls:
+                self.trial_calls -= 1
+
+    def call(self, fn, *args, **kwargs):
+        self.allow()
+        try:
+            result = fn(*args, **kwargs)
+        except self.ignore:
+            self.release()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._transition(CLOSED)
+
+    def snapshot(self):
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.recovery_timeout - (time.monotonic() - self.opened_at))
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_in_s': retry_in,
+                **self.counts,
+            }
+
+
+class BreakerRegistry:
+    def __init__(self):
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, name, **kwargs):
+        """Return the breaker for `name`, creating it with `kwargs` on first use."""
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, **kwargs)
+            return self._breakers[name]
+
+    def reset(self):
+        for breaker in list(self._breakers.values()):
+            breaker.reset()
+
+    def snapshot(self):
+        return {name: breaker.snapshot() for name, breaker in sorted(self._breakers.items())}
+
+
+breakers = BreakerRegistry()
+
+
+class LastKnownGood:
+    """Bounded LRU of the last successful result per key, with a maximum age."""
+
+    def __init__(self, max_entries=10000, max_age=24 * 3600, errors=TRANSIENT_ERRORS):
+        """`errors` are the exceptions that fall back to the last good value."""
+        self.max_entries = max_entries
+        self.errors = tuple(errors)
+        self.max_age = max_age
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self.served = 0
+
+    def put(self, key, value):
+        with self._lock:
+            self._values[key] = (value, time.time())
+            self._values.move_to_end(key)
+            while len(self._values) > self.max_entries:
+                self._values.popitem(last=False)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or time.time() - entry[1] > self.max_age:
+                return default
+            self.served += 1
+            return entry[0]
+
+    def fetch(self, key, fn, default=None):
+        """Call `fn()`, remembering its result; returns `(value, stale)`.
+
+        If `fn()` raises one of `errors`, returns the last good value (or `default`).
+        """
+        try:
+            value = fn()
+        except self.errors:
+            return self.get(key, default), True
+        self.put(key, value)
+        return value, False
+
+    def snapshot(self):
+        with self._lock:
+            return {'entries': len(self._values), 'served_stale': self.served}
+
+
+class GuardedClient:
+    """Proxy a query-builder client (Supabase) so every `.execute()` goes through a breaker.
+
+    Builders returned from `.table()`, `.select()`, `.eq()` etc. are wrapped
+    too, so call sites keep the normal chained syntax.
+    """
+
+    def __init__(self, client, breaker):
+        self.client = client
+        self.breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if name == 'execute':
+            return lambda *args, **kwargs: self.breaker.call(attr, *args, **kwargs)
+        if not callable(attr):
+            return attr
+
+        def wrapped(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute') or hasattr(result, 'table'):
+                return GuardedClient(result, self.breaker)
+            return result
+        return wrapped
@@ -0,0 +1,202 @@
+"""BM25 retrieval over the Ayurvedic remedy corpus and curated knowledge.
+
+The index is built from `remedy_model` (`features`/`remedies`) plus the
+curated `models/ayurvedic/knowledge.jsonl`, and only the top-k snippets are
+injected into remedy and diet prompts so the LLM can answer in a short,
+grounded form instead of generating everything from scratch.
+
+Documents can be added, replaced or removed one at a time; postings and
+document frequencies are updated in place, so nothing is rebuilt.
+"""
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it of on or the to with "
+    "this that very mild slight feeling feel some".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    # Corpus terms are underscore-joined (morning_sickness); index the words too.
+    text = text.lower()
+    tokens = [t for t in _TOKEN.findall(text.replace('_', ' ')) if t not in STOPWORDS]
+    tokens.extend(w for w in re.findall(r"[a-z0-9]+(?:_[a-z0-9]+)+", text))
+    return tokens
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (~4 characters per token) for prompt accounting."""
+    return max(1, len(text) // 4)
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs: Dict[str, dict] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_len: Dict[str, int] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.total_len = 0
+        self._knowledge_mtime = {}
+        self._knowledge_ids = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, doc_id: str, text: str, **meta):
+        """Add or replace a document."""
+        with self._lock:
+            if doc_id in self.docs:
+                self.remove(doc_id)
+            terms = Counter(tokenize(text + ' ' + ' '.join(meta.get('tags', []))))
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[doc_id] = tf
+            length = sum(terms.values())
+            self.doc_terms[doc_id] = list(terms)
+            self.doc_len[doc_id] = length
+            self.total_len += length
+            self.docs[doc_id] = {'id': doc_id, 'text': text, **meta}
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            if doc_id not in self.docs:
+                return
+            for term in self.doc_terms.pop(doc_id):
+                postings = self.postings[term]
+                del postings[doc_id]
+                if not postings:
+                    del self.postings[term]
+            self.total_len -= self.doc_len.pop(doc_id)
+            del self.docs[doc_id]
+
+    def search(self, query: str, k=4, kind: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            n = len(self.docs)
+            if not n:
+                return []
+            avgdl = self.total_len / n
+            scores = Counter()
+            for term in set(tokenize(query)):
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avgdl)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            results = []
+            for doc_id, score in scores.most_common():
+                doc = self.docs[doc_id]
+                if kind and doc.get('kind') != kind:
+                    continue
+                results.append({**doc, 'score': round(score, 4)})
+                if len(results) >= k:
+                    break
+            return results
+
+    def add_remedy_model(self, remedy_model):
+        """Index each `features[i]` / `remedies[i]` pair of a RemedyRecommendationModel."""
+        for i, (feature, remedies) in enumerate(zip(remedy_model.features, remedy_model.remedies)):
+            self.add(f"model-{i}", '; '.join(remedies), kind='remedy',
+                     title=feature.replace('_', ' '), tags=feature.split())
+
+    def load_knowledge(self, path: str) -> int:
+        """Sync entries from a JSON-lines knowledge file; returns the count read.
+
+        New or edited entries are (re)indexed, entries deleted from the file
+        are removed, and unchanged ones are left alone.
+        """
+        if not os.path.exists(path):
+            return 0
+        with self._lock:
+            self._knowledge_mtime[path] = os.path.getmtime(path)
+            seen = set()
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    doc_id = entry.pop('id')
+                    text = entry.pop('text')
+                    seen.add(doc_id)
+                    current = self.docs.get(doc_id)
+                    if current is None or current['text'] != text or current.get('tags') != entry.get('tags'):
+                        self.add(doc_id, text, **entry)
+            for doc_id in self._knowledge_ids.get(path, set()) - seen:
+                self.remove(doc_id)
+            self._knowledge_ids[path] = seen
+            return len(seen)
+
+    def refresh_knowledge(self, path: str) -> bool:
+        """Re-sync a knowledge file if it changed on disk since the last load."""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return False
+        if mtime == self._knowledge_mtime.get(path):
+            return False
+        self.load_knowledge(path)
+        return True
+
+
+def _clip(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind('. ', 0, max_chars)
+    return text[:cut + 1] if cut > 0 else text[:max_chars].rsplit(' ', 1)[0] + '...'
+
+
+def format_snippets(snippets: List[dict], max_chars=200) -> str:
+    """One bullet per snippet, clipped at a sentence boundary to bound prompt size."""
+    return '\n'.join(f"- {s.get('title', s['id'])}: {_clip(s['text'], max_chars)}" for s in snippets)
+
+
+class TokenLedger:
+    """Per-endpoint token averages for each prompt mode (legacy or retrieval-grounded)."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, mode, report):
+        with self._lock:
+            totals = self._totals.setdefault((endpoint, mode), Counter())
+            totals['requests'] += 1
+            totals.update({k: v for k, v in report.items() if isinstance(v, (int, float))})
+
+    def snapshot(self):
+        with self._lock:
+            items = {key: dict(counter) for key, counter in self._totals.items()}
+        report = {}
+        for (endpoint, mode), totals in items.items():
+            n = totals.pop('requests')
+            entry = {'requests': n}
+            entry.update({f"avg_{k}": v / n for k, v in totals.items()})
+            report.setdefault(endpoint, {})[mode] = entry
+        # A deployment runs one mode, so only prompt savings (estimated per call
+        # against the unsent legacy prompt) are reported, not completion savings.
+        return report
+
+
+def usage_report(response, prompt, baseline_prompt=None):
+    """Token usage for one LLM call, preferring the backend's own counts."""
+    usage = getattr(response, 'usage', None) or {}
+    report = {
+        'prompt_tokens': usage.get('prompt_tokens') or estimate_tokens(prompt),
+        'completion_tokens': usage.get('completion_tokens') or estimate_tokens(response.message.content),
+    }
+    if baseline_prompt is not None:
+        # The legacy prompt was never sent, so both sides use the same estimate.
+        report['baseline_prompt_tokens'] = estimate_tokens(baseline_prompt)
+        report['prompt_tokens_saved'] = report['baseline_prompt_tokens'] - estimate_tokens(prompt)
+    return report
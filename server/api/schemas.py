@@ -0,0 +1,253 @@
+"""Compiled request validation and fast JSON for the API.
+
+The flask-restx models document `required`, `min`/`max`, `enum`, string
+lengths and list sizes, but restx never enforces them. `compile_model`
+turns a model into a `Validator` once at import: one checker closure per
+field, with the constraints bound in, so a request is validated with a
+handful of function calls and no per-request schema walking.
+
+Validation is lenient where clients have always been accepted: numeric
+strings are coerced ("120" -> 120), enums match case-insensitively and
+return the declared spelling, and fields the model doesn't declare pass
+through untouched (handlers read extras such as `node_token`).
+
+Bodies are decoded straight from the request bytes with orjson when it is
+installed (stdlib `json` otherwise), and `output_json` is registered as the
+API's JSON representation so responses, including NumPy scalars and
+arrays, are serialized by the same fast encoder.
+"""
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from flask_restx import fields
+
+
+class ValidationError(ValueError):
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('; '.join(errors))
+
+
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _default(obj):
+    """NumPy and other non-JSON types for the stdlib fallback (orjson handles NumPy itself)."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj):
+    """Serialize to bytes."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS,
+                                default=_default)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; the stdlib encoder copes
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+
+def output_json(data, code, headers=None):
+    """flask-restx representation for application/json."""
+    from flask import make_response
+    response = make_response(dumps(data), code)
+    response.headers.extend(headers or {})
+    response.mimetype = 'application/json'
+    return response
+
+
+def _number(field, integer):
+    minimum, maximum = field.minimum, field.maximum
+    exclusive_min, exclusive_max = field.exclusiveMinimum, field.exclusiveMaximum
+    kind = 'an integer' if integer else 'a number'
+
+    def check(value, path, errors):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            errors.append(f"{path}: must be {kind}")
+            return None
+        if isinstance(value, str):
+            try:
+                value = float(value.strip())
+            except ValueError:
+                errors.append(f"{path}: must be {kind}")
+                return None
+        if not math.isfinite(value):
+            errors.append(f"{path}: must be finite")
+            return None
+        if integer:
+            if value != int(value):
+                errors.append(f"{path}: must be {kind}")
+                return None
+            value = int(value)
+        else:
+            value = float(value)
+        if minimum is not None and (value <= minimum if exclusive_min else value < minimum):
+            errors.append(f"{path}: must be {'>' if exclusive_min else '>='} {minimum}")
+        elif maximum is not None and (value >= maximum if exclusive_max else value > maximum):
+            errors.append(f"{path}: must be {'<' if exclusive_max else '<='} {maximum}")
+        return value
+    return check
+
+
+def _string(field):
+    enum = {str(option).lower(): option for option in field.enum or ()}
+    min_length, max_length = field.min_length, field.max_length
+    pattern = None
+    if field.pattern:
+        import re
+        pattern = re.compile(field.pattern)
+
+    def check(value, path, errors):
+        if not isinstance(value, str):
+            errors.append(f"{path}: must be a string")
+            return None
+        if enum:
+            canonical = enum.get(value.strip().lower())
+            if canonical is None:
+                errors.append(f"{path}: must be one of {', '.join(map(str, field.enum))}")
+                return None
+            return canonical
+        if min_length is not None and len(value) < min_length:
+            errors.append(f"{path}: must be at least {min_length} characters")
+        elif max_length is not None and len(value) > max_length:
+            errors.append(f"{path}: must be at most {max_length} characters")
+        elif pattern is not None and not pattern.search(value):
+            errors.append(f"{path}: does not match {field.pattern}")
+        return value
+    return check
+
+
+def _boolean(field):
+    def check(value, path, errors):
+        if not isinstance(value, bool):
+            errors.append(f"{path}: must be true or false")
+            return None
+        return value
+    return check
+
+
+def _list(field):
+    container = field.container() if isinstance(field.container, type) else field.container
+    item = compile_field(container)
+    min_items, max_items = field.min_items, field.max_items
+    # Unbounded float lists (CTG features) that are already plain numbers skip the per-item checks.
+    plain_floats = (isinstance(container, fields.Float)
+                    and container.minimum is None and container.maximum is None)
+
+    def check(value, path, errors):
+        if not isinstance(value, list):
+            errors.append(f"{path}: must be a list")
+            return None
+        if min_items is not None and len(value) < min_items:
+            errors.append(f"{path}: must have at least {min_items} items")
+            return None
+        if max_items is not None and len(value) > max_items:
+            errors.append(f"{path}: must have at most {max_items} items")
+            return None
+        if plain_floats:
+            try:
+                if all(map(math.isfinite, value)) and not any(v is True or v is False for v in value):
+                    return [float(v) for v in value]
+            except TypeError:
+                pass  # strings or nulls; report them item by item
+        return [item(v, f"{path}[{i}]", errors) for i, v in enumerate(value)]
+    return check
+
+
+def _raw(field):
+    return lambda value, path, errors: value
+
+
+def compile_field(field):
+    if isinstance(field, type):
+        field = field()
+    if isinstance(field, fields.Nested):
+        return Validator(field.model).check
+    if isinstance(field, fields.List):
+        return _list(field)
+    if isinstance(field, fields.Integer):
+        return _number(field, integer=True)
+    if isinstance(field, (fields.Float, fields.Arbitrary, fields.Fixed)):
+        return _number(field, integer=False)
+    if isinstance(field, fields.Boolean):
+        return _boolean(field)
+    if isinstance(field, fields.String):
+        return _string(field)
+    return _raw(field)
+
+
+class Validator:
+    """Validator for one flask-restx model, compiled once."""
+
+    def __init__(self, model):
+        self.name = getattr(model, 'name', 'payload')
+        self.fields = [(name, bool(field.required), compile_field(field)) for name, field in model.items()]
+
+    def check(self, data, path, errors):
+        if not isinstance(data, dict):
+            errors.append(f"{path}: must be an object")
+            return None
+        clean = dict(data)
+        for name, required, checker in self.fields:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    errors.append(f"{path}.{name}: is required" if path else f"{name}: is required")
+                continue
+            clean[name] = checker(value, f"{path}.{name}" if path else name, errors)
+        return clean
+
+    def validate(self, data):
+        """The cleaned payload (coerced values, extras kept); raises ValidationError."""
+        errors = []
+        clean = self.check(data, '', errors)
+        if errors:
+            raise ValidationError(errors)
+        return clean
+
+    def validate_batch(self, items):
+        """Validate a list of payloads: `(valid, errors)`, errors keyed by index."""
+        if not isinstance(items, list):
+            raise ValidationError(['payload: must be a list'])
+        valid, failed = [], {}
+        for i, item in enumerate(items):
+            errors = []
+            clean = self.check(item, f"[{i}]", errors)
+            if errors:
+                failed[i] = errors
+            else:
+                valid.append(clean)
+        return valid, failed
+
+
+def compile_model(model):
+    return Validator(model)
+
+
+def validate_request(request, validator):
+    """Decode and validate the JSON body: `(data, None)` or `(None, (error body, status))`."""
+    body = request.get_data(cache=True)
+    if not body:
+        return None, ({'error': 'Missing input data'}, 400)
+    try:
+        data = loads(body)
+    except ValueError as e:
+        return None, ({'error': f'Malformed JSON: {e}'}, 400)
+    try:
+        return validator.validate(data), None
+    except ValidationError as e:
+        return None, ({'error': f'Invalid input data: {e}', 'details': e.errors}, 400)
@@ -0,0 +1,275 @@
+"""Semantic answer cache for first-turn / context-free chat questions.
+
+Questions are embedded with a TF-IDF vectorizer configured like the one in
+`SymptomClassifier` (word 1-2 grams, English stop words). At cold start it
+is fitted on the Ayurvedic knowledge corpus; an offline rebuild refits it
+on the real question log. Vectors are indexed with random-hyperplane LSH
+for approximate nearest-neighbour lookup, and a cached answer is returned
+when the cosine similarity to a stored question clears the threshold.
+
+Only vetted answers are served. First-turn questions often carry personal
+or medical details, so a live LLM answer is never indexed: with admission
+on, it is appended to a `ReviewQueue` file, and reviewers copy the pairs
+worth keeping (rewritten without personal details) into the vetted file
+for the next rebuild. Loading an artifact skips any unvetted entry.
+
+Offline rebuild (from server/api):
+    python semantic_cache.py rebuild --vetted faq.jsonl --out ../models/chat_cache/semantic_cache.pkl
+where each line of faq.jsonl is {"question": ..., "answer": ...}.
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_WORD = re.compile(r"\b\w\w+\b")
+
+# Follow-ups that only make sense with the previous turns ("what about...", "is it safe")
+_FOLLOW_UP = re.compile(
+    r"^\s*(and|also|but|so|then|what about|how about|why|ok|okay)\b|\b(it|that|this|those|these|them|above)\b",
+    re.IGNORECASE,
+)
+
+
+def is_context_free(message, history):
+    """True for the first user turn, or a later question that doesn't lean on earlier ones."""
+    if not any(m.get('role') == 'user' for m in history):
+        return True
+    return not _FOLLOW_UP.search(message)
+
+
+class _Entry:
+    __slots__ = ('id', 'question', 'answer', 'vector', 'keys', 'vetted', 'hits', 'created_at')
+
+    def __init__(self, entry_id, question, answer, vector, keys, vetted):
+        self.id = entry_id
+        self.question = question
+        self.answer = answer
+        self.vector = vector
+        self.keys = keys
+        self.vetted = vetted
+        self.hits = 0
+        self.created_at = time.time()
+
+
+class SemanticCache:
+    def __init__(self, vectorizer, threshold=0.85, max_entries=2000, n_tables=12, n_bits=8,
+                 brute_force_below=512, min_coverage=0.8, seed=42):
+        self.vectorizer = vectorizer
+        self.threshold = threshold
+        self.min_coverage = min_coverage
+        self.max_entries = max_entries
+        self.n_tables = n_tables
+        self.n_bits = n_bits
+        self.brute_force_below = brute_force_below
+        n_features = len(vectorizer.get_feature_names_out())
+        rng = np.random.default_rng(seed)
+        self._planes = rng.standard_normal((n_features, n_tables * n_bits)).astype(np.float32)
+        self._bit_weights = (1 << np.arange(n_bits)).astype(np.int64)
+        self._tables = [{} for _ in range(n_tables)]
+        self._entries = OrderedDict()  # id -> _Entry, least recently used first
+        self._matrix = None  # stacked entry vectors, rebuilt lazily after writes
+        self._matrix_ids = []
+        self._vocabulary = vectorizer.vocabulary_
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _embed(self, text):
+        # Questions mostly outside the vocabulary would match on a few shared
+        # words ("is morning sickness dangerous" vs "... remedies"), so skip them.
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+        words = [w for w in _WORD.findall(text.lower()) if w not in ENGLISH_STOP_WORDS]
+        if not words or sum(w in self._vocabulary for w in words) / len(words) < self.min_coverage:
+            return None
+        vector = self.vectorizer.transform([text])
+        norm = np.sqrt(vector.multiply(vector).sum())
+        return vector / norm if norm else None
+
+    def _keys(self, vector):
+        bits = np.asarray(vector @ self._planes).ravel() > 0
+        return (bits.reshape(self.n_tables, self.n_bits) @ self._bit_weights).tolist()
+
+    def _stacked(self):
+        if self._matrix is None:
+            from scipy.sparse import vstack
+            self._matrix_ids = list(self._entries)
+            self._matrix = vstack([self._entries[i].vector for i in self._matrix_ids]).tocsr()
+        return self._matrix, self._matrix_ids
+
+    def _candidates(self, keys):
+        matrix, ids = self._stacked()
+        if len(ids) < self.brute_force_below:
+            return matrix, ids
+        wanted = set()
+        for table, key in zip(self._tables, keys):
+            wanted.update(table.get(key, ()))
+        rows = [row for row, entry_id in enumerate(ids) if entry_id in wanted]
+        return matrix[rows], [ids[row] for row in rows]
+
+    def lookup(self, question):
+        """Return `(answer, similarity)` for the nearest cached question, or None."""
+        vector = self._embed(question)
+        with self._lock:
+            self.lookups += 1
+            if vector is None or not self._entries:
+                return None
+            matrix, ids = self._candidates(self._keys(vector))
+            if not ids:
+                return None
+            sims = np.asarray((matrix @ vector.T).todense()).ravel()
+            best_row = int(sims.argmax())
+            if sims[best_row] < self.threshold:
+                return None
+            best = self._entries[ids[best_row]]
+            best.hits += 1
+            self.hits += 1
+            self._entries.move_to_end(best.id)
+            return best.answer, float(sims[best_row])
+
+    def add(self, question, answer, vetted=False):
+        vector = self._embed(question)
+        if vector is None:
+            return False
+        keys = self._keys(vector)
+        with self._lock:
+            entry = _Entry(self._next_id, question, answer, vector, keys, vetted)
+            self._next_id += 1
+            self._entries[entry.id] = entry
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, set()).add(entry.id)
+            self._matrix = None
+            self._evict()
+        return True
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            victim = next((e for e in self._entries.values() if not e.vetted), None)
+            if victim is None:
+                return
+            self._remove(victim)
+            self.evictions += 1
+
+    def _remove(self, entry):
+        del self._entries[entry.id]
+        self._matrix = None
+        for table, key in zip(self._tables, entry.keys):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(entry.id)
+                if not bucket:
+                    del table[key]
+
+    def items(self):
+        with self._lock:
+            return [{'question': e.question, 'answer': e.answer, 'vetted': e.vetted, 'hits': e.hits}
+                    for e in self._entries.values()]
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'vetted': sum(1 for e in self._entries.values() if e.vetted),
+            'lookups': self.lookups,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.lookups if self.lookups else 0.0,
+            'evictions': self.evictions,
+            'threshold': self.threshold,
+        }
+
+    def save(self, path):
+        import joblib
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.tmp"
+        joblib.dump({'vectorizer': self.vectorizer, 'items': self.items()}, tmp)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        import joblib
+        state = joblib.load(path)
+        cache = cls(state['vectorizer'], **kwargs)
+        # Artifacts from older rebuilds may hold answers admitted online; never serve those
+        for item in state['items']:
+            if item.get('vetted'):
+                cache.add(item['question'], item['answer'], vetted=True)
+        return cache
+
+
+class ReviewQueue:
+    """Append-only JSON-lines file of live answers waiting for review.
+
+    Each line is written with one `O_APPEND` write, so several workers can
+    share the file. Nothing in it is served until it is vetted and rebuilt.
+    """
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.submitted = 0
+        self.dropped = 0
+
+    def submit(self, question, answer):
+        line = json.dumps({'question': question, 'answer': answer, 'submitted_at': time.time()}) + '\n'
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self.dropped += 1
+                return False
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            try:
+                os.write(fd, line.encode())
+            finally:
+                os.close(fd)
+        except OSError:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def stats(self):
+        return {'submitted': self.submitted, 'dropped': self.dropped}
+
+
+def fit_vectorizer(texts):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), stop_words='english', sublinear_tf=True)
+    return vectorizer.fit(list(texts))
+
+
+def rebuild(vetted_items, **kwargs):
+    """Fit a fresh vectorizer over the vetted questions and index them."""
+    vetted_items = list(vetted_items)
+    cache = SemanticCache(fit_vectorizer(i['question'] for i in vetted_items), **kwargs)
+    for item in vetted_items:
+        cache.add(item['question'], item['answer'], vetted=True)
+    return cache
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Semantic chat cache tools')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('rebuild', help='Rebuild the cache artifact offline')
+    build.add_argument('--vetted', required=True, help='JSON-lines file of vetted question/answer pairs')
+    build.add_argument('--out', required=True)
+    build.add_argument('--max-entries', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    with open(args.vetted) as f:
+        vetted = [json.loads(line) for line in f if line.strip()]
+    cache = rebuild(vetted, max_entries=args.max_entries)
+    cache.save(args.out)
+    print(f"Wrote {len(cache)} entries ({len(vetted)} vetted) to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
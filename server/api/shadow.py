@@ -0,0 +1,283 @@
+"""Shadow evaluation of candidate models on live traffic.
+
+A candidate (for example a retrained `fetal_health_model.sav`) is scored on
+a sample of the inputs the live model sees, off the request path: the
+handler calls `ShadowEvaluator.submit` after its own prediction, which
+samples, then puts the inputs and the live output on a bounded queue
+without blocking. A single background thread loads the candidates on
+first use, scores queued items in small batches and writes one row per
+item to a local SQLite store. Before each batch the thread waits for
+`busy()` to turn false (no request in flight), but for at most
+`max_defer` seconds: under sustained load it still scores up to
+`batch_size` items per `max_defer` instead of starving. When the queue is
+full new items are dropped and counted, so shadow load can't hold up a
+response.
+
+Each row records whether the candidate agreed with the live model and
+both latencies; inputs are only kept for disagreements. The store is
+shared by every worker process on the host (WAL mode), so stats and
+disagreements cover all of them.
+"""
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model TEXT NOT NULL,
+    candidate TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    agree INTEGER,
+    primary_ms REAL,
+    shadow_ms REAL,
+    primary_output TEXT,
+    shadow_output TEXT,
+    inputs TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS shadow_results_model ON shadow_results (model, candidate, id);
+"""
+
+
+class Candidate:
+    """A candidate model for `name`: `load()` builds it, `score(model, inputs)` predicts.
+
+    Outputs must be JSON-serializable and comparable with the live output
+    (`compare`, equality by default).
+    """
+
+    def __init__(self, name, path, load, score, compare=None):
+        self.name = name
+        self.path = path
+        self.load = load
+        self.score = score
+        self.compare = compare or (lambda primary, shadow: primary == shadow)
+        self.model = None
+        self.version = None
+        self.error = None
+
+    def ensure_loaded(self):
+        if self.model is None and self.error is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    digest = hashlib.sha256(f.read()).hexdigest()[:12]
+                self.model = self.load()
+                self.version = f"{os.path.basename(self.path)}@{digest}"
+                logger.info(f"[Shadow] Loaded {self.name} candidate {self.version}")
+            except Exception as e:
+                self.error = str(e)
+                logger.warning(f"[Shadow] Could not load {self.name} candidate {self.path}: {e}")
+        return self.model is not None
+
+
+class ShadowStore:
+    def __init__(self, path, max_rows=100000):
+        self.path = path
+        self.max_rows = max_rows
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def record(self, rows, conn=None):
+        """Insert `(model, candidate, created_at, agree, primary_ms, shadow_ms, primary, shadow, inputs, error)`."""
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT INTO shadow_results (model, candidate, created_at, agree, primary_ms, shadow_ms,'
+                    ' primary_output, shadow_output, inputs, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+                if self.max_rows:
+                    conn.execute('DELETE FROM shadow_results WHERE id <= '
+                                 '(SELECT MAX(id) FROM shadow_results) - ?', (self.max_rows,))
+        finally:
+            if own:
+                conn.close()
+
+    def summary(self, since=None):
+        query = ('SELECT model, candidate, COUNT(*), SUM(agree), SUM(error IS NOT NULL), AVG(primary_ms),'
+                 ' AVG(shadow_ms), MIN(created_at), MAX(created_at) FROM shadow_results')
+        params = ()
+        if since:
+            query += ' WHERE created_at >= ?'
+            params = (since,)
+        query += ' GROUP BY model, candidate ORDER BY model, MAX(id) DESC'
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        result = {}
+        for model, candidate, count, agreed, errors, primary_ms, shadow_ms, first, last in rows:
+            compared = count - errors
+            result.setdefault(model, {})[candidate] = {
+                'rows': count,
+                'errors': errors,
+                'agreement_rate': round(agreed / compared, 4) if compared else None,
+                'mean_primary_ms': round(primary_ms, 3) if primary_ms is not None else None,
+                'mean_shadow_ms': round(shadow_ms, 3) if shadow_ms is not None else None,
+                'first_at': first,
+                'last_at': last,
+            }
+        return result
+
+    def disagreements(self, model=None, limit=50):
+        query = ('SELECT id, model, candidate, created_at, primary_output, shadow_output, inputs, error'
+                 ' FROM shadow_results WHERE (agree = 0 OR error IS NOT NULL)')
+        params = []
+        if model:
+            query += ' AND model = ?'
+            params.append(model)
+        query += ' ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{'id': row_id, 'model': name, 'candidate': candidate, 'created_at': created_at,
+                 'primary': json.loads(primary) if primary else None,
+                 'shadow': json.loads(shadow) if shadow else None,
+                 'inputs': json.loads(inputs) if inputs else None, 'error': error}
+                for row_id, name, candidate, created_at, primary, shadow, inputs, error in rows]
+
+
+def _percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+    return {'p50': pick(0.5), 'p95': pick(0.95)}
+
+
+class ShadowEvaluator:
+    def __init__(self, candidates, store, sample_rate=0.1, max_queued=256, batch_size=32, latency_window=1000,
+                 busy=None, max_defer=0.05, idle_poll=0.005):
+        self.candidates = {c.name: c for c in candidates}
+        self.store = store
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.busy = busy
+        self.max_defer = max_defer
+        self.idle_poll = idle_poll
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._latency = {name: deque(maxlen=latency_window) for name in self.candidates}
+        self.counts = {name: {'seen': 0, 'sampled': 0, 'dropped': 0, 'scored': 0, 'agreed': 0, 'errors': 0}
+                       for name in self.candidates}
+        self.deferrals = 0  # batches that waited for the worker to go idle
+        self.forced = 0  # ... and were scored anyway after max_defer
+
+    def __contains__(self, name):
+        return name in self.candidates
+
+    def _start(self):
+        # Started on first use so forked server workers each get their own.
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name='shadow-eval', daemon=True)
+                self._thread.start()
+
+    def submit(self, name, inputs, primary, primary_ms):
+        """Queue a sampled live prediction for the `name` candidate; never blocks."""
+        counts = self.counts.get(name)
+        if counts is None:
+            return False
+        counts['seen'] += 1
+        if random.random() >= self.sample_rate:
+            return False
+        counts['sampled'] += 1
+        try:
+            self._queue.put_nowait((name, inputs, primary, primary_ms, time.time()))
+        except queue.Full:
+            counts['dropped'] += 1
+            return False
+        if self._thread is None:
+            self._start()
+        return True
+
+    def _work(self):
+        conn = self.store._connect()
+        while True:
+            batch = [self._queue.get()]
+            self._wait_idle()
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in map(self._evaluate, batch) if row is not None]
+            try:
+                if rows:
+                    self.store.record(rows, conn)
+            except Exception as e:
+                logger.warning(f"[Shadow] Failed to record {len(rows)} results: {e}")
+
+    def _wait_idle(self):
+        """Wait until no request is in flight, at most `max_defer` seconds; False when it gave up."""
+        if self.busy is None or not self.busy():
+            return True
+        self.deferrals += 1
+        deadline = time.monotonic() + self.max_defer
+        while time.monotonic() < deadline:
+            time.sleep(self.idle_poll)
+            if not self.busy():
+                return True
+        self.forced += 1
+        return False
+
+    def _evaluate(self, item):
+        name, inputs, primary, primary_ms, created_at = item
+        candidate, counts = self.candidates[name], self.counts[name]
+        if not candidate.ensure_loaded():
+            counts['errors'] += 1
+            return None
+        t0 = time.perf_counter()
+        try:
+            shadow = candidate.score(candidate.model, inputs)
+        except Exception as e:
+            counts['errors'] += 1
+            return (name, candidate.version, created_at, None, primary_ms, None,
+                    json.dumps(primary, default=str), None, json.dumps(inputs, default=str), str(e))
+        shadow_ms = (time.perf_counter() - t0) * 1000
+        agree = bool(candidate.compare(primary, shadow))
+        counts['scored'] += 1
+        counts['agreed'] += agree
+        self._latency[name].append((primary_ms, shadow_ms))
+        return (name, candidate.version, created_at, int(agree), primary_ms, shadow_ms,
+                json.dumps(primary, default=str), json.dumps(shadow, default=str),
+                None if agree else json.dumps(inputs, default=str), None)
+
+    def stats(self):
+        """This process's counters and recent latencies, plus the store's totals for every worker."""
+        local = {}
+        for name, candidate in self.candidates.items():
+            latency = list(self._latency[name])
+            counts = self.counts[name]
+            local[name] = {
+                **counts,
+                'candidate': candidate.version or candidate.path,
+                'load_error': candidate.error,
+                'agreement_rate': round(counts['agreed'] / counts['scored'], 4) if counts['scored'] else None,
+                'primary_ms': _percentiles([p for p, _ in latency if p is not None]),
+                'shadow_ms': _percentiles([s for _, s in latency]),
+            }
+        return {
+            'sample_rate': self.sample_rate,
+            'queued': self._queue.qsize(),
+            'max_queued': self._queue.maxsize,
+            'deferrals': self.deferrals,
+            'forced': self.forced,
+            'process': local,
+            'store': self.store.summary(),
+        }
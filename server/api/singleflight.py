@@ -0,0 +1,89 @@
+"""Coalesce identical in-flight calls so only one reaches the upstream.
+
+Modelled on Go's `singleflight`: the first caller for a key runs the
+function, concurrent callers with the same key block until it finishes
+and receive the same result or the same exception. Nothing is cached once
+the call completes, so a failure is never served to later requests.
+"""
+import hashlib
+import json
+import re
+import threading
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run `fn()` once per concurrent `key`; returns `(result, shared)`.
+
+        A follower that gives up after `timeout` seconds gets TimeoutError;
+        this only abandons its own wait, the leader's call keeps running for
+        everybody else.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    call.waiters -= 1
+                raise TimeoutError(f"Timed out waiting for in-flight call {key[:12]}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def snapshot(self):
+        return {'leaders': self.leaders, 'shared': self.shared, 'in_flight': self.in_flight()}
+
+
+def normalize_messages(messages):
+    return [
+        {'role': m.get('role'), 'content': _WHITESPACE.sub(' ', str(m.get('content', ''))).strip()}
+        for m in messages
+    ]
+
+
+def request_key(model, messages, **options):
+    """Stable key for a chat request: model + whitespace-normalized messages."""
+    payload = json.dumps([model, normalize_messages(messages), options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -0,0 +1,309 @@
+"""Structured (JSON) output for the LLM generations the API parses.
+
+Lifestyle recommendations and remedy recommendations ask the model for a
+JSON object. The request carries `response_format` (OpenAI-compatible
+backends; Ollama gets the equivalent `format`), and the prompt ends with
+the expected shape, since JSON mode only guarantees *some* JSON.
+
+`OutputSpec.parse` reads an answer in one pass:
+
+1. `loads` and the schema's compiled `Validator` (see schemas.py);
+2. if that fails to decode, one bounded repair: drop `<think>` blocks and
+   code fences, cut to the outermost object, remove trailing commas and
+   close brackets left open by a truncated answer, then decode again;
+3. if there is still no usable object (a backend that ignored JSON mode),
+   a single scan over the lines picks up `Label: value` headings and the
+   bullets under them.
+
+There is no re-generation: a malformed answer costs microseconds, not
+another LLM call. Every parse records its outcome and time; `stats()` has
+the counts, failure rate and parse latency per spec.
+"""
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from flask_restx import Model, fields
+
+from schemas import compile_model, loads
+
+PRAKRITI = ['Vata', 'Pitta', 'Kapha', 'Vata-Pitta', 'Pitta-Kapha', 'Vata-Kapha', 'Tridoshic']
+MAX_REPAIR_CHARS = 16384
+MAX_DEPTH = 32
+
+THINK = re.compile(r'<think>.*?(?:</think>|$)', re.DOTALL | re.IGNORECASE)
+FENCE = re.compile(r'```(?:json)?', re.IGNORECASE)
+TRAILING_COMMA = re.compile(r',\s*([}\]])')
+BULLET = re.compile(r'^\s*(?:[-*•]|\d+[.)])\s*')
+BULLET_START = frozenset('-*•0123456789')
+VALUE_TRIM = ' \t",*[]{}'
+
+
+def json_schema(model):
+    """JSON Schema for a flask-restx model with nested models inlined."""
+    schema = dict(model.__schema__)
+    properties = schema['properties'] = {name: dict(prop) for name, prop in schema['properties'].items()}
+    for name, field in model.items():
+        if isinstance(field, fields.Nested):
+            properties[name] = json_schema(field.model)
+        elif isinstance(field, fields.List) and isinstance(field.container, fields.Nested):
+            properties[name]['items'] = json_schema(field.container.model)
+        properties[name].pop('example', None)
+    schema['additionalProperties'] = False
+    return schema
+
+
+def _close(text):
+    """`text` with the arrays and objects a truncated answer left open closed; None when
+    it stops inside a string (a cut-off value is worse than none) or nests too deep."""
+    stack, in_string, escaped = [], False, False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+            if len(stack) > MAX_DEPTH:
+                return None
+        elif ch in '}]' and stack:
+            stack.pop()
+    if in_string:
+        return None
+    return TRAILING_COMMA.sub(r'\1', text.rstrip().rstrip(',') + ''.join(reversed(stack)))
+
+
+def repair(text):
+    """Bounded attempt at turning a malformed answer into decodable JSON, or None.
+
+    Tries the answer with open brackets closed, then cut back to its last
+    complete member (for a key or value cut off mid-way), and gives up:
+    `{}` when the answer was an object, None when it wasn't JSON at all.
+    """
+    text = FENCE.sub('', THINK.sub('', text[:MAX_REPAIR_CHARS])).strip()
+    start = text.find('{')
+    if start == -1:
+        return None
+    end = text.rfind('}')
+    body = text[start:end + 1] if end > start else text[start:]
+    comma = body.rfind(',')
+    for candidate in (body, body[:comma]) if comma > 0 else (body,):
+        closed = _close(candidate)
+        if closed is None:
+            continue
+        try:
+            return loads(closed)
+        except ValueError:
+            continue
+    # A JSON answer cut off before its first complete member has nothing to read as text either
+    return {} if start == 0 else None
+
+
+class ParseStats:
+    def __init__(self, window=1000):
+        self.outcomes = Counter()
+        self.latency = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def record(self, outcome, seconds):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.latency.append(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            outcomes = dict(self.outcomes)
+            latency = sorted(self.latency)
+        total = sum(outcomes.values())
+        pick = lambda q: round(latency[min(len(latency) - 1, int(q * len(latency)))] * 1e6, 1) if latency else None
+        return {
+            'parsed': total,
+            'outcomes': outcomes,
+            # answers that didn't match the schema as sent, and answers nothing could be read from
+            'nonconforming_rate': round(1 - outcomes.get('json', 0) / total, 4) if total else None,
+            'failure_rate': round(outcomes.get('failed', 0) / total, 4) if total else None,
+            'parse_us': {'p50': pick(0.5), 'p95': pick(0.95), 'max': pick(1.0)},
+        }
+
+
+class OutputSpec:
+    """Schema, prompt instructions and parser for one kind of generation.
+
+    `labels` maps field names to the headings a plain-text answer would use
+    (regex alternatives); bullets outside any heading go to `list_field`.
+    `finish(data)` turns the parsed fields into the endpoint's response shape.
+    """
+
+    def __init__(self, name, model, example, labels, finish, list_field=None):
+        self.name = name
+        self.validator = compile_model(model)
+        self.schema = json_schema(model)
+        self.example = json.dumps(example)
+        self.fields = list(model)
+        self.required = [name for name, field in model.items() if field.required]
+        # The matched label is the last group, its value follows the match
+        self.heading = re.compile(
+            r'[\s#*"]*(?:\d+[.)]\s*)?\**(?:' + '|'.join(f"(?P<{key}>{pattern})" for key, pattern in labels.items())
+            + r')["\s*]*(?:[:\-–]\s*|$)', re.IGNORECASE)
+        self.list_field = list_field
+        self.finish = finish
+        self.stats = ParseStats()
+
+    def instructions(self, example=None):
+        example = json.dumps(example) if example is not None else self.example
+        return f"Reply with only a JSON object in this form, no other text:\n{example}"
+
+    def response_format(self, mode='json_object'):
+        """Request options for JSON mode (`json_object`, `json_schema` or `off`)."""
+        if mode == 'json_schema':
+            return {'response_format': {'type': 'json_schema',
+                                        'json_schema': {'name': self.name, 'schema': self.schema}}}
+        if mode == 'json_object':
+            return {'response_format': {'type': 'json_object'}}
+        return {}
+
+    def _check(self, data):
+        """`(fields, complete)` of a decoded object: complete when it validates with every required field."""
+        errors = []
+        clean = self.validator.check(data, '', errors)
+        if errors:
+            # Keep what failed validation for `finish` to make sense of (e.g. "Vata Pitta")
+            for key, value in clean.items():
+                if value is None:
+                    clean[key] = data[key]
+                elif isinstance(value, list) and isinstance(data[key], list):
+                    clean[key] = [c if c is not None else r for c, r in zip(value, data[key])]
+        complete = all(clean.get(name) not in (None, '', []) for name in self.required)
+        return clean, complete and not errors
+
+    def _from_text(self, text):
+        found, items, current = {}, [], None
+        for line in THINK.sub('', text).splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('```'):
+                continue
+            match = self.heading.match(stripped)
+            if match:
+                current = match.lastgroup
+                value = stripped[match.end():].strip(VALUE_TRIM)
+                if value and current not in found:
+                    found[current] = value
+                continue
+            bullet = BULLET.sub('', stripped) if stripped[0] in BULLET_START else stripped
+            bullet = bullet.strip(VALUE_TRIM)
+            if not bullet:
+                continue
+            if current is not None and current != self.list_field and not isinstance(found.get(current), str):
+                found.setdefault(current, []).append(bullet)
+            elif self.list_field:
+                items.append(bullet)
+        found = {k: '\n'.join(v) if isinstance(v, list) else v for k, v in found.items()}
+        if self.list_field and items:
+            found[self.list_field] = items
+        return found or None
+
+    def parse(self, text):
+        """`(result, outcome)`: outcome is json, repaired, partial, text or failed."""
+        t0 = time.perf_counter()
+        text = text or ''
+        try:
+            data = loads(text)
+        except ValueError:
+            data = repair(text)
+            decoded = 'repaired' if data is not None else None
+        else:
+            decoded = 'json'
+        if isinstance(data, dict):
+            clean, complete = self._check(data)
+            if complete:
+                outcome = decoded
+            else:
+                # JSON that missed the schema: use what fits, don't read the JSON as prose
+                known = any(clean.get(name) not in (None, '', []) for name in self.fields)
+                outcome = 'partial' if known else 'failed'
+        else:
+            clean = self._from_text(text)
+            outcome = 'text' if clean else 'failed'
+        result = self.finish(clean or {})
+        self.stats.record(outcome, time.perf_counter() - t0)
+        return result, outcome
+
+
+def _lifestyle(data):
+    result = {}
+    for key in ('self_care', 'music', 'exercise', 'ayurveda_tip'):
+        value = data.get(key)
+        if isinstance(value, list):
+            value = '\n'.join(map(str, value))
+        result[key] = str(value).strip() if value else 'Not found'
+    return result
+
+
+CANONICAL_PRAKRITI = {p.lower(): p for p in PRAKRITI}
+
+
+def _remedies(data):
+    prakriti = data.get('prakriti')
+    if isinstance(prakriti, str):
+        # "Vata-Pitta (dominant Vata)" and "pitta vata" read as the declared spellings when possible
+        key = re.sub(r'\s*[-/ ]\s*', '-', prakriti.strip().split('(')[0].strip()).lower()
+        prakriti = CANONICAL_PRAKRITI.get(key) or CANONICAL_PRAKRITI.get('-'.join(reversed(key.split('-')))) \
+            or prakriti.strip() or None
+    remedies = []
+    for item in data.get('remedies') or []:
+        if item is None:
+            continue
+        if isinstance(item, dict):
+            name, usage = str(item.get('remedy') or '').strip(), str(item.get('usage') or '').strip()
+            text = f"{name} - {usage}" if name and usage else name or usage
+        else:
+            text = str(item).strip()
+        if text:
+            remedies.append({'remedy': text, 'confidence': 1.0})
+    return {'prakriti': prakriti, 'remedies': remedies}
+
+
+LIFESTYLE = OutputSpec(
+    'lifestyle_recommendations',
+    Model('LifestyleOutput', {
+        'self_care': fields.String(required=True),
+        'music': fields.String(required=True),
+        'exercise': fields.String(required=True),
+        'ayurveda_tip': fields.String(required=True),
+    }),
+    example={'self_care': '<short daily self-care activity>', 'music': '<music type or genre>',
+             'exercise': '<specific safe exercise>', 'ayurveda_tip': '<Ayurvedic tip>'},
+    labels={'self_care': r'self[-_ ]?care(?: activity)?', 'music': r'music', 'exercise': r'exercise',
+            'ayurveda_tip': r'ayurved(?:a|ic)(?:[_ ]tip)?'},
+    finish=_lifestyle,
+)
+
+REMEDIES = OutputSpec(
+    'remedy_recommendations',
+    Model('RemedyOutput', {
+        'prakriti': fields.String(enum=PRAKRITI),
+        'remedies': fields.List(fields.Nested(Model('RemedyOutputItem', {
+            'remedy': fields.String(required=True),
+            'usage': fields.String(),
+        })), required=True, min_items=1),
+    }),
+    example={'prakriti': '|'.join(PRAKRITI),
+             'remedies': [{'remedy': '<remedy>', 'usage': '<how and when to use>'}]},
+    labels={'prakriti': r'prakriti(?: \(body type\))?', 'remedies': r'remedies'},
+    finish=_remedies,
+    list_field='remedies',
+)
+
+# Postpartum remedies don't decide a prakriti
+POSTPARTUM_EXAMPLE = {'remedies': [{'remedy': '<remedy>', 'usage': '<how and when to use>'}]}
+
+
+def stats():
+    return {spec.name: spec.stats.snapshot() for spec in (LIFESTYLE, REMEDIES)}
@@ -0,0 +1,287 @@
+"""Out-of-core retraining of the symptom classifier from the `symptoms` table.
+
+`SymptomClassification.post` stores every `reported_symptoms` /
+`classified_categories` pair. This pipeline streams those rows in pages
+(keyset on `recorded_at`, skipping rows already seen at a tied timestamp),
+hashes the text with a stateless `HashingVectorizer` and updates a
+`MultiLabelSGD` batch by batch, so memory depends on the page and batch size, not on how many rows have accumulated.
+
+Rows are split into train and held-out streams by a hash of the row, so a
+row lands on the same side in every run. After training, the new model and
+the current one are scored on the held-out stream (raw classifier output,
+without `SymptomClassifier.predict`'s substring fallback).
+
+Each run writes `symptom_classifier_model.v<version>.pkl` plus a `.json`
+report next to the live model. `--promote` replaces the live
+`symptom_classifier_model.pkl` atomically, unless the new model scores
+worse than the current one by more than `--tolerance` micro-F1. When the
+live model came from this pipeline, the next run continues from it and
+only streams rows recorded after its watermark.
+
+    python symptom_training.py train --epochs 2 --promote
+    python symptom_training.py train --jsonl symptoms_export.jsonl --full
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from ml_models import MultiLabelSGD, SymptomClassifier
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.join(HERE, '..', 'models', 'ayurvedic')
+LIVE_MODEL = os.path.join(MODEL_DIR, 'symptom_classifier_model.pkl')
+COLUMNS = 'reported_symptoms,classified_categories,recorded_at'
+
+
+def stream_rows(client, table='symptoms', page_size=500, since=None):
+    """Yield rows recorded after `since` in `recorded_at` order, holding one page at a time.
+
+    Each page starts at the last timestamp seen (inclusive), skipping the rows
+    already yielded for it, so rows sharing a timestamp across a page
+    boundary aren't lost and offsets stay as small as the ties.
+    """
+    last, ties = since, 0
+    while True:
+        query = client.table(table).select(COLUMNS).order('recorded_at')
+        if ties:
+            query = query.gte('recorded_at', last)
+        elif last:
+            query = query.gt('recorded_at', last)
+        page = query.range(ties, ties + page_size - 1).execute().data or []
+        yield from page
+        if len(page) < page_size:
+            return
+        newest = page[-1]['recorded_at']
+        same = sum(1 for row in page if row['recorded_at'] == newest)
+        ties = ties + same if ties and newest == last else same
+        last = newest
+
+
+def read_jsonl(path, since=None):
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                if not since or (row.get('recorded_at') or '') > since:
+                    yield row
+
+
+def in_holdout(row, fraction):
+    key = f"{row.get('recorded_at')}|{row.get('reported_symptoms')}".encode()
+    bucket = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big') / 2 ** 64
+    return bucket < fraction
+
+
+def shuffled(rows, buffer_size, seed=42):
+    """Approximate shuffle of a stream with a fixed-size buffer."""
+    rng = random.Random(seed)
+    buffer = []
+    for row in rows:
+        if len(buffer) < buffer_size:
+            buffer.append(row)
+            continue
+        i = rng.randrange(buffer_size)
+        yield buffer[i]
+        buffer[i] = row
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def batches(rows, known, batch_size):
+    """`(texts, label lists)` batches of labelled rows; labels outside `known` are dropped."""
+    texts, labels = [], []
+    for row in rows:
+        text = (row.get('reported_symptoms') or '').strip()
+        categories = [c for c in row.get('classified_categories') or [] if c in known]
+        if not text or not categories:
+            continue
+        texts.append(text)
+        labels.append(categories)
+        if len(texts) == batch_size:
+            yield texts, labels
+            texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+class Scores:
+    """Streaming multi-label scores: micro precision/recall/F1 and exact-match rate."""
+
+    def __init__(self):
+        self.tp = self.fp = self.fn = self.exact = self.rows = 0
+
+    def add(self, Y_true, Y_pred):
+        Y_true, Y_pred = np.asarray(Y_true, dtype=bool), np.asarray(Y_pred, dtype=bool)
+        self.tp += int((Y_true & Y_pred).sum())
+        self.fp += int((~Y_true & Y_pred).sum())
+        self.fn += int((Y_true & ~Y_pred).sum())
+        self.exact += int((Y_true == Y_pred).all(axis=1).sum())
+        self.rows += len(Y_true)
+
+    def summary(self):
+        precision = self.tp / (self.tp + self.fp) if self.tp + self.fp else 0.0
+        recall = self.tp / (self.tp + self.fn) if self.tp + self.fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {'rows': self.rows, 'precision': round(precision, 4), 'recall': round(recall, 4),
+                'f1': round(f1, 4), 'exact_match': round(self.exact / self.rows, 4) if self.rows else 0.0}
+
+
+def is_incremental(model):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return isinstance(model.classifier, MultiLabelSGD) and isinstance(model.vectorizer, HashingVectorizer)
+
+
+def new_model(label_binarizer, n_features=2 ** 15, threshold=0.5):
+    from sklearn.feature_extraction.text import HashingVectorizer
+    vectorizer = HashingVectorizer(n_features=n_features, ngram_range=(1, 2), stop_words='english',
+                                   alternate_sign=False)
+    return SymptomClassifier(MultiLabelSGD(len(label_binarizer.classes_), threshold=threshold),
+                             vectorizer, label_binarizer)
+
+
+def evaluate(model, rows, batch_size=1000):
+    scores = Scores()
+    known = set(model.label_binarizer.classes_)
+    for texts, labels in batches(rows, known, batch_size):
+        scores.add(model.label_binarizer.transform(labels),
+                   model.classifier.predict(model.vectorizer.transform(texts)))
+    return scores.summary()
+
+
+def train(source, model, holdout=0.1, epochs=1, batch_size=1000, shuffle_buffer=4096):
+    """Update `model` in place from `source()` (a fresh row iterator per pass)."""
+    known = set(model.label_binarizer.classes_)
+    seen = {'rows': 0, 'batches': 0, 'watermark': None}
+
+    def train_rows():
+        for row in source():
+            if row.get('recorded_at') and (seen['watermark'] is None or row['recorded_at'] > seen['watermark']):
+                seen['watermark'] = row['recorded_at']
+            if not in_holdout(row, holdout):
+                yield row
+
+    for epoch in range(epochs):
+        rows = shuffled(train_rows(), shuffle_buffer, seed=epoch) if shuffle_buffer else train_rows()
+        for texts, labels in batches(rows, known, batch_size):
+            model.classifier.partial_fit(model.vectorizer.transform(texts),
+                                         model.label_binarizer.transform(labels))
+            if epoch == 0:
+                seen['rows'] += len(texts)
+            seen['batches'] += 1
+    return seen
+
+
+def save_artifact(model, report, out_dir, promote=False):
+    """Write the versioned model and report; with `promote`, swap them in as the live model."""
+    import joblib
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"symptom_classifier_model.v{report['version']}")
+    joblib.dump(model, f"{stem}.pkl")
+    with open(f"{stem}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    if promote:
+        live = os.path.join(out_dir, 'symptom_classifier_model')
+        for ext in ('.pkl', '.json'):
+            tmp = f"{live}{ext}.tmp"
+            with open(f"{stem}{ext}", 'rb') as src, open(tmp, 'wb') as dst:
+                dst.write(src.read())
+            os.replace(tmp, f"{live}{ext}")
+    return f"{stem}.pkl"
+
+
+def load_report(model_path):
+    path = os.path.splitext(model_path)[0] + '.json'
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Symptom classifier retraining')
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('train', help='Stream labelled symptoms and train incrementally')
+    run.add_argument('--base', default=LIVE_MODEL, help='Current model (label space, comparison, warm start)')
+    run.add_argument('--out-dir', default=MODEL_DIR)
+    run.add_argument('--jsonl', help='Read rows from an export instead of Supabase')
+    run.add_argument('--table', default='symptoms')
+    run.add_argument('--page-size', type=int, default=500)
+    run.add_argument('--batch-size', type=int, default=1000)
+    run.add_argument('--epochs', type=int, default=1)
+    run.add_argument('--holdout', type=float, default=0.1)
+    run.add_argument('--n-features', type=int, default=2 ** 15)
+    run.add_argument('--threshold', type=float, default=0.5)
+    run.add_argument('--full', action='store_true', help='Start a new model from all rows')
+    run.add_argument('--promote', action='store_true')
+    run.add_argument('--tolerance', type=float, default=0.01)
+    args = parser.parse_args(argv)
+
+    import joblib
+    base = joblib.load(args.base)
+    base_report = load_report(args.base)
+    if is_incremental(base) and not args.full:
+        model = base
+        model.classifier.densify()
+        since = base_report.get('watermark')
+        base = joblib.load(args.base)  # untouched copy for the comparison
+    else:
+        model = new_model(base.label_binarizer, args.n_features, args.threshold)
+        since = None
+
+    if args.jsonl:
+        def source(since=since):
+            return read_jsonl(args.jsonl, since)
+    else:
+        from dotenv import load_dotenv
+        from supabase import create_client
+        load_dotenv()
+        client = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"])
+
+        def source(since=since):
+            return stream_rows(client, args.table, args.page_size, since)
+
+    start = time.perf_counter()
+    seen = train(source, model, args.holdout, args.epochs, args.batch_size)
+    train_s = time.perf_counter() - start
+    if not seen['rows']:
+        print(f"No labelled rows after {since or 'the beginning'}; nothing to train")
+        return 0
+    model.classifier.sparsify()
+
+    # Score both models on every held-out row, not just the new ones.
+    def holdout_rows():
+        return (row for row in source(since=None) if in_holdout(row, args.holdout))
+    report = {
+        'version': datetime.utcnow().strftime('%Y%m%d%H%M%S'),
+        'parent': base_report.get('version'),
+        'watermark': seen['watermark'] or since,
+        'trained_rows': seen['rows'],
+        'epochs': args.epochs,
+        'train_seconds': round(train_s, 2),
+        'rows_per_second': round(seen['rows'] * args.epochs / train_s, 1) if train_s else None,
+        'holdout': args.holdout,
+        'scores': evaluate(model, holdout_rows()),
+        'base_scores': evaluate(base, holdout_rows()),
+    }
+    promote = args.promote and report['scores']['f1'] >= report['base_scores']['f1'] - args.tolerance
+    report['promoted'] = promote
+    path = save_artifact(model, report, args.out_dir, promote)
+
+    print(f"Trained on {seen['rows']} rows in {train_s:.1f}s -> {path}")
+    print(f"  held-out new:  {report['scores']}")
+    print(f"  held-out base: {report['base_scores']}")
+    if args.promote and not promote:
+        print("Not promoted: the new model scores worse than the current one")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""Incremental kick-count and contraction statistics.
+
+Clients upload batches of raw events (kick timestamps, contraction start/end
+times). Each event updates a few running values per user, so ingestion is
+O(1) per event and summaries are O(1) to serve:
+
+- kicks: a deque of kick times inside the sliding window (2 hours by
+  default) plus the last ten kicks, for "time to 10 kicks";
+- contractions: the contractions in the last hour with a running duration
+  sum, and the start of the current run of contractions that satisfy the
+  5-1-1 rule (at most 5 minutes apart, each lasting at least 1 minute).
+  The rule is met once that run spans an hour.
+
+Windows slide from the newest event, and entries leave the deques once, so
+the eviction work is amortised over the inserts. Events must arrive in time
+order per user; anything not newer than the last accepted event (a retried
+batch, a late upload) is skipped. A user not yet in memory is hydrated once
+from stored history through the loader callbacks.
+
+Uploads pass a `store` callback that persists the new events before they
+are folded in, so a failed write leaves the tracker as it was and the
+client's retry is accepted instead of being skipped as already seen.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+from trends import _timestamp
+
+KICK_WINDOW = 2 * 3600
+KICK_TARGET = 10
+CONTRACTION_WINDOW = 3600
+MAX_SKEW = 300
+
+
+def event_time(value, now=None, max_skew=MAX_SKEW):
+    """Epoch seconds from an ISO 8601 timestamp or an epoch in s or ms (number or string).
+
+    Raises ValueError for anything more than `max_skew` seconds in the future.
+    """
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    if isinstance(value, bool) or value is None:
+        raise ValueError(f"not a timestamp: {value!r}")
+    ts = _timestamp(value)
+    # Clients send epochs in s or ms; normalise by magnitude.
+    while ts > 1e11:
+        ts /= 1000.0
+    now = time.time() if now is None else now
+    if ts > now + max_skew:
+        raise ValueError(f"{value!r} is in the future")
+    return ts
+
+
+class KickStats:
+    __slots__ = ('window', 'recent', 'last_ten', 'total', 'last_at', 'best_window')
+
+    def __init__(self, window=KICK_WINDOW):
+        self.window = window
+        self.recent = deque()
+        self.last_ten = deque(maxlen=KICK_TARGET)
+        self.total = 0
+        self.last_at = None
+        self.best_window = 0
+
+    def _evict(self, now):
+        recent = self.recent
+        while recent and recent[0] <= now - self.window:
+            recent.popleft()
+
+    def add(self, ts):
+        if self.last_at is not None and ts <= self.last_at:
+            return False
+        self.recent.append(ts)
+        self._evict(ts)
+        self.last_ten.append(ts)
+        self.total += 1
+        self.last_at = ts
+        self.best_window = max(self.best_window, len(self.recent))
+        return True
+
+    def summary(self, now):
+        self._evict(now)
+        to_target = None
+        if len(self.last_ten) == KICK_TARGET:
+            to_target = round((self.last_ten[-1] - self.last_ten[0]) / 60, 1)
+        return {
+            'window_hours': self.window / 3600,
+            'kicks_in_window': len(self.recent),
+            'target_reached': len(self.recent) >= KICK_TARGET,
+            'minutes_for_last_10': to_target,
+            'best_window': self.best_window,
+            'total': self.total,
+            'last_kick_at': self.last_at,
+        }
+
+
+class ContractionStats:
+    __slots__ = ('window', 'max_interval', 'min_duration', 'sustain', 'recent', 'window_duration',
+                 'total', 'total_duration', 'last_start', 'last_end', 'run_start')
+
+    def __init__(self, window=CONTRACTION_WINDOW, max_interval=300, min_duration=60, sustain=3600):
+        self.window = window
+        self.max_interval = max_interval
+        self.min_duration = min_duration
+        self.sustain = sustain
+        self.recent = deque()  # (start, duration)
+        self.window_duration = 0.0
+        self.total = 0
+        self.total_duration = 0.0
+        self.last_start = None
+        self.last_end = None
+        self.run_start = None
+
+    def _evict(self, now):
+        recent = self.recent
+        while recent and recent[0][0] <= now - self.window:
+            self.window_duration -= recent.popleft()[1]
+
+    def add(self, start, duration):
+        if self.last_start is not None and start <= self.last_start:
+            return False
+        if duration >= self.min_duration:
+            if (self.run_start is None or self.last_start is None
+                    or start - self.last_start > self.max_interval):
+                self.run_start = start
+        else:
+            self.run_start = None
+        self.recent.append((start, duration))
+        self.window_duration += duration
+        self._evict(start)
+        self.total += 1
+        self.total_duration += duration
+        self.last_start = start
+        self.last_end = start + duration
+        return True
+
+    def summary(self, now):
+        self._evict(now)
+        n = len(self.recent)
+        interval = None
+        if n > 1:
+            interval = (self.recent[-1][0] - self.recent[0][0]) / (n - 1)
+        # The run only counts while contractions are still coming.
+        active = self.last_start is not None and now - self.last_start <= self.max_interval
+        run = self.last_start - self.run_start if self.run_start is not None and active else 0.0
+        return {
+            'count_last_hour': n,
+            'mean_duration_s': round(self.window_duration / n, 1) if n else None,
+            'mean_interval_s': round(interval, 1) if interval is not None else None,
+            'five_one_one': run >= self.sustain,
+            'five_one_one_run_minutes': round(run / 60, 1),
+            'total': self.total,
+            'mean_duration_all_s': round(self.total_duration / self.total, 1) if self.total else None,
+            'last_contraction_at': self.last_start,
+        }
+
+
+class _UserTracking:
+    __slots__ = ('kicks', 'contractions')
+
+    def __init__(self, kick_window):
+        self.kicks = KickStats(kick_window)
+        self.contractions = ContractionStats()
+
+
+class TrackingEngine:
+    def __init__(self, kick_window=KICK_WINDOW, max_users=50000, kick_loader=None,
+                 contraction_loader=None, max_skew=MAX_SKEW):
+        """Loaders return a user's stored events oldest first: kick times, and
+        `(start, duration)` pairs for contractions. Uploaded times more than
+        `max_skew` seconds ahead of the server clock are rejected."""
+        self.kick_window = kick_window
+        self.max_skew = max_skew
+        self.max_users = max_users
+        self.kick_loader = kick_loader
+        self.contraction_loader = contraction_loader
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._users)
+
+    def _user(self, user_id):
+        with self._lock:
+            tracking = self._users.get(user_id)
+            if tracking is not None:
+                self._users.move_to_end(user_id)
+                return tracking
+        tracking = _UserTracking(self.kick_window)
+        for loader, add in ((self.kick_loader, lambda ts: tracking.kicks.add(ts)),
+                            (self.contraction_loader, lambda event: tracking.contractions.add(*event))):
+            if loader is None:
+                continue
+            try:
+                for event in loader(user_id):
+                    add(event)
+            except Exception:
+                pass
+        with self._lock:
+            # Another request may have hydrated the same user meanwhile; keep the first.
+            existing = self._users.setdefault(user_id, tracking)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return existing
+
+    def add_kicks(self, user_id, timestamps, store=None):
+        """Fold a batch of kick times in; returns the accepted timestamps.
+
+        `store(new)` gets the kicks newer than the last accepted one before they
+        are folded in; if it raises, nothing is.
+        """
+        parsed = sorted(event_time(value, max_skew=self.max_skew) for value in timestamps)
+        stats = self._user(user_id).kicks
+        with self._lock:
+            new = _newer(parsed, stats.last_at, lambda ts: ts)
+        if new and store is not None:
+            store(new)
+        with self._lock:
+            return [ts for ts in new if stats.add(ts)]
+
+    def add_contractions(self, user_id, events, store=None):
+        """Fold a batch of contractions in; each has `start_time` and `end_time` or `duration`.
+
+        Returns the accepted `(start, duration)` pairs. `store` works as for `add_kicks`.
+        """
+        parsed = []
+        for event in events:
+            start = event_time(event['start_time'], max_skew=self.max_skew)
+            if event.get('end_time') is not None:
+                duration = event_time(event['end_time'], max_skew=self.max_skew) - start
+            else:
+                duration = float(event['duration'])
+            if duration < 0:
+                raise ValueError('Contraction ends before it starts')
+            parsed.append((start, duration))
+        stats = self._user(user_id).contractions
+        with self._lock:
+            new = _newer(sorted(parsed), stats.last_start, lambda event: event[0])
+        if new and store is not None:
+            store(new)
+        with self._lock:
+            return [(start, duration) for start, duration in new if stats.add(start, duration)]
+
+    def kick_summary(self, user_id, now=None):
+        stats = self._user(user_id).kicks
+        with self._lock:
+            return stats.summary(now or time.time())
+
+    def contraction_summary(self, user_id, now=None):
+        stats = self._user(user_id).contractions
+        with self._lock:
+            return stats.summary(now or time.time())
+
+
+def _newer(events, last, key):
+    """Sorted events strictly newer than `last` and than each other."""
+    new = []
+    for event in events:
+        if last is None or key(event) > last:
+            new.append(event)
+            last = key(event)
+    return new
@@ -0,0 +1,346 @@
+"""Reproducible training for the maternal (vitals) and fetal (CTG) models.
+
+Scripts the steps of `models/vitals_model.ipynb` and `models/ctg_model.ipynb`:
+
+- load: the CSV is deduplicated, the notebook's dropped columns removed
+  and labels encoded. The result is cached in a columnar file keyed by
+  the CSV hash: Parquet when pyarrow is installed, else one `.npz` array
+  per column.
+- search: random hyperparameter search scored by stratified k-fold CV.
+  Every (candidate, fold) fit runs in its own worker process, so the
+  search spreads across cores. Scaling and the fetal oversampling happen
+  inside each fold, so duplicated minority rows never reach validation.
+- fit, evaluate: the best candidate is refit on the training split and
+  scored on a held-out test split.
+- save: the scaler and model are written atomically next to app.py under
+  the names it loads, with their portable export (portable.py). `model_manifest.json` records metrics, parameters,
+  library versions, data and artifact hashes, and per-stage timings.
+
+    python train_models.py fetal
+    python train_models.py maternal --data "../models/Maternal Health Risk Data Set.csv"
+    python train_models.py all --trials 40 --folds 5 --workers 8
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(HERE, '..', 'models')
+CACHE_DIR = os.path.join(MODELS_DIR, '.cache')
+MANIFEST = 'model_manifest.json'
+PREPROCESS_VERSION = 1  # bump when preprocessing changes, to invalidate caches
+
+SPECS = {
+    'fetal': {
+        'data': os.path.join(MODELS_DIR, 'fetal_health.csv'),
+        'target': 'fetal_health',
+        # Dropped in ctg_model.ipynb after the correlation and ANOVA checks
+        'drop': ['histogram_median', 'histogram_mode', 'severe_decelerations',
+                 'histogram_number_of_zeroes', 'fetal_movement', 'histogram_max'],
+        'labels': {1.0: 0, 2.0: 1, 3.0: 2},
+        'scaler': 'minmax',
+        'estimator': 'lightgbm',
+        'oversample': True,
+        'model_file': 'fetal_health_model.sav',
+        'scaler_file': 'scaleX1.pkl',
+        'portable_file': 'fetal_health_model.json',
+        'defaults': {},
+        'space': {
+            'n_estimators': [100, 200, 300, 500],
+            'learning_rate': [0.03, 0.05, 0.1, 0.2],
+            'num_leaves': [15, 31, 63],
+            'min_child_samples': [5, 10, 20, 40],
+            'subsample': [0.7, 0.85, 1.0],
+            'subsample_freq': [1],
+            'colsample_bytree': [0.6, 0.8, 1.0],
+        },
+    },
+    'maternal': {
+        'data': os.path.join(MODELS_DIR, 'Maternal Health Risk Data Set.csv'),
+        'target': 'RiskLevel',
+        'drop': [],
+        'labels': {'low risk': 0, 'mid risk': 1, 'high risk': 2},
+        'scaler': 'standard',
+        'estimator': 'xgboost',
+        'oversample': False,
+        'model_file': 'finalized_maternal_model.sav',
+        'scaler_file': 'scaleX.pkl',
+        'portable_file': 'finalized_maternal_model.json',
+        'defaults': {'eval_metric': 'mlogloss'},
+        # Ranges from the optuna study in vitals_model.ipynb
+        'space': {
+            'n_estimators': [50, 100, 150, 200, 250, 300],
+            'max_depth': list(range(3, 16)),
+            'learning_rate': [0.01, 0.03, 0.05, 0.1, 0.2, 0.3],
+            'subsample': [0.6, 0.7, 0.8, 0.9, 1.0],
+            'colsample_bytree': [0.6, 0.7, 0.8, 0.9, 1.0],
+        },
+    },
+}
+
+
+class Stages:
+    """Wall-clock time per named stage."""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = round(self.seconds.get(name, 0) + time.perf_counter() - start, 3)
+            print(f"  {name:<10} {self.seconds[name]:8.2f}s")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def preprocess(df, spec):
+    df = df.drop_duplicates(keep='first').drop(columns=spec['drop'])
+    y = df[spec['target']].map(spec['labels'])
+    if y.isna().any():
+        raise ValueError(f"Unknown {spec['target']} values: {sorted(df[spec['target']][y.isna()].unique())}")
+    X = df.drop(columns=[spec['target']]).astype(float)
+    return X, y.astype(int).to_numpy()
+
+
+def _has_parquet():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def load_dataset(name, spec, path, cache_dir=CACHE_DIR):
+    """Preprocessed `(X, y, info)`, from the columnar cache when the CSV is unchanged."""
+    import pandas as pd
+    data_hash = file_sha256(path)
+    stem = os.path.join(cache_dir, f"{name}-{data_hash[:16]}-v{PREPROCESS_VERSION}")
+    parquet = _has_parquet()
+    cache_path = f"{stem}.parquet" if parquet else f"{stem}.npz"
+    info = {'path': os.path.relpath(path, HERE), 'sha256': data_hash, 'cache': os.path.basename(cache_path)}
+    if os.path.exists(cache_path):
+        if parquet:
+            frame = pd.read_parquet(cache_path)
+        else:
+            with np.load(cache_path, allow_pickle=False) as arrays:
+                columns = [str(c) for c in arrays['__columns__']]
+                frame = pd.DataFrame({c: arrays[f"c{i}"] for i, c in enumerate(columns)})
+                frame['__target__'] = arrays['__target__']
+        y = frame.pop('__target__').to_numpy()
+        info.update(cache_hit=True, rows=len(frame))
+        return frame, y, info
+
+    raw = pd.read_csv(path)
+    X, y = preprocess(raw, spec)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{stem}.tmp"
+    if parquet:
+        X.assign(__target__=y).to_parquet(tmp, index=False)
+    else:
+        with open(tmp, 'wb') as f:
+            np.savez(f, __columns__=np.array(X.columns, dtype=str), __target__=y,
+                     **{f"c{i}": X[c].to_numpy() for i, c in enumerate(X.columns)})
+    os.replace(tmp, cache_path)
+    info.update(cache_hit=False, rows=len(X), raw_rows=len(raw))
+    return X.reset_index(drop=True), y, info
+
+
+def oversample(X, y, seed=42):
+    """Resample every class with replacement up to the majority count (as in ctg_model.ipynb)."""
+    rng = np.random.default_rng(seed)
+    classes, counts = np.unique(y, return_counts=True)
+    index = np.concatenate([
+        rng.choice(np.flatnonzero(y == c), counts.max(), replace=True) if n < counts.max() else np.flatnonzero(y == c)
+        for c, n in zip(classes, counts)
+    ])
+    rng.shuffle(index)
+    return X[index], y[index]
+
+
+def make_scaler(spec):
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+    return MinMaxScaler() if spec['scaler'] == 'minmax' else StandardScaler()
+
+
+def make_model(spec, params, seed=42, threads=None):
+    params = {**spec['defaults'], **params}
+    if spec['estimator'] == 'lightgbm':
+        import lightgbm
+        return lightgbm.LGBMClassifier(random_state=seed, n_jobs=threads, verbose=-1, **params)
+    import xgboost
+    return xgboost.XGBClassifier(random_state=seed, n_jobs=threads, **params)
+
+
+def fit(spec, params, X, y, seed=42, threads=None):
+    """Fit scaler and model on raw rows `X` (a DataFrame, so the scaler keeps feature names)."""
+    scaler = make_scaler(spec).fit(X)
+    X_scaled, y_fit = scaler.transform(X), y
+    if spec['oversample']:
+        X_scaled, y_fit = oversample(X_scaled, y, seed)
+    return scaler, make_model(spec, params, seed, threads).fit(X_scaled, y_fit)
+
+
+def score(scaler, model, X, y):
+    import warnings
+    from sklearn.metrics import accuracy_score, confusion_matrix, f1_score, roc_auc_score
+    X_scaled = scaler.transform(X)
+    with warnings.catch_warnings():
+        # LightGBM names numpy columns Column_0.. at fit time, as in the live model
+        warnings.filterwarnings('ignore', message='X does not have valid feature names')
+        predicted = model.predict(X_scaled)
+        proba = model.predict_proba(X_scaled)
+    return {
+        'accuracy': round(float(accuracy_score(y, predicted)), 4),
+        'macro_f1': round(float(f1_score(y, predicted, average='macro')), 4),
+        'roc_auc_ovr': round(float(roc_auc_score(y, proba, multi_class='ovr')), 4),
+        'confusion': confusion_matrix(y, predicted).tolist(),
+    }
+
+
+def _fold_score(spec, params, X, y, train_index, val_index, seed):
+    scaler, model = fit(spec, params, X.iloc[train_index], y[train_index], seed, threads=1)
+    return score(scaler, model, X.iloc[val_index], y[val_index])['macro_f1']
+
+
+def search(spec, X, y, trials=20, folds=5, workers=None, seed=42):
+    """Candidates ranked by mean CV macro-F1; every (candidate, fold) fit is a separate job."""
+    from joblib import Parallel, delayed
+    from sklearn.model_selection import ParameterSampler, StratifiedKFold
+    candidates = [{}] + list(ParameterSampler(spec['space'], n_iter=max(0, trials - 1), random_state=seed))
+    splits = list(StratifiedKFold(folds, shuffle=True, random_state=seed).split(X, y))
+    jobs = [(i, train, val) for i in range(len(candidates)) for train, val in splits]
+    scores = Parallel(n_jobs=workers or -1)(
+        delayed(_fold_score)(spec, candidates[i], X, y, train, val, seed) for i, train, val in jobs)
+    per_candidate = {}
+    for (i, _, _), value in zip(jobs, scores):
+        per_candidate.setdefault(i, []).append(value)
+    ranked = sorted(({'params': candidates[i], 'mean': float(np.mean(v)), 'std': float(np.std(v))}
+                     for i, v in per_candidate.items()), key=lambda r: -r['mean'])
+    return ranked
+
+
+def _dump_atomic(obj, path):
+    import joblib
+    tmp = f"{path}.tmp"
+    joblib.dump(obj, tmp)
+    return tmp
+
+
+def _export_atomic(scaler, model, path):
+    import portable
+    tmp = f"{path}.tmp"
+    portable.save(portable.export(model, scaler), tmp)
+    return tmp
+
+
+def save_artifacts(spec, scaler, model, out_dir):
+    """Replace the scaler, model and export files; all are fully written before any is swapped in."""
+    os.makedirs(out_dir, exist_ok=True)
+    staged = {spec['scaler_file']: _dump_atomic(scaler, os.path.join(out_dir, spec['scaler_file'])),
+              spec['model_file']: _dump_atomic(model, os.path.join(out_dir, spec['model_file'])),
+              spec['portable_file']: _export_atomic(scaler, model, os.path.join(out_dir, spec['portable_file']))}
+    hashes = {filename: file_sha256(tmp) for filename, tmp in staged.items()}
+    for filename, tmp in staged.items():
+        os.replace(tmp, os.path.join(out_dir, filename))
+    return hashes
+
+
+def write_manifest(name, entry, out_dir):
+    manifest_path = os.path.join(out_dir, MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    manifest[name] = entry
+    tmp = f"{manifest_path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_path)
+
+
+def versions(spec):
+    import sklearn
+    library = __import__(spec['estimator'])
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'scikit-learn': sklearn.__version__, spec['estimator']: library.__version__}
+
+
+def train(name, data=None, trials=20, folds=5, workers=None, test_size=0.2, seed=42, out_dir=HERE):
+    from sklearn.model_selection import train_test_split
+    spec = SPECS[name]
+    data = data or spec['data']
+    if not os.path.exists(data):
+        raise FileNotFoundError(f"{name} dataset not found at {data} (pass --data)")
+    stages = Stages()
+    print(f"Training {name} model")
+    with stages('load'):
+        X, y, data_info = load_dataset(name, spec, data)
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=test_size, stratify=y, random_state=seed)
+    with stages('search'):
+        ranked = search(spec, X_train, y_train, trials, folds, workers, seed)
+    best = ranked[0]
+    with stages('fit'):
+        scaler, model = fit(spec, best['params'], X_train, y_train, seed)
+    with stages('evaluate'):
+        test = score(scaler, model, X_test, y_test)
+    entry = {
+        'trained_at': datetime.utcnow().isoformat(),
+        'data': {**data_info, 'train_rows': len(X_train), 'test_rows': len(X_test)},
+        'features': list(X.columns),
+        'params': {**spec['defaults'], **best['params']},
+        'cv': {'folds': folds, 'trials': len(ranked), 'scoring': 'macro_f1',
+               'best_mean': round(best['mean'], 4), 'best_std': round(best['std'], 4)},
+        'test': test,
+        'versions': versions(spec),
+        'seed': seed,
+    }
+    with stages('save'):
+        entry['artifacts'] = save_artifacts(spec, scaler, model, out_dir)
+    entry['timings'] = dict(stages.seconds)
+    write_manifest(name, entry, out_dir)
+    print(f"  cv macro-F1 {best['mean']:.4f} ± {best['std']:.4f}, test {test['macro_f1']:.4f} "
+          f"(accuracy {test['accuracy']:.4f}) -> {os.path.join(out_dir, spec['model_file'])}")
+    return entry
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the maternal and fetal risk models')
+    parser.add_argument('model', choices=[*SPECS, 'all'])
+    parser.add_argument('--data', help='Dataset CSV (default: the notebook dataset under models/)')
+    parser.add_argument('--trials', type=int, default=20, help='Hyperparameter candidates, defaults included')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None, help='Parallel fits (default: all cores)')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--out-dir', default=HERE)
+    args = parser.parse_args(argv)
+
+    names = list(SPECS) if args.model == 'all' else [args.model]
+    if args.data and len(names) > 1:
+        parser.error('--data needs a single model')
+    for name in names:
+        train(name, args.data, args.trials, args.folds, args.workers, args.test_size, args.seed, args.out_dir)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
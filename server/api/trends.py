@@ -0,0 +1,208 @@
+"""Incremental per-user vitals trends.
+
+Each new vitals row updates a handful of running sums per metric, so the
+cost per reading is O(1) no matter how long the history is:
+
+- an EWMA with a time-based half-life (readings are irregular, so the
+  smoothing factor depends on the gap since the previous reading);
+- time-decayed weighted sums for each window (7 and 30 days by default),
+  from which the weighted mean, standard deviation and least-squares slope
+  (units per day) follow in closed form.
+
+Weights decay as exp(-age / window), so a 7-day window is a soft window:
+readings from last week dominate, older ones fade out instead of dropping
+off a cliff. A user not yet in memory is hydrated from their stored
+history through the `loader` callback. Each worker keeps its own copy, so
+with `ttl` set a user's aggregates are re-hydrated once they are older than
+that, picking up readings other workers stored meanwhile.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+METRICS = ('systolic_bp', 'diastolic_bp', 'blood_glucose', 'body_temp', 'heart_rate')
+DAY = 86400.0
+
+
+class DecayedWindow:
+    """Exponentially decayed sums of w, w*x, w*x^2, w*t, w*t^2 and w*t*x."""
+
+    __slots__ = ('tau', 'last_t', 'w', 'sx', 'sxx', 'st', 'stt', 'stx')
+
+    def __init__(self, days):
+        self.tau = days
+        self.last_t = None
+        self.w = self.sx = self.sxx = self.st = self.stt = self.stx = 0.0
+
+    def add(self, t, x):
+        """Add value `x` observed at `t` (days since the user's origin)."""
+        if self.last_t is not None:
+            # Out-of-order readings are treated as arriving now.
+            decay = math.exp(-max(0.0, t - self.last_t) / self.tau)
+            self.w *= decay
+            self.sx *= decay
+            self.sxx *= decay
+            self.st *= decay
+            self.stt *= decay
+            self.stx *= decay
+        self.last_t = t if self.last_t is None else max(self.last_t, t)
+        self.w += 1.0
+        self.sx += x
+        self.sxx += x * x
+        self.st += t
+        self.stt += t * t
+        self.stx += t * x
+
+    def stats(self, now_t=None):
+        if not self.w:
+            return None
+        mean = self.sx / self.w
+        var = max(0.0, self.sxx / self.w - mean * mean)
+        denom = self.w * self.stt - self.st * self.st
+        # The slope needs readings spread over time, not a burst at one moment.
+        slope = (self.w * self.stx - self.st * self.sx) / denom if denom > 1e-9 * self.w * self.w else None
+        weight = self.w
+        if now_t is not None and self.last_t is not None:
+            weight *= math.exp(-max(0.0, now_t - self.last_t) / self.tau)
+        return {'mean': mean, 'std': math.sqrt(var), 'slope_per_day': slope, 'weight': weight}
+
+
+class MetricTrend:
+    __slots__ = ('ewma', 'last', 'last_t', 'windows')
+
+    def __init__(self, windows):
+        self.ewma = None
+        self.last = None
+        self.last_t = None
+        self.windows = {days: DecayedWindow(days) for days in windows}
+
+    def add(self, t, x, half_life):
+        if self.ewma is None:
+            self.ewma = x
+        else:
+            alpha = 1.0 - 0.5 ** (max(0.0, t - self.last_t) / half_life)
+            self.ewma += alpha * (x - self.ewma)
+        if self.last_t is None or t >= self.last_t:
+            self.last, self.last_t = x, t
+        for window in self.windows.values():
+            window.add(t, x)
+
+
+class UserTrends:
+    def __init__(self, windows, origin):
+        self.origin = origin
+        self.count = 0
+        self.updated_at = None
+        self.loaded_at = time.monotonic()
+        self.metrics = {name: MetricTrend(windows) for name in METRICS}
+
+
+def _timestamp(value):
+    if value is None:
+        return time.time()
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        # Supabase timestamps without an offset are UTC.
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class TrendEngine:
+    def __init__(self, windows=(7, 30), half_life=2.0, max_users=50000, loader=None, ttl=None):
+        """`half_life` is in days; `loader(user_id)` returns stored vitals rows oldest first;
+        `ttl` is in seconds, None to hydrate each user only once."""
+        self.windows = tuple(windows)
+        self.half_life = half_life
+        self.max_users = max_users
+        self.loader = loader
+        self.ttl = ttl
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._users)
+
+    def _apply(self, trends, row, ts):
+        t = (ts - trends.origin) / DAY
+        for name in METRICS:
+            value = row.get(name)
+            if value is None:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            trends.metrics[name].add(t, value, self.half_life)
+        trends.count += 1
+        trends.updated_at = max(trends.updated_at or ts, ts)
+
+    def _fresh(self, trends):
+        return self.loader is None or self.ttl is None or time.monotonic() - trends.loaded_at < self.ttl
+
+    def _user(self, user_id, origin=None):
+        with self._lock:
+            cached = self._users.get(user_id)
+            if cached is not None:
+                self._users.move_to_end(user_id)
+                if self._fresh(cached):
+                    return cached
+        history = []
+        if self.loader is not None:
+            try:
+                history = list(self.loader(user_id))
+            except Exception:
+                if cached is not None:
+                    # Stale beats empty while the store is unreachable; retry after another ttl.
+                    cached.loaded_at = time.monotonic()
+                    return cached
+                history = []
+        stamps = [_timestamp(row.get('created_at')) for row in history]
+        trends = UserTrends(self.windows, min(stamps + [origin or time.time()]))
+        for row, ts in zip(history, stamps):
+            self._apply(trends, row, ts)
+        with self._lock:
+            # Another request may have hydrated the same user meanwhile; keep the first.
+            existing = self._users.get(user_id)
+            if existing is None or existing is cached:
+                existing = self._users[user_id] = trends
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        return existing
+
+    def update(self, user_id, row, ts=None):
+        """Fold one vitals row into the user's aggregates."""
+        ts = _timestamp(ts if ts is not None else row.get('created_at'))
+        trends = self._user(user_id, origin=ts)
+        with self._lock:
+            self._apply(trends, row, ts)
+
+    def summary(self, user_id, now=None):
+        """Nested per-metric trends for the API."""
+        trends = self._user(user_id)
+        now_t = ((now or time.time()) - trends.origin) / DAY
+        with self._lock:
+            metrics = {}
+            for name, metric in trends.metrics.items():
+                if metric.ewma is None:
+                    continue
+                entry = {'last': metric.last, 'ewma': round(metric.ewma, 3)}
+                for days, window in metric.windows.items():
+                    stats = window.stats(now_t)
+                    entry[f"{days}d"] = {
+                        'mean': round(stats['mean'], 3),
+                        'std': round(stats['std'], 3),
+                        'slope_per_day': None if stats['slope_per_day'] is None else round(stats['slope_per_day'], 4),
+                        'effective_readings': round(stats['weight'], 2),
+                    }
+                metrics[name] = entry
+            return {
+                'readings': trends.count,
+                'updated_at': datetime.utcfromtimestamp(trends.updated_at).isoformat() if trends.updated_at else None,
+                'metrics': metrics,
+            }
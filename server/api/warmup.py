@@ -0,0 +1,105 @@
+"""Deferred construction of heavy resources, with a background warm-up.
+
+`Warmup.register(name, factory)` returns a `Lazy` handle instead of the
+resource itself, so importing the app doesn't load models, build indexes
+or import sklearn. The resource is built on first use, or earlier by the
+warm-up thread, which builds every registered item in order. `status()`
+feeds the readiness endpoint.
+
+A `Lazy` forwards attribute access to the built value, so
+`maternal_model.predict(...)` works unchanged; use `.get()` where the
+value itself is needed (e.g. to test a model that failed to load for None).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+PENDING, LOADING, READY, FAILED = 'pending', 'loading', 'ready', 'failed'
+
+
+class Lazy:
+    def __init__(self, name, factory, required=True):
+        self._name = name
+        self._factory = factory
+        self._required = required
+        self._value = None
+        self._state = PENDING
+        self._error = None
+        self._seconds = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._state == READY:
+            return self._value
+        with self._lock:
+            if self._state != READY:
+                self._state = LOADING
+                start = time.perf_counter()
+                try:
+                    self._value = self._factory()
+                except Exception as e:
+                    self._state, self._error = FAILED, str(e)
+                    raise
+                finally:
+                    self._seconds = time.perf_counter() - start
+                self._state, self._error = READY, None
+        return self._value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+    def status(self):
+        return {'state': self._state, 'required': self._required,
+                'seconds': None if self._seconds is None else round(self._seconds, 3),
+                'error': self._error}
+
+
+class Warmup:
+    def __init__(self):
+        self.items = OrderedDict()
+        self.started_at = None
+        self.finished_at = None
+        self._thread = None
+        self._done = threading.Event()
+
+    def register(self, name, factory, required=True):
+        """`required` items must be built before the app reports ready."""
+        item = self.items[name] = Lazy(name, factory, required)
+        return item
+
+    def _run(self):
+        for item in list(self.items.values()):
+            try:
+                item.get()
+            except Exception:
+                pass  # recorded on the item; first use will retry
+        self.finished_at = time.time()
+        self._done.set()
+
+    def start(self):
+        if self._thread is None:
+            self.started_at = time.time()
+            self._thread = threading.Thread(target=self._run, name='warmup', daemon=True)
+            self._thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Block until the warm-up pass is over (starting it if needed)."""
+        self.start()
+        return self._done.wait(timeout)
+
+    def ready(self):
+        return all(item._state == READY for item in self.items.values() if item._required)
+
+    def status(self):
+        items = {name: item.status() for name, item in self.items.items()}
+        done = sum(1 for item in items.values() if item['state'] in (READY, FAILED))
+        return {
+            'ready': self.ready(),
+            'progress': f"{done}/{len(items)}",
+            'started': self.started_at is not None,
+            'elapsed_s': round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            'items': items,
+        }
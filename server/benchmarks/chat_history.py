@@ -0,0 +1,83 @@
+"""Chat history GET: full download vs delta sync, 304 and compression.
+
+A long-term user's history (a few hundred messages) is seeded, then the
+same GET is issued as a full fetch, a delta fetch of the last two
+messages, a conditional fetch with the current ETag, and a gzip-encoded
+full fetch. Reported per variant: latency, status and bytes on the wire.
+`chat_history_since` is emulated in the fake database so the slice path
+is measured; `fallback` disables it to measure the Python-side slice.
+"""
+import time
+
+from harness import quiet, summarize
+
+USER = '00000000-0000-4000-8000-00000000c4a7'
+ANSWER = ("Ginger tea, small frequent meals and plain crackers can ease morning sickness. "
+          "Stay hydrated and avoid greasy or spicy foods; rest when you can. ") * 4
+
+
+def chat_history_since(tables, p_uid, p_since):
+    rows = [r for r in tables.get('chats', []) if r.get('UID') == p_uid]
+    if not rows:
+        return None
+    history = max(rows, key=lambda r: r.get('created_at') or '')['chat_history']
+    return {'total': len(history), 'last': history[-1] if history else None,
+            'messages': history[p_since:]}
+
+
+def _seed(db, messages):
+    history = [{'role': 'system', 'content': 'You are AyurJanani.'}]
+    for i in range(messages // 2):
+        history.append({'role': 'user', 'content': f'Question {i}: what helps with nausea in week {i % 40}?'})
+        history.append({'role': 'assistant', 'content': ANSWER})
+    db.tables['chats'] = [r for r in db.tables.get('chats', []) if r.get('UID') != USER]
+    db.seed('chats', [{'UID': USER, 'chat_history': history}])
+    return len(history)
+
+
+def _measure(fn, calls):
+    latencies, sizes, statuses = [], [], set()
+    with quiet():
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            response = fn()
+            latencies.append(time.perf_counter() - t0)
+            sizes.append(len(response.get_data()))
+            statuses.add(response.status_code)
+    result = summarize(latencies)
+    result['bytes'] = max(sizes)
+    result['status_codes'] = sorted(statuses)
+    return result
+
+
+def run(harness, messages=400, calls=50, only=None):
+    app = harness.app_module
+    client = harness.client
+    headers = harness.headers(USER)
+    total = _seed(harness.db, messages)
+    harness.db.functions['chat_history_since'] = chat_history_since
+    app.chat_sync._rpc_disabled_until = 0.0
+    etag = client.get('/chat/history', headers=headers).headers['ETag']
+    variants = {
+        'full': lambda: client.get('/chat/history', headers=headers),
+        'full_gzip': lambda: client.get('/chat/history', headers={**headers, 'Accept-Encoding': 'gzip'}),
+        'delta_2': lambda: client.get(f'/chat/history?since={total - 2}', headers=headers),
+        'not_modified': lambda: client.get(f'/chat/history?since={total}',
+                                           headers={**headers, 'If-None-Match': etag}),
+    }
+    results = {}
+    try:
+        for name, fn in variants.items():
+            if only and name not in only:
+                continue
+            results[f"chat_history.{name}"] = _measure(fn, calls)
+        if not only or 'fallback' in only:
+            del harness.db.functions['chat_history_since']
+            app.chat_sync._rpc_disabled_until = float('inf')
+            results['chat_history.delta_2_fallback'] = _measure(variants['delta_2'], calls)
+    finally:
+        harness.db.functions.pop('chat_history_since', None)
+        app.chat_sync._rpc_disabled_until = 0.0
+    for result in results.values():
+        result['messages'] = total
+    return results
@@ -0,0 +1,83 @@
+"""Diet plans from the precomputed cohort library vs the LLM.
+
+A library is built for the default cohorts with a canned generator (no
+LLM needed) and swapped into the app. A mix of realistic requests is then
+sent to /diet/plan: phrasings the parser understands are served from the
+library, the rest (unknown conditions, multiple conditions, unusual
+preferences) fall through to the fake LLM. Reported: hit rate and latency
+for each path.
+"""
+import itertools
+import time
+
+from diet_library import build_library, default_cohorts
+from harness import quiet, summarize
+
+USER = '00000000-0000-4000-8000-00000000d1e7'
+
+PLAN = """Breakfast
+- Moong dal chilla with mint chutney (2 pieces)
+- Warm milk with a pinch of saffron (1 cup)
+- Soaked almonds (5 pieces)
+Lunch
+- Brown rice (1/2 cup)
+- Palak dal (1 bowl)
+- Roti (2 pieces)
+Snacks
+- Roasted makhana (30 g)
+- Seasonal fruit (1 cup)
+Dinner
+- Vegetable khichdi with ghee (1.5 cups)
+- Ginger tea (1 tsp ginger)"""
+
+REQUESTS = [
+    ('second', 'mild morning sickness', 'vegetarian'),
+    ('first', 'nausea', 'vegetarian, lactose intolerant'),
+    ('third', 'feeling tired', 'non-vegetarian'),
+    ('second', 'none', 'vegan'),
+    ('third', 'acidity', 'Veg'),
+    ('first', 'high BP', 'vegetarian with eggs'),
+    ('second', 'gestational diabetes', 'vegetarian, gluten free'),
+    ('third', 'constipation', 'no restrictions'),
+    # Misses: several conditions, unknown words, under-specified preferences.
+    ('second', 'mild morning sickness, slight fatigue', 'vegetarian'),
+    ('third', 'swollen feet and headaches', 'vegetarian'),
+    ('first', 'none', 'jain, no onion garlic'),
+    ('second', 'thyroid', 'vegetarian'),
+]
+
+
+def run(harness, calls=120, only=None):
+    app = harness.app_module
+    client = harness.client
+    headers = harness.headers(USER)
+    start = time.perf_counter()
+    library, failures = build_library(default_cohorts(), lambda prompt: PLAN, workers=4)
+    build_seconds = time.perf_counter() - start
+
+    saved = app.diet_library
+    app.diet_library = library
+    paths = {'library': [], 'llm': []}
+    try:
+        with quiet():
+            for i, (trimester, conditions, preference) in zip(range(calls), itertools.cycle(REQUESTS)):
+                t0 = time.perf_counter()
+                response = client.post('/diet/plan', headers=headers, json={
+                    'trimester': trimester, 'weight': 52 + i % 30,
+                    'health_conditions': conditions, 'dietary_preference': preference})
+                elapsed = time.perf_counter() - t0
+                paths[response.get_json().get('source', 'llm')].append(elapsed)
+    finally:
+        app.diet_library = saved
+
+    results = {}
+    for source, latencies in paths.items():
+        if latencies and (not only or source in only):
+            results[f"cohorts.{source}"] = summarize(latencies)
+    served = sum(len(v) for v in paths.values())
+    for result in results.values():
+        result['hit_rate'] = len(paths['library']) / served
+        result['library_plans'] = len(library)
+        result['build_seconds'] = build_seconds
+        result['build_failures'] = len(failures)
+    return results
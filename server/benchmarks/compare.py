@@ -0,0 +1,59 @@
+"""Compare two benchmark result files and flag regressions.
+
+Usage: python benchmarks/compare.py BASE.json NEW.json [--threshold 0.15]
+Exits with status 1 when any shared benchmark's p50/p95 latency grows, or
+its throughput drops, by more than the threshold.
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ('p50_ms', 'p95_ms')
+
+
+def compare(base, new, threshold):
+    regressions = []
+    rows = []
+    for name in sorted(set(base) & set(new)):
+        old_stats, new_stats = base[name], new[name]
+        for key in LATENCY_KEYS:
+            if key not in old_stats or key not in new_stats or not old_stats[key]:
+                continue
+            change = new_stats[key] / old_stats[key] - 1
+            rows.append((name, key, old_stats[key], new_stats[key], change))
+            if change > threshold:
+                regressions.append((name, key, change))
+        if old_stats.get('throughput_rps') and new_stats.get('throughput_rps'):
+            change = new_stats['throughput_rps'] / old_stats['throughput_rps'] - 1
+            rows.append((name, 'throughput_rps', old_stats['throughput_rps'],
+                         new_stats['throughput_rps'], change))
+            if change < -threshold:
+                regressions.append((name, 'throughput_rps', change))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare benchmark result files')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.15)
+    args = parser.parse_args(argv)
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows, regressions = compare(base['results'], new['results'], args.threshold)
+    print(f"base={base['meta'].get('commit')} new={new['meta'].get('commit')}")
+    for name, key, old, cur, change in rows:
+        print(f"{name:32s} {key:15s} {old:12.3f} -> {cur:12.3f} ({change:+.1%})")
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}:")
+        for name, key, change in regressions:
+            print(f"  {name} {key} {change:+.1%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
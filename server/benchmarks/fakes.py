@@ -0,0 +1,390 @@
+"""In-process stand-ins for the external services used by the API.
+
+FakeSupabase mimics the subset of the supabase-py query builder used by
+app.py. FakeLLMServer and FakeNodeServer are real HTTP servers bound to
+localhost so the `requests` code path in app.py is exercised unchanged.
+"""
+import json
+import threading
+import time
+import uuid
+from copy import deepcopy
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class FakeQuery:
+    def __init__(self, store, table):
+        self.store = store
+        self.table_name = table
+        self.action = 'select'
+        self.columns = None
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.order_desc = False
+        self.row_limit = None
+        self.row_range = None
+
+    def select(self, columns='*', **kwargs):
+        self.action = 'select'
+        if columns and columns != '*':
+            self.columns = [c.strip() for c in columns.split(',')]
+        return self
+
+    def insert(self, payload, **kwargs):
+        self.action = 'insert'
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, **kwargs):
+        self.action = 'upsert'
+        self.payload = payload
+        return self
+
+    def update(self, payload, **kwargs):
+        self.action = 'update'
+        self.payload = payload
+        return self
+
+    def delete(self, **kwargs):
+        self.action = 'delete'
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def neq(self, column, value):
+        self.filters.append(lambda row: row.get(column) != value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) > value)
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) >= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) < value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row.get(column) <= value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.order_by = column
+        self.order_desc = desc
+        return self
+
+    def limit(self, size, **kwargs):
+        self.row_limit = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self.row_range = (start, end)
+        return self
+
+    def execute(self):
+        self.store.before_execute(self.table_name, self.action)
+        with self.store.lock:
+            rows = self.store.tables.setdefault(self.table_name, [])
+            if self.action in ('insert', 'upsert'):
+                return FakeResponse(self._write(rows))
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+            if self.action == 'update':
+                for row in matched:
+                    row.update(deepcopy(self.payload))
+                return FakeResponse(deepcopy(matched))
+            if self.action == 'delete':
+                self.store.tables[self.table_name] = [r for r in rows if r not in matched]
+                return FakeResponse(deepcopy(matched))
+            if self.order_by:
+                matched.sort(key=lambda r: (r.get(self.order_by) is None, r.get(self.order_by)),
+                             reverse=self.order_desc)
+            if self.row_range:
+                matched = matched[self.row_range[0]:self.row_range[1] + 1]
+            if self.row_limit is not None:
+                matched = matched[:self.row_limit]
+            if self.columns:
+                matched = [{c: row.get(c) for c in self.columns} for row in matched]
+            return FakeResponse(deepcopy(matched))
+
+    def _write(self, rows):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        written = []
+        for item in payload:
+            # Round-trip through JSON like PostgREST does (tuples -> lists, etc.)
+            row = json.loads(json.dumps(item, default=str))
+            row.setdefault('id', str(uuid.uuid4()))
+            row.setdefault('created_at', datetime.utcnow().isoformat())
+            if self.action == 'upsert':
+                key = self.store.upsert_keys.get(self.table_name, 'UID')
+                existing = next((r for r in rows if key in row and r.get(key) == row[key]), None)
+                if existing is not None:
+                    existing.update(row)
+                    written.append(deepcopy(existing))
+                    continue
+            rows.append(row)
+            written.append(deepcopy(row))
+        return written
+
+
+class FakeCall:
+    def __init__(self, store, name, params):
+        self.store = store
+        self.name = name
+        self.params = params
+
+    def execute(self):
+        self.store.before_execute(self.name, 'rpc')
+        function = self.store.functions.get(self.name)
+        if function is None:
+            raise RuntimeError(f"Could not find the function public.{self.name}")
+        with self.store.lock:
+            return FakeResponse(deepcopy(function(self.store.tables, **self.params)))
+
+
+class FakeSupabase:
+    """Thread-safe in-memory replacement for `supabase.Client`.
+
+    `latency` adds a fixed delay per query and `fail_rate` raises
+    ConnectionError on a deterministic fraction of queries, so the API can be measured under a
+    slow or flaky database. With `timeout` set, a query slower than that
+    raises `TimeoutError` after `timeout` seconds, as the HTTP client would.
+    """
+
+    def __init__(self, latency=0.0, fail_rate=0.0, upsert_keys=None, timeout=None):
+        self.tables = {}
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.timeout = timeout
+        self.upsert_keys = upsert_keys or {'chats': 'UID'}
+        self.functions = {}  # name -> fn(tables, **params), for rpc()
+        self.calls = 0
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return FakeCall(self, name, params or {})
+
+    def before_execute(self, table, action):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        if self.timeout is not None and self.latency > self.timeout:
+            time.sleep(self.timeout)
+            raise TimeoutError(f"Injected Supabase timeout on {action} {table}")
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and int(calls * self.fail_rate) != int((calls - 1) * self.fail_rate):
+            raise ConnectionError(f"Injected Supabase failure on {action} {table}")
+
+    def seed(self, table, rows):
+        with self.lock:
+            self.tables.setdefault(table, []).extend(deepcopy(rows))
+
+
+class _FakeServer:
+    """Run a BaseHTTPRequestHandler subclass on an ephemeral localhost port."""
+
+    handler_class = None
+
+    def __init__(self):
+        owner = self
+
+        class Handler(self.handler_class):
+            server_owner = owner
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.requests_served = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def count(self):
+        with self.lock:
+            self.requests_served += 1
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        return json.loads(body) if body else {}
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+DEFAULT_REPLY = (
+    "Prakriti: Vata-Pitta\n"
+    "Self-care: 10-minute morning meditation with deep breathing\n"
+    "Music: Soft classical music with nature sounds\n"
+    "Exercise: Gentle prenatal yoga focusing on hip stretches\n"
+    "Ayurveda: Start the day with warm water and a pinch of ginger\n"
+    "- Ginger tea with honey - 1 cup in the morning\n"
+    "- Soaked almonds - 5 every morning"
+)
+
+# Answer to JSON-mode requests (`response_format` / Ollama `format`)
+DEFAULT_JSON_REPLY = json.dumps({
+    'prakriti': 'Vata-Pitta',
+    'remedies': [{'remedy': 'Ginger tea with honey', 'usage': '1 cup in the morning'},
+                 {'remedy': 'Soaked almonds', 'usage': '5 every morning'}],
+    'self_care': '10-minute morning meditation with deep breathing',
+    'music': 'Soft classical music with nature sounds',
+    'exercise': 'Gentle prenatal yoga focusing on hip stretches',
+    'ayurveda_tip': 'Start the day with warm water and a pinch of ginger',
+})
+
+
+class _LLMHandler(_JSONHandler):
+    def do_POST(self):
+        owner = self.server_owner
+        owner.count()
+        payload = self._read_json()
+        status, headers = owner.next_fault()
+        if status:
+            self._send_json(status, {'error': {'message': 'injected fault'}}, headers)
+            return
+        messages = payload.get('messages', [])
+        reply = owner.reply
+        if owner.json_reply is not None and (payload.get('response_format') or payload.get('format')):
+            reply = owner.json_reply
+        content = reply(messages) if callable(reply) else reply
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in messages)
+        completion_tokens = len(content.split())
+        delay = owner.latency
+        if owner.tokens_per_second:
+            delay += completion_tokens / owner.tokens_per_second
+        if delay:
+            time.sleep(delay)
+        usage = {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+        }
+        if self.path.rstrip('/').endswith('/api/chat'):
+            # Ollama native chat API
+            self._send_json(200, {
+                'model': payload.get('model'),
+                'message': {'role': 'assistant', 'content': content},
+                'done': True,
+                'prompt_eval_count': prompt_tokens,
+                'eval_count': completion_tokens,
+            })
+            return
+        self._send_json(200, {
+            'id': f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'model': payload.get('model'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': usage,
+        })
+
+
+class FakeLLMServer(_FakeServer):
+    """OpenAI-compatible (and Ollama `/api/chat`) chat completion server.
+
+    Response time is `latency + completion_tokens / tokens_per_second`.
+    `faults` is a list of `(status, headers)` tuples returned, in order,
+    before normal responses resume, e.g. `[(429, {'Retry-After': '1'})]`.
+    JSON-mode requests get `json_reply` (None answers them with `reply`).
+    """
+
+    handler_class = _LLMHandler
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, reply=DEFAULT_REPLY, json_reply=DEFAULT_JSON_REPLY):
+        super().__init__()
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.json_reply = json_reply
+        self.faults = []
+
+    @property
+    def chat_url(self):
+        return f"{self.url}/openai/v1/chat/completions"
+
+    def next_fault(self):
+        with self.lock:
+            if self.faults:
+                return self.faults.pop(0)
+        return None, None
+
+
+class _NodeHandler(_JSONHandler):
+    def do_GET(self):
+        owner = self.server_owner
+        owner.count()
+        if owner.latency:
+            time.sleep(owner.latency)
+        if owner.status != 200:
+            self._send_json(owner.status, {'error': 'injected fault'})
+            return
+        self._send_json(200, {'recent_diagnoses': list(owner.diagnoses)})
+
+
+class FakeNodeServer(_FakeServer):
+    """Stand-in for the Node reports service (`/api/reports/diagnosis`)."""
+
+    handler_class = _NodeHandler
+
+    def __init__(self, latency=0.0, diagnoses=('mild anemia',), status=200):
+        super().__init__()
+        self.latency = latency
+        self.diagnoses = diagnoses
+        self.status = status
@@ -0,0 +1,98 @@
+"""Fault injection: dependency outages with circuit breakers and fallbacks.
+
+Each scenario first serves a few requests against healthy fakes (so the
+last-known-good caches hold real values), then degrades one dependency and
+records latency, status codes and the breaker state afterwards.
+"""
+import time
+from collections import Counter
+
+from fakes import FakeLLMServer
+from harness import quiet, summarize
+from gateway import MESSAGES, _gateway
+
+USER = '00000000-0000-4000-8000-00000000fa17'
+REMEDY = {'symptoms': ['headache', 'blurred vision'], 'node_token': 'nt_bench'}
+
+
+def _drive(fn, calls):
+    latencies, statuses = [], Counter()
+    start = time.perf_counter()
+    with quiet():
+        for i in range(calls):
+            t0 = time.perf_counter()
+            statuses[fn(i)] += 1
+            latencies.append(time.perf_counter() - t0)
+    result = summarize(latencies, time.perf_counter() - start,
+                       sum(n for code, n in statuses.items() if code >= 400))
+    result['status_codes'] = {str(k): v for k, v in sorted(statuses.items())}
+    return result
+
+
+def _reset(app_module):
+    app_module.breakers.reset()
+    app_module.last_known_good = type(app_module.last_known_good)()
+
+
+def _node_hang(harness, calls):
+    """Node stops answering: requests should pay NODE_TIMEOUT only until the breaker opens."""
+    app = harness.app_module
+    _reset(app)
+    headers = harness.headers(USER)
+    remedy = lambda i: harness.client.post('/ayurveda/remedy_recommendation', headers=headers,
+                                           json=REMEDY).status_code
+    _drive(remedy, 3)
+    saved = app.NODE_TIMEOUT, harness.node.latency
+    app.NODE_TIMEOUT, harness.node.latency = 0.2, 2.0
+    try:
+        result = _drive(remedy, calls)
+    finally:
+        app.NODE_TIMEOUT, harness.node.latency = saved
+    result['breaker'] = app.breakers.get('node').snapshot()
+    result['last_known_good'] = app.last_known_good.snapshot()
+    return result
+
+
+def _supabase_outage(harness, calls):
+    """Supabase hangs: vitals reads fall back to the last good row, then fail fast."""
+    app = harness.app_module
+    _reset(app)
+    headers = harness.headers(USER)
+    harness.db.seed('vitals', [{'UID': USER, 'systolic_bp': 118, 'diastolic_bp': 76, 'blood_glucose': 92,
+                                'body_temp': 36.7, 'heart_rate': 80, 'created_at': '2025-01-01T08:00:00'}])
+    recommend = lambda i: harness.client.get('/recommendations/', headers=headers).status_code
+    _drive(recommend, 3)
+    harness.db.latency, harness.db.timeout = 2.0, 0.2
+    try:
+        result = _drive(recommend, calls)
+    finally:
+        harness.db.latency, harness.db.timeout = 0.0, None
+    result['breaker'] = app.breakers.get('supabase').snapshot()
+    result['last_known_good'] = app.last_known_good.snapshot()
+    return result
+
+
+def _llm_primary_down(calls):
+    """Groq returns 500s: once its breaker opens no further requests should reach it."""
+    with FakeLLMServer(latency=0.2) as remote, FakeLLMServer(latency=0.02) as local:
+        remote.faults = [(500, {})] * (calls * 2)
+        gateway = _gateway(remote, local, probe_interval=0)
+        result = _drive(lambda i: 200 if gateway.chat(MESSAGES, coalesce=False) else 500, calls)
+        result['remote_requests'] = remote.requests_served
+        result['breaker'] = gateway.backends[0].breaker.snapshot()
+    return result
+
+
+def run(harness, calls=30, only=None):
+    scenarios = {
+        'node_hang': lambda: _node_hang(harness, calls),
+        'supabase_outage': lambda: _supabase_outage(harness, calls),
+        'llm_primary_down': lambda: _llm_primary_down(calls),
+    }
+    results = {}
+    for name, scenario in scenarios.items():
+        if only and name not in only:
+            continue
+        results[f"faults.{name}"] = scenario()
+    _reset(harness.app_module)
+    return results
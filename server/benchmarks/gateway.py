@@ -0,0 +1,84 @@
+"""LLM gateway routing scenarios against two local fake servers.
+
+The "remote" fake plays Groq (OpenAI-compatible) and the "local" fake plays
+Ollama (`/api/chat`). Each scenario reports latency and which backend
+answered, so routing changes show up in the stored results.
+"""
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fakes import FakeLLMServer
+from harness import summarize
+from llm_gateway import LLMGateway, OllamaBackend, OpenAICompatibleBackend
+
+MESSAGES = [{'role': 'user', 'content': 'Suggest a light breakfast for the second trimester.'}]
+
+
+def _gateway(remote, local, **kwargs):
+    return LLMGateway([
+        OpenAICompatibleBackend('groq', remote.chat_url, 'bench-key', 'bench-remote', timeout=10),
+        OllamaBackend('ollama', local.url, 'bench-local', timeout=10),
+    ], **kwargs)
+
+
+def _drive(gateway, calls):
+    latencies, served, errors = [], Counter(), 0
+    start = time.perf_counter()
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        try:
+            served[gateway.chat(MESSAGES).backend] += 1
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - t0)
+    result = summarize(latencies, time.perf_counter() - start, errors)
+    result['served_by'] = dict(served)
+    result.update({k: v for k, v in gateway.snapshot().items() if k.startswith('hedges')})
+    return result
+
+
+def _burst(remote, local, callers=32, rounds=5):
+    """Simulate a push-notification cohort sending the same prompt at once."""
+    gateway = _gateway(remote, local)
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        for _ in range(rounds):
+            def one(_):
+                t0 = time.perf_counter()
+                gateway.chat(MESSAGES)
+                return time.perf_counter() - t0
+            for future in [pool.submit(one, i) for i in range(callers)]:
+                try:
+                    latencies.append(future.result())
+                except Exception:
+                    errors += 1
+    result = summarize(latencies, time.perf_counter() - start, errors)
+    result['upstream_requests'] = remote.requests_served + local.requests_served
+    result['coalescing'] = gateway.flights.snapshot()
+    return result
+
+
+def run(harness=None, calls=40, only=None):
+    scenarios = {
+        # Remote healthy: everything should stay on the preferred backend.
+        'healthy': dict(remote_latency=0.02, faults=[], hedge=False),
+        # Remote returns 429 with Retry-After: traffic moves to the local model.
+        'rate_limited': dict(remote_latency=0.02, faults=[(429, {'Retry-After': '30'})], hedge=False),
+        # Remote has a slow tail: hedged duplicates should cap latency.
+        'slow_tail_hedged': dict(remote_latency=0.3, faults=[], hedge=True),
+    }
+    results = {}
+    for name, cfg in scenarios.items():
+        if only and name not in only:
+            continue
+        with FakeLLMServer(latency=cfg['remote_latency']) as remote, \
+                FakeLLMServer(latency=0.05) as local:
+            remote.faults = list(cfg['faults'])
+            gateway = _gateway(remote, local, hedge=cfg['hedge'], hedge_delay=0.1)
+            results[f"gateway.{name}"] = _drive(gateway, calls)
+    if not only or 'coalesced_burst' in only:
+        with FakeLLMServer(latency=0.2) as remote, FakeLLMServer(latency=0.2) as local:
+            results['gateway.coalesced_burst'] = _burst(remote, local)
+    return results
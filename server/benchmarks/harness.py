@@ -0,0 +1,161 @@
+"""Boot `api/app.py` against local fakes and provide timing helpers."""
+import contextlib
+import io
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from fakes import FakeLLMServer, FakeNodeServer, FakeSupabase
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(SERVER_DIR, 'api')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+JWT_SECRET = 'benchmark-secret'
+
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+
+class Harness:
+    """Owns the fake services and the imported `app` module.
+
+    app.py resolves its .sav/.pkl files relative to the working directory
+    and the ayurvedic pickles reference classes on `__main__`, so both are
+    arranged here exactly as `python app.py` would see them. State the app
+    writes (drift windows, shadow results, report cache) goes to a temporary
+    directory instead of server/models.
+    """
+
+    def __init__(self, llm_latency=0.05, llm_tokens_per_second=400.0, node_latency=0.01,
+                 db_latency=0.0):
+        self.llm = FakeLLMServer(latency=llm_latency, tokens_per_second=llm_tokens_per_second)
+        self.node = FakeNodeServer(latency=node_latency)
+        self.db = FakeSupabase(latency=db_latency)
+        self.app_module = None
+        self.client = None
+        self.state_dir = None
+
+    def start(self):
+        self.llm.start()
+        self.node.start()
+        self.state_dir = tempfile.mkdtemp(prefix='ayurjanani-bench-')
+        os.environ.update({
+            'SUPABASE_URL': 'http://127.0.0.1:9',
+            'SUPABASE_KEY': 'benchmark-anon-key',
+            'SUPABASE_JWT_SECRET': JWT_SECRET,
+            'GROQ_API_KEY': 'benchmark-groq-key',
+            'GROQ_API_URL': self.llm.chat_url,
+            'OLLAMA_API_HOST': self.llm.url,
+            'OLLAMA_MODEL_ID': 'benchmark-model',
+            'NODE_API_URL': self.node.url,
+            'DRIFT_STATE_DIR': os.path.join(self.state_dir, 'drift'),
+            'SHADOW_DB_PATH': os.path.join(self.state_dir, 'shadow', 'shadow.sqlite'),
+            'REPORTS_CACHE_DIR': os.path.join(self.state_dir, 'reports'),
+            'SEMANTIC_CACHE_REVIEW_PATH': os.path.join(self.state_dir, 'review.jsonl'),
+        })
+        logging.disable(logging.CRITICAL)
+        import __main__
+        import ml_models
+        for name in ('SymptomClassifier', 'SymptomRiskModel', 'RemedyRecommendationModel'):
+            setattr(__main__, name, getattr(ml_models, name))
+        cwd = os.getcwd()
+        os.chdir(API_DIR)
+        try:
+            with quiet():
+                import app as app_module
+                # Models resolve relative to api/, so finish the warm-up here.
+                app_module.warmup.wait()
+        finally:
+            os.chdir(cwd)
+        # Keep app's circuit-breaker proxy, but point it at the fake.
+        app_module.supabase.client = self.db
+        # Per-user rate limits would skew the endpoint benchmarks; the
+        # admission suite turns the controller on for its own scenarios.
+        app_module.admission.enabled = False
+        self.app_module = app_module
+        self.client = app_module.app.test_client()
+        return self
+
+    def stop(self):
+        self.llm.stop()
+        self.node.stop()
+        if self.state_dir:
+            shutil.rmtree(self.state_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def token(self, user_id):
+        import jwt
+        return jwt.encode({'sub': user_id, 'aud': 'authenticated',
+                           'exp': int(time.time()) + 3600}, JWT_SECRET, algorithm='HS256')
+
+    def headers(self, user_id):
+        return {'Authorization': f'Bearer {self.token(user_id)}'}
+
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the endpoint `print` calls so they don't dominate timings."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def summarize(latencies, elapsed=None, errors=0):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    if not n:
+        return {'count': 0, 'errors': errors}
+
+    def pct(p):
+        return latencies[min(n - 1, int(round(p / 100.0 * (n - 1))))]
+
+    result = {
+        'count': n,
+        'errors': errors,
+        'mean_ms': statistics.fmean(latencies) * 1000,
+        'p50_ms': pct(50) * 1000,
+        'p95_ms': pct(95) * 1000,
+        'p99_ms': pct(99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+    if elapsed:
+        result['throughput_rps'] = n / elapsed
+    return result
+
+
+def time_calls(fn, iterations, warmup=10):
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def run_metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                         cwd=SERVER_DIR, stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = 'unknown'
+    return {
+        'commit': commit,
+        'timestamp': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
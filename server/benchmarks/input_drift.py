@@ -0,0 +1,94 @@
+"""Drift monitor cost and sensitivity.
+
+`observe_*` is the per-prediction overhead the handlers pay. `merge_workers`
+merges the fetal state files of 8 simulated worker processes (1000
+predictions each), `check` compares all models with the reference. The
+`detect_*` cases replay the fetal training rows with and without a +15 bpm
+shift of the baseline heart rate and report its PSI/KS; `sketch_bytes_*`
+is the serialized size of the fetal sketches after 1k and 100k
+predictions, which should stay flat.
+"""
+import json
+import os
+import random
+import tempfile
+
+import pandas as pd
+
+import drift
+from harness import API_DIR, time_calls
+
+MATERNAL = [28.0, 135.0, 88.0, 7.5, 98.0, 85.0]
+SYMPTOM_RISK = [120, 80, 90, 36.8, 78, ['nausea', 'fatigue']]
+WORKERS = 8
+
+
+def fetal_rows():
+    from train_models import SPECS, preprocess
+    X, _ = preprocess(pd.read_csv(os.path.join(API_DIR, '..', 'models', 'fetal_health.csv')), SPECS['fetal'])
+    return X[drift.FEATURES['fetal']].values.tolist()
+
+
+def replay(rows, state_dir, n, shift=0.0, seed=0):
+    rng = random.Random(seed)
+    monitor = drift.DriftMonitor(reference=drift.load_reference(), state_dir=state_dir, interval=0, min_count=1)
+    for _ in range(n):
+        row = list(rng.choice(rows))
+        row[0] += shift
+        monitor.observe('fetal', row)
+    return monitor
+
+
+def sketch_bytes(monitor):
+    return len(json.dumps({name: s.to_dict() for name, s in monitor.merged('fetal').items()}))
+
+
+def run(harness=None, iterations=20000, only=None):
+    rows = fetal_rows()
+    results = {}
+
+    def wanted(name):
+        return not only or f"drift.{name}" in only or name in only
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        monitor = drift.DriftMonitor(reference=drift.load_reference(), state_dir=state_dir, interval=0)
+        row = rows[0]
+        cases = {
+            'observe_fetal': lambda: monitor.observe('fetal', row),
+            'observe_maternal': lambda: monitor.observe('maternal', MATERNAL),
+            'observe_symptom_risk': lambda: monitor.observe('symptom_risk', SYMPTOM_RISK),
+        }
+        for name, fn in cases.items():
+            if wanted(name):
+                results[f"drift.{name}"] = time_calls(fn, iterations)
+
+        # Other workers' windows, as their flushers leave them (pids that aren't ours)
+        os.makedirs(os.path.join(state_dir, 'fetal'), exist_ok=True)
+        for i in range(WORKERS):
+            worker, pid = replay(rows, state_dir, 1000, seed=i), 10 ** 6 + i
+            for window_id, sketches in worker._windows['fetal'].items():
+                features = {n: s.to_dict() for n, s in zip(drift.FEATURES['fetal'], sketches)}
+                with open(os.path.join(state_dir, 'fetal', f"{window_id}-{pid}.json"), 'w') as f:
+                    json.dump({'window': window_id, 'pid': pid, 'features': features}, f)
+        if wanted('merge_workers'):
+            results['drift.merge_workers'] = {**time_calls(lambda: monitor.merged('fetal'), 50, warmup=2),
+                                              'workers': WORKERS,
+                                              'predictions': monitor.merged('fetal')['histogram_mean'].count}
+        if wanted('check'):
+            results['drift.check'] = time_calls(monitor.check, 50, warmup=2)
+
+    for name, shift in (('detect_none', 0.0), ('detect_shift', 15.0)):
+        if not wanted(name):
+            continue
+        with tempfile.TemporaryDirectory() as state_dir:
+            report = replay(rows, state_dir, 5000, shift=shift).check()['fetal']
+        baseline = report['features']['baseline value']
+        results[f"drift.{name}"] = {'count': baseline['count'], 'psi': baseline['psi'], 'ks': baseline['ks'],
+                                    'status': baseline['status'], 'drifted': report['drifted']}
+
+    for n in (1000, 100000):
+        name = f"sketch_bytes_{n}"
+        if wanted(name):
+            with tempfile.TemporaryDirectory() as state_dir:
+                results[f"drift.{name}"] = {'count': n, 'bytes': sketch_bytes(replay(rows, state_dir, n))}
+    return results
@@ -0,0 +1,105 @@
+"""Parsing the recommendation and remedy answers.
+
+`lifestyle_legacy_text` is the old path (four `extract_section` calls, a
+regex compiled per call) on the fake's plain-text answer;
+`lifestyle_text` and `lifestyle_json` are `structured.LIFESTYLE.parse` on
+the same answer and on the JSON-mode answer. `remedies_json` likewise.
+
+`corpus_*` parse a set of malformed answers: every valid JSON answer
+wrapped in a `<think>` block and a code fence, and cut off at each tenth of
+its length (as `max_tokens` does). The outcome counts show how much the
+bounded repair recovers; `failed` answers had nothing usable.
+`endpoint_recommendations` checks `/recommendations/` end to end in JSON mode.
+"""
+import json
+import re
+from collections import Counter
+
+from fakes import DEFAULT_JSON_REPLY, DEFAULT_REPLY
+from harness import time_calls
+
+import structured
+
+LIFESTYLE_JSON = json.dumps({k: v for k, v in json.loads(DEFAULT_JSON_REPLY).items()
+                             if k in ('self_care', 'music', 'exercise', 'ayurveda_tip')}, indent=2)
+REMEDIES_JSON = json.dumps({k: v for k, v in json.loads(DEFAULT_JSON_REPLY).items()
+                            if k in ('prakriti', 'remedies')}, indent=2)
+
+
+def extract_section(text, section_name):
+    """The parser the lifestyle endpoint used before JSON mode (baseline)."""
+    pattern = re.compile(rf"{section_name}[:\-]?\s*(.*)", re.IGNORECASE)
+    for line in text.splitlines():
+        match = pattern.match(line.strip())
+        if match:
+            value = match.group(1).strip()
+            if value:
+                return value
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if section_name.lower() in line.lower():
+            bullets = []
+            for l in lines[i + 1:]:
+                if l.strip().startswith('-') or l.strip().startswith('*'):
+                    bullets.append(l.strip('-* ').strip())
+                elif l.strip() == '' or l.strip().startswith('#'):
+                    continue
+                else:
+                    break
+            if bullets:
+                return '\n'.join(bullets)
+    return "Not found"
+
+
+def legacy(text):
+    return {name: extract_section(text, name) for name in ('self-care', 'music', 'exercise', 'Ayurveda')}
+
+
+def malformed(answer):
+    yield f"<think>\nThe user is pregnant, keep it gentle.\n</think>\n```json\n{answer}\n```"
+    for tenth in range(1, 10):
+        yield answer[:len(answer) * tenth // 10]
+
+
+def corpus(spec, answer, iterations):
+    texts = list(malformed(answer))
+    outcomes = Counter(spec.parse(text)[1] for text in texts)
+    stats = time_calls(lambda: [spec.parse(text) for text in texts], iterations, warmup=5)
+    stats['per_answer_us'] = round(stats['p50_ms'] * 1000 / len(texts), 2)
+    stats['answers'] = len(texts)
+    stats['outcomes'] = dict(outcomes)
+    stats['failure_rate'] = round(outcomes['failed'] / len(texts), 4)
+    return stats
+
+
+def run(harness, iterations=2000, only=None):
+    results = {}
+
+    def wanted(name):
+        return not only or f"structured.{name}" in only or name in only
+
+    cases = {
+        'lifestyle_legacy_text': lambda: legacy(DEFAULT_REPLY),
+        'lifestyle_text': lambda: structured.LIFESTYLE.parse(DEFAULT_REPLY),
+        'lifestyle_json': lambda: structured.LIFESTYLE.parse(LIFESTYLE_JSON),
+        'remedies_json': lambda: structured.REMEDIES.parse(REMEDIES_JSON),
+    }
+    for name, fn in cases.items():
+        if wanted(name):
+            results[f"structured.{name}"] = time_calls(fn, iterations)
+
+    if wanted('corpus_lifestyle'):
+        results['structured.corpus_lifestyle'] = corpus(structured.LIFESTYLE, LIFESTYLE_JSON, iterations // 10)
+    if wanted('corpus_remedies'):
+        results['structured.corpus_remedies'] = corpus(structured.REMEDIES, REMEDIES_JSON, iterations // 10)
+
+    if wanted('endpoint_recommendations') and harness is not None:
+        headers = harness.headers('bench-structured')
+        response = harness.client.get('/recommendations/', headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        assert 'Not found' not in body.values(), body
+        stats = harness.client.get('/llm/output/stats', headers=headers).get_json()
+        results['structured.endpoint_recommendations'] = {
+            'outcomes': stats['specs']['lifestyle_recommendations']['outcomes'], 'json_mode': stats['json_mode']}
+    return results
@@ -0,0 +1,101 @@
+"""Scenario load tests, one per API namespace, driven through the WSGI app."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import quiet, summarize
+from micro import FETAL_ROW
+
+USERS = [f"00000000-0000-4000-8000-{i:012d}" for i in range(50)]
+
+
+def _maternal(client, headers, i):
+    return client.post('/maternal/predict', headers=headers, json={
+        'age': 25 + i % 15, 'systolic_bp': 110 + i % 40, 'diastolic_bp': 70 + i % 20,
+        'blood_glucose': 90 + i % 30, 'body_temp': 36.8, 'heart_rate': 70 + i % 20,
+    })
+
+
+def _fetal(client, headers, i):
+    row = list(FETAL_ROW)
+    row[0] = 110.0 + i % 40
+    return client.post('/fetal/predict', headers=headers, json={'features': row})
+
+
+def _diet(client, headers, i):
+    return client.post('/diet/plan', headers=headers, json={
+        'trimester': ('first', 'second', 'third')[i % 3], 'weight': 60 + i % 15,
+        'health_conditions': 'mild morning sickness', 'dietary_preference': 'vegetarian',
+    })
+
+
+def _chat(client, headers, i):
+    if i % 4 == 0:
+        return client.get('/chat/history', headers=headers)
+    return client.post('/chat/history', headers=headers,
+                       json={'message': 'What foods are good for morning sickness?'})
+
+
+def _ayurveda(client, headers, i):
+    kind = i % 3
+    if kind == 0:
+        return client.post('/ayurveda/classify_symptoms', headers=headers,
+                           json={'symptoms': ['mild headache', 'lower back pain', 'fatigue']})
+    if kind == 1:
+        return client.post('/ayurveda/map_symptom_risk', headers=headers,
+                           json={'symptom_categories': ['headache', 'edema']})
+    return client.post('/ayurveda/remedy_recommendation', headers=headers,
+                       json={'symptoms': ['morning sickness', 'fatigue'], 'node_token': 'nt_bench'})
+
+
+def _recommendations(client, headers, i):
+    return client.get('/recommendations/', headers=headers)
+
+
+SCENARIOS = {
+    'maternal': _maternal,
+    'fetal': _fetal,
+    'diet': _diet,
+    'chat': _chat,
+    'ayurveda': _ayurveda,
+    'recommendations': _recommendations,
+}
+
+
+def run_scenario(harness, fn, requests_total=200, concurrency=8):
+    """Issue `requests_total` calls from `concurrency` threads and summarize."""
+    headers = [harness.headers(user) for user in USERS]
+    latencies = []
+    errors = [0]
+    statuses = {}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, 'client'):
+            local.client = harness.app_module.app.test_client()
+        t0 = time.perf_counter()
+        response = fn(local.client, headers[i % len(headers)], i)
+        elapsed = time.perf_counter() - t0
+        with lock:
+            latencies.append(elapsed)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 400:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    with quiet(), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_total)))
+    result = summarize(latencies, time.perf_counter() - start, errors[0])
+    result['concurrency'] = concurrency
+    result['status_codes'] = {str(k): v for k, v in sorted(statuses.items())}
+    return result
+
+
+def run(harness, requests_total=200, concurrency=8, only=None):
+    results = {}
+    for name, fn in SCENARIOS.items():
+        if only and name not in only:
+            continue
+        results[f"load.{name}"] = run_scenario(harness, fn, requests_total, concurrency)
+    return results
@@ -0,0 +1,91 @@
+"""Microbenchmarks for each model's predict path, without HTTP or Flask."""
+import itertools
+import numpy as np
+import pandas as pd
+
+from harness import time_calls
+
+MATERNAL_ROW = [29.0, 120.0, 80.0, 95.5, 37.2, 75.0]
+MATERNAL_COLUMNS = ["Age", "SystolicBP", "DiastolicBP", "BS", "BodyTemp", "HeartRate"]
+FETAL_ROW = [120.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 73.0, 0.5, 43.0, 2.4, 64.0, 62.0, 126.0, 2.0]
+SYMPTOM_TEXT = "mild headache lower back pain fatigue"
+RISK_FEATURES = {
+    "symptoms": ["headache", "edema"],
+    "systolic_bp": 135, "diastolic_bp": 88, "blood_glucose": 110,
+    "body_temp": 37.0, "heart_rate": 85,
+}
+REMEDY_INPUT = {"symptoms": ["morning_sickness", "nausea"], "prakriti": "vata"}
+
+
+def benchmarks(app_module):
+    """Return `{name: callable}` for every model that loaded."""
+    m = app_module
+    cases = {}
+    # Resolve the lazy handles so the timings measure the models, not the proxy.
+    maternal_model, maternal_scaler = m.maternal_model.get(), m.maternal_scaler.get()
+    fetal_model, fetal_scaler = m.fetal_model.get(), m.fetal_scaler.get()
+    symptom_classifier = m.symptom_classifier.get()
+    symptom_risk_model = m.symptom_risk_model.get()
+    remedy_model = m.remedy_model.get()
+
+    def maternal():
+        features = pd.DataFrame([MATERNAL_ROW], columns=MATERNAL_COLUMNS)
+        return maternal_model.predict(maternal_scaler.transform(features))
+
+    def fetal():
+        features = np.array(FETAL_ROW, dtype=float).reshape(1, -1)
+        return fetal_model.predict(fetal_scaler.transform(features))
+
+    cases['maternal_predict'] = maternal
+    cases['fetal_predict'] = fetal
+
+    # The exported ensembles the endpoints predict with (scaling included)
+    for name, handle, row in (('maternal', m.maternal_portable, MATERNAL_ROW), ('fetal', m.fetal_portable, FETAL_ROW)):
+        exported = handle.get()
+        if exported is not None:
+            X = np.array([row], dtype=float)
+            cases[f'{name}_predict_portable'] = lambda e=exported, X=X: e.predict(X)
+
+    # Explanation overhead: uncached (max_entries=0 evicts every entry) and cached.
+    for name, model, scaler, row in (('maternal', maternal_model, maternal_scaler, MATERNAL_ROW),
+                                     ('fetal', fetal_model, fetal_scaler, FETAL_ROW)):
+        names = scaler.feature_names_in_
+        uncached = m.Explainer(model, scaler, names, max_entries=0)
+        cached = m.Explainer(model, scaler, names)
+        X = np.array([row], dtype=float)
+        cases[f'{name}_explain'] = lambda e=uncached, X=X: e.explain(X)
+        cases[f'{name}_explain_cached'] = lambda e=cached, X=X: e.explain(X)
+
+    if symptom_classifier is not None:
+        cases['symptom_classify'] = lambda: (symptom_classifier.predict([SYMPTOM_TEXT]),
+                                             symptom_classifier.predict_proba([SYMPTOM_TEXT]))
+    if symptom_risk_model is not None:
+        def risk():
+            X = m.encode_features_for_model(RISK_FEATURES, symptom_risk_model)
+            return (symptom_risk_model.model.predict(X),
+                    symptom_risk_model.model.predict_proba(X))
+        cases['symptom_risk'] = risk
+    if remedy_model is not None:
+        cases['remedy_recommend'] = lambda: remedy_model.predict_with_confidence(REMEDY_INPUT)
+
+    # A standalone engine so the app's users and loader are untouched.
+    trends = type(m.trend_engine)()
+    vitals = {k: v for k, v in RISK_FEATURES.items() if k != 'symptoms'}
+    cases['trend_update'] = lambda: trends.update('bench-user', vitals)
+
+    tracking = type(m.tracking_engine)()
+    clock = itertools.count(1_700_000_000, 90)
+    cases['kick_ingest_batch10'] = lambda: tracking.add_kicks('bench-user', [next(clock) for _ in range(10)])
+    cases['contraction_ingest'] = lambda: tracking.add_contractions(
+        'bench-user', [{'start_time': next(clock), 'duration': 60}])
+    cases['contraction_summary'] = lambda: tracking.contraction_summary('bench-user')
+    return cases
+
+
+def run(harness, iterations=200, only=None):
+    results = {}
+    for name, fn in benchmarks(harness.app_module).items():
+        if only and name not in only:
+            continue
+        results[f"micro.{name}"] = time_calls(fn, iterations)
+    return results
@@ -0,0 +1,134 @@
+"""Exported (portable) models against the pickled ones.
+
+`parity_*` is the agreement check: the predicted class from the exported
+ensemble must equal the native model's on every row (CTG dataset rows for
+the fetal model, and random rows spanning each scaler's range with a margin
+beyond it, some with missing values), and the class probabilities must
+match within `portable.PROBA_TOLERANCE`. The scaled inputs must be
+identical. Any disagreement fails the suite.
+
+`predict_*` time one row and a batch of 1000 through each path, scaling
+included. `import_*` is the cost of a fresh interpreter importing what each
+path needs. `endpoint_*` time the prediction endpoints with the exported
+models and with the pickled fallback.
+"""
+import os
+import subprocess
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from harness import API_DIR, time_calls
+
+import portable
+from warmup import Lazy
+
+FETAL_DATA = os.path.join(API_DIR, '..', 'models', 'fetal_health.csv')
+IMPORTS = {
+    'native': 'import joblib, sklearn, lightgbm, xgboost, pandas',
+    'portable': 'import numpy, portable',
+}
+
+
+def import_ms(statement, repeats=5):
+    samples = []
+    for _ in range(repeats):
+        proc = subprocess.run([sys.executable, '-c', f"import time; t = time.perf_counter(); {statement}; "
+                               "print(time.perf_counter() - t)"], cwd=API_DIR, capture_output=True, text=True)
+        if proc.returncode:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+        samples.append(float(proc.stdout.split()[-1]) * 1000)
+    return round(sorted(samples)[len(samples) // 2], 1)
+
+
+def parity_sets(name, ensemble):
+    sets = {'sampled': portable.sample_rows(ensemble, 20000, seed=11)}
+    with_missing = portable.sample_rows(ensemble, 5000, seed=12)
+    with_missing[np.random.default_rng(13).random(with_missing.shape) < 0.15] = np.nan
+    sets['missing'] = with_missing
+    if name == 'fetal' and os.path.exists(FETAL_DATA):
+        import pandas as pd
+        sets['dataset'] = pd.read_csv(FETAL_DATA)[ensemble.features].to_numpy(dtype=float)
+    return sets
+
+
+def run(harness, iterations=200, only=None):
+    results = {}
+
+    def wanted(name):
+        return not only or f"portable.{name}" in only or name in only
+
+    for name, (model_file, scaler_file, export_file) in portable.MODELS.items():
+        model = joblib.load(os.path.join(API_DIR, model_file))
+        scaler = joblib.load(os.path.join(API_DIR, scaler_file))
+        started = time.perf_counter()
+        document = portable.export(model, scaler)
+        export_s = time.perf_counter() - started
+        ensemble = portable.TreeEnsemble(document)
+
+        if wanted(f"parity_{name}"):
+            checks = {label: portable.parity(model, scaler, ensemble, X)
+                      for label, X in parity_sets(name, ensemble).items()}
+            failed = {label: check for label, check in checks.items()
+                      if check['agree'] != check['rows'] or not check['proba_close'] or not check['scaled_equal']}
+            assert not failed, f"{name} export disagrees with the native model: {failed}"
+            results[f"portable.parity_{name}"] = {
+                'rows': {label: check['rows'] for label, check in checks.items()},
+                'agree': sum(check['agree'] for check in checks.values()),
+                'max_proba_diff': max(check['max_proba_diff'] for check in checks.values()),
+                'trees': len(document['roots']), 'nodes': len(document['feature']),
+                'max_depth': document['max_depth'], 'export_s': round(export_s, 3),
+                'file_kb': round(os.path.getsize(os.path.join(API_DIR, export_file)) / 1024, 1)
+                if os.path.exists(os.path.join(API_DIR, export_file)) else None,
+            }
+
+        X = portable.sample_rows(ensemble, 1000, seed=21)
+        for size, count in ((1, iterations), (1000, max(iterations // 20, 5))):
+            rows = X[:size]
+            cases = {
+                'native': lambda rows=rows: model.predict(scaler.transform(rows)),
+                'portable': lambda rows=rows: ensemble.predict(rows),
+            }
+            for path, fn in cases.items():
+                label = f"predict_{name}_{path}_{size}"
+                if wanted(label):
+                    results[f"portable.{label}"] = time_calls(fn, count)
+
+    for path, statement in IMPORTS.items():
+        if wanted(f"import_{path}"):
+            results[f"portable.import_{path}"] = {'p50_ms': import_ms(statement)}
+
+    if harness is not None:
+        m = harness.app_module
+        headers = harness.headers('bench-portable')
+        requests = {
+            'maternal': ('/maternal/predict', {'age': 29, 'systolic_bp': 120, 'diastolic_bp': 80,
+                                              'blood_glucose': 95.5, 'body_temp': 36.8, 'heart_rate': 75}),
+            'fetal': ('/fetal/predict', {'features': [120.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 73.0, 0.5, 43.0,
+                                                      2.4, 64.0, 62.0, 126.0, 2.0]}),
+        }
+        for name, (path, body) in requests.items():
+            attr = f"{name}_portable"
+            original = getattr(m, attr)
+            # The app only loads the exports with PORTABLE_MODELS=true
+            exported = Lazy(attr, lambda f=portable.MODELS[name][2]: portable.load(os.path.join(API_DIR, f)))
+            predictions = {}
+            try:
+                for mode, handle in (('portable', exported), ('native', Lazy(attr, lambda: None))):
+                    label = f"endpoint_{name}_{mode}"
+                    setattr(m, attr, handle)
+
+                    def call():
+                        response = harness.client.post(path, headers=headers, json=body)
+                        assert response.status_code == 200, response.get_data(as_text=True)
+                        return response.get_json()
+
+                    predictions[mode] = call()['prediction']
+                    if wanted(label):
+                        results[f"portable.{label}"] = time_calls(call, iterations)
+            finally:
+                setattr(m, attr, original)
+            assert predictions['portable'] == predictions['native'], predictions
+    return results
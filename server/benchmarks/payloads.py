@@ -0,0 +1,67 @@
+"""Request decoding/validation and response encoding cost.
+
+`*_adhoc` reproduces the handlers' previous parsing (stdlib `json.loads`
+then `float(data[...])` / `np.array(..., dtype=float)`, no range checks);
+`*_compiled` is `schemas.loads` plus the compiled validator, which also
+enforces the model's ranges, enums and list sizes. `batch_*` validates a
+list of payloads (per-call time is for the whole batch). `encode_*`
+serializes a fetal response with a NumPy explanation.
+"""
+import json
+
+import numpy as np
+
+import schemas
+from harness import time_calls
+
+MATERNAL = {'age': 28, 'systolic_bp': 135, 'diastolic_bp': 88, 'blood_glucose': 110,
+            'body_temp': 37.0, 'heart_rate': 85}
+FETAL = {'features': [120.0, 0.0, 0.0, 0.0, 0.0, 73.0, 0.5, 43.0, 2.4, 64.0, 62.0, 2.0, 137.0, 73.0, 1.0]}
+DIET = {'trimester': 'second', 'weight': 65.5, 'health_conditions': 'mild morning sickness',
+        'dietary_preference': 'vegetarian'}
+BATCH = 1000
+
+
+def _maternal_adhoc(body):
+    data = json.loads(body)
+    return [float(data[k]) for k in ('age', 'systolic_bp', 'diastolic_bp', 'blood_glucose',
+                                     'body_temp', 'heart_rate')]
+
+
+def _fetal_adhoc(body):
+    features = np.array(json.loads(body)['features'], dtype=float)
+    if features.size != 15:
+        raise ValueError('expected 15')
+    return features.reshape(1, -1)
+
+
+def run(harness, iterations=2000, only=None):
+    m = harness.app_module
+    maternal_body, fetal_body, diet_body = (json.dumps(p).encode() for p in (MATERNAL, FETAL, DIET))
+    batch = [dict(MATERNAL, age=20 + i % 20) for i in range(BATCH)]
+    response = {
+        'prediction': np.int64(1), 'status': 'Suspect',
+        'explanation': {'class': 'Suspect', 'base_value': np.float64(-2.6),
+                        'contributions': [{'feature': f'f{i}', 'value': np.float64(i),
+                                           'contribution': np.float32(0.1 * i)} for i in range(15)],
+                        'raw': np.arange(16, dtype=np.float64)},
+    }
+    cases = {
+        'maternal_adhoc': lambda: _maternal_adhoc(maternal_body),
+        'maternal_compiled': lambda: m.maternal_validator.validate(schemas.loads(maternal_body)),
+        'fetal_adhoc': lambda: _fetal_adhoc(fetal_body),
+        'fetal_compiled': lambda: np.array(m.fetal_validator.validate(schemas.loads(fetal_body))['features'],
+                                           dtype=float).reshape(1, -1),
+        'diet_compiled': lambda: m.diet_validator.validate(schemas.loads(diet_body)),
+        f'batch_{BATCH}_maternal': lambda: m.maternal_validator.validate_batch(batch),
+        'encode_stdlib': lambda: json.dumps(response, default=schemas._default).encode(),
+        'encode_fast': lambda: schemas.dumps(response),
+    }
+    results = {}
+    for name, fn in cases.items():
+        key = f"payload.{name}"
+        if only and key not in only and name not in only:
+            continue
+        n = iterations if not name.startswith('batch_') else max(1, iterations // 100)
+        results[key] = time_calls(fn, n)
+    return results
@@ -0,0 +1,59 @@
+"""Cost of the admin diagnostics on a running worker.
+
+`/maternal/predict` latency with nothing running, while a CPU profile
+samples every 5 ms (and 1 ms) from another thread, and with tracemalloc
+tracing 25 frames. The profile cases also report the sampler's own share
+of the wall time and how many distinct stacks it saw.
+"""
+import threading
+
+from harness import time_calls
+from payloads import MATERNAL
+
+
+def run(harness, iterations=200, only=None):
+    m = harness.app_module
+    headers = harness.headers('bench-profile')
+    results = {}
+
+    def post():
+        response = harness.client.post('/maternal/predict', json=MATERNAL, headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    def wanted(name):
+        return not only or f"profile.{name}" in only or name in only
+
+    if wanted('maternal_baseline'):
+        results['profile.maternal_baseline'] = time_calls(post, iterations)
+
+    for name, interval in (('maternal_sampling_5ms', 0.005), ('maternal_sampling_1ms', 0.001)):
+        if not wanted(name):
+            continue
+        stop = threading.Event()
+        profiles = []
+
+        def sample():
+            while not stop.is_set():
+                profiles.append(m.profiler.profile(0.5, interval))
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        try:
+            stats = time_calls(post, iterations)
+        finally:
+            stop.set()
+            sampler.join()
+        stats['sampler_overhead'] = round(sum(p['overhead'] for p in profiles) / len(profiles), 4)
+        stats['stacks'] = len(set().union(*(p['stacks'] for p in profiles)))
+        results[f"profile.{name}"] = stats
+
+    if wanted('maternal_tracemalloc'):
+        m.allocation_tracker.start(frames=25)
+        try:
+            stats = time_calls(post, iterations)
+            status, rows = m.allocation_tracker.report(top=5, diff=True)
+        finally:
+            m.allocation_tracker.stop()
+        stats['traced_kb'] = status['traced_kb']
+        stats['tracemalloc_overhead_kb'] = status['overhead_kb']
+        results['profile.maternal_tracemalloc'] = stats
+    return results
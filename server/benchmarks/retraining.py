@@ -0,0 +1,69 @@
+"""Out-of-core symptom classifier retraining at growing table sizes.
+
+Synthetic `symptoms` rows (text built from the live model's label names and
+filler phrases) are seeded into a fake Supabase table and streamed through
+`symptom_training.train` in pages. Reported per size: training throughput,
+peak traced memory of the pipeline (should stay flat as rows grow) and the
+held-out scores of the new model next to the live one.
+"""
+import random
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import joblib
+
+import symptom_training as st
+from fakes import FakeSupabase
+from harness import API_DIR
+
+FILLER = ['since yesterday', 'mostly at night', 'after meals', 'feeling very', 'a lot of',
+          'on and off', 'in the morning', 'week 24', 'mild', 'severe', 'and some']
+
+
+def synthetic_rows(labels, n, seed=7):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    for i in range(n):
+        chosen = rng.sample(labels, rng.choice((1, 1, 2, 3)))
+        words = []
+        for label in chosen:
+            words += [rng.choice(FILLER), label.replace('_', ' ')]
+        yield {'reported_symptoms': ' '.join(words), 'classified_categories': chosen,
+               'recorded_at': (start + timedelta(seconds=37 * i)).isoformat()}
+
+
+def run(harness=None, sizes=(2000, 20000), only=None):
+    base = joblib.load(f"{API_DIR}/../models/ayurvedic/symptom_classifier_model.pkl")
+    labels = list(base.label_binarizer.classes_)
+    results = {}
+    for n in sizes:
+        name = f"retrain.rows_{n}"
+        if only and name not in only:
+            continue
+        db = FakeSupabase()
+        db.seed('symptoms', list(synthetic_rows(labels, n)))
+
+        def source(since=None):
+            return st.stream_rows(db, page_size=500, since=since)
+
+        model = st.new_model(base.label_binarizer)
+        t0 = time.perf_counter()
+        seen = st.train(source, model)
+        elapsed = time.perf_counter() - t0
+        # Memory on a second pass; tracing slows training several-fold.
+        tracemalloc.start()
+        st.train(source, st.new_model(base.label_binarizer))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        holdout = [row for row in source() if st.in_holdout(row, 0.1)]
+        results[name] = {
+            'count': seen['rows'],
+            'mean_ms': elapsed / max(1, seen['batches']) * 1000,
+            'throughput_rps': seen['rows'] / elapsed,
+            'peak_mb': peak / 2 ** 20,
+            'f1': st.evaluate(model, holdout)['f1'],
+            'base_f1': st.evaluate(base, holdout)['f1'],
+        }
+    return results
@@ -0,0 +1,119 @@
+"""Run the benchmark suite and store the results as JSON.
+
+Usage (from server/):
+    python benchmarks/run.py                       # micro + load, default fakes
+    python benchmarks/run.py --suite micro --iterations 500
+    python benchmarks/run.py --suite load --only chat diet --llm-latency 0.5
+    python benchmarks/run.py --suite gateway
+    python benchmarks/run.py --suite shedding --llm-latency 0.5
+    python benchmarks/run.py --suite faults
+    python benchmarks/run.py --suite alerts
+    python benchmarks/run.py --suite chat
+    python benchmarks/run.py --suite diet --llm-latency 0.5
+    python benchmarks/run.py --suite startup
+    python benchmarks/run.py --suite retrain
+    python benchmarks/run.py --suite payload --iterations 5000
+    python benchmarks/run.py --suite drift
+    python benchmarks/run.py --suite shadow
+    python benchmarks/run.py --suite profile
+    python benchmarks/run.py --suite reports
+    python benchmarks/run.py --suite structured
+    python benchmarks/run.py --suite portable
+    python benchmarks/startup.py --budget-ms 600   # import-time gate, exits 1 on regression
+    python benchmarks/compare.py benchmarks/results/<old>.json benchmarks/results/<new>.json
+"""
+import argparse
+import json
+import os
+
+import shedding
+import chat_history
+import cohorts
+import early_warning
+import input_drift
+import faults
+import gateway
+import llm_output
+import load
+import micro
+import model_export
+import payloads
+import profiling
+import retraining
+import shadow_eval
+import startup
+import weekly_reports
+from harness import RESULTS_DIR, Harness, run_metadata
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suite', choices=['micro', 'load', 'gateway', 'shedding', 'faults', 'alerts', 'chat', 'diet', 'startup', 'retrain', 'payload', 'drift', 'shadow', 'profile', 'reports', 'structured', 'portable', 'all'], default='all')
+    parser.add_argument('--only', nargs='*', help='Restrict to these benchmark/scenario names')
+    parser.add_argument('--iterations', type=int, default=200, help='Microbenchmark iterations')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per load scenario')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='Fake LLM base latency (s)')
+    parser.add_argument('--llm-tps', type=float, default=400.0, help='Fake LLM tokens per second')
+    parser.add_argument('--node-latency', type=float, default=0.01)
+    parser.add_argument('--db-latency', type=float, default=0.0)
+    parser.add_argument('--out', help='Output JSON path (default: results/<commit>.json)')
+    args = parser.parse_args(argv)
+
+    results = {}
+    with Harness(llm_latency=args.llm_latency, llm_tokens_per_second=args.llm_tps,
+                 node_latency=args.node_latency, db_latency=args.db_latency) as harness:
+        if args.suite in ('micro', 'all'):
+            results.update(micro.run(harness, args.iterations, args.only))
+        if args.suite in ('load', 'all'):
+            results.update(load.run(harness, args.requests, args.concurrency, args.only))
+        if args.suite in ('gateway', 'all'):
+            results.update(gateway.run(harness, only=args.only))
+        if args.suite in ('shedding', 'all'):
+            results.update(shedding.run(harness, only=args.only))
+        if args.suite in ('faults', 'all'):
+            results.update(faults.run(harness, only=args.only))
+        if args.suite in ('alerts', 'all'):
+            results.update(early_warning.run(harness, only=args.only))
+        if args.suite in ('chat', 'all'):
+            results.update(chat_history.run(harness, only=args.only))
+        if args.suite in ('diet', 'all'):
+            results.update(cohorts.run(harness, only=args.only))
+        if args.suite in ('startup', 'all'):
+            results.update(startup.run(harness, only=args.only))
+        if args.suite in ('retrain', 'all'):
+            results.update(retraining.run(harness, only=args.only))
+        if args.suite in ('payload', 'all'):
+            results.update(payloads.run(harness, args.iterations * 10, args.only))
+        if args.suite in ('drift', 'all'):
+            results.update(input_drift.run(harness, args.iterations * 10, args.only))
+        if args.suite in ('shadow', 'all'):
+            results.update(shadow_eval.run(harness, args.iterations, args.only))
+        if args.suite in ('profile', 'all'):
+            results.update(profiling.run(harness, args.iterations, args.only))
+        if args.suite in ('reports', 'all'):
+            results.update(weekly_reports.run(harness, args.only))
+        if args.suite in ('structured', 'all'):
+            results.update(llm_output.run(harness, args.iterations * 10, args.only))
+        if args.suite in ('portable', 'all'):
+            results.update(model_export.run(harness, args.iterations, args.only))
+
+    meta = run_metadata()
+    meta['config'] = {k: v for k, v in vars(args).items() if k != 'out'}
+    out = args.out or os.path.join(RESULTS_DIR, f"{meta['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2, sort_keys=True)
+
+    for name, stats in sorted(results.items()):
+        line = f"{name:32s} p50={stats.get('p50_ms', 0):9.3f}ms p95={stats.get('p95_ms', 0):9.3f}ms"
+        if 'throughput_rps' in stats:
+            line += f" {stats['throughput_rps']:9.1f}/s"
+        if stats.get('errors'):
+            line += f" errors={stats['errors']}"
+        print(line)
+    print(f"Results written to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Shadow evaluation overhead on the request path.
+
+`submit_*` is what a handler pays per prediction (sampled or not).
+`fetal_*` compares `/fetal/predict` latency with no shadow, with the live
+model shadowing itself at a 100% sample, and with a candidate that takes
+50 ms per item behind a 16-item queue (most items are dropped, the
+responses shouldn't slow down). Agreement, drop and deferral counts are
+reported alongside. Admission control is switched on for these scenarios,
+since the shadow thread waits (up to `max_defer`) for it to report no
+request in flight.
+"""
+import os
+import tempfile
+import time
+
+from harness import API_DIR, time_calls
+from payloads import FETAL
+
+import shadow as shadow_module
+
+
+def build(m, store_path, delay=0.0, max_queued=256):
+    def score(candidate, features):
+        if delay:
+            time.sleep(delay)
+        return m.score_fetal_candidate(candidate, features)
+    candidate = shadow_module.Candidate(
+        'fetal', os.path.join(API_DIR, 'fetal_health_model.sav'),
+        lambda: (m.fetal_model.get(), m.fetal_scaler.get()), score)
+    return shadow_module.ShadowEvaluator([candidate], shadow_module.ShadowStore(store_path),
+                                         sample_rate=1.0, max_queued=max_queued,
+                                         busy=lambda: m.admission.in_flight() > 0)
+
+
+def drain(evaluator, timeout=30):
+    deadline = time.time() + timeout
+    while evaluator._queue.unfinished_tasks and time.time() < deadline:
+        if evaluator._queue.empty():
+            time.sleep(0.2)  # last batch being written
+            return
+        time.sleep(0.01)
+
+
+def run(harness, iterations=200, only=None):
+    m = harness.app_module
+    headers = harness.headers('bench-shadow')
+    original, admission_enabled = m.shadow, m.admission.enabled
+    # The shadow thread defers to in-flight requests, which admission tracks
+    m.admission.enabled = True
+    results = {}
+
+    def post():
+        response = harness.client.post('/fetal/predict', json=FETAL, headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            evaluator = build(m, os.path.join(tmp, 'submit.sqlite'), max_queued=10 ** 6)
+            if not only or 'shadow.submit_sampled' in only:
+                results['shadow.submit_sampled'] = time_calls(
+                    lambda: evaluator.submit('fetal', FETAL['features'], 0, 1.0), iterations * 10)
+            evaluator.sample_rate = 0.0
+            if not only or 'shadow.submit_skipped' in only:
+                results['shadow.submit_skipped'] = time_calls(
+                    lambda: evaluator.submit('fetal', FETAL['features'], 0, 1.0), iterations * 10)
+
+            scenarios = [('fetal_off', None),
+                         ('fetal_shadow_all', lambda: build(m, os.path.join(tmp, 'all.sqlite'))),
+                         ('fetal_slow_candidate', lambda: build(m, os.path.join(tmp, 'slow.sqlite'),
+                                                                delay=0.05, max_queued=16))]
+            for name, factory in scenarios:
+                key = f"shadow.{name}"
+                if only and key not in only:
+                    continue
+                m.shadow = factory() if factory else None
+                stats = time_calls(post, iterations)
+                if m.shadow is not None:
+                    drain(m.shadow)
+                    counts = m.shadow.stats()['process']['fetal']
+                    stats.update({k: counts[k] for k in ('sampled', 'dropped', 'scored', 'agreement_rate')})
+                    stats['shadow_p50_ms'] = (counts['shadow_ms'] or {}).get('p50')
+                    stats['deferrals'] = m.shadow.deferrals
+                    stats['forced'] = m.shadow.forced
+                results[key] = stats
+        finally:
+            m.shadow, m.admission.enabled = original, admission_enabled
+    return results
@@ -0,0 +1,73 @@
+"""Clinical latency under LLM saturation, with and without admission control.
+
+Requests arrive open-loop (fixed schedule, independent of completions) and
+are served by a bounded worker pool, like gunicorn's threaded workers, so a
+backlog of slow LLM calls delays everything queued behind it. Each request
+carries `X-Request-Start` with its arrival time, as a proxy would set it,
+and latency is measured from arrival to completion.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import quiet, summarize
+from load import USERS, _chat, _diet, _fetal, _maternal, _recommendations
+
+CLINICAL = (_maternal, _fetal)
+LLM = (_chat, _diet, _recommendations)
+
+
+def _schedule(duration, clinical_rps, llm_rps):
+    arrivals = [(i / clinical_rps, 'clinical', CLINICAL[i % 2]) for i in range(int(duration * clinical_rps))]
+    arrivals += [(i / llm_rps, 'llm', LLM[i % 3]) for i in range(int(duration * llm_rps))]
+    return sorted(arrivals, key=lambda a: a[0])
+
+
+def _run(harness, enabled, duration, workers, clinical_rps, llm_rps):
+    harness.app_module.admission.enabled = enabled
+    headers = [harness.headers(user) for user in USERS]
+    latencies = {'clinical': [], 'llm': []}
+    statuses = {'clinical': Counter(), 'llm': Counter()}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i, kind, fn, arrived):
+        if not hasattr(local, 'client'):
+            local.client = harness.app_module.app.test_client()
+        request_headers = dict(headers[i % len(headers)], **{'X-Request-Start': f"t={arrived:.6f}"})
+        response = fn(local.client, request_headers, i)
+        elapsed = time.time() - arrived
+        with lock:
+            latencies[kind].append(elapsed)
+            statuses[kind][response.status_code] += 1
+
+    start = time.time()
+    with quiet(), ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, (offset, kind, fn) in enumerate(_schedule(duration, clinical_rps, llm_rps)):
+            delay = start + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, i, kind, fn, time.time())
+    elapsed = time.time() - start
+    harness.app_module.admission.enabled = False
+
+    results = {}
+    for kind in ('clinical', 'llm'):
+        ok = [lat for lat in latencies[kind]]
+        result = summarize(ok, elapsed, sum(n for code, n in statuses[kind].items() if code >= 400))
+        result['status_codes'] = {str(k): v for k, v in sorted(statuses[kind].items())}
+        results[kind] = result
+    return results
+
+
+def run(harness, duration=5.0, workers=16, clinical_rps=20, llm_rps=60, only=None):
+    """LLM load is set well above what `workers` can serve at the harness LLM latency."""
+    results = {}
+    for name, enabled in (('unprotected', False), ('admission', True)):
+        if only and name not in only:
+            continue
+        for kind, result in _run(harness, enabled, duration, workers, clinical_rps, llm_rps).items():
+            result.update(workers=workers, clinical_rps=clinical_rps, llm_rps=llm_rps)
+            results[f"shedding.{name}.{kind}"] = result
+    return results
@@ -0,0 +1,116 @@
+"""Worker start-up cost: `import app` under `-X importtime`, and time to ready.
+
+Each sample runs in a fresh interpreter with the warm-up thread disabled,
+so it measures what a gunicorn worker pays before it can accept requests.
+`ready` imports the app and waits for the warm-up (models, indexes).
+
+The gate fails (exit status 1) when the import exceeds `--budget-ms` or
+pulls in one of the `DEFERRED` modules, which must only load on first use
+or in the warm-up thread:
+
+    python benchmarks/startup.py --budget-ms 600
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from harness import API_DIR, JWT_SECRET, summarize
+
+DEFERRED = ('pandas', 'sklearn', 'scipy', 'lightgbm', 'xgboost', 'joblib', 'supabase', 'postgrest')
+
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+READY_SCRIPT = """
+import time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.warmup.wait()
+print(t1 - t0, time.perf_counter() - t0)
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.update({
+        'SUPABASE_URL': 'http://127.0.0.1:9',
+        'SUPABASE_KEY': 'benchmark-anon-key',
+        'SUPABASE_JWT_SECRET': JWT_SECRET,
+        'WARMUP': 'false',
+    })
+    return env
+
+
+def import_profile():
+    """`{module: (self_us, cumulative_us, depth)}` for one `import app`."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                          cwd=API_DIR, env=_env(), capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    profile = {}
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            profile[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return profile
+
+
+def time_to_ready():
+    proc = subprocess.run([sys.executable, '-c', READY_SCRIPT], cwd=API_DIR, env=_env(),
+                          capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    imported, ready = proc.stdout.strip().splitlines()[-1].split()
+    return float(imported), float(ready)
+
+
+def run(harness=None, repeat=5, only=None, top=10):
+    results = {}
+    if not only or 'import' in only:
+        profiles = [import_profile() for _ in range(repeat)]
+        results['startup.import_app'] = summarize([p['app'][1] / 1e6 for p in profiles])
+        last = profiles[-1]
+        # Heaviest direct imports of app.py, cumulative.
+        direct = sorted(((name, cum) for name, (_, cum, depth) in last.items() if depth == 1),
+                        key=lambda item: -item[1])[:top]
+        results['startup.import_app']['top_imports_ms'] = {name: cum / 1000 for name, cum in direct}
+        results['startup.import_app']['deferred_loaded'] = sorted(set(DEFERRED) & set(last))
+    if not only or 'ready' in only:
+        samples = [time_to_ready() for _ in range(max(1, repeat // 2))]
+        results['startup.ready'] = summarize([ready for _, ready in samples])
+    return results
+
+
+def check(results, budget_ms):
+    """Problems that should fail the gate."""
+    stats = results['startup.import_app']
+    problems = []
+    if stats['p50_ms'] > budget_ms:
+        problems.append(f"import app took {stats['p50_ms']:.0f}ms (budget {budget_ms:.0f}ms)")
+    if stats['deferred_loaded']:
+        problems.append(f"imported at start-up: {', '.join(stats['deferred_loaded'])}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import-time gate for api/app.py')
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('IMPORT_BUDGET_MS', 600)))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(repeat=args.repeat, only=['import'])
+    stats = results['startup.import_app']
+    print(f"import app: p50={stats['p50_ms']:.0f}ms max={stats['max_ms']:.0f}ms")
+    for name, ms in stats['top_imports_ms'].items():
+        print(f"  {name:<28} {ms:8.1f}ms")
+    problems = check(results, args.budget_ms)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Weekly report generation.
+
+`endpoint_*` time `GET /reports/weekly` for a patient with two readings a
+day: with no section cache (every section laid out and compressed), with a
+warm cache, and a conditional request that ends in a 304. `bulk_*` render
+200 patients through the process pool into a temporary directory, first
+with an empty cache and then again with every section cached (sections
+with identical rows, such as the same remedies, are shared between
+patients even on the cold run). `stream_peak_*` is the tracemalloc peak
+while rendering a patient with 5000 vitals and 5000 CTG readings at two
+page sizes; it follows the page, not the rows.
+"""
+import functools
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+from fakes import FakeSupabase
+from harness import time_calls
+
+import reports
+
+WEEK = '2025-06-02'
+PATIENTS = 200
+
+
+def week_rows(user_id, seed, readings_per_day=2):
+    rng = random.Random(seed)
+    rows = {'vitals': [], 'ctg': [], 'symptoms': [], 'risk_assessments': [], 'remedy_recommendations': []}
+    for day in range(7):
+        for i in range(readings_per_day):
+            ts = f"2025-06-{2 + day:02d}T{(8 + i * 24 // readings_per_day) % 24:02d}:{i % 60:02d}:00"
+            rows['vitals'].append({'UID': user_id, 'systolic_bp': rng.randint(105, 150), 'diastolic_bp': rng.randint(65, 95),
+                                   'blood_glucose': round(rng.uniform(4.5, 9.0), 1), 'body_temp': 98.4,
+                                   'heart_rate': rng.randint(65, 100), 'prediction': rng.choice([0, 0, 0, 1, 2]),
+                                   'created_at': ts})
+            rows['ctg'].append({'UID': user_id, 'baseline_value': rng.randint(115, 155), 'accelerations': 0.003,
+                                'uterine_contractions': 0.004, 'prolonged_decelerations': 0.0,
+                                'abnormal_short_term_variability': rng.randint(20, 70),
+                                'prediction': rng.choice([0, 0, 1]), 'created_at': ts})
+    for day in rng.sample(range(7), 3):
+        rows['symptoms'].append({'UID': user_id, 'reported_symptoms': 'Morning nausea and mild lower back pain',
+                                 'classified_categories': ['nausea', 'back pain'],
+                                 'recorded_at': f"2025-06-{2 + day:02d}T09:30:00"})
+    rows['risk_assessments'].append({'UID': user_id, 'assessed_at': '2025-06-04T10:00:00',
+                                     'risks': [{'risk_type': 'gestational_diabetes', 'probability': rng.randint(40, 90) / 100,
+                                                'severity': 'medium'},
+                                               {'risk_type': 'preeclampsia', 'probability': 0.31, 'severity': 'low'}]})
+    rows['remedy_recommendations'].append({'UID': user_id, 'prakriti': 'Vata-Pitta', 'recorded_at': '2025-06-05T10:00:00',
+                                           'recommended_remedies': [{'remedy': 'Ginger tea with honey'},
+                                                                    {'remedy': 'Soaked almonds'}]})
+    return rows
+
+
+def seed(db, user_id, seed_value, readings_per_day=2):
+    for table, rows in week_rows(user_id, seed_value, readings_per_day).items():
+        db.seed(table, rows)
+
+
+def fake_client(path):
+    """Worker-side client: a FakeSupabase loaded from a JSON dump of the tables."""
+    db = FakeSupabase()
+    with open(path) as f:
+        for table, rows in json.load(f).items():
+            db.seed(table, rows)
+    return db
+
+
+def run(harness, only=None):
+    m = harness.app_module
+    user_id = 'bench-report'
+    headers = harness.headers(user_id)
+    seed(harness.db, user_id, 0)
+    original = m.report_cache
+    results = {}
+
+    def wanted(name):
+        return not only or f"reports.{name}" in only or name in only
+
+    def get(expect=200, extra=None):
+        response = harness.client.get(f'/reports/weekly?week={WEEK}', headers={**headers, **(extra or {})})
+        assert response.status_code == expect, response.get_data(as_text=True)
+        return response
+
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            if wanted('endpoint_uncached'):
+                m.report_cache = None
+                results['reports.endpoint_uncached'] = {**time_calls(get, 100), 'bytes': len(get().data)}
+            m.report_cache = reports.SectionCache(os.path.join(tmp, 'endpoint'))
+            if wanted('endpoint_cached'):
+                results['reports.endpoint_cached'] = time_calls(get, 100)
+            if wanted('endpoint_not_modified'):
+                etag = get().headers['ETag']
+                results['reports.endpoint_not_modified'] = time_calls(
+                    lambda: get(304, {'If-None-Match': etag}), 100)
+        finally:
+            m.report_cache = original
+
+        if wanted('bulk_cold') or wanted('bulk_warm'):
+            db = FakeSupabase()
+            for i in range(PATIENTS):
+                seed(db, f"patient-{i}", i)
+            dump = os.path.join(tmp, 'tables.json')
+            with open(dump, 'w') as f:
+                json.dump(db.tables, f)
+            factory = functools.partial(fake_client, dump)
+            cache_dir = os.path.join(tmp, 'bulk-cache')
+            for name in ('bulk_cold', 'bulk_warm'):
+                totals = reports.bulk_render(reports.patients_with_data(db, WEEK), WEEK, os.path.join(tmp, 'out'),
+                                             client_factory=factory, cache_dir=cache_dir)
+                if wanted(name):
+                    results[f"reports.{name}"] = {k: totals[k] for k in (
+                        'reports', 'errors', 'seconds', 'reports_per_second', 'sections_rendered', 'sections_cached')}
+                    results[f"reports.{name}"]['workers'] = os.cpu_count()
+
+    for page_size in (100, 1000):
+        name = f"stream_peak_page_{page_size}"
+        if not wanted(name):
+            continue
+        db = FakeSupabase()
+        seed(db, 'heavy', 1, readings_per_day=715)
+        tracemalloc.start()
+        try:
+            pdf, info = reports.render_weekly_report(db, 'heavy', WEEK, page_size=page_size)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[f"reports.{name}"] = {'rows': sum(info['rows'].values()), 'queries': db.calls,
+                                      'peak_kb': round(peak / 1024, 1)}
+    return results
@@ -0,0 +1,30 @@
+"""Shared fixtures. api/ and benchmarks/ go on the path as the app and the
+benchmark harness expect; `harness` boots the app once against the local
+fakes (Supabase, LLM, Node service)."""
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (os.path.join(SERVER_DIR, 'api'), os.path.join(SERVER_DIR, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+@pytest.fixture(scope='session')
+def harness():
+    from harness import Harness
+    with Harness(llm_latency=0.0, llm_tokens_per_second=0.0, node_latency=0.0) as h:
+        yield h
+
+
+@pytest.fixture
+def db(harness):
+    """The harness's fake Supabase, emptied and without injected failures."""
+    harness.db.tables.clear()
+    harness.db.fail_rate = 0.0
+    yield harness.db
+    harness.db.fail_rate = 0.0
+    # Injected failures may have opened the Supabase breaker
+    harness.app_module.breakers.reset()
@@ -0,0 +1,69 @@
+from flask import Flask
+
+from admission import AdmissionController, RequestClass, TokenBuckets
+
+
+def controller(llm_burst=2):
+    return AdmissionController(
+        classes=[
+            RequestClass('default', max_concurrent=8),
+            RequestClass('llm', max_concurrent=1, rate=0.001, burst=llm_burst),
+        ],
+        routes=[
+            ('/chat/history', {'POST'}, 'llm'),
+            ('/diet/plan', None, 'llm', 'default'),
+        ],
+        user_key=lambda req: req.headers.get('X-User'),
+    )
+
+
+def test_async_exemption_only_on_job_routes():
+    admission = controller()
+    async_args = {'async': 'true'}
+    assert admission.classify('POST', '/chat/history', async_args) == ('llm', 'llm')
+    assert admission.classify('POST', '/diet/plan', async_args) == ('default', 'llm')
+    assert admission.classify('POST', '/diet/plan', {}) == ('llm', 'llm')
+    assert admission.classify('GET', '/health', async_args) == ('default', 'default')
+
+
+def test_async_submissions_are_charged_to_the_llm_bucket():
+    admission = controller(llm_burst=2)
+    app = Flask(__name__)
+    admission.init_app(app)
+
+    @app.route('/diet/plan', methods=['POST'])
+    def diet_plan():
+        return {'class': 'ok'}
+
+    client = app.test_client()
+    statuses = [client.post('/diet/plan?async=true', headers={'X-User': 'u1'}).status_code for _ in range(3)]
+    assert statuses == [200, 200, 429]
+    assert admission.classes['default'].counts['admitted'] == 2
+    assert admission.classes['llm'].counts['admitted'] == 0
+    # another user has their own bucket
+    assert client.post('/diet/plan?async=true', headers={'X-User': 'u2'}).status_code == 200
+
+
+def test_async_on_other_llm_routes_still_needs_an_llm_slot():
+    admission = controller()
+    admission.classes['llm'].active = admission.classes['llm'].max_concurrent
+    app = Flask(__name__)
+    admission.init_app(app)
+
+    @app.route('/chat/history', methods=['POST'])
+    def chat():
+        return {}
+
+    response = app.test_client().post('/chat/history?async=true', headers={'X-User': 'u1'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+
+def test_token_buckets_evict_the_least_recently_used_key():
+    buckets = TokenBuckets(rate=0.001, burst=1, max_keys=2)
+    assert buckets.take('drained') == 0
+    assert buckets.take('idle') == 0
+    assert buckets.take('drained') > 0  # used again: now the most recent
+    assert buckets.take('new') == 0  # over max_keys: 'idle' goes, not 'drained'
+    assert 'idle' not in buckets._buckets
+    assert buckets.take('drained') > 0
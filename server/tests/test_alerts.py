@@ -0,0 +1,89 @@
+from alerts import RulesEngine, load_rules
+
+HOUR = 3600.0
+T0 = 1_760_000_000.0
+
+
+def high_bp(ts, row_id):
+    return {'id': row_id, 'UID': 'u1', 'systolic_bp': 145, 'diastolic_bp': 85, 'created_at': ts}
+
+
+def shared_store():
+    rows = []
+
+    def loader(stream, user_id, since):
+        return [r for r in rows if r['UID'] == user_id and r['created_at'] >= since]
+    return rows, loader
+
+
+def fired_rules(alerts):
+    return [a['rule'] for a in alerts]
+
+
+def test_readings_on_different_workers_fire_the_rule():
+    rows, loader = shared_store()
+    worker_a = RulesEngine(load_rules(), loader=loader)
+    worker_b = RulesEngine(load_rules(), loader=loader)
+
+    first = high_bp(T0, 'r1')
+    rows.append(first)
+    assert worker_a.process('vitals', 'u1', first) == []
+
+    second = high_bp(T0 + HOUR, 'r2')
+    rows.append(second)
+    alerts = worker_b.process('vitals', 'u1', second)
+    assert fired_rules(alerts) == ['preeclampsia_bp']
+    assert alerts[0]['triggered_at'] == T0 + HOUR
+
+
+def test_windows_use_event_time_not_arrival_order():
+    engine = RulesEngine(load_rules())
+    assert engine.process('vitals', 'u1', high_bp(T0, 'r1')) == []
+    # 7 hours apart: outside the 6 hour window
+    assert engine.process('vitals', 'u1', high_bp(T0 + 7 * HOUR, 'r2')) == []
+    # A late upload taken in between pairs with the earlier reading
+    late = engine.process('vitals', 'u1', high_bp(T0 + 3 * HOUR, 'r3'))
+    assert fired_rules(late) == ['preeclampsia_bp']
+
+
+def test_stored_event_is_not_counted_twice():
+    rows, loader = shared_store()
+    engine = RulesEngine(load_rules(), loader=loader)
+    reading = high_bp(T0, 'r1')
+    rows.append(reading)
+    assert engine.process('vitals', 'u1', reading) == []
+    assert engine.process('vitals', 'u1', reading) == []
+
+
+def test_cooldown_is_shared_through_stored_alerts():
+    rows, loader = shared_store()
+    fired_at = {}
+    engine = RulesEngine(load_rules(), loader=loader,
+                         fired_loader=lambda user_id, rule_id: fired_at.get((user_id, rule_id)))
+    fired_at[('u1', 'preeclampsia_bp')] = T0
+    rows.append(high_bp(T0, 'r1'))
+    second = high_bp(T0 + HOUR, 'r2')
+    rows.append(second)
+    assert engine.process('vitals', 'u1', second) == []
+    assert engine.stats()['suppressed'] == 1
+
+
+def test_loader_failure_falls_back_to_memory():
+    def broken(stream, user_id, since):
+        raise RuntimeError('store down')
+
+    engine = RulesEngine(load_rules(), loader=broken)
+    assert engine.process('vitals', 'u1', high_bp(T0, 'r1')) == []
+    assert fired_rules(engine.process('vitals', 'u1', high_bp(T0 + HOUR, 'r2'))) == ['preeclampsia_bp']
+    assert engine.stats()['load_failures'] == 2
+
+
+def test_maternal_predictions_fire_across_a_restart(harness, db):
+    m = harness.app_module
+    body = {'age': 29, 'systolic_bp': 145, 'diastolic_bp': 85,
+            'blood_glucose': 95.5, 'body_temp': 36.8, 'heart_rate': 75}
+    headers = harness.headers('alerts-user')
+    assert harness.client.post('/maternal/predict', headers=headers, json=body).status_code == 200
+    m.alert_engine._users.clear()  # as if the next request reached a fresh worker
+    assert harness.client.post('/maternal/predict', headers=headers, json=body).status_code == 200
+    assert 'preeclampsia_bp' in fired_rules(m.alert_engine.recent('alerts-user'))
@@ -0,0 +1,46 @@
+import pytest
+from flask import Flask
+
+from compression import Compressor, parse_accept_encoding
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding('gzip, deflate;q=0.5, br;q=0, *;q=bad') == {
+        'gzip': 1.0, 'deflate': 0.5, 'br': 0.0, '*': 0.0}
+    assert parse_accept_encoding('') == {}
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('GZIP; Q=0.0', None),
+    ('deflate, gzip;q=0', None),
+    ('*', 'gzip'),
+    ('*;q=0', None),
+    ('gzip;q=0.5, *;q=0', 'gzip'),
+    ('identity', None),
+    (None, None),
+])
+def test_choose_honours_q_values(header, expected):
+    assert Compressor().choose(header) == expected
+
+
+def test_choose_prefers_the_higher_q_with_brotli():
+    pytest.importorskip('brotli')
+    compressor = Compressor()
+    assert compressor.choose('gzip, br') == 'br'
+    assert compressor.choose('gzip;q=1, br;q=0.5') == 'gzip'
+    assert compressor.choose('gzip, br;q=0') == 'gzip'
+
+
+def test_refused_encoding_is_not_applied():
+    app = Flask(__name__)
+    Compressor(min_size=10).init_app(app)
+
+    @app.route('/big')
+    def big():
+        return {'data': 'x' * 2000}
+
+    client = app.test_client()
+    assert client.get('/big', headers={'Accept-Encoding': 'gzip;q=0'}).headers.get('Content-Encoding') is None
+    assert client.get('/big', headers={'Accept-Encoding': 'gzip'}).headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,75 @@
+from diet_library import parse_conditions, parse_preference, personalize, scale_portion
+
+
+def test_parse_preference():
+    assert parse_preference('Vegetarian') == ('vegetarian', frozenset())
+    assert parse_preference('non veg') == ('non_vegetarian', frozenset())
+    assert parse_preference('vegetarian, lactose intolerant') == ('vegetarian', frozenset({'lactose_free'}))
+    assert parse_preference('vegan, no dairy, gluten free') == ('vegan', frozenset({'lactose_free', 'gluten_free'}))
+    assert parse_preference('no restrictions') == ('non_vegetarian', frozenset())
+    assert parse_preference('veg with eggs') == ('eggetarian', frozenset())
+
+
+def test_parse_preference_misses():
+    assert parse_preference('jain, no onion garlic') is None
+    assert parse_preference('vegan and non veg') is None
+    assert parse_preference('lactose free') is None  # no base diet
+    assert parse_preference('') is None
+
+
+def test_negated_preference_is_a_miss():
+    assert parse_preference('not vegetarian') is None
+    assert parse_preference('no veg') is None
+
+
+def test_parse_conditions():
+    assert parse_conditions('mild morning sickness') == frozenset({'nausea'})
+    assert parse_conditions('None') == frozenset()
+    assert parse_conditions('no issues') == frozenset()
+    assert parse_conditions('high BP and acidity') == frozenset({'hypertension', 'heartburn'})
+    assert parse_conditions('swollen feet') is None
+
+
+def test_negated_condition_is_a_miss():
+    assert parse_conditions('no diabetes') is None
+    assert parse_conditions('not nauseous') is None
+    assert parse_conditions('tired but no heartburn') is None
+
+
+def test_scale_portion():
+    assert scale_portion('1/2 cup', 1.5) == '3/4 cup'
+    assert scale_portion('150 g', 1.1) == '165 g'
+    assert scale_portion('2 pieces', 1.2) == '2 pieces'
+    assert scale_portion('1 bowl', 0.85) == '3/4 bowl'  # nearest quarter
+    assert scale_portion('1.5 cups', 1.2) == '1.75 cups'
+    assert scale_portion('1 tsp ginger', 1.2) == '1 tsp ginger'  # spices are left alone
+    assert scale_portion('100 ml', 1.0) == '100 ml'
+    assert scale_portion('', 1.2) == ''
+
+
+SECTIONS = {
+    'Breakfast': [{'food': 'Warm milk with saffron', 'portion': '1 cup'},
+                  {'food': 'Poha', 'portion': '1 bowl'}],
+    'Lunch': [{'food': 'Roti', 'portion': '2 pieces'}, {'food': 'Palak dal', 'portion': '200 g'}],
+    'Snacks': [{'food': 'Almond milk', 'portion': '1 glass'}],
+    'Dinner': [{'food': 'Chicken curry', 'portion': '150 g'}, {'food': 'Rice', 'portion': '1 cup'}],
+}
+
+
+def test_personalize_filters_and_scales():
+    plan = personalize(SECTIONS, 72, {'vegetarian', 'lactose_free'})
+    assert [item['food'] for item in plan['Breakfast']] == ['Poha']
+    assert plan['Snacks'] == [{'food': 'Almond milk', 'portion': '1.25 glass'}]  # plant milk isn't dairy
+    assert plan['Dinner'] == [{'food': 'Rice', 'portion': '1.25 cup'}]
+    assert plan['Lunch'][1] == {'food': 'Palak dal', 'portion': '240 g'}
+    assert SECTIONS['Dinner'][0]['food'] == 'Chicken curry'  # the stored plan is untouched
+
+
+def test_personalize_clamps_weight_and_ignores_bad_values():
+    assert personalize(SECTIONS, 200, set())['Lunch'][1]['portion'] == '240 g'
+    assert personalize(SECTIONS, 'heavy', set())['Lunch'][1]['portion'] == '200 g'
+    assert personalize(SECTIONS, None, set()) == SECTIONS
+
+
+def test_personalize_empty_meal_is_a_miss():
+    assert personalize(SECTIONS, 60, {'nut_free'}) is None
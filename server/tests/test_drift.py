@@ -0,0 +1,127 @@
+import os
+import random
+
+import pytest
+
+from drift import CategorySketch, DriftMonitor, Sketch, compare, load_sketch, status_for
+
+FEATURES = {'vitals': ['bp', 'symptoms']}
+
+
+def sketch_of(values, alpha=0.01):
+    sketch = Sketch(alpha)
+    for v in values:
+        sketch.add(v)
+    return sketch
+
+
+def exact_quantile(values, q):
+    return sorted(values)[int(q * (len(values) - 1))]
+
+
+def test_quantiles_are_within_relative_error():
+    rng = random.Random(1)
+    values = [rng.lognormvariate(4, 1) for _ in range(20000)] + [-v for v in range(1, 50)] + [0.0] * 30
+    sketch = sketch_of(values)
+    for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+        exact = exact_quantile(values, q)
+        assert sketch.quantile(q) == pytest.approx(exact, rel=0.01, abs=1e-9)
+    assert sketch.quantile(0) == pytest.approx(min(values), rel=0.01)
+    assert sketch.quantile(1) == max(values)  # clamped to the largest value seen
+    assert Sketch().quantile(0.5) is None
+
+
+def test_nan_is_ignored():
+    sketch = sketch_of([1.0, float('nan'), 2.0])
+    assert sketch.count == 2
+
+
+def test_merge_equals_one_sketch_of_all_values():
+    rng = random.Random(2)
+    a = [rng.gauss(120, 15) for _ in range(3000)]
+    b = [rng.gauss(80, 10) for _ in range(2000)]
+    merged = sketch_of(a).merge(sketch_of(b))
+    whole = sketch_of(a + b)
+    assert merged.to_dict() == whole.to_dict()
+    # and survives the round trip through the state files
+    assert load_sketch(merged.to_dict()).buckets() == whole.buckets()
+    with pytest.raises(ValueError):
+        Sketch(0.01).merge(Sketch(0.02))
+
+
+def test_category_sketch_merge_caps_keys():
+    a, b = CategorySketch(max_keys=2), CategorySketch(max_keys=2)
+    a.add(['nausea', 'fatigue'])
+    b.add(['nausea', 'headache'])
+    a.merge(b)
+    assert a.counts == {'nausea': 2, 'fatigue': 1, CategorySketch.OTHER: 1}
+    assert a.count == 4
+
+
+def test_psi_and_ks():
+    rng = random.Random(3)
+    reference = sketch_of([rng.gauss(120, 15) for _ in range(5000)])
+    same = sketch_of([rng.gauss(120, 15) for _ in range(5000)])
+    shifted = sketch_of([rng.gauss(150, 15) for _ in range(5000)])
+    stable, drifted = compare(reference, same), compare(reference, shifted)
+    assert stable['psi'] < 0.1 and stable['ks'] < 0.05
+    assert drifted['psi'] > 0.25 and drifted['ks'] > 0.5
+    assert status_for(stable['psi']) == 'stable'
+    assert status_for(drifted['psi']) == 'drift'
+    assert status_for(0.2) == 'moderate'
+
+
+def test_categorical_psi():
+    reference, live = CategorySketch(), CategorySketch()
+    reference.add(['nausea'] * 50 + ['fatigue'] * 50)
+    live.add(['nausea'] * 90 + ['fatigue'] * 10)
+    scores = compare(reference, live)
+    assert scores['ks'] is None
+    assert scores['psi'] > 0.25
+
+
+def test_windows_from_other_processes_are_merged(tmp_path):
+    worker = DriftMonitor(FEATURES, state_dir=str(tmp_path), interval=0)
+    for bp in (110, 120, 130):
+        worker.observe('vitals', [bp, ['nausea']])
+    assert worker.flush() == 1
+    # Pretend the file came from another worker process.
+    directory = tmp_path / 'vitals'
+    [name] = os.listdir(directory)
+    window, pid = name[:-len('.json')].split('-')
+    os.rename(directory / name, directory / f"{window}-{int(pid) + 1}.json")
+
+    monitor = DriftMonitor(FEATURES, state_dir=str(tmp_path), interval=0)
+    monitor.observe('vitals', [140, ['fatigue']])
+    merged = monitor.merged('vitals')
+    assert merged['bp'].count == 4
+    assert merged['bp'].max == 140 and merged['bp'].min == 110
+    assert merged['symptoms'].counts == {'fatigue': 1, 'nausea': 3}
+
+    # This process's own file is skipped (its windows come from memory).
+    monitor.flush()
+    assert monitor.merged('vitals')['bp'].count == 4
+
+
+def test_expired_window_files_are_removed(tmp_path):
+    directory = tmp_path / 'vitals'
+    directory.mkdir()
+    (directory / '1-99999.json').write_text('{}')
+    monitor = DriftMonitor(FEATURES, state_dir=str(tmp_path), interval=0)
+    assert monitor.merged('vitals')['bp'].count == 0
+    assert not os.listdir(directory)
+
+
+def test_check_reports_status_per_feature():
+    rng = random.Random(4)
+    reference = {'vitals': {'source': 'test', 'rows': 1000, 'created_at': 'now', 'features': {
+        'bp': sketch_of([rng.gauss(120, 10) for _ in range(1000)])}}}
+    monitor = DriftMonitor(FEATURES, reference=reference, state_dir=None, interval=0, min_count=50)
+    for _ in range(200):
+        monitor.observe('vitals', [rng.gauss(160, 10), ['nausea']])
+    monitor.observe('vitals', [120])  # wrong length
+    result = monitor.check()['vitals']
+    assert result['features']['bp']['status'] == 'drift'
+    assert result['features']['symptoms']['status'] == 'no_reference'
+    assert result['drifted'] == ['bp']
+    assert monitor.counts['rejected'] == 1
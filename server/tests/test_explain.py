@@ -0,0 +1,44 @@
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+
+from explain import Explainer, explain_frame
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+
+
+@pytest.fixture(scope='module')
+def fetal():
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # pickles from an older scikit-learn
+        model = joblib.load(os.path.join(API_DIR, 'fetal_health_model.sav'))
+        scaler = joblib.load(os.path.join(API_DIR, 'scaleX1.pkl'))
+    return model, scaler
+
+
+def rows(scaler, n=4):
+    return np.random.default_rng(3).uniform(scaler.data_min_, scaler.data_max_, (n, scaler.n_features_in_))
+
+
+def test_contributions_from_arrays_do_not_warn(fetal):
+    model, scaler = fetal
+    explainer = Explainer(model, scaler, scaler.feature_names_in_)
+    X = rows(scaler)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        contrib = explainer.contributions(X)
+    assert contrib.shape[0] == len(X)
+    assert contrib.shape[2] == len(scaler.feature_names_in_) + 1
+
+
+def test_explain_frame_from_arrays_does_not_warn(fetal):
+    model, scaler = fetal
+    X = rows(scaler, 8)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', UserWarning)
+        warnings.filterwarnings('ignore', message='Trying to unpickle')
+        contrib = explain_frame(os.path.join(API_DIR, 'fetal_health_model.sav'), scaler, X, workers=1)
+    assert contrib.shape[0] == 8
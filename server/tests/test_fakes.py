@@ -0,0 +1,60 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from fakes import FakeLLMServer, FakeNodeServer, FakeSupabase
+
+
+def post(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode(), {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, json.loads(response.read())
+
+
+def test_supabase_filters_orders_and_pages():
+    db = FakeSupabase()
+    db.seed('vitals', [{'UID': 'a', 'n': i} for i in range(5)] + [{'UID': 'b', 'n': 9}])
+    rows = db.table('vitals').select('n').eq('UID', 'a').gte('n', 1).order('n', desc=True).range(0, 1).execute().data
+    assert rows == [{'n': 4}, {'n': 3}]
+    assert db.calls == 1
+
+
+def test_supabase_fail_rate_is_deterministic():
+    db = FakeSupabase(fail_rate=0.5)
+    outcomes = []
+    for _ in range(4):
+        try:
+            db.table('vitals').insert({'UID': 'a'}).execute()
+            outcomes.append('ok')
+        except ConnectionError:
+            outcomes.append('failed')
+    assert outcomes == ['ok', 'failed', 'ok', 'failed']
+    assert len(db.tables['vitals']) == 2
+
+
+def test_supabase_timeout():
+    db = FakeSupabase(latency=1.0, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        db.table('vitals').select().execute()
+
+
+def test_llm_faults_then_recovers():
+    with FakeLLMServer(reply='hello there') as llm:
+        llm.faults = [(429, {'Retry-After': '1'})]
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post(llm.chat_url, {'messages': [{'role': 'user', 'content': 'hi'}]})
+        assert error.value.code == 429 and error.value.headers['Retry-After'] == '1'
+        status, body = post(llm.chat_url, {'messages': [{'role': 'user', 'content': 'hi'}]})
+        assert status == 200
+        assert body['choices'][0]['message']['content'] == 'hello there'
+        assert body['usage']['completion_tokens'] == 2
+        assert llm.requests_served == 2
+
+
+def test_node_status_fault():
+    with FakeNodeServer(status=503) as node:
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{node.url}/api/reports/diagnosis", timeout=5)
+        assert error.value.code == 503
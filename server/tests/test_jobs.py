@@ -0,0 +1,83 @@
+import threading
+import time
+
+import pytest
+
+from jobs import DONE, FAILED, JobQueue, JobQueueFull
+
+
+def blocked_queue(**kwargs):
+    """A one-worker queue whose worker is held on a gate job until `gate.set()`."""
+    jobs = JobQueue(workers=1, **kwargs)
+    gate, started = threading.Event(), threading.Event()
+    jobs.submit('gate', 'u0', 'gate', lambda: (started.set(), gate.wait(5)))
+    assert started.wait(5)
+    return jobs, gate
+
+
+def test_identical_submissions_attach_to_one_job():
+    jobs, gate = blocked_queue()
+    runs = []
+    first, attached = jobs.submit('diet', 'u1', 'k', lambda: runs.append(1) or 'plan')
+    second, attached_again = jobs.submit('diet', 'u1', 'k', lambda: runs.append(2) or 'other')
+    assert (attached, attached_again) == (False, True)
+    assert second is first
+    # Other users and other kinds don't share the job
+    assert jobs.submit('diet', 'u2', 'k', lambda: 'x')[0] is not first
+    assert jobs.submit('remedy', 'u1', 'k', lambda: 'x')[0] is not first
+    gate.set()
+    assert jobs.get(first.id, wait=5).result == 'plan'
+    assert runs == [1]
+    # A retained successful job still absorbs retries
+    assert jobs.submit('diet', 'u1', 'k', lambda: 'again') == (first, True)
+
+
+def test_failed_jobs_are_not_reused():
+    jobs = JobQueue(workers=1)
+    failed, _ = jobs.submit('diet', 'u1', 'k', lambda: 1 / 0)
+    assert jobs.get(failed.id, wait=5).status == FAILED
+    retry, attached = jobs.submit('diet', 'u1', 'k', lambda: 'plan')
+    assert not attached and retry is not failed
+    assert jobs.get(retry.id, wait=5).status == DONE
+
+
+def test_lower_priority_value_runs_first():
+    jobs, gate = blocked_queue()
+    order = []
+    submitted = [jobs.submit('job', 'u1', name, lambda name=name: order.append(name), priority=priority)[0]
+                 for name, priority in (('late', 20), ('urgent', 1), ('normal', 10), ('normal-2', 10))]
+    gate.set()
+    for job in submitted:
+        jobs.get(job.id, wait=5)
+    assert order == ['urgent', 'normal', 'normal-2', 'late']
+
+
+def test_full_queue_rejects_submissions():
+    jobs, gate = blocked_queue(max_queued=1)
+    jobs.submit('diet', 'u1', 'a', lambda: 'a')
+    with pytest.raises(JobQueueFull):
+        jobs.submit('diet', 'u1', 'b', lambda: 'b')
+    gate.set()
+    assert jobs.counts['rejected'] == 1
+
+
+def test_finished_jobs_are_kept_for_the_retention_period():
+    jobs = JobQueue(workers=1, retention=0.2)
+    job, _ = jobs.submit('diet', 'u1', 'k', lambda: 'plan')
+    assert jobs.get(job.id, wait=5).result == 'plan'
+    assert jobs.get(job.id) is job
+    time.sleep(0.25)
+    assert jobs.get(job.id) is None
+    assert jobs.counts['expired'] == 1
+    # Once expired, the same payload generates again
+    assert jobs.submit('diet', 'u1', 'k', lambda: 'fresh')[1] is False
+
+
+def test_job_status_hides_other_users_jobs(harness):
+    job, _ = harness.app_module.job_queue.submit('diet', 'owner', 'status-test', lambda: {'plan': 'ok'})
+    job.finished.wait(5)
+    other = harness.client.get(f"/jobs/{job.id}", headers=harness.headers('someone-else'))
+    assert other.status_code == 404
+    mine = harness.client.get(f"/jobs/{job.id}", headers=harness.headers('owner'))
+    assert mine.status_code == 200
+    assert mine.get_json()['result'] == {'plan': 'ok'}
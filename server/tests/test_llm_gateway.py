@@ -0,0 +1,16 @@
+from llm_gateway import backends_from_env, gateway_from_env
+
+ENV = {'GROQ_API_KEY': 'key', 'OLLAMA_API_HOST': 'http://127.0.0.1:9'}
+
+
+def test_default_backends_prefer_groq():
+    assert [b.name for b in backends_from_env(ENV)] == ['groq', 'ollama']
+
+
+def test_backends_override_env():
+    gateway = gateway_from_env({**ENV, 'LLM_BACKENDS': 'groq,ollama'}, backends='ollama')
+    assert [b.name for b in gateway.backends] == ['ollama']
+
+
+def test_groq_skipped_without_key():
+    assert [b.name for b in backends_from_env({'LLM_BACKENDS': 'groq,ollama'})] == ['ollama']
@@ -0,0 +1,65 @@
+import os
+import warnings
+
+import joblib
+import numpy as np
+import pytest
+
+import portable
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+FETAL_DATA = os.path.join(API_DIR, '..', 'models', 'fetal_health.csv')
+
+
+@pytest.fixture(scope='module', params=sorted(portable.MODELS))
+def deployed(request):
+    """(name, native model, scaler, exported ensemble) for each shipped export."""
+    model_file, scaler_file, export_file = portable.MODELS[request.param]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # pickles from older scikit-learn / xgboost
+        model = joblib.load(os.path.join(API_DIR, model_file))
+        scaler = joblib.load(os.path.join(API_DIR, scaler_file))
+    return request.param, model, scaler, portable.load(os.path.join(API_DIR, export_file))
+
+
+def check(model, scaler, ensemble, X):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # feature names on the native path
+        return portable.parity(model, scaler, ensemble, X)
+
+
+def assert_parity(result):
+    assert result['agree'] == result['rows'], result['mismatches']
+    assert result['proba_close'], result['max_proba_diff']
+    assert result['scaled_equal']
+
+
+def test_export_matches_native_on_sampled_rows(deployed):
+    name, model, scaler, ensemble = deployed
+    X = portable.sample_rows(ensemble, 5000, seed=11)
+    assert_parity(check(model, scaler, ensemble, X))
+
+
+def test_export_matches_native_with_missing_values(deployed):
+    name, model, scaler, ensemble = deployed
+    X = portable.sample_rows(ensemble, 2000, seed=12)
+    X[np.random.default_rng(13).random(X.shape) < 0.15] = np.nan
+    assert_parity(check(model, scaler, ensemble, X))
+
+
+def test_fetal_export_matches_native_on_the_dataset(deployed):
+    name, model, scaler, ensemble = deployed
+    if name != 'fetal' or not os.path.exists(FETAL_DATA):
+        pytest.skip('CTG dataset rows apply to the fetal model')
+    import pandas as pd
+    X = pd.read_csv(FETAL_DATA)[ensemble.features].to_numpy(dtype=float)
+    assert_parity(check(model, scaler, ensemble, X))
+
+
+def test_parity_reports_probability_drift(deployed):
+    name, model, scaler, ensemble = deployed
+    X = portable.sample_rows(ensemble, 200, seed=14)
+    ensemble = portable.load(os.path.join(API_DIR, portable.MODELS[name][2]))
+    ensemble.value = ensemble.value * 1.01
+    result = check(model, scaler, ensemble, X)
+    assert not result['proba_close']
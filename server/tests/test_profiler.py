@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from profiler import AllocationTracker, ProfilerBusy, SamplingProfiler, folded, top_functions
+
+ADMIN = '00000000-0000-4000-8000-00000000ad02'
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profile_samples_other_threads():
+    stop = threading.Event()
+    worker = threading.Thread(target=spin, args=(stop,), name='spinner')
+    worker.start()
+    try:
+        result = SamplingProfiler().profile(0.2, 0.002, by_thread=True)
+    finally:
+        stop.set()
+        worker.join()
+    assert result['samples'] > 10
+    assert any(frames[0] == 'spinner' and frames[-1].startswith('spin (') for frames in result['stacks'])
+    assert folded(result['stacks']).endswith('\n')
+    assert top_functions(result['stacks'])[0]['total'] > 0
+
+
+def test_duration_is_capped():
+    start = time.perf_counter()
+    SamplingProfiler(max_seconds=0.05).profile(30, 0.01)
+    assert time.perf_counter() - start < 1
+
+
+@pytest.mark.parametrize('seconds, interval', [
+    (float('nan'), 0.005), (float('inf'), 0.005), (0.1, float('nan')), (0.1, float('inf')), ('nan', 0.005)])
+def test_non_finite_arguments_are_rejected(seconds, interval):
+    profiler = SamplingProfiler()
+    with pytest.raises(ValueError):
+        profiler.profile(seconds, interval)
+    # the lock wasn't taken
+    assert profiler.profile(0.01, 0.005)['samples'] >= 1
+
+
+def test_one_profile_at_a_time():
+    profiler = SamplingProfiler()
+    thread = threading.Thread(target=profiler.profile, args=(0.3,))
+    thread.start()
+    time.sleep(0.05)
+    try:
+        with pytest.raises(ProfilerBusy):
+            profiler.profile(0.01)
+    finally:
+        thread.join()
+
+
+def test_allocation_tracker_rejects_non_finite_duration():
+    with pytest.raises(ValueError):
+        AllocationTracker().start(max_seconds=float('nan'))
+
+
+@pytest.mark.parametrize('query', ['seconds=nan', 'seconds=inf', 'interval_ms=nan', 'interval_ms=-inf',
+                                   'seconds=abc'])
+def test_profile_endpoint_rejects_bad_numbers(harness, monkeypatch, query):
+    monkeypatch.setattr(harness.app_module, 'ADMIN_USER_IDS', {ADMIN})
+    response = harness.client.get(f'/admin/profile?{query}', headers=harness.headers(ADMIN))
+    assert response.status_code == 400
+
+
+def test_memory_endpoint_rejects_non_finite_duration(harness, monkeypatch):
+    monkeypatch.setattr(harness.app_module, 'ADMIN_USER_IDS', {ADMIN})
+    response = harness.client.post('/admin/memory?max_seconds=nan', headers=harness.headers(ADMIN))
+    assert response.status_code == 400
@@ -0,0 +1,105 @@
+import pytest
+
+from fakes import FakeSupabase
+from resilience import (CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, GuardedClient,
+                        LastKnownGood)
+
+
+def fail():
+    raise ConnectionError('down')
+
+
+def elapse(breaker):
+    """Pretend the recovery timeout has passed."""
+    breaker.opened_at -= breaker.recovery_timeout
+
+
+def test_breaker_opens_after_consecutive_failures_and_fails_fast():
+    breaker = CircuitBreaker('db', failure_threshold=3, recovery_timeout=30)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.call(lambda: 'ok') == 'ok'  # a success resets the count
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == OPEN and breaker.is_open()
+    calls = []
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(lambda: calls.append(1))
+    assert calls == [] and 0 < error.value.retry_after <= 30
+    assert breaker.snapshot()['rejected'] == 1
+
+
+def test_half_open_trial_success_closes_the_breaker():
+    breaker = CircuitBreaker('db', failure_threshold=1, recovery_timeout=30)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    elapse(breaker)
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one trial at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.call(lambda: 'ok') == 'ok'
+
+
+def test_half_open_trial_failure_reopens_the_breaker():
+    breaker = CircuitBreaker('db', failure_threshold=5, recovery_timeout=30)
+    breaker._transition(OPEN)
+    elapse(breaker)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == OPEN and breaker.is_open()
+
+
+def test_ignored_errors_do_not_count_and_release_the_trial():
+    breaker = CircuitBreaker('db', failure_threshold=1, recovery_timeout=30, ignore=(KeyError,))
+    with pytest.raises(KeyError):
+        breaker.call(lambda: {}['missing'])
+    assert breaker.state == CLOSED
+    breaker._transition(OPEN)
+    elapse(breaker)
+    with pytest.raises(KeyError):
+        breaker.call(lambda: {}['missing'])
+    assert breaker.state == HALF_OPEN
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+
+
+def test_guarded_client_passes_through_and_counts_executes():
+    db = FakeSupabase()
+    db.seed('vitals', [{'UID': 'u1', 'heart_rate': 80}, {'UID': 'u2', 'heart_rate': 90}])
+    breaker = CircuitBreaker('db', failure_threshold=1)
+    client = GuardedClient(db, breaker)
+    assert client.tables is db.tables  # plain attributes are untouched
+    result = client.table('vitals').select('heart_rate').eq('UID', 'u2').execute()
+    assert result.data == [{'heart_rate': 90}]
+    assert breaker.snapshot()['successes'] == 1
+    db.fail_rate = 1.0
+    with pytest.raises(ConnectionError):
+        client.table('vitals').select('*').execute()
+    with pytest.raises(CircuitOpenError):
+        client.table('vitals').select('*').execute()
+
+
+def test_last_known_good_only_covers_dependency_failures():
+    cache = LastKnownGood()
+    assert cache.fetch('k', lambda: {'hr': 80}) == ({'hr': 80}, False)
+    assert cache.fetch('k', fail) == ({'hr': 80}, True)
+    assert cache.fetch('k', lambda: (_ for _ in ()).throw(CircuitOpenError('db', 1))) == ({'hr': 80}, True)
+    assert cache.fetch('other', fail, default={}) == ({}, True)
+    with pytest.raises(KeyError):
+        cache.fetch('k', lambda: {}['typo'])
+
+
+def test_symptom_risk_flags_degraded_vitals(harness, db):
+    headers = harness.headers('degraded-user')
+    body = {'symptom_categories': ['digestive', 'fatigue']}
+    healthy = harness.client.post('/ayurveda/map_symptom_risk', headers=headers, json=body)
+    assert healthy.status_code == 200 and healthy.get_json()['degraded'] is False
+    db.fail_rate = 1.0
+    outage = harness.client.post('/ayurveda/map_symptom_risk', headers=headers, json=body)
+    assert outage.status_code == 200 and outage.get_json()['degraded'] is True
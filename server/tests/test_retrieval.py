@@ -0,0 +1,10 @@
+from retrieval import TokenLedger
+
+
+def test_ledger_averages_per_mode_without_cross_mode_fields():
+    ledger = TokenLedger()
+    ledger.record('diet', 'retrieval', {'prompt_tokens': 100, 'completion_tokens': 40, 'prompt_tokens_saved': 30})
+    ledger.record('diet', 'retrieval', {'prompt_tokens': 120, 'completion_tokens': 60, 'prompt_tokens_saved': 10})
+    report = ledger.snapshot()
+    assert report == {'diet': {'retrieval': {
+        'requests': 2, 'avg_prompt_tokens': 110.0, 'avg_completion_tokens': 50.0, 'avg_prompt_tokens_saved': 20.0}}}
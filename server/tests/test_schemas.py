@@ -0,0 +1,88 @@
+import pytest
+from flask_restx import Model, fields
+
+from schemas import ValidationError, compile_model
+
+VITALS = Model('Vitals', {
+    'age': fields.Integer(required=True, min=10, max=60),
+    'temp': fields.Float(min=30, max=45, exclusiveMin=True, exclusiveMax=True),
+    'trimester': fields.String(enum=['First', 'Second', 'Third']),
+    'features': fields.List(fields.Float, min_items=2, max_items=4),
+    'flags': fields.List(fields.Boolean),
+})
+PATIENT = Model('Patient', {
+    'name': fields.String(required=True, min_length=2),
+    'vitals': fields.Nested(VITALS, required=True),
+    'history': fields.List(fields.Nested(VITALS)),
+})
+
+vitals = compile_model(VITALS)
+patient = compile_model(PATIENT)
+
+
+def errors(validator, data):
+    with pytest.raises(ValidationError) as info:
+        validator.validate(data)
+    return info.value.errors
+
+
+def test_numeric_strings_are_coerced_and_extras_kept():
+    clean = vitals.validate({'age': ' 28 ', 'temp': '37.5', 'node_token': 'x'})
+    assert clean == {'age': 28, 'temp': 37.5, 'node_token': 'x'}
+    assert type(clean['age']) is int
+    assert errors(vitals, {'age': 28.5}) == ['age: must be an integer']
+    assert errors(vitals, {'age': 'old'}) == ['age: must be an integer']
+    assert errors(vitals, {'age': True}) == ['age: must be an integer']
+    assert errors(vitals, {'age': 'nan'}) == ['age: must be finite']
+
+
+def test_required_and_null_fields():
+    assert errors(vitals, {}) == ['age: is required']
+    assert vitals.validate({'age': 30, 'temp': None}) == {'age': 30, 'temp': None}
+    assert errors(vitals, []) == [': must be an object']
+
+
+def test_enum_matches_case_insensitively_and_returns_declared_spelling():
+    assert vitals.validate({'age': 30, 'trimester': ' second '})['trimester'] == 'Second'
+    assert errors(vitals, {'age': 30, 'trimester': 'fourth'}) == ['trimester: must be one of First, Second, Third']
+
+
+def test_inclusive_and_exclusive_bounds():
+    assert vitals.validate({'age': 10})['age'] == 10
+    assert vitals.validate({'age': 60})['age'] == 60
+    assert errors(vitals, {'age': 61}) == ['age: must be <= 60']
+    assert vitals.validate({'age': 30, 'temp': 30.01})['temp'] == 30.01
+    assert errors(vitals, {'age': 30, 'temp': 30}) == ['temp: must be > 30']
+    assert errors(vitals, {'age': 30, 'temp': 45}) == ['temp: must be < 45']
+
+
+def test_plain_float_lists():
+    assert vitals.validate({'age': 30, 'features': [1, 2.5, 3]})['features'] == [1.0, 2.5, 3.0]
+    # Anything the fast path can't take is checked item by item.
+    assert vitals.validate({'age': 30, 'features': ['1', 2]})['features'] == [1.0, 2.0]
+    assert errors(vitals, {'age': 30, 'features': [1.0, True]}) == ['features[1]: must be a number']
+    assert errors(vitals, {'age': 30, 'features': [float('nan'), 1.0]}) == ['features[0]: must be finite']
+    assert errors(vitals, {'age': 30, 'features': [1.0, float('inf')]}) == ['features[1]: must be finite']
+    assert errors(vitals, {'age': 30, 'features': [1.0, None]}) == ['features[1]: must be a number']
+    assert errors(vitals, {'age': 30, 'features': [1.0]}) == ['features: must have at least 2 items']
+    assert errors(vitals, {'age': 30, 'features': [1.0] * 5}) == ['features: must have at most 4 items']
+    assert errors(vitals, {'age': 30, 'flags': [True, 1]}) == ['flags[1]: must be true or false']
+
+
+def test_nested_errors_carry_their_path():
+    assert errors(patient, {'name': 'A', 'vitals': {'age': 5}, 'history': [{'age': 30}, {'trimester': 'x'}]}) == [
+        'name: must be at least 2 characters',
+        'vitals.age: must be >= 10',
+        'history[1].age: is required',
+        'history[1].trimester: must be one of First, Second, Third',
+    ]
+    clean = patient.validate({'name': 'Asha', 'vitals': {'age': '30'}})
+    assert clean['vitals'] == {'age': 30}
+
+
+def test_batch_errors_are_keyed_by_index():
+    valid, failed = vitals.validate_batch([{'age': '20'}, {'age': 70}, {'trimester': 'first', 'age': 30}, 'x'])
+    assert valid == [{'age': 20}, {'trimester': 'First', 'age': 30}]
+    assert failed == {1: ['[1].age: must be <= 60'], 3: ['[3]: must be an object']}
+    with pytest.raises(ValidationError):
+        vitals.validate_batch({'age': 20})
@@ -0,0 +1,46 @@
+import json
+
+from semantic_cache import ReviewQueue, SemanticCache, fit_vectorizer
+
+QUESTIONS = ['which herbs ease morning sickness in pregnancy', 'is ginger tea safe for morning sickness',
+             'what foods help with pregnancy constipation']
+
+
+def test_load_serves_only_vetted_entries(tmp_path):
+    cache = SemanticCache(fit_vectorizer(QUESTIONS), threshold=0.5)
+    cache.add(QUESTIONS[0], 'vetted answer', vetted=True)
+    cache.add(QUESTIONS[2], 'answer given to one patient')
+    path = str(tmp_path / 'cache.pkl')
+    cache.save(path)
+
+    loaded = SemanticCache.load(path, threshold=0.5)
+    assert len(loaded) == 1
+    assert loaded.lookup(QUESTIONS[0])[0] == 'vetted answer'
+    assert loaded.lookup(QUESTIONS[2]) is None
+
+
+def test_review_queue_appends(tmp_path):
+    queue = ReviewQueue(str(tmp_path / 'review' / 'queue.jsonl'))
+    assert queue.submit('q1', 'a1') and queue.submit('q2', 'a2')
+    lines = [json.loads(line) for line in open(queue.path)]
+    assert [(l['question'], l['answer']) for l in lines] == [('q1', 'a1'), ('q2', 'a2')]
+
+
+def test_live_answers_are_not_shared_between_users(harness, db, tmp_path, monkeypatch):
+    m = harness.app_module
+    cache = m.semantic_cache.get()
+    before = len(cache)
+    question = {'message': 'which herbs ease morning sickness in pregnancy'}
+
+    first = harness.client.post('/chat/history', headers=harness.headers('patient-a'), json=question)
+    assert first.status_code == 200 and not first.get_json()['cached']
+    second = harness.client.post('/chat/history', headers=harness.headers('patient-b'), json=question)
+    assert second.status_code == 200 and not second.get_json()['cached']
+    assert len(cache) == before
+
+    review = ReviewQueue(str(tmp_path / 'review.jsonl'))
+    monkeypatch.setattr(m, 'SEMANTIC_CACHE_ADMIT', True)
+    monkeypatch.setattr(m, 'semantic_review', review)
+    response = harness.client.post('/chat/history', headers=harness.headers('patient-c'), json=question)
+    assert response.status_code == 200
+    assert review.submitted == 1 and len(cache) == before
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+from shadow import Candidate, ShadowEvaluator, ShadowStore
+
+ADMIN = '00000000-0000-4000-8000-00000000ad01'
+USER = '00000000-0000-4000-8000-0000000005e1'
+
+
+def evaluator(tmp_path, busy=None, **kwargs):
+    model_path = tmp_path / 'candidate.sav'
+    model_path.write_bytes(b'candidate')
+    candidate = Candidate('fetal', str(model_path), lambda: 'model',
+                          lambda model, inputs: int(sum(inputs) > 10))
+    store = ShadowStore(str(tmp_path / 'shadow.sqlite'))
+    return ShadowEvaluator([candidate], store, sample_rate=1.0, busy=busy, **kwargs)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_scores_and_records_disagreements(tmp_path):
+    shadow = evaluator(tmp_path)
+    shadow.submit('fetal', [1, 2], 0, 1.0)
+    shadow.submit('fetal', [20, 2], 0, 1.0)
+    assert wait_for(lambda: len(shadow.store.disagreements()) == 1)
+    counts = shadow.counts['fetal']
+    assert (counts['scored'], counts['agreed']) == (2, 1)
+    [row] = shadow.store.disagreements()
+    assert row['inputs'] == [20, 2] and row['shadow'] == 1
+    assert shadow.store.summary()['fetal'][shadow.candidates['fetal'].version]['rows'] == 2
+
+
+def test_waits_for_idle_before_scoring(tmp_path):
+    idle = threading.Event()
+    shadow = evaluator(tmp_path, busy=lambda: not idle.is_set(), max_defer=10.0)
+    shadow.submit('fetal', [1], 0, 1.0)
+    time.sleep(0.05)
+    assert shadow.counts['fetal']['scored'] == 0
+    idle.set()
+    assert wait_for(lambda: shadow.counts['fetal']['scored'] == 1)
+    assert (shadow.deferrals, shadow.forced) == (1, 0)
+
+
+def test_sustained_load_still_scores(tmp_path):
+    # Never idle: every batch waits max_defer and is then scored anyway, so
+    # all sampled items that fit the queue get scored at <= batch_size per max_defer.
+    shadow = evaluator(tmp_path, busy=lambda: True, max_defer=0.01, batch_size=4, max_queued=64)
+    start = time.monotonic()
+    for i in range(40):
+        shadow.submit('fetal', [i], 0, 1.0)
+    assert wait_for(lambda: shadow.counts['fetal']['scored'] == 40)
+    assert time.monotonic() - start >= 10 * 0.01
+    assert shadow.forced == shadow.deferrals >= 10
+    assert shadow.counts['fetal']['dropped'] == 0
+
+
+def test_full_queue_drops(tmp_path):
+    shadow = evaluator(tmp_path, busy=lambda: True, max_defer=10.0, batch_size=1, max_queued=2)
+    results = [shadow.submit('fetal', [i], 0, 1.0) for i in range(5)]
+    # the thread holds the first item while it waits, so 3 fit
+    assert results.count(False) == shadow.counts['fetal']['dropped'] >= 2
+
+
+def test_disagreement_limit_is_clamped(harness, monkeypatch, tmp_path):
+    app = harness.app_module
+    monkeypatch.setattr(app, 'ADMIN_USER_IDS', {ADMIN})
+    shadow = evaluator(tmp_path)
+    for i in range(3):
+        shadow.submit('fetal', [20 + i], 0, 1.0)
+    assert wait_for(lambda: shadow.counts['fetal']['scored'] == 3)
+    monkeypatch.setattr(app, 'shadow', shadow)
+    headers = harness.headers(ADMIN)
+
+    def disagreements(limit):
+        response = harness.client.get(f'/shadow/disagreements?limit={limit}', headers=headers)
+        assert response.status_code == 200, response.get_json()
+        return response.get_json()['disagreements']
+
+    assert len(disagreements(2)) == 2
+    assert len(disagreements(-1)) == 1
+    assert len(disagreements(0)) == 1
+    assert len(disagreements(10 ** 6)) == 3
+    assert harness.client.get('/shadow/disagreements?limit=x', headers=headers).status_code == 400
+
+
+@pytest.mark.parametrize('path', ['/shadow/stats', '/shadow/disagreements'])
+def test_shadow_routes_need_an_admin(harness, monkeypatch, path):
+    monkeypatch.setattr(harness.app_module, 'ADMIN_USER_IDS', {ADMIN})
+    assert harness.client.get(path).status_code == 401
+    assert harness.client.get(path, headers=harness.headers(USER)).status_code == 403
+    assert harness.client.get(path, headers=harness.headers(ADMIN)).status_code == 200
@@ -0,0 +1,94 @@
+import threading
+
+import pytest
+
+from singleflight import SingleFlight, request_key
+
+
+def run_followers(flight, key, fn, count, timeout=None):
+    """Start `count` callers of `flight.do(key, fn)`; returns their outcomes once all finish."""
+    outcomes = [None] * count
+
+    def call(i):
+        try:
+            outcomes[i] = ('ok', flight.do(key, fn, timeout=timeout))
+        except BaseException as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def wait_for_waiters(flight, key, count):
+    for _ in range(1000):
+        with flight._lock:
+            call = flight._calls.get(key)
+            if call is not None and call.waiters >= count:
+                return
+        threading.Event().wait(0.005)
+    raise AssertionError('followers never joined the call')
+
+
+def test_concurrent_identical_keys_share_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return 'answer'
+
+    threads, outcomes = run_followers(flight, 'k', upstream, 5)
+    wait_for_waiters(flight, 'k', 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(shared for _, (_, shared) in outcomes) == [False, True, True, True, True]
+    assert all(result == 'answer' for _, (result, _) in outcomes)
+    assert flight.snapshot() == {'leaders': 1, 'shared': 4, 'in_flight': 0}
+
+
+def test_leader_exception_reaches_followers_and_is_not_cached():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError('upstream down')
+
+    threads, outcomes = run_followers(flight, 'k', failing, 3)
+    wait_for_waiters(flight, 'k', 2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert [kind for kind, _ in outcomes] == ['error'] * 3
+    assert all(isinstance(e, ValueError) for _, e in outcomes)
+    # The failure isn't served to the next caller
+    assert flight.do('k', lambda: 'recovered') == ('recovered', False)
+
+
+def test_follower_timeout_leaves_the_leader_running():
+    flight = SingleFlight()
+    release = threading.Event()
+    leader_threads, leader = run_followers(flight, 'k', lambda: release.wait(5) and 'slow', 1)
+    wait_for_waiters(flight, 'k', 0)
+    with pytest.raises(TimeoutError):
+        flight.do('k', lambda: 'unused', timeout=0.05)
+    with flight._lock:
+        assert flight._calls['k'].waiters == 0
+    release.set()
+    leader_threads[0].join(5)
+    assert leader == [('ok', ('slow', False))]
+
+
+def test_request_key_normalizes_whitespace():
+    a = request_key('m', [{'role': 'user', 'content': '  What   helps\nnausea? '}], temperature=0.2)
+    b = request_key('m', [{'role': 'user', 'content': 'What helps nausea?'}], temperature=0.2)
+    assert a == b
+    assert a != request_key('m', [{'role': 'user', 'content': 'What helps nausea?'}], temperature=0.7)
+    assert a != request_key('other', [{'role': 'user', 'content': 'What helps nausea?'}], temperature=0.2)
+    assert a != request_key('m', [{'role': 'system', 'content': 'What helps nausea?'}], temperature=0.2)
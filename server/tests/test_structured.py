@@ -0,0 +1,120 @@
+import json
+
+from structured import LIFESTYLE, MAX_DEPTH, REMEDIES, repair
+
+LIFESTYLE_JSON = {'self_care': 'Warm oil massage', 'music': 'Soft instrumental',
+                  'exercise': 'Prenatal yoga', 'ayurveda_tip': 'Sip warm water'}
+
+
+def test_repair_closes_truncated_objects():
+    assert repair('{"a": 1, "b": [1, 2') == {'a': 1, 'b': [1, 2]}
+    assert repair('{"a": {"b": [{"c": 1}') == {'a': {'b': [{'c': 1}]}}
+    # a key cut off mid-way: back to the last complete member
+    assert repair('{"a": 1, "b') == {'a': 1}
+    assert repair('{"a": 1, "b":') == {'a': 1}
+
+
+def test_repair_drops_trailing_commas():
+    assert repair('{"a": [1, 2,], "b": 3,}') == {'a': [1, 2], 'b': 3}
+    assert repair('{"a": 1,') == {'a': 1}
+
+
+def test_repair_strips_think_blocks_and_fences():
+    assert repair('<think>the user wants {json}</think>\n```json\n{"a": 1}\n```') == {'a': 1}
+    assert repair('Sure! Here it is:\n```\n{"a": "x"}\n``` Hope that helps.') == {'a': 'x'}
+    # an unterminated think block swallows the rest
+    assert repair('<think>still thinking {"a": 1}') is None
+
+
+def test_repair_gives_up_on_cut_off_strings():
+    assert repair('{"a": "half a sent') == {}
+    assert repair('Here: {"a": "half a sent') is None
+    assert repair('no json here') is None
+
+
+def test_repair_depth_guard():
+    deep = '{"a": ' * (MAX_DEPTH + 1)
+    assert repair(deep) == {}
+    shallow = '{"a": ' * (MAX_DEPTH - 1) + '1'
+    assert repair(shallow) is not None
+
+
+def test_lifestyle_json_and_repaired():
+    result, outcome = LIFESTYLE.parse(json.dumps(LIFESTYLE_JSON))
+    assert (result, outcome) == (LIFESTYLE_JSON, 'json')
+    truncated = json.dumps(LIFESTYLE_JSON)[:-1] + ','
+    assert LIFESTYLE.parse(truncated) == (LIFESTYLE_JSON, 'repaired')
+
+
+def test_lifestyle_partial_json_is_not_read_as_text():
+    result, outcome = LIFESTYLE.parse('{"self_care": "Rest", "music": "Sitar", "exercise": "Walk')
+    assert outcome == 'partial'
+    assert result == {'self_care': 'Rest', 'music': 'Sitar', 'exercise': 'Not found', 'ayurveda_tip': 'Not found'}
+    assert LIFESTYLE.parse('{"mood": "calm"}') == (
+        {key: 'Not found' for key in LIFESTYLE_JSON}, 'failed')
+
+
+def test_lifestyle_text_answer():
+    text = """1. **Self-care activity**: Warm oil massage before bath
+2. **Music**: Soft instrumental
+**Exercise:**
+- Prenatal yoga
+- Short walks
+Ayurvedic tip - Sip warm water"""
+    result, outcome = LIFESTYLE.parse(text)
+    assert outcome == 'text'
+    assert result == {'self_care': 'Warm oil massage before bath', 'music': 'Soft instrumental',
+                      'exercise': 'Prenatal yoga\nShort walks', 'ayurveda_tip': 'Sip warm water'}
+    assert LIFESTYLE.parse('I cannot help with that.')[1] == 'failed'
+
+
+def test_remedies_json():
+    answer = {'prakriti': 'pitta', 'remedies': [{'remedy': 'Ginger tea', 'usage': 'after meals'},
+                                                {'remedy': 'Coconut water'}]}
+    result, outcome = REMEDIES.parse(json.dumps(answer))
+    assert outcome == 'json'
+    assert result == {'prakriti': 'Pitta', 'remedies': [
+        {'remedy': 'Ginger tea - after meals', 'confidence': 1.0},
+        {'remedy': 'Coconut water', 'confidence': 1.0}]}
+
+
+def test_remedies_text_answer():
+    text = """<think>Let me decide.</think>
+Prakriti (body type): Vata-Pitta
+Remedies:
+- Ginger tea after meals
+- Soaked almonds in the morning"""
+    result, outcome = REMEDIES.parse(text)
+    assert outcome == 'text'
+    assert result == {'prakriti': 'Vata-Pitta', 'remedies': [
+        {'remedy': 'Ginger tea after meals', 'confidence': 1.0},
+        {'remedy': 'Soaked almonds in the morning', 'confidence': 1.0}]}
+
+
+def test_remedies_prakriti_canonicalisation():
+    def prakriti(value):
+        return REMEDIES.parse(json.dumps({'prakriti': value, 'remedies': ['Ginger tea']}))[0]['prakriti']
+    assert prakriti('pitta vata') == 'Vata-Pitta'
+    assert prakriti('Vata-Pitta (dominant Vata)') == 'Vata-Pitta'
+    assert prakriti('kapha / pitta') == 'Pitta-Kapha'
+    assert prakriti('TRIDOSHIC') == 'Tridoshic'
+    assert prakriti('Sattvic') == 'Sattvic'  # unknown values are kept as given
+    assert prakriti('  ') is None
+
+
+def test_remedies_without_any_remedy_fail():
+    result, outcome = REMEDIES.parse('{"prakriti": "Vata", "remedies": []}')
+    assert outcome == 'partial'
+    assert result == {'prakriti': 'Vata', 'remedies': []}
+    assert REMEDIES.parse('')[1] == 'failed'
+
+
+def test_stats_count_outcomes():
+    before = REMEDIES.stats.snapshot()['outcomes']
+    REMEDIES.parse('{"remedies": [{"remedy": "Ginger tea"}]}')
+    REMEDIES.parse('')
+    snapshot = REMEDIES.stats.snapshot()
+    assert snapshot['outcomes']['json'] == before.get('json', 0) + 1
+    assert snapshot['outcomes']['failed'] == before.get('failed', 0) + 1
+    assert 0 < snapshot['failure_rate'] <= snapshot['nonconforming_rate'] < 1
+    assert snapshot['parse_us']['max'] >= snapshot['parse_us']['p50']
@@ -0,0 +1,30 @@
+from fakes import FakeSupabase
+from symptom_training import stream_rows
+
+
+def rows(timestamps):
+    return [{'reported_symptoms': f'row {i}', 'classified_categories': [], 'recorded_at': ts}
+            for i, ts in enumerate(timestamps)]
+
+
+def streamed(db, **kwargs):
+    return [row['reported_symptoms'] for row in stream_rows(db, **kwargs)]
+
+
+def test_ties_at_a_page_boundary_are_not_skipped():
+    db = FakeSupabase()
+    db.seed('symptoms', rows(['t1', 't2', 't2', 't2', 't3']))
+    assert streamed(db, page_size=2) == [f'row {i}' for i in range(5)]
+
+
+def test_more_ties_than_a_page():
+    db = FakeSupabase()
+    db.seed('symptoms', rows(['t1'] + ['t2'] * 7 + ['t3', 't3']))
+    assert streamed(db, page_size=3) == [f'row {i}' for i in range(10)]
+
+
+def test_since_is_exclusive():
+    db = FakeSupabase()
+    db.seed('symptoms', rows(['t1', 't2', 't2', 't3']))
+    assert streamed(db, page_size=1, since='t1') == ['row 1', 'row 2', 'row 3']
+    assert streamed(db, page_size=2, since='t3') == []
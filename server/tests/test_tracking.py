@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from tracking import TrackingEngine, event_time
+
+NOW = 1_760_000_000.0
+
+
+def test_event_time_formats():
+    assert event_time(NOW, now=NOW) == NOW
+    assert event_time(NOW * 1000, now=NOW) == NOW
+    assert event_time(str(int(NOW)), now=NOW) == NOW
+    assert event_time(str(int(NOW * 1000)), now=NOW) == NOW
+    assert event_time('2025-10-09T08:53:20Z', now=NOW) == NOW
+
+
+@pytest.mark.parametrize('value', [NOW + 3600, (NOW + 3600) * 1000, 'soon', None, True])
+def test_event_time_rejects(value):
+    with pytest.raises(ValueError):
+        event_time(value, now=NOW)
+
+
+def test_failed_store_leaves_the_tracker_unchanged():
+    engine = TrackingEngine()
+    kicks = [NOW - 120, NOW - 60]
+
+    def failing(new):
+        raise RuntimeError('insert failed')
+
+    with pytest.raises(RuntimeError):
+        engine.add_kicks('u1', kicks, store=failing)
+    stored = []
+    assert engine.add_kicks('u1', kicks, store=stored.extend) == kicks
+    assert stored == kicks
+    # A retry of a batch that was stored is skipped without another write
+    assert engine.add_kicks('u1', kicks + kicks, store=stored.extend) == []
+    assert stored == kicks
+
+
+def kick_batch(count, start):
+    return [start + 60 * i for i in range(count)]
+
+
+def test_kick_upload_dedups_retries(harness, db):
+    headers = harness.headers('tracking-dedup')
+    kicks = kick_batch(3, time.time() - 600)
+    response = harness.client.post('/kicks/', headers=headers, json={'kicks': kicks})
+    assert response.status_code == 200
+    assert response.get_json()['accepted'] == 3
+    retry = harness.client.post('/kicks/', headers=headers, json={'kicks': kicks}).get_json()
+    assert (retry['accepted'], retry['skipped']) == (0, 3)
+    assert len(db.tables['kicks']) == 3
+
+
+def test_kick_upload_insert_failure_can_be_retried(harness, db):
+    headers = harness.headers('tracking-failure')
+    kicks = [str(int(ts * 1000)) for ts in kick_batch(4, time.time() - 600)]
+    db.fail_rate = 1.0
+    response = harness.client.post('/kicks/', headers=headers, json={'kicks': kicks})
+    assert response.status_code == 503
+    db.fail_rate = 0.0
+    retry = harness.client.post('/kicks/', headers=headers, json={'kicks': kicks})
+    assert retry.status_code == 200
+    assert retry.get_json()['accepted'] == 4
+    assert len(db.tables['kicks']) == 4
+
+
+def test_kick_upload_rejects_future_times(harness, db):
+    headers = harness.headers('tracking-future')
+    response = harness.client.post('/kicks/', headers=headers, json={'kicks': [time.time() + 86400]})
+    assert response.status_code == 400
+    assert 'future' in response.get_json()['error']
+    assert not db.tables.get('kicks')
+
+
+def test_contraction_upload_insert_failure_can_be_retried(harness, db):
+    headers = harness.headers('tracking-contractions')
+    start = time.time() - 900
+    contractions = [{'start_time': start + 300 * i, 'duration': 60} for i in range(3)]
+    db.fail_rate = 1.0
+    assert harness.client.post('/contractions/', headers=headers,
+                               json={'contractions': contractions}).status_code == 503
+    db.fail_rate = 0.0
+    retry = harness.client.post('/contractions/', headers=headers, json={'contractions': contractions})
+    assert retry.status_code == 200
+    assert retry.get_json()['accepted'] == 3
+    assert len(db.tables['contractions']) == 3
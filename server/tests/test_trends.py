@@ -0,0 +1,54 @@
+from trends import TrendEngine
+
+
+def shared_store():
+    rows = []
+    return rows, lambda user_id: [r for r in rows if r['UID'] == user_id]
+
+
+def reading(ts, systolic):
+    return {'UID': 'u1', 'systolic_bp': systolic, 'created_at': ts}
+
+
+def test_stale_user_is_rehydrated_from_the_store():
+    rows, loader = shared_store()
+    worker_a = TrendEngine(loader=loader, ttl=60)
+    worker_b = TrendEngine(loader=loader, ttl=60)
+    assert worker_b.summary('u1', now=1000.0)['readings'] == 0
+
+    for ts, value in ((900.0, 120), (950.0, 130)):
+        worker_a.update('u1', reading(ts, value))
+        rows.append(reading(ts, value))
+    assert worker_a.summary('u1')['readings'] == 2
+    assert worker_b.summary('u1')['readings'] == 0
+
+    worker_b._users['u1'].loaded_at -= 61
+    summary = worker_b.summary('u1')
+    assert summary['readings'] == 2
+    assert summary['metrics']['systolic_bp']['last'] == 130
+
+
+def test_failed_rehydration_keeps_the_stale_aggregates():
+    rows, loader = shared_store()
+    rows.append(reading(900.0, 120))
+    healthy = [True]
+
+    def flaky(user_id):
+        if not healthy[0]:
+            raise RuntimeError('store down')
+        return loader(user_id)
+
+    engine = TrendEngine(loader=flaky, ttl=60)
+    assert engine.summary('u1')['readings'] == 1
+    healthy[0] = False
+    engine._users['u1'].loaded_at -= 61
+    assert engine.summary('u1')['readings'] == 1
+
+
+def test_without_ttl_users_are_hydrated_once():
+    rows, loader = shared_store()
+    engine = TrendEngine(loader=loader)
+    assert engine.summary('u1')['readings'] == 0
+    rows.append(reading(900.0, 120))
+    engine._users['u1'].loaded_at -= 10 ** 6
+    assert engine.summary('u1')['readings'] == 0